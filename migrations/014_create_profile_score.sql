@@ -0,0 +1,16 @@
+-- Precomputed Churn/LTV Scores
+-- Written by the ml-scorer-service nightly scoring job, read in SCORE_SERVING_MODE=table
+
+CREATE TABLE IF NOT EXISTS profile_score (
+  profile_id UUID PRIMARY KEY REFERENCES customer_profile(id) ON DELETE CASCADE,
+  churn_probability DOUBLE PRECISION NOT NULL,
+  churn_model_version VARCHAR(255) NOT NULL,
+  predicted_ltv DOUBLE PRECISION NOT NULL,
+  ltv_model_version VARCHAR(255) NOT NULL,
+  profile_updated_at TIMESTAMPTZ NOT NULL, -- customer_profile.updated_at the scores were computed from
+  scored_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_profile_score_scored_at ON profile_score(scored_at);
+
+COMMENT ON TABLE profile_score IS 'Nightly churn/LTV scores; stale when the profile changed after scoring or the model version moved';
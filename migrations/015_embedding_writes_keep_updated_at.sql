@@ -0,0 +1,33 @@
+-- Migration: 015_embedding_writes_keep_updated_at
+-- Description: Embedding-only updates no longer bump customer_profile.updated_at
+--
+-- updated_at means "the profile changed". Writing a derived embedding is not
+-- a change: bumping it made the embedding "changed since" cursor re-read its
+-- own writes and marked precomputed profile_score rows stale.
+
+-- Every column but the derived ones, compared by name: serializing the
+-- row (to_jsonb) would format both 768-dim vectors as text on every UPDATE.
+-- A column added to customer_profile must be added to both rows here.
+CREATE OR REPLACE FUNCTION update_customer_profile_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF NEW.embedding IS DISTINCT FROM OLD.embedding
+     AND ROW(NEW.id, NEW.first_name, NEW.last_name, NEW.full_name, NEW.primary_phone, NEW.primary_email,
+           NEW.gender, NEW.date_of_birth, NEW.city, NEW.state, NEW.country, NEW.postal_code,
+           NEW.ltv, NEW.total_orders, NEW.total_spent, NEW.avg_order_value, NEW.first_seen_at, NEW.last_seen_at,
+           NEW.last_purchase_at, NEW.segment, NEW.tags, NEW.is_merged, NEW.merged_into, NEW.created_at)
+       IS NOT DISTINCT FROM
+       ROW(OLD.id, OLD.first_name, OLD.last_name, OLD.full_name, OLD.primary_phone, OLD.primary_email,
+           OLD.gender, OLD.date_of_birth, OLD.city, OLD.state, OLD.country, OLD.postal_code,
+           OLD.ltv, OLD.total_orders, OLD.total_spent, OLD.avg_order_value, OLD.first_seen_at, OLD.last_seen_at,
+           OLD.last_purchase_at, OLD.segment, OLD.tags, OLD.is_merged, OLD.merged_into, OLD.created_at) THEN
+    NEW.updated_at = OLD.updated_at;
+  ELSE
+    NEW.updated_at = NOW();
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Keyset order for the bulk embedding endpoint's changed-since cursor
+CREATE INDEX IF NOT EXISTS idx_customer_profile_updated_at_id ON customer_profile(updated_at, id);
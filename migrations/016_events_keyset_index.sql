@@ -0,0 +1,8 @@
+-- Migration: 016_events_keyset_index
+-- Description: Keyset order for paging through events newest first
+--
+-- The batch embedding pipeline reads events page by page with
+-- (event_ts, id) < (last_ts, last_id) ORDER BY event_ts DESC, id DESC;
+-- idx_events_event_ts alone cannot order ties on event_ts.
+
+CREATE INDEX IF NOT EXISTS idx_events_event_ts_id ON events(event_ts DESC, id DESC);
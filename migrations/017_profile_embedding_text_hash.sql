@@ -0,0 +1,39 @@
+-- Migration: 017_profile_embedding_text_hash
+-- Description: Record what each profile embedding was computed from
+--
+-- embedding_text_hash is the hash of the input text (ml/common/src/embedding_text.py)
+-- and embedding_model the encoder. The incremental updater re-embeds only
+-- profiles whose current text hashes differently or whose model changed.
+
+ALTER TABLE customer_profile
+  ADD COLUMN IF NOT EXISTS embedding_text_hash TEXT,
+  ADD COLUMN IF NOT EXISTS embedding_model VARCHAR(255);
+
+COMMENT ON COLUMN customer_profile.embedding_text_hash IS 'Hash of the text the embedding was computed from';
+COMMENT ON COLUMN customer_profile.embedding_model IS 'Encoder that produced the embedding';
+
+-- Like 015: writing derived embedding columns is not a profile change.
+-- Every column but the derived ones, compared by name: serializing the
+-- row (to_jsonb) would format both 768-dim vectors as text on every UPDATE.
+-- A column added to customer_profile must be added to both rows here.
+CREATE OR REPLACE FUNCTION update_customer_profile_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF (NEW.embedding, NEW.embedding_text_hash, NEW.embedding_model)
+       IS DISTINCT FROM (OLD.embedding, OLD.embedding_text_hash, OLD.embedding_model)
+     AND ROW(NEW.id, NEW.first_name, NEW.last_name, NEW.full_name, NEW.primary_phone, NEW.primary_email,
+           NEW.gender, NEW.date_of_birth, NEW.city, NEW.state, NEW.country, NEW.postal_code,
+           NEW.ltv, NEW.total_orders, NEW.total_spent, NEW.avg_order_value, NEW.first_seen_at, NEW.last_seen_at,
+           NEW.last_purchase_at, NEW.segment, NEW.tags, NEW.is_merged, NEW.merged_into, NEW.created_at)
+       IS NOT DISTINCT FROM
+       ROW(OLD.id, OLD.first_name, OLD.last_name, OLD.full_name, OLD.primary_phone, OLD.primary_email,
+           OLD.gender, OLD.date_of_birth, OLD.city, OLD.state, OLD.country, OLD.postal_code,
+           OLD.ltv, OLD.total_orders, OLD.total_spent, OLD.avg_order_value, OLD.first_seen_at, OLD.last_seen_at,
+           OLD.last_purchase_at, OLD.segment, OLD.tags, OLD.is_merged, OLD.merged_into, OLD.created_at) THEN
+    NEW.updated_at = OLD.updated_at;
+  ELSE
+    NEW.updated_at = NOW();
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
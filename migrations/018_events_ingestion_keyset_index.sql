@@ -0,0 +1,9 @@
+-- Migration: 018_events_ingestion_keyset_index
+-- Description: Keyset order over events in ingestion order
+--
+-- The event embedding store resumes from its cursor with
+-- (created_at, id) > (last_created_at, last_id) ORDER BY created_at, id.
+-- created_at is when the row was inserted, so backfills and late imports
+-- with an old event_ts are still read after the cursor.
+
+CREATE INDEX IF NOT EXISTS idx_events_created_at_id ON events(created_at, id);
@@ -0,0 +1,214 @@
+"""
+Compact Embeddings
+Projected, int8-quantized embedding codes for memory-lean similarity search
+
+A CompactCodec maps a dims-wide float32 embedding to `compact_dims` int8
+codes:
+
+    projection   PCA learned from a sample (or plain truncation to the
+                 leading dimensions)
+    quantization per-dimension int8 scalar quantization over the sample's
+                 0.1-99.9 percentile range
+
+768 float32 values (3 KB) become e.g. 128 bytes. Inner products against
+a query are computed on the codes directly with one precomputed weight
+vector, so similarity search can scan the codes and re-rank a short list
+with the exact vectors.
+
+Stored as columnar .npy files next to the full vectors:
+
+    compact_codec.json        method, dims, compact_dims
+    compact_mean.npy          (dims,)
+    compact_components.npy    (dims, compact_dims)
+    compact_scale.npy / compact_offset.npy   (compact_dims,)
+    compact_codes.npy         (n, compact_dims) int8
+"""
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+METHOD_PCA = 'pca'
+METHOD_TRUNCATE = 'truncate'
+CODEC_FILE = 'compact_codec.json'
+CODES_FILE = 'compact_codes.npy'
+
+# int8 codes cover [offset, offset + 255 * scale]; code -128 is offset
+_CODE_SHIFT = 128.0
+
+
+@dataclass
+class CompactCodec:
+    method: str
+    mean: np.ndarray        # (dims,)
+    components: np.ndarray  # (dims, compact_dims)
+    scale: np.ndarray       # (compact_dims,)
+    offset: np.ndarray      # (compact_dims,)
+
+    @property
+    def dims(self) -> int:
+        return self.components.shape[0]
+
+    @property
+    def compact_dims(self) -> int:
+        return self.components.shape[1]
+
+    def project(self, vectors: np.ndarray) -> np.ndarray:
+        return (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components
+
+    def encode(self, vectors: np.ndarray, chunk_rows: int = 65536) -> np.ndarray:
+        """int8 codes of a (n, dims) matrix"""
+        vectors = np.atleast_2d(vectors)
+        codes = np.empty((len(vectors), self.compact_dims), dtype=np.int8)
+        for start in range(0, len(vectors), chunk_rows):
+            projected = self.project(vectors[start:start + chunk_rows])
+            levels = np.rint((projected - self.offset) / self.scale - _CODE_SHIFT)
+            codes[start:start + len(projected)] = np.clip(levels, -128, 127)
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Approximate float32 vectors of codes"""
+        projected = (codes.astype(np.float32) + _CODE_SHIFT) * self.scale + self.offset
+        return projected @ self.components.T + self.mean
+
+    def query_weights(self, query: np.ndarray) -> Tuple[np.ndarray, float]:
+        """
+        (weights, bias) such that codes @ weights + bias ~ query . vector
+
+        query . (mean + P (offset + scale (code + 128)))
+            = query . mean + (P^T query) . offset + 128 sum(w) + code . w
+        with w = (P^T query) * scale.
+        """
+        projected_query = np.asarray(query, dtype=np.float32) @ self.components
+        weights = (projected_query * self.scale).astype(np.float32)
+        bias = float(query @ self.mean + projected_query @ self.offset + _CODE_SHIFT * weights.sum())
+        return weights, bias
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate inner products of query with every coded vector"""
+        weights, bias = self.query_weights(query)
+        return codes.astype(np.float32) @ weights + bias
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, CODEC_FILE), 'w') as f:
+            json.dump({'method': self.method, 'dims': self.dims, 'compact_dims': self.compact_dims}, f)
+        for name in ('mean', 'components', 'scale', 'offset'):
+            np.save(os.path.join(path, f"compact_{name}.npy"), getattr(self, name), allow_pickle=False)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['CompactCodec']:
+        """The codec stored in path, or None if there is none"""
+        if not os.path.exists(os.path.join(path, CODEC_FILE)):
+            return None
+        with open(os.path.join(path, CODEC_FILE)) as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(path, f"compact_{name}.npy"), allow_pickle=False)
+            for name in ('mean', 'components', 'scale', 'offset')
+        }
+        return cls(method=meta['method'], **arrays)
+
+
+def fit_codec(
+    sample: np.ndarray,
+    compact_dims: int,
+    method: str = METHOD_PCA,
+    clip_percentile: float = 0.1
+) -> CompactCodec:
+    """
+    Learn the projection and int8 ranges from a sample of embeddings
+
+    Args:
+        sample: (n, dims) float32 embeddings, a few thousand rows or more
+        compact_dims: Output dimensions (<= dims)
+        method: 'pca' (learned projection) or 'truncate' (leading dimensions)
+        clip_percentile: Tail mass clipped on each side of every dimension
+    """
+    sample = np.asarray(sample, dtype=np.float32)
+    dims = sample.shape[1]
+    if not 0 < compact_dims <= dims:
+        raise ValueError(f"compact_dims must be in 1..{dims}, got {compact_dims}")
+
+    if method == METHOD_PCA:
+        mean = sample.mean(axis=0)
+        # Right singular vectors of the centred sample = principal axes
+        _, _, vt = np.linalg.svd(sample - mean, full_matrices=False)
+        components = np.ascontiguousarray(vt[:compact_dims].T)
+    elif method == METHOD_TRUNCATE:
+        mean = np.zeros(dims, dtype=np.float32)
+        components = np.eye(dims, compact_dims, dtype=np.float32)
+    else:
+        raise ValueError(f"Unknown compact method: {method}")
+
+    projected = (sample - mean) @ components
+    low = np.percentile(projected, clip_percentile, axis=0)
+    high = np.percentile(projected, 100.0 - clip_percentile, axis=0)
+    scale = np.maximum(high - low, 1e-8) / 255.0
+    return CompactCodec(
+        method=method,
+        mean=mean.astype(np.float32),
+        components=components.astype(np.float32),
+        scale=scale.astype(np.float32),
+        offset=low.astype(np.float32),
+    )
+
+
+def memory_report(count: int, dims: int, compact_dims: int) -> Dict:
+    """Bytes held by full float32 vectors vs int8 codes"""
+    full = count * dims * 4
+    compact = count * compact_dims
+    return {
+        'profiles': count,
+        'full_bytes': full,
+        'compact_bytes': compact,
+        'bytes_saved': full - compact,
+        'compression_ratio': round(full / compact, 1) if compact else None,
+    }
+
+
+def recall_report(
+    vectors: np.ndarray,
+    codes: np.ndarray,
+    codec: CompactCodec,
+    queries: int = 200,
+    k: int = 10,
+    rerank: int = 4,
+    seed: int = 0
+) -> Dict:
+    """
+    recall@k of code-only and code + exact re-rank search vs exact search
+
+    Sample rows act as queries (excluding themselves). Code search keeps
+    k * rerank candidates, which are re-scored with the exact vectors.
+    """
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(len(vectors), min(queries, len(vectors)), replace=False)
+    candidates = min(len(vectors) - 1, k * rerank)
+    code_hits = rerank_hits = 0
+
+    for row in query_rows:
+        query = np.asarray(vectors[row], dtype=np.float32)
+        exact = vectors @ query
+        exact[row] = -np.inf
+        truth = set(np.argpartition(-exact, k)[:k])
+
+        approx = codec.scores(codes, query)
+        approx[row] = -np.inf
+        shortlist = np.argpartition(-approx, candidates)[:candidates]
+        code_top = shortlist[np.argsort(-approx[shortlist])[:k]]
+        reranked = shortlist[np.argsort(-exact[shortlist])[:k]]
+
+        code_hits += len(truth & set(code_top))
+        rerank_hits += len(truth & set(reranked))
+
+    total = k * len(query_rows)
+    return {
+        'queries': int(len(query_rows)),
+        'k': k,
+        'rerank_candidates': int(candidates),
+        'recall_codes_only': round(code_hits / total, 4),
+        'recall_with_rerank': round(rerank_hits / total, 4),
+    }
@@ -0,0 +1,426 @@
+"""
+Database Pool
+Bounded, health-checked PostgreSQL connection pools shared by the Python services
+
+Every process gets at most DB_POOL_MAX_SIZE connections per named pool, so
+Postgres connection counts grow with replicas * max_size instead of with
+request rate. Connections are opened once and reused; each checkout is
+health-checked if the connection sat idle for longer than
+DB_POOL_HEALTH_CHECK_INTERVAL and transparently replaced if it is dead.
+
+Sync:
+    pool = get_pool()
+    with pool.connection() as conn:   # commits on success, rolls back on error
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+
+Async (psycopg2 work runs on a worker thread, the event loop never blocks):
+    pool = get_async_pool()
+    rows = await pool.fetchall("SELECT id FROM customer_profile LIMIT %s", [10])
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# psycopg2.extensions.TRANSACTION_STATUS_IDLE
+TRANSACTION_STATUS_IDLE = 0
+
+DEFAULT_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 1))
+DEFAULT_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+DEFAULT_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+DEFAULT_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 15000))
+DEFAULT_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', 5))
+DEFAULT_HEALTH_CHECK_INTERVAL = float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30))
+DEFAULT_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', 1800))
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the acquire timeout"""
+
+
+def database_config() -> Dict:
+    """Connection parameters from the standard POSTGRES_* environment variables"""
+    return {
+        'host': os.getenv('POSTGRES_HOST', 'localhost'),
+        'port': int(os.getenv('POSTGRES_PORT', 5432)),
+        'database': os.getenv('POSTGRES_DB', 'retail_brain'),
+        'user': os.getenv('POSTGRES_USER', 'retail_brain_user'),
+        'password': os.getenv('POSTGRES_PASSWORD', 'retail_brain_pass'),
+    }
+
+
+def connect(statement_timeout_ms: Optional[int] = None, **overrides):
+    """
+    Open one dedicated connection outside any pool
+
+    For batch jobs and server-side cursors that hold a connection for a long
+    time. statement_timeout_ms=0 disables the statement timeout.
+    """
+    import psycopg2
+
+    config = dict(database_config(), connect_timeout=DEFAULT_CONNECT_TIMEOUT, **overrides)
+    if statement_timeout_ms is None:
+        statement_timeout_ms = DEFAULT_STATEMENT_TIMEOUT_MS
+    if statement_timeout_ms:
+        config['options'] = f"-c statement_timeout={int(statement_timeout_ms)}"
+    return psycopg2.connect(**config)
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def _detach_after_fork(conn):
+    """
+    Disown a connection inherited across fork()
+
+    The child shares the parent's socket. Freeing the connection runs
+    PQfinish, which sends Terminate on that socket and ends the parent's
+    session, so the child's descriptor is pointed at /dev/null first: the
+    Terminate goes nowhere and only the child's copy of the fd is closed.
+    """
+    try:
+        fd = conn.fileno()
+    except Exception:
+        return  # already closed
+    devnull = os.open(os.devnull, os.O_RDWR)
+    try:
+        os.dup2(devnull, fd)
+    finally:
+        os.close(devnull)
+
+
+class ConnectionPool:
+    """
+    Thread-safe bounded psycopg2 connection pool
+
+    At most max_size connections are open at once; callers wait up to
+    timeout seconds for one to be returned and then get PoolTimeout.
+    Idle connections are reused most-recently-used first so the hot set
+    stays small, and are recycled after max_lifetime seconds.
+    """
+
+    def __init__(
+        self,
+        name: str = 'default',
+        min_size: int = DEFAULT_MIN_SIZE,
+        max_size: int = DEFAULT_MAX_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+        statement_timeout_ms: int = DEFAULT_STATEMENT_TIMEOUT_MS,
+        health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL,
+        max_lifetime: float = DEFAULT_MAX_LIFETIME,
+        connect_fn: Optional[Callable] = None
+    ):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool bounds: min_size={min_size}, max_size={max_size}")
+
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.statement_timeout_ms = statement_timeout_ms
+        self.health_check_interval = health_check_interval
+        self.max_lifetime = max_lifetime
+        self._connect_fn = connect_fn or (lambda: connect(statement_timeout_ms))
+
+        self._cond = threading.Condition()
+        self._idle = deque()     # (conn, created_at, last_used_at)
+        self._in_use = {}        # id(conn) -> (conn, created_at)
+        self._size = 0           # open connections, idle + in use
+        self._waiting = 0
+        self._closed = False
+        self._pid = os.getpid()
+
+        # Counters for stats()
+        self._acquired = 0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._wait_seconds = 0.0
+
+        self._prefill()
+
+    def _prefill(self):
+        """Open min_size connections up front (best effort: the database may still be starting)"""
+        try:
+            for _ in range(self.min_size):
+                conn = self._connect_fn()
+                with self._cond:
+                    self._size += 1
+                    now = time.monotonic()
+                    self._idle.append((conn, now, now))
+        except Exception as e:
+            print(f"⚠️  DB pool '{self.name}': could not open initial connections: {e}")
+
+    def _check_fork(self):
+        """Drop connections inherited from a parent process (sockets cannot be shared)"""
+        if os.getpid() == self._pid:
+            return
+        with self._cond:
+            if os.getpid() != self._pid:
+                for conn in [entry[0] for entry in self._idle] + [entry[0] for entry in self._in_use.values()]:
+                    _detach_after_fork(conn)
+                self._idle.clear()
+                self._in_use.clear()
+                self._size = 0
+                self._waiting = 0
+                self._pid = os.getpid()
+
+    def getconn(self, timeout: Optional[float] = None):
+        """Check out a healthy connection; pair with putconn() or use connection()"""
+        self._check_fork()
+        started = time.monotonic()
+        deadline = started + (self.timeout if timeout is None else timeout)
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError(f"DB pool '{self.name}' is closed")
+                if self._idle:
+                    conn, created_at, last_used_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # Reserve the slot now, connect outside the lock
+                    self._size += 1
+                    conn, created_at, last_used_at = None, None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"DB pool '{self.name}': no connection available within "
+                        f"{deadline - started:.1f}s ({self.max_size} in use)"
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+        try:
+            if conn is None:
+                conn, created_at = self._connect_fn(), time.monotonic()
+            else:
+                conn, created_at = self._validate(conn, created_at, last_used_at)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._in_use[id(conn)] = (conn, created_at)
+            self._acquired += 1
+            self._wait_seconds += time.monotonic() - started
+        return conn
+
+    def _validate(self, conn, created_at: float, last_used_at: float):
+        """Return a usable connection, replacing it if closed, expired or failing SELECT 1"""
+        now = time.monotonic()
+        expired = self.max_lifetime and now - created_at > self.max_lifetime
+
+        healthy = not conn.closed and not expired
+        if healthy and now - last_used_at > self.health_check_interval:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except Exception:
+                healthy = False
+
+        if healthy:
+            return conn, created_at
+
+        _close_quietly(conn)
+        if not expired:
+            with self._cond:
+                self._reconnects += 1
+        return self._connect_fn(), time.monotonic()
+
+    def putconn(self, conn, discard: bool = False):
+        """Return a connection; discard=True closes it instead of reusing it"""
+        forked = os.getpid() != self._pid
+        self._check_fork()
+        with self._cond:
+            entry = self._in_use.pop(id(conn), None)
+        if entry is None:
+            if forked:
+                return  # checked out before the fork; detached by _check_fork
+            raise ValueError(f"Connection does not belong to DB pool '{self.name}'")
+        created_at = entry[1]
+
+        # Leave no open transaction or session setting behind for the next borrower
+        if not discard and not conn.closed:
+            try:
+                if conn.autocommit:
+                    conn.autocommit = False
+                elif conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            if discard or conn.closed or self._closed:
+                self._size -= 1
+                reuse = False
+            else:
+                self._idle.append((conn, created_at, time.monotonic()))
+                reuse = True
+            self._cond.notify()
+
+        if not reuse:
+            _close_quietly(conn)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Borrow a connection; commits on success, rolls back on error"""
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+            if not conn.closed and not conn.autocommit:
+                conn.commit()
+        except Exception:
+            discard = bool(conn.closed)
+            if not discard:
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+            self.putconn(conn, discard=discard)
+            raise
+        self.putconn(conn)
+
+    def stats(self) -> Dict:
+        """Pool utilization metrics"""
+        with self._cond:
+            in_use = len(self._in_use)
+            return {
+                'name': self.name,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': in_use,
+                'waiting': self._waiting,
+                'utilization': round(in_use / self.max_size, 3),
+                'acquired_total': self._acquired,
+                'timeouts_total': self._timeouts,
+                'reconnects_total': self._reconnects,
+                'avg_wait_ms': round(1000 * self._wait_seconds / self._acquired, 3) if self._acquired else 0.0,
+            }
+
+    def close(self):
+        """Close idle connections and refuse new checkouts"""
+        self._check_fork()
+        with self._cond:
+            self._closed = True
+            idle = [entry[0] for entry in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            _close_quietly(conn)
+
+
+class AsyncConnectionPool:
+    """
+    asyncio front end for a ConnectionPool
+
+    psycopg2 is blocking, so each unit of work runs on a dedicated thread
+    pool (one thread per connection) with a pooled connection; coroutines
+    await the result and the event loop keeps serving other requests.
+    """
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+        self._executor = ThreadPoolExecutor(
+            max_workers=pool.max_size,
+            thread_name_prefix=f"db-{pool.name}"
+        )
+
+    async def run(self, fn: Callable, *args):
+        """Run fn(conn, *args) with a pooled connection; commits on success"""
+        def call():
+            with self.pool.connection() as conn:
+                return fn(conn, *args)
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    async def fetchall(self, query: str, params=None, dict_rows: bool = False) -> List:
+        def call(conn):
+            with conn.cursor(cursor_factory=_dict_cursor() if dict_rows else None) as cur:
+                cur.execute(query, params)
+                return cur.fetchall()
+
+        return await self.run(call)
+
+    async def fetchone(self, query: str, params=None, dict_rows: bool = False):
+        def call(conn):
+            with conn.cursor(cursor_factory=_dict_cursor() if dict_rows else None) as cur:
+                cur.execute(query, params)
+                return cur.fetchone()
+
+        return await self.run(call)
+
+    async def execute(self, query: str, params=None) -> int:
+        """Execute a statement; returns the affected row count"""
+        def call(conn):
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                return cur.rowcount
+
+        return await self.run(call)
+
+    def stats(self) -> Dict:
+        return self.pool.stats()
+
+    def close(self):
+        self.pool.close()
+        self._executor.shutdown(wait=False)
+
+
+def _dict_cursor():
+    import psycopg2.extras
+    return psycopg2.extras.RealDictCursor
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_async_pools: Dict[str, AsyncConnectionPool] = {}
+_registry_lock = threading.Lock()
+
+
+def get_pool(name: str = 'default', **kwargs) -> ConnectionPool:
+    """Process-wide pool by name, created on first use (kwargs only apply then)"""
+    pool = _pools.get(name)
+    if pool is None:
+        with _registry_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = ConnectionPool(name=name, **kwargs)
+                _pools[name] = pool
+    return pool
+
+
+def get_async_pool(name: str = 'default', **kwargs) -> AsyncConnectionPool:
+    """Async front end over get_pool(name)"""
+    pool = _async_pools.get(name)
+    if pool is None:
+        sync_pool = get_pool(name, **kwargs)
+        with _registry_lock:
+            pool = _async_pools.get(name)
+            if pool is None:
+                pool = AsyncConnectionPool(sync_pool)
+                _async_pools[name] = pool
+    return pool
+
+
+def pool_stats() -> Dict[str, Dict]:
+    """stats() of every pool in this process, for health/metrics endpoints"""
+    return {name: pool.stats() for name, pool in list(_pools.items())}
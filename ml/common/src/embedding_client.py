@@ -0,0 +1,80 @@
+"""
+Embedding Client
+Python client for embedding-service using the binary transport
+
+Usage:
+    client = EmbeddingClient()                   # EMBEDDING_SERVICE_URL
+    vector = client.embed("first order, Mumbai")  # (768,) float32
+    matrix = client.embed_batch(texts)            # (len(texts), 768)
+"""
+import json
+import os
+import urllib.error
+import urllib.request
+from typing import List, Optional
+
+import numpy as np
+
+from embedding_codec import (
+    DEFAULT_DTYPE,
+    MEDIA_TYPE_BINARY,
+    MEDIA_TYPE_JSON,
+    content_type,
+    decode,
+)
+
+
+class EmbeddingServiceError(Exception):
+    """Non-2xx response from embedding-service"""
+
+    def __init__(self, status: int, detail: str):
+        super().__init__(f"embedding-service returned {status}: {detail}")
+        self.status = status
+        self.detail = detail
+
+
+class EmbeddingClient:
+    """Requests embeddings as raw float32/float16 arrays instead of JSON lists"""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        media_type: str = MEDIA_TYPE_BINARY,
+        dtype: str = DEFAULT_DTYPE,
+        timeout: float = 30.0
+    ):
+        self.base_url = (base_url or os.getenv('EMBEDDING_SERVICE_URL', 'http://localhost:3016')).rstrip('/')
+        self.accept = content_type(media_type, dtype)
+        self.timeout = timeout
+        self.model = None
+
+    def _post(self, path: str, payload: dict) -> np.ndarray:
+        request = urllib.request.Request(
+            f"{self.base_url}{path}",
+            data=json.dumps(payload).encode('utf-8'),
+            headers={'Content-Type': MEDIA_TYPE_JSON, 'Accept': self.accept},
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+                response_type = response.headers.get('Content-Type', MEDIA_TYPE_JSON)
+                self.model = response.headers.get('X-Embedding-Model', self.model)
+        except urllib.error.HTTPError as e:
+            raise EmbeddingServiceError(e.code, e.read().decode('utf-8', 'replace')) from e
+
+        if response_type.split(';')[0].strip() == MEDIA_TYPE_JSON:
+            # Server without binary support: fall back to the JSON body
+            data = json.loads(body)
+            self.model = data.get('model', self.model)
+            rows = data['embeddings'] if 'embeddings' in data else [data['embedding']]
+            return np.asarray(rows, dtype=np.float32)
+        return decode(body, response_type)
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embedding of one text, shape (dims,)"""
+        return self._post('/v1/embeddings/generate', {'text': text})[0]
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embeddings of many texts in input order, shape (len(texts), dims)"""
+        return self._post('/v1/embeddings/batch', {'texts': list(texts)})
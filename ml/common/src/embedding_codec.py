@@ -0,0 +1,143 @@
+"""
+Embedding Codec
+Compact binary wire formats for embedding matrices and Accept-header negotiation
+
+Formats (chosen by the client's Accept header, JSON stays the default):
+
+    application/json           {"embedding": [...]} / {"embeddings": [[...]]}
+    application/x-embeddings   16-byte header + raw little-endian values
+    application/x-npy          numpy .npy bytes (np.load(io.BytesIO(body)))
+
+Binary formats take a dtype parameter, float32 (default) or float16:
+
+    Accept: application/x-embeddings; dtype=float16
+
+The x-embeddings header is struct '<4sBBHII':
+magic b'EMBD', format version, dtype code (1=float32, 2=float16),
+reserved, rows, dims. The values follow in row-major order.
+"""
+import io
+import struct
+from typing import Optional, Tuple
+
+import numpy as np
+
+MEDIA_TYPE_JSON = 'application/json'
+MEDIA_TYPE_BINARY = 'application/x-embeddings'
+MEDIA_TYPE_NPY = 'application/x-npy'
+
+DTYPES = {
+    'float32': np.dtype('<f4'),
+    'float16': np.dtype('<f2'),
+}
+DEFAULT_DTYPE = 'float32'
+
+MAGIC = b'EMBD'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sBBHII')
+DTYPE_CODES = {'float32': 1, 'float16': 2}
+DTYPE_NAMES = {code: name for name, code in DTYPE_CODES.items()}
+
+
+class UnsupportedFormat(ValueError):
+    """Accept header or payload names a format/dtype this codec does not speak"""
+
+
+def _as_matrix(embeddings: np.ndarray, dtype: str) -> np.ndarray:
+    if dtype not in DTYPES:
+        raise UnsupportedFormat(f"Unsupported dtype: {dtype}")
+    matrix = np.asarray(embeddings)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    return np.ascontiguousarray(matrix, dtype=DTYPES[dtype])
+
+
+def encode_binary(embeddings: np.ndarray, dtype: str = DEFAULT_DTYPE) -> bytes:
+    matrix = _as_matrix(embeddings, dtype)
+    rows, dims = matrix.shape
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, DTYPE_CODES[dtype], 0, rows, dims)
+    return header + matrix.tobytes()
+
+
+def decode_binary(data: bytes) -> np.ndarray:
+    """(rows, dims) array of the payload's dtype, backed by `data` (read-only)"""
+    if len(data) < HEADER.size:
+        raise UnsupportedFormat("Payload shorter than the x-embeddings header")
+    magic, version, dtype_code, _, rows, dims = HEADER.unpack_from(data)
+    if magic != MAGIC or version > FORMAT_VERSION or dtype_code not in DTYPE_NAMES:
+        raise UnsupportedFormat("Not an x-embeddings payload (or a newer version)")
+    dtype = DTYPES[DTYPE_NAMES[dtype_code]]
+    expected = HEADER.size + rows * dims * dtype.itemsize
+    if len(data) != expected:
+        raise UnsupportedFormat(f"x-embeddings payload is {len(data)} bytes, expected {expected}")
+    return np.frombuffer(data, dtype=dtype, offset=HEADER.size).reshape(rows, dims)
+
+
+def encode_npy(embeddings: np.ndarray, dtype: str = DEFAULT_DTYPE) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, _as_matrix(embeddings, dtype), allow_pickle=False)
+    return buffer.getvalue()
+
+
+def decode_npy(data: bytes) -> np.ndarray:
+    return np.load(io.BytesIO(data), allow_pickle=False)
+
+
+def negotiate(accept: Optional[str]) -> Tuple[str, str]:
+    """
+    (media_type, dtype) to respond with for an Accept header
+
+    Picks the highest-q supported media type; JSON when the header is
+    missing, a wildcard, or names nothing this codec supports.
+
+    Raises:
+        UnsupportedFormat: a binary type was requested with an unknown dtype
+    """
+    best, best_q = (MEDIA_TYPE_JSON, DEFAULT_DTYPE), 0.0
+    for position, item in enumerate((accept or '').split(',')):
+        fields = [field.strip() for field in item.split(';')]
+        media_type = fields[0].lower()
+        if media_type not in (MEDIA_TYPE_JSON, MEDIA_TYPE_BINARY, MEDIA_TYPE_NPY):
+            continue
+
+        params = dict(
+            (key.strip().lower(), value.strip().strip('"'))
+            for key, _, value in (field.partition('=') for field in fields[1:])
+        )
+        try:
+            q = float(params.get('q', 1.0))
+        except ValueError:
+            q = 0.0
+        dtype = params.get('dtype', DEFAULT_DTYPE).lower()
+        if media_type != MEDIA_TYPE_JSON and dtype not in DTYPES:
+            raise UnsupportedFormat(f"Unsupported dtype: {dtype}")
+
+        # Earlier entries win ties
+        if q > best_q:
+            best, best_q = (media_type, dtype), q
+    return best
+
+
+def encode(embeddings: np.ndarray, media_type: str, dtype: str = DEFAULT_DTYPE) -> bytes:
+    """Binary body for a negotiated (non-JSON) media type"""
+    if media_type == MEDIA_TYPE_BINARY:
+        return encode_binary(embeddings, dtype)
+    if media_type == MEDIA_TYPE_NPY:
+        return encode_npy(embeddings, dtype)
+    raise UnsupportedFormat(f"Not a binary embedding media type: {media_type}")
+
+
+def content_type(media_type: str, dtype: str = DEFAULT_DTYPE) -> str:
+    if media_type == MEDIA_TYPE_JSON:
+        return media_type
+    return f"{media_type}; dtype={dtype}"
+
+
+def decode(data: bytes, content_type_header: str) -> np.ndarray:
+    """Embedding matrix of a binary response body"""
+    media_type = content_type_header.split(';')[0].strip().lower()
+    if media_type == MEDIA_TYPE_BINARY:
+        return decode_binary(data)
+    if media_type == MEDIA_TYPE_NPY:
+        return decode_npy(data)
+    raise UnsupportedFormat(f"Not a binary embedding media type: {media_type}")
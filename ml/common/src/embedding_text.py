@@ -0,0 +1,49 @@
+"""
+Embedding Input Text
+The text an entity is embedded from, and the hash that detects changes to it
+
+embedding-service and the batch and incremental pipelines all build
+profile text here. customer_profile.embedding_text_hash is compared
+against text_hash(profile_text(row)) to decide what to re-embed, which
+only works if every writer uses the same template.
+"""
+import hashlib
+from typing import Dict, Optional
+
+# Columns profile_text reads (select these to detect changes)
+PROFILE_TEXT_COLUMNS = ('full_name', 'city', 'state', 'segment', 'ltv')
+
+
+def profile_text(profile: Dict) -> str:
+    """Text representation of a customer_profile row"""
+    parts = []
+    if profile.get('full_name'):
+        parts.append(f"Customer name: {profile['full_name']}")
+    if profile.get('city') and profile.get('state'):
+        parts.append(f"Location: {profile['city']}, {profile['state']}")
+    if profile.get('segment'):
+        parts.append(f"Segment: {profile['segment']}")
+    if profile.get('ltv'):
+        parts.append(f"Lifetime value: {profile['ltv']}")
+    return ". ".join(parts) if parts else "Customer profile"
+
+
+def text_hash(text: str) -> str:
+    """128-bit hex digest of an embedding input text"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def embedding_change(row: Dict, model: str) -> Optional[str]:
+    """
+    Why a profile row needs (re-)embedding, or None if its stored embedding is current
+
+    row carries PROFILE_TEXT_COLUMNS plus missing_embedding, embedding_text_hash
+    and embedding_model. Returns 'new', 'text' or 'model'.
+    """
+    if row.get('missing_embedding'):
+        return 'new'
+    if row.get('embedding_text_hash') != text_hash(profile_text(row)):
+        return 'text'
+    if row.get('embedding_model') != model:
+        return 'model'
+    return None
@@ -0,0 +1,210 @@
+"""
+Event Embedding Store
+Append-only columnar event embeddings, sharded by event date
+
+Event embeddings are too numerous to keep in Postgres and are only read
+in bulk (recommendation and intent training) or by id, so they live in
+.npy shards that downstream jobs memory-map directly:
+
+    <root>/manifest.json
+    <root>/date=2026-10-19/part-00007.ids.npy        (n,) event ids, S36, sorted
+    <root>/date=2026-10-19/part-00007.event_ts.npy   (n,) datetime64[us], UTC
+    <root>/date=2026-10-19/part-00007.vectors.npy    (n, dims) float32
+
+Each flush writes one new part per event date and never rewrites an
+existing one. Rows inside a part are sorted by id, so ids.npy doubles as
+the part's id index (binary search). The manifest lists the visible parts
+and the writer's source cursor: an opaque position (for the pipeline,
+events.created_at and id of the last row read) that the next run resumes
+after. Parts and cursor are published together by replacing the manifest
+atomically once the part files are in place, so readers never see a
+half-written part and an interrupted run loses nothing. One writer at a
+time.
+
+Usage:
+    store = EventEmbeddingStore('/data/event_embeddings', model='all-mpnet-base-v2')
+    store.append(ids, event_ts, embeddings, cursor=[last_created_at, last_id])
+    store.flush()
+
+    for date, ids, event_ts, vectors in EventEmbeddingStore(root).iter_shards(start='2026-10-01'):
+        ...                                   # memory-mapped
+    found, vectors = EventEmbeddingStore(root).lookup(event_ids)
+"""
+import json
+import os
+from datetime import date, datetime, timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+MANIFEST_FILE = 'manifest.json'
+COLUMNS = ('ids', 'event_ts', 'vectors')
+
+DateLike = Union[str, date]
+
+
+def _utc_datetime64(values: Sequence) -> np.ndarray:
+    """datetimes (naive = UTC) or datetime64 values -> datetime64[us] UTC"""
+    converted = [
+        value.astimezone(timezone.utc).replace(tzinfo=None)
+        if isinstance(value, datetime) and value.tzinfo is not None else value
+        for value in values
+    ]
+    return np.array(converted, dtype='datetime64[us]')
+
+
+def _date_key(value: Optional[DateLike]) -> Optional[str]:
+    return value.isoformat()[:10] if isinstance(value, date) else value
+
+
+class EventEmbeddingStore:
+    """Date-sharded .npy event embeddings with a resumable source cursor"""
+
+    def __init__(self, root: str, model: Optional[str] = None):
+        """
+        Args:
+            root: Store directory (created on first flush)
+            model: Embedding model of the vectors appended; must match the store's
+        """
+        self.root = root
+        self._buffers: Dict[str, List[Tuple[np.ndarray, np.ndarray, np.ndarray]]] = {}
+        self._cursor: Optional[List] = None
+        path = os.path.join(root, MANIFEST_FILE)
+        if os.path.exists(path):
+            with open(path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {'model': model, 'dims': None, 'next_part': 0, 'cursor': None, 'shards': []}
+        if model is not None and self.manifest['model'] not in (None, model):
+            raise ValueError(
+                f"Store {root} holds {self.manifest['model']} embeddings, not {model}; use a new store"
+            )
+        self.manifest['model'] = self.manifest['model'] or model
+
+    @property
+    def rows(self) -> int:
+        return sum(shard['rows'] for shard in self.manifest['shards'])
+
+    @property
+    def cursor(self) -> Optional[List]:
+        """Source position the last flush covered (JSON values), None before the first"""
+        return self.manifest.get('cursor')
+
+    # Writing
+
+    def append(self, ids: Sequence[str], event_ts: Sequence, embeddings: np.ndarray, cursor: Optional[List] = None):
+        """
+        Buffer rows until the next flush
+
+        Args:
+            cursor: Source position reached with these rows (JSON values);
+                published by the next flush together with the rows
+        """
+        if cursor is not None:
+            self._cursor = list(cursor)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if len(ids) != len(event_ts) or len(ids) != len(embeddings):
+            raise ValueError("ids, event_ts and embeddings must have the same length")
+        if not len(ids):
+            return
+        dims = self.manifest['dims']
+        if dims is not None and embeddings.shape[1] != dims:
+            raise ValueError(f"Store holds {dims}-dim vectors, got {embeddings.shape[1]}")
+        self.manifest['dims'] = embeddings.shape[1]
+
+        ids = np.asarray([str(event_id) for event_id in ids], dtype='S36')
+        stamps = _utc_datetime64(event_ts)
+        days = stamps.astype('datetime64[D]')
+        for day in np.unique(days):
+            rows = days == day
+            self._buffers.setdefault(str(day), []).append((ids[rows], stamps[rows], embeddings[rows]))
+
+    def flush(self) -> int:
+        """Write buffered rows as new parts and publish them; returns rows written"""
+        if not self._buffers and self._cursor is None:
+            return 0
+        written = 0
+        for day, chunks in sorted(self._buffers.items()):
+            ids = np.concatenate([chunk[0] for chunk in chunks])
+            stamps = np.concatenate([chunk[1] for chunk in chunks])
+            vectors = np.concatenate([chunk[2] for chunk in chunks])
+            order = np.argsort(ids, kind='stable')
+            part = f"part-{self.manifest['next_part']:05d}"
+            self.manifest['next_part'] += 1
+
+            directory = os.path.join(self.root, f"date={day}")
+            os.makedirs(directory, exist_ok=True)
+            for column, values in zip(COLUMNS, (ids[order], stamps[order], vectors[order])):
+                path = os.path.join(directory, f"{part}.{column}.npy")
+                np.save(path + '.tmp.npy', values, allow_pickle=False)
+                os.replace(path + '.tmp.npy', path)
+
+            self.manifest['shards'].append({
+                'date': day,
+                'part': part,
+                'rows': int(len(ids)),
+                'min_event_ts': f"{stamps.min()}+00:00",
+                'max_event_ts': f"{stamps.max()}+00:00",
+            })
+            written += len(ids)
+
+        if self._cursor is not None:
+            self.manifest['cursor'] = self._cursor
+        self._buffers = {}
+        self._cursor = None
+        self._save_manifest()
+        return written
+
+    def _save_manifest(self):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, MANIFEST_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    # Reading
+
+    def shards(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> List[Dict]:
+        """Published parts with start <= date <= end (ISO dates or date objects), oldest first"""
+        start, end = _date_key(start), _date_key(end)
+        return sorted(
+            (shard for shard in self.manifest['shards']
+             if (start is None or shard['date'] >= start) and (end is None or shard['date'] <= end)),
+            key=lambda shard: (shard['date'], shard['part'])
+        )
+
+    def open_shard(self, shard: Dict, mmap: bool = True) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(ids, event_ts, vectors) of one part, memory-mapped by default"""
+        directory = os.path.join(self.root, f"date={shard['date']}")
+        return tuple(
+            np.load(os.path.join(directory, f"{shard['part']}.{column}.npy"), mmap_mode='r' if mmap else None)
+            for column in COLUMNS
+        )
+
+    def iter_shards(
+        self, start: Optional[DateLike] = None, end: Optional[DateLike] = None
+    ) -> Iterator[Tuple[str, np.ndarray, np.ndarray, np.ndarray]]:
+        """Yield (date, ids, event_ts, vectors) per part, memory-mapped"""
+        for shard in self.shards(start, end):
+            yield (shard['date'], *self.open_shard(shard))
+
+    def lookup(self, ids: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectors of the given event ids
+
+        Returns:
+            (found, vectors): found is a bool mask; rows of ids not stored are zero
+        """
+        wanted = np.asarray([str(event_id) for event_id in ids], dtype='S36')
+        found = np.zeros(len(wanted), dtype=bool)
+        vectors = np.zeros((len(wanted), self.manifest['dims'] or 0), dtype=np.float32)
+        for shard in self.shards():
+            missing = np.flatnonzero(~found)
+            if not len(missing):
+                break
+            shard_ids, _, shard_vectors = self.open_shard(shard)
+            positions = np.minimum(np.searchsorted(shard_ids, wanted[missing]), len(shard_ids) - 1)
+            hits = shard_ids[positions] == wanted[missing]
+            vectors[missing[hits]] = shard_vectors[positions[hits]]
+            found[missing[hits]] = True
+        return found, vectors
@@ -0,0 +1,205 @@
+"""
+Import-Time Budget
+Per-service import-time report and startup regression check
+
+Imports a service's entry module in a fresh interpreter with
+`python -X importtime`, reports the most expensive top-level packages and
+fails when the import exceeds the service's budget or pulls in a package
+that must stay deferred until first use (shap, mlflow, ...).
+
+Each service declares its budget in import_budget.json:
+
+    {
+        "module": "src.main",
+        "budget_ms": 2500,
+        "deferred": ["shap", "mlflow"],
+        "env": {"MODEL_RESOLVE_MODE": "offline", "MODEL_CACHE_DIR": "{tmp}"}
+    }
+
+"{tmp}" in env values is replaced by a fresh empty directory, so model
+loading fails fast instead of contacting MLflow.
+
+Usage (from the repository root):
+    python ml/common/src/import_budget.py services/ml-scorer-service
+    python ml/common/src/import_budget.py services/intent-service --top 20 --json report.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+BUDGET_FILE = 'import_budget.json'
+
+
+@dataclass
+class ImportEntry:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+@dataclass
+class ImportReport:
+    module: str
+    total_ms: float
+    packages_ms: Dict[str, float]
+    modules: List[str]
+    budget_ms: Optional[float] = None
+    deferred_loaded: List[str] = field(default_factory=list)
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget_ms is not None and self.total_ms > self.budget_ms
+
+    @property
+    def ok(self) -> bool:
+        return not self.over_budget and not self.deferred_loaded
+
+    def to_dict(self) -> Dict:
+        return {
+            'module': self.module,
+            'total_ms': round(self.total_ms, 1),
+            'budget_ms': self.budget_ms,
+            'deferred_loaded': self.deferred_loaded,
+            'packages_ms': {name: round(ms, 1) for name, ms in self.packages_ms.items()},
+        }
+
+
+def parse_importtime(stderr: str) -> List[ImportEntry]:
+    """Entries of `-X importtime` output in the order they were printed"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # header line
+        name = parts[2].rstrip()
+        stripped = name.lstrip()
+        entries.append(ImportEntry(
+            module=stripped,
+            self_us=int(parts[0]),
+            cumulative_us=int(parts[1]),
+            depth=(len(name) - len(stripped) - 1) // 2
+        ))
+    return entries
+
+
+def build_report(
+    entries: List[ImportEntry],
+    module: str,
+    budget_ms: Optional[float] = None,
+    deferred: Optional[List[str]] = None
+) -> ImportReport:
+    """
+    Cost of importing `module` and everything it pulled in
+
+    Modules are printed in completion order (children before their
+    parent), so the import of `module` is the last top-level entry with
+    that name and covers every entry printed since the previous top-level
+    entry.
+    """
+    target = None
+    for idx in range(len(entries) - 1, -1, -1):
+        if entries[idx].depth == 0 and entries[idx].module == module:
+            target = idx
+            break
+    if target is None:
+        raise ValueError(f"{module} not found in importtime output")
+
+    start = target
+    while start > 0 and entries[start - 1].depth > 0:
+        start -= 1
+    covered = entries[start:target + 1]
+
+    packages: Dict[str, float] = {}
+    for entry in covered:
+        package = entry.module.split('.')[0]
+        packages[package] = packages.get(package, 0.0) + entry.self_us / 1000.0
+
+    modules = [entry.module for entry in covered]
+    loaded_roots = {name.split('.')[0] for name in modules}
+    return ImportReport(
+        module=module,
+        total_ms=entries[target].cumulative_us / 1000.0,
+        packages_ms=dict(sorted(packages.items(), key=lambda item: -item[1])),
+        modules=modules,
+        budget_ms=budget_ms,
+        deferred_loaded=sorted(name for name in (deferred or []) if name in loaded_roots)
+    )
+
+
+def measure(service_dir: str, config: Dict) -> ImportReport:
+    """Import the service module in a fresh interpreter and build its report"""
+    module = config.get('module', 'src.main')
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.abspath(service_dir), env.get('PYTHONPATH')]))
+        for key, value in config.get('env', {}).items():
+            env[key] = str(value).replace('{tmp}', tmp)
+
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=service_dir,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=config.get('timeout_seconds', 300)
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    return build_report(
+        parse_importtime(result.stderr),
+        module,
+        budget_ms=config.get('budget_ms'),
+        deferred=config.get('deferred', [])
+    )
+
+
+def load_config(service_dir: str) -> Dict:
+    with open(os.path.join(service_dir, BUDGET_FILE)) as f:
+        return json.load(f)
+
+
+def check_service(service_dir: str) -> ImportReport:
+    return measure(service_dir, load_config(service_dir))
+
+
+def print_report(report: ImportReport, top: int = 15):
+    print(f"Import of {report.module}: {report.total_ms:.0f} ms"
+          + (f" (budget {report.budget_ms:.0f} ms)" if report.budget_ms is not None else ""))
+    for name, ms in list(report.packages_ms.items())[:top]:
+        print(f"  {ms:9.1f} ms  {name}")
+
+    if report.over_budget:
+        print(f"⚠️  Over budget by {report.total_ms - report.budget_ms:.0f} ms")
+    if report.deferred_loaded:
+        print(f"⚠️  Imported at startup but must stay deferred: {', '.join(report.deferred_loaded)}")
+    if report.ok:
+        print("✅ Import budget OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report and check a service\'s import time')
+    parser.add_argument('service_dir', help='Service directory containing import_budget.json')
+    parser.add_argument('--top', type=int, default=15, help='Packages to list')
+    parser.add_argument('--json', type=str, default=None, help='Also write the report as JSON')
+    args = parser.parse_args()
+
+    report = check_service(args.service_dir)
+    print_report(report, top=args.top)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report.to_dict(), f, indent=2)
+
+    sys.exit(0 if report.ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,436 @@
+"""
+Model Resolver
+Resolves registered MLflow models once and serves their artifacts from a local cache
+
+Resolution order for a model name: latest registry version by stage
+priority, then the latest run of the model's experiment. The artifacts of
+the resolved run are downloaded once into MODEL_CACHE_DIR, stored under
+their content hash, and recorded in a manifest. When the registry is
+unreachable the last manifest entry for the model is loaded instead, so a
+pod starts from its cache without the tracking server.
+
+MODEL_RESOLVE_MODE:
+    registry  ask the registry, fall back to the cache on failure (default)
+    cache     use the cached entry if there is one, ask the registry otherwise
+    offline   never contact the registry
+"""
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from serving_bundle import BUNDLE_ARTIFACT_PATH, load_bundle
+
+MODE_REGISTRY = 'registry'
+MODE_CACHE = 'cache'
+MODE_OFFLINE = 'offline'
+
+DEFAULT_STAGES = ("Production", "Staging", "None")
+
+MANIFEST_FILE = 'manifest.json'
+LOCK_FILE = '.manifest.lock'
+
+
+class ModelUnavailable(Exception):
+    """Neither the registry nor the local cache can provide the model"""
+
+
+@dataclass
+class ResolvedModel:
+    """A model version whose artifacts are on local disk"""
+    name: str
+    version: str
+    run_id: str
+    paths: Dict[str, str]
+    hashes: Dict[str, str]
+    source: str
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def path(self) -> str:
+        """Local path of the model artifact (the first one requested)"""
+        return next(iter(self.paths.values()))
+
+    def artifact(self, artifact_path: str) -> str:
+        return self.paths[artifact_path]
+
+
+def _hash_tree(root: str) -> str:
+    """sha256 over relative paths and contents of every file under root"""
+    digest = hashlib.sha256()
+    if os.path.isfile(root):
+        entries = [(os.path.basename(root), root)]
+    else:
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                full_path = os.path.join(dirpath, filename)
+                entries.append((os.path.relpath(full_path, root), full_path))
+
+    for relative_path, full_path in entries:
+        digest.update(relative_path.replace(os.sep, '/').encode())
+        digest.update(b'\0')
+        with open(full_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ModelResolver:
+    """Registry lookup plus content-addressed local artifact cache"""
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        mode: Optional[str] = None,
+        tracking_uri: Optional[str] = None,
+        stages: Sequence[str] = DEFAULT_STAGES,
+        download_fn: Optional[Callable[[str, str], str]] = None,
+        registry_fn: Optional[Callable[[str, Optional[str]], Tuple[str, str]]] = None
+    ):
+        self.cache_dir = cache_dir or os.getenv(
+            'MODEL_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'ml-models')
+        )
+        self.mode = mode or os.getenv('MODEL_RESOLVE_MODE', MODE_REGISTRY)
+        if self.mode not in (MODE_REGISTRY, MODE_CACHE, MODE_OFFLINE):
+            raise ValueError(f"Unknown MODEL_RESOLVE_MODE: {self.mode}")
+        self.tracking_uri = tracking_uri or os.getenv('MLFLOW_TRACKING_URI', 'http://localhost:5001')
+        self.stages = tuple(stages)
+        self._download_fn = download_fn or self._mlflow_download
+        self._registry_fn = registry_fn or self._mlflow_lookup
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(self.cache_dir, 'objects'), exist_ok=True)
+
+        # An unreachable tracking server should fail in seconds, not after
+        # MLflow's default 120s timeout and five backoff retries
+        os.environ.setdefault('MLFLOW_HTTP_REQUEST_TIMEOUT', os.getenv('MODEL_REGISTRY_TIMEOUT', '5'))
+        os.environ.setdefault('MLFLOW_HTTP_REQUEST_MAX_RETRIES', '1')
+
+    # Manifest
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.cache_dir, MANIFEST_FILE)
+
+    @contextmanager
+    def _manifest_lock(self):
+        """
+        Exclusive hold on the manifest across threads and processes
+
+        Uvicorn workers and other services may share MODEL_CACHE_DIR; without
+        the file lock each would replace the manifest with its own copy and
+        drop entries the others recorded.
+        """
+        with self._lock, open(os.path.join(self.cache_dir, LOCK_FILE), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_manifest(self) -> Dict:
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        manifest.setdefault('models', {})
+        manifest.setdefault('artifacts', {})
+        return manifest
+
+    def _write_manifest(self, manifest: Dict):
+        # Atomic replace: concurrent workers never see a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.manifest-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _object_path(self, sha256: str) -> str:
+        return os.path.join(self.cache_dir, 'objects', sha256)
+
+    def _cached_artifact(self, sha256: Optional[str]) -> Optional[str]:
+        """Local path of a cached artifact, None if it is not (fully) on disk"""
+        if not sha256:
+            return None
+        object_dir = self._object_path(sha256)
+        if not os.path.isdir(object_dir):
+            return None
+        entries = os.listdir(object_dir)
+        return os.path.join(object_dir, entries[0]) if len(entries) == 1 else None
+
+    # MLflow
+
+    def _mlflow_lookup(self, name: str, experiment: Optional[str]) -> Tuple[str, str]:
+        """
+        (version, run_id) of the registry version to serve, else the latest run
+
+        Only "model not registered" moves on to the experiment. Any other
+        failure (connection refused, timeout, server error) is raised at once,
+        so resolve() falls back to the cache after a single failed request.
+        """
+        import mlflow
+        from mlflow.exceptions import RestException
+
+        mlflow.set_tracking_uri(self.tracking_uri)
+        client = mlflow.tracking.MlflowClient()
+
+        try:
+            versions = client.get_latest_versions(name, stages=list(self.stages))
+        except RestException as e:
+            if e.error_code != 'RESOURCE_DOES_NOT_EXIST':
+                raise
+            versions = []
+
+        for stage in self.stages:
+            for model_version in versions:
+                if model_version.current_stage == stage:
+                    return str(model_version.version), model_version.run_id
+
+        if experiment is None:
+            raise ModelUnavailable(f"No registered version of {name}")
+
+        exp = mlflow.get_experiment_by_name(experiment)
+        if not exp:
+            raise ModelUnavailable(f"Experiment not found: {experiment}")
+        runs = mlflow.search_runs(experiment_ids=[exp.experiment_id], order_by=["start_time DESC"], max_results=1)
+        if runs.empty:
+            raise ModelUnavailable(f"No runs found in experiment {experiment}")
+        run_id = runs.iloc[0]['run_id']
+        return run_id, run_id
+
+    def _mlflow_download(self, artifact_uri: str, dst_path: str) -> str:
+        import mlflow
+
+        mlflow.set_tracking_uri(self.tracking_uri)
+        return mlflow.artifacts.download_artifacts(artifact_uri=artifact_uri, dst_path=dst_path)
+
+    def _fetch(self, manifest: Dict, run_id: str, artifact_path: str) -> Tuple[str, str, bool]:
+        """(local path, sha256, downloaded) of one run artifact, downloading on a cache miss"""
+        source_uri = f"runs:/{run_id}/{artifact_path}"
+
+        # Run artifacts are immutable: a recorded hash is still valid
+        cached = self._cached_artifact(manifest['artifacts'].get(source_uri))
+        if cached:
+            return cached, manifest['artifacts'][source_uri], False
+
+        staging_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix='.download-')
+        try:
+            local_path = self._download_fn(source_uri, staging_dir)
+            sha256 = _hash_tree(local_path)
+            object_dir = self._object_path(sha256)
+            if not os.path.isdir(object_dir):
+                holder = tempfile.mkdtemp(dir=self.cache_dir, prefix='.object-')
+                shutil.move(local_path, os.path.join(holder, os.path.basename(local_path.rstrip(os.sep))))
+                try:
+                    os.rename(holder, object_dir)
+                except OSError:
+                    # Another process stored the same content first
+                    shutil.rmtree(holder, ignore_errors=True)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+        manifest['artifacts'][source_uri] = sha256
+        return self._cached_artifact(sha256), sha256, True
+
+    # Resolution
+
+    def _from_cache(self, name: str, choices: Sequence[Sequence[str]], manifest: Dict) -> Optional[ResolvedModel]:
+        """The cached entry for name with the first artifact set that is fully on disk"""
+        entry = manifest['models'].get(name)
+        if not entry:
+            return None
+        for artifacts in choices:
+            paths = {}
+            for artifact_path in artifacts:
+                cached = self._cached_artifact(entry['artifacts'].get(artifact_path))
+                if cached is None:
+                    break
+                paths[artifact_path] = cached
+            else:
+                return ResolvedModel(
+                    name=name,
+                    version=entry['version'],
+                    run_id=entry['run_id'],
+                    paths=paths,
+                    hashes={path: entry['artifacts'][path] for path in artifacts},
+                    source='cache'
+                )
+        return None
+
+    def _fetch_first(self, manifest: Dict, run_id: str, choices: Sequence[Sequence[str]]):
+        """(paths, hashes, downloaded) of the first artifact set the run has; raises the first error"""
+        first_error = None
+        for artifacts in choices:
+            try:
+                paths, hashes, downloaded = {}, {}, False
+                for artifact_path in artifacts:
+                    paths[artifact_path], hashes[artifact_path], fetched = self._fetch(manifest, run_id, artifact_path)
+                    downloaded = downloaded or fetched
+                return paths, hashes, downloaded
+            except Exception as e:
+                first_error = first_error or e
+        raise first_error
+
+    def resolve(
+        self,
+        name: str,
+        experiment: Optional[str] = None,
+        artifacts: Iterable[str] = ('models',),
+        fallbacks: Iterable[Iterable[str]] = ()
+    ) -> ResolvedModel:
+        """
+        Resolve a model name to a version and make its artifacts local
+
+        Args:
+            name: Registered model name
+            experiment: Experiment whose latest run is used when nothing is registered
+            artifacts: Run artifact paths to fetch ('models' is the model itself)
+            fallbacks: Alternative artifact sets, tried in order against the same
+                resolved run (and cache entry) when the run lacks `artifacts`
+
+        Returns:
+            ResolvedModel with local paths per artifact
+
+        Raises:
+            ModelUnavailable: registry and cache both failed
+        """
+        choices = [list(artifacts)] + [list(choice) for choice in fallbacks]
+        started = time.perf_counter()
+
+        # Read -> fetch -> write under the lock, re-reading what other processes wrote
+        with self._manifest_lock():
+            manifest = self._read_manifest()
+
+            if self.mode in (MODE_CACHE, MODE_OFFLINE):
+                resolved = self._from_cache(name, choices, manifest)
+                if resolved is not None:
+                    resolved.timings['resolve'] = time.perf_counter() - started
+                    return resolved
+                if self.mode == MODE_OFFLINE:
+                    raise ModelUnavailable(f"{name} is not in the local model cache ({self.cache_dir})")
+
+            try:
+                version, run_id = self._registry_fn(name, experiment)
+                resolved_at = time.perf_counter()
+                paths, hashes, downloaded = self._fetch_first(manifest, run_id, choices)
+            except Exception as e:
+                resolved = self._from_cache(name, choices, manifest)
+                if resolved is None:
+                    raise ModelUnavailable(f"{name}: registry unavailable ({e}) and no cached copy") from e
+                print(f"⚠️  Model registry unavailable for {name} ({e}), using cached v{resolved.version}")
+                resolved.timings['resolve'] = time.perf_counter() - started
+                return resolved
+
+            entry = manifest['models'].get(name, {})
+            if entry.get('run_id') != run_id:
+                # Hashes of another run's artifacts must not serve this version
+                entry['artifacts'] = {}
+            entry.update({
+                'version': version,
+                'run_id': run_id,
+                'resolved_at': datetime.now(timezone.utc).isoformat(),
+            })
+            entry.setdefault('artifacts', {}).update(hashes)
+            manifest['models'][name] = entry
+            self._write_manifest(manifest)
+
+        return ResolvedModel(
+            name=name,
+            version=version,
+            run_id=run_id,
+            paths=paths,
+            hashes=hashes,
+            source='download' if downloaded else 'registry',
+            timings={
+                'resolve': resolved_at - started,
+                'download': time.perf_counter() - resolved_at,
+            }
+        )
+
+    def load(
+        self,
+        name: str,
+        loader: Callable[[ResolvedModel], object],
+        experiment: Optional[str] = None,
+        artifacts: Iterable[str] = ('models',),
+        fallbacks: Iterable[Iterable[str]] = ()
+    ):
+        """
+        Resolve a model and load it with loader(resolved), logging startup time
+
+        Returns:
+            Tuple of (loaded model, ResolvedModel)
+        """
+        resolved = self.resolve(name, experiment=experiment, artifacts=artifacts, fallbacks=fallbacks)
+
+        started = time.perf_counter()
+        model = loader(resolved)
+        resolved.timings['load'] = time.perf_counter() - started
+
+        total = sum(resolved.timings.values())
+        steps = ', '.join(f"{step} {seconds:.2f}s" for step, seconds in resolved.timings.items())
+        print(f"✅ {name} v{resolved.version} ready in {total:.2f}s ({steps}, source={resolved.source})")
+        return model, resolved
+
+
+_resolver: Optional[ModelResolver] = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver() -> ModelResolver:
+    """Process-wide resolver configured from the environment"""
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = ModelResolver()
+        return _resolver
+
+
+def _load_bundle_booster(resolved: ResolvedModel):
+    bundle = load_bundle(resolved.artifact(BUNDLE_ARTIFACT_PATH))
+    bundle.booster()
+    return bundle
+
+
+def _load_mlflow_lightgbm(resolved: ResolvedModel):
+    # Only runs without a bundle pay for the MLflow import
+    import mlflow.lightgbm
+
+    return mlflow.lightgbm.load_model(resolved.path)
+
+
+def _load_lightgbm_artifact(resolved: ResolvedModel):
+    """(booster, bundle or None) from whichever artifact resolve() found"""
+    if BUNDLE_ARTIFACT_PATH in resolved.paths:
+        bundle = _load_bundle_booster(resolved)
+        return bundle.booster(), bundle
+    return _load_mlflow_lightgbm(resolved), None
+
+
+def load_lightgbm(name: str, experiment: Optional[str] = None, resolver: Optional[ModelResolver] = None):
+    """
+    A registered LightGBM model as an lgb.Booster
+
+    Loads the run's serving bundle (native model file, no MLflow flavor or
+    pickle); runs logged before bundles existed go through mlflow.lightgbm.
+
+    Returns:
+        Tuple of (booster, ServingBundle or None, ResolvedModel)
+    """
+    resolver = resolver or get_resolver()
+    # One registry lookup; the bundle-less 'models' artifact is the fallback
+    (model, bundle), resolved = resolver.load(
+        name, _load_lightgbm_artifact, experiment=experiment,
+        artifacts=(BUNDLE_ARTIFACT_PATH,), fallbacks=[('models',)]
+    )
+    return model, bundle, resolved
@@ -0,0 +1,182 @@
+"""
+pgvector Bulk Writes
+Binary COPY encoding for pgvector columns and set-based embedding updates
+
+Writing embeddings as `%s::vector` with `str(embedding.tolist())` makes
+Postgres parse ~768 decimal strings per row, one round trip per row.
+Here the vectors are sent in COPY binary format (the same bytes as
+pgvector's vector_send: int16 dims, int16 unused, big-endian float4
+values) into a temporary table, then applied with a single UPDATE ... FROM.
+
+Reads go the other way with `COPY (SELECT ...) TO STDOUT WITH (FORMAT
+binary)` and decode_copy_rows / decode_vector.
+
+Usage:
+    with get_pool().connection() as conn:
+        updated = bulk_update_embeddings(conn, profile_ids, embeddings)
+"""
+import io
+import struct
+import uuid
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+COPY_SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+COPY_HEADER = COPY_SIGNATURE + struct.pack('>ii', 0, 0)
+COPY_TRAILER = struct.pack('>h', -1)
+
+_TUPLE_HEAD = struct.Struct('>h')
+_FIELD_LENGTH = struct.Struct('>i')
+_VECTOR_HEAD = struct.Struct('>hh')
+UUID_SIZE = 16
+
+
+def encode_uuid_vector_copy(
+    ids: Sequence[str],
+    embeddings: np.ndarray,
+    texts: Optional[Sequence[Optional[str]]] = None
+) -> bytes:
+    """
+    COPY binary payload of (uuid, vector) rows, or (uuid, vector, text) with texts
+
+    Raises:
+        ValueError: an id is not a UUID or ids and embeddings differ in length
+    """
+    matrix = np.ascontiguousarray(np.asarray(embeddings, dtype='>f4'))
+    if matrix.ndim != 2 or matrix.shape[0] != len(ids):
+        raise ValueError(f"Expected {len(ids)} embeddings, got array of shape {matrix.shape}")
+
+    rows, dims = matrix.shape
+    vector_head = _VECTOR_HEAD.pack(dims, 0)
+    vector_length = _FIELD_LENGTH.pack(_VECTOR_HEAD.size + dims * 4)
+    if texts is not None and len(texts) != rows:
+        raise ValueError(f"Expected {rows} texts, got {len(texts)}")
+    tuple_head = _TUPLE_HEAD.pack(2 if texts is None else 3) + _FIELD_LENGTH.pack(UUID_SIZE)
+
+    buffer = io.BytesIO()
+    buffer.write(COPY_HEADER)
+    for i, (row_id, row) in enumerate(zip(ids, matrix)):
+        buffer.write(tuple_head)
+        buffer.write(uuid.UUID(str(row_id)).bytes)
+        buffer.write(vector_length)
+        buffer.write(vector_head)
+        buffer.write(row.tobytes())
+        if texts is not None:
+            if texts[i] is None:
+                buffer.write(_FIELD_LENGTH.pack(-1))
+            else:
+                text = texts[i].encode('utf-8')
+                buffer.write(_FIELD_LENGTH.pack(len(text)))
+                buffer.write(text)
+    buffer.write(COPY_TRAILER)
+    return buffer.getvalue()
+
+
+def bulk_update_embeddings(
+    conn,
+    ids: Sequence[str],
+    embeddings: np.ndarray,
+    table: str = 'customer_profile',
+    column: str = 'embedding',
+    text_hashes: Optional[Sequence[str]] = None,
+    model: Optional[str] = None
+) -> int:
+    """
+    Set `column` for every id in one COPY + UPDATE; returns rows updated
+
+    With text_hashes and model, also records what each embedding was
+    computed from in embedding_text_hash / embedding_model (migration 017).
+
+    Runs in the caller's transaction (pooled connections commit on exit).
+    `table` and `column` are trusted identifiers, never request input.
+    """
+    if len(ids) == 0:
+        return 0
+    payload = encode_uuid_vector_copy(ids, embeddings, text_hashes)
+    copy_columns = 'id, embedding' if text_hashes is None else 'id, embedding, text_hash'
+    provenance = '' if text_hashes is None else ', embedding_text_hash = u.text_hash, embedding_model = %s'
+
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TEMP TABLE IF NOT EXISTS _embedding_update (
+                id UUID,
+                embedding VECTOR,
+                text_hash TEXT
+            ) ON COMMIT DELETE ROWS
+            """
+        )
+        cur.execute("TRUNCATE _embedding_update")
+        cur.copy_expert(f"COPY _embedding_update ({copy_columns}) FROM STDIN WITH (FORMAT binary)", io.BytesIO(payload))
+        cur.execute(
+            f"""
+            UPDATE {table} AS t
+            SET {column} = u.embedding{provenance}
+            FROM _embedding_update AS u
+            WHERE t.id = u.id
+            """,
+            [] if text_hashes is None else [model]
+        )
+        return cur.rowcount
+
+
+def decode_copy_rows(payload: bytes) -> List[Tuple[Optional[bytes], ...]]:
+    """
+    Rows of a COPY binary payload, each a tuple of raw field bytes (None for NULL)
+
+    Raises:
+        ValueError: the payload is not COPY binary format
+    """
+    if not payload.startswith(COPY_SIGNATURE):
+        raise ValueError("Not a COPY binary payload")
+    offset = len(COPY_SIGNATURE) + 4
+    (extension_length,) = _FIELD_LENGTH.unpack_from(payload, offset)
+    offset += 4 + extension_length
+
+    rows = []
+    while True:
+        (field_count,) = _TUPLE_HEAD.unpack_from(payload, offset)
+        offset += _TUPLE_HEAD.size
+        if field_count == -1:
+            return rows
+        fields = []
+        for _ in range(field_count):
+            (length,) = _FIELD_LENGTH.unpack_from(payload, offset)
+            offset += _FIELD_LENGTH.size
+            if length == -1:
+                fields.append(None)
+            else:
+                fields.append(payload[offset:offset + length])
+                offset += length
+        rows.append(tuple(fields))
+
+
+def copy_query_rows(conn, query: str, params=None) -> List[Tuple[Optional[bytes], ...]]:
+    """Run `COPY (query) TO STDOUT` in binary format and decode its rows"""
+    with conn.cursor() as cur:
+        select = cur.mogrify(query, params).decode('utf-8')
+        buffer = io.BytesIO()
+        cur.copy_expert(f"COPY ({select}) TO STDOUT WITH (FORMAT binary)", buffer)
+    return decode_copy_rows(buffer.getvalue())
+
+
+def decode_vector(field: bytes) -> np.ndarray:
+    """float32 array of a binary pgvector value"""
+    dims, _ = _VECTOR_HEAD.unpack_from(field)
+    return np.frombuffer(field, dtype='>f4', count=dims, offset=_VECTOR_HEAD.size).astype(np.float32)
+
+
+def decode_uuid(field: bytes) -> str:
+    return str(uuid.UUID(bytes=field))
+
+
+def invalid_uuids(ids: Sequence[str]) -> List[str]:
+    """The ids that are not valid UUIDs (empty when all are)"""
+    invalid = []
+    for row_id in ids:
+        try:
+            uuid.UUID(str(row_id))
+        except ValueError:
+            invalid.append(row_id)
+    return invalid
@@ -0,0 +1,174 @@
+"""
+Serving Bundles
+Self-contained, memory-mappable model artifacts for online serving
+
+A bundle is a plain directory, logged by the training scripts as the
+'serving' artifact of the run:
+
+    bundle.json   format version, kind, feature order, label classes, metadata
+    model.txt     LightGBM booster in its native text format (if any)
+    <name>.npy    one array per file
+
+Loading needs numpy (and lightgbm for the booster) only: no MLflow flavor,
+no pickle, no shap or sklearn. Arrays are opened with mmap_mode='r', so
+every worker process on a host shares the same page-cache pages instead
+of holding its own copy.
+"""
+import json
+import os
+import tempfile
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+BUNDLE_FORMAT_VERSION = 1
+BUNDLE_ARTIFACT_PATH = 'serving'
+BUNDLE_MANIFEST = 'bundle.json'
+BOOSTER_FILE = 'model.txt'
+
+KIND_LIGHTGBM = 'lightgbm'
+KIND_LIGHTFM = 'lightfm'
+
+
+def write_bundle(
+    path: str,
+    kind: str,
+    booster=None,
+    feature_names: Optional[List[str]] = None,
+    label_classes: Optional[Iterable] = None,
+    arrays: Optional[Dict[str, np.ndarray]] = None,
+    indexed: Iterable[str] = (),
+    metadata: Optional[Dict] = None
+) -> str:
+    """
+    Write a serving bundle directory
+
+    Args:
+        path: Target directory (created if missing)
+        kind: Model family, e.g. 'lightgbm' or 'lightfm'
+        booster: lgb.Booster, saved in LightGBM's text format
+        feature_names: Model input order (defaults to the booster's)
+        label_classes: Class labels in model output order
+        arrays: name -> array, each saved as <name>.npy
+        indexed: Names of id arrays that get a sort order (<name>_order)
+            so the loader can look ids up without building a dict
+        metadata: Extra JSON-serializable fields
+
+    Returns:
+        The bundle path
+    """
+    os.makedirs(path, exist_ok=True)
+    arrays = dict(arrays or {})
+
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'kind': kind,
+        'metadata': metadata or {},
+    }
+
+    if booster is not None:
+        booster.save_model(os.path.join(path, BOOSTER_FILE))
+        manifest['booster'] = BOOSTER_FILE
+        if feature_names is None:
+            feature_names = booster.feature_name()
+    if feature_names is not None:
+        manifest['feature_names'] = [str(name) for name in feature_names]
+    if label_classes is not None:
+        manifest['label_classes'] = [
+            label.item() if isinstance(label, np.generic) else label
+            for label in label_classes
+        ]
+
+    for name in indexed:
+        # Ids are looked up as strings (request payloads are JSON)
+        arrays[name] = np.asarray(arrays[name]).astype(str)
+        arrays[f'{name}_order'] = np.argsort(arrays[name], kind='stable').astype(np.int64)
+
+    for name, array in arrays.items():
+        array = np.asarray(array)
+        if array.dtype == object:
+            # Fixed-width unicode can be memory-mapped, object arrays cannot
+            array = array.astype(str)
+        np.save(os.path.join(path, f'{name}.npy'), array, allow_pickle=False)
+    manifest['arrays'] = sorted(arrays)
+
+    with open(os.path.join(path, BUNDLE_MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    return path
+
+
+def log_bundle(kind: str, **kwargs):
+    """Write a bundle and log it as the 'serving' artifact of the active MLflow run"""
+    import mlflow
+
+    with tempfile.TemporaryDirectory() as bundle_dir:
+        write_bundle(bundle_dir, kind, **kwargs)
+        mlflow.log_artifacts(bundle_dir, BUNDLE_ARTIFACT_PATH)
+
+
+class ServingBundle:
+    """A loaded bundle: manifest fields plus memory-mapped arrays"""
+
+    def __init__(self, path: str, mmap: bool = True):
+        self.path = path
+        with open(os.path.join(path, BUNDLE_MANIFEST)) as f:
+            self.manifest = json.load(f)
+
+        if self.manifest.get('format_version', 0) > BUNDLE_FORMAT_VERSION:
+            raise ValueError(
+                f"Bundle format {self.manifest['format_version']} is newer than "
+                f"supported ({BUNDLE_FORMAT_VERSION}): {path}"
+            )
+
+        self.kind = self.manifest['kind']
+        self.feature_names = self.manifest.get('feature_names')
+        self.label_classes = self.manifest.get('label_classes')
+        self.metadata = self.manifest.get('metadata', {})
+        self.arrays = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r' if mmap else None, allow_pickle=False)
+            for name in self.manifest.get('arrays', [])
+        }
+        self._booster = None
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.arrays
+
+    @property
+    def has_booster(self) -> bool:
+        return 'booster' in self.manifest
+
+    def booster(self):
+        """The LightGBM booster (lightgbm is only imported here)"""
+        if self._booster is None:
+            if not self.has_booster:
+                raise ValueError(f"Bundle has no booster: {self.path}")
+            import lightgbm as lgb
+            self._booster = lgb.Booster(model_file=os.path.join(self.path, self.manifest['booster']))
+        return self._booster
+
+    def index_of(self, name: str, keys: Iterable) -> np.ndarray:
+        """
+        Positions of keys in the id array `name` (-1 where missing)
+
+        Binary search over the sort order written for indexed arrays, so
+        no per-process dict of all ids is needed.
+        """
+        ids = self.arrays[name]
+        order = self.arrays[f'{name}_order']
+        keys = np.asarray([str(key) for key in keys])
+        if len(ids) == 0 or len(keys) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+
+        pos = np.searchsorted(ids, keys, sorter=order)
+        pos = np.minimum(pos, len(ids) - 1)
+        rows = np.asarray(order[pos], dtype=np.int64)
+        rows[ids[rows] != keys] = -1
+        return rows
+
+
+def load_bundle(path: str, mmap: bool = True) -> ServingBundle:
+    return ServingBundle(path, mmap=mmap)
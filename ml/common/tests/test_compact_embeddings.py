@@ -0,0 +1,64 @@
+"""
+Unit tests for compact (projected + int8) embedding codes
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../src'))
+
+from compact_embeddings import CompactCodec, fit_codec, memory_report, recall_report
+
+
+def low_rank_embeddings(n=2000, dims=64, rank=12, seed=0):
+    """Unit vectors that mostly live in a rank-`rank` subspace, like real embeddings"""
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, rank)) @ rng.normal(size=(rank, dims)) + 0.05 * rng.normal(size=(n, dims))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+class TestCompactCodec(unittest.TestCase):
+
+    def setUp(self):
+        self.vectors = low_rank_embeddings()
+
+    def test_pca_codes_approximate_inner_products(self):
+        codec = fit_codec(self.vectors, 16)
+        codes = codec.encode(self.vectors)
+        query = self.vectors[0]
+
+        self.assertEqual(codes.dtype, np.int8)
+        self.assertEqual(codes.shape, (2000, 16))
+        np.testing.assert_allclose(codec.scores(codes, query), self.vectors @ query, atol=0.08)
+        np.testing.assert_allclose(codec.decode(codes[:5]), self.vectors[:5], atol=0.2)
+
+    def test_save_load_and_reports(self):
+        path = tempfile.mkdtemp()
+        try:
+            codec = fit_codec(self.vectors, 16)
+            codec.save(path)
+            loaded = CompactCodec.load(path)
+        finally:
+            shutil.rmtree(path)
+
+        np.testing.assert_array_equal(loaded.encode(self.vectors[:10]), codec.encode(self.vectors[:10]))
+        self.assertIsNone(CompactCodec.load(tempfile.gettempdir() + '/missing-codec'))
+
+        recall = recall_report(self.vectors, codec.encode(self.vectors), codec, queries=50)
+        self.assertGreaterEqual(recall['recall_with_rerank'], recall['recall_codes_only'])
+        self.assertGreater(recall['recall_with_rerank'], 0.9)
+        self.assertEqual(memory_report(2000, 64, 16)['compression_ratio'], 16.0)
+
+    def test_truncate_and_bad_dims(self):
+        codec = fit_codec(self.vectors, 8, method='truncate')
+        np.testing.assert_array_equal(codec.components, np.eye(64, 8))
+        with self.assertRaises(ValueError):
+            fit_codec(self.vectors, 65)
+
+
+if __name__ == '__main__':
+    unittest.main()
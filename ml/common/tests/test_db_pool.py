@@ -0,0 +1,229 @@
+"""
+Unit tests for the shared database pool
+"""
+import asyncio
+import gc
+import os
+import socket
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../src'))
+
+from db_pool import AsyncConnectionPool, ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        if self.conn.broken:
+            raise RuntimeError("server closed the connection unexpectedly")
+        self.conn.executed.append(query)
+        self.conn.in_transaction = True
+
+    def fetchall(self):
+        return [(1,)]
+
+    def fetchone(self):
+        return (1,)
+
+
+class FakeConnection:
+    """Just enough of a psycopg2 connection for the pool"""
+
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = False
+        self.broken = False
+        self.in_transaction = False
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+        self.in_transaction = False
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def get_transaction_status(self):
+        return 2 if self.in_transaction else 0
+
+    def close(self):
+        self.closed = 1
+
+
+class SocketConnection(FakeConnection):
+    """Backed by a real socket; like PQfinish, close and dealloc send Terminate ('X') on it"""
+
+    def __init__(self, sock):
+        super().__init__()
+        self.sock = sock
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def close(self):
+        if not self.closed:
+            self.closed = 1
+            try:
+                self.sock.send(b'X')
+            except OSError:
+                pass
+            self.sock.close()
+
+    def __del__(self):
+        self.close()
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.opened = []
+
+    def connect(self):
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+
+def make_pool(db, **kwargs):
+    params = dict(min_size=0, max_size=2, timeout=0.2, connect_fn=db.connect)
+    params.update(kwargs)
+    return ConnectionPool(**params)
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def test_connections_are_reused(self):
+        """Connections are opened once and reused across checkouts"""
+        db = FakeDatabase()
+        pool = make_pool(db)
+        for _ in range(5):
+            with pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+        self.assertEqual(len(db.opened), 1)
+        self.assertEqual(db.opened[0].commits, 5)
+        self.assertEqual(pool.stats()['acquired_total'], 5)
+
+    def test_pool_is_bounded(self):
+        """Checkouts beyond max_size wait, then time out"""
+        db = FakeDatabase()
+        pool = make_pool(db)
+        a, b = pool.getconn(), pool.getconn()
+        self.assertEqual(pool.stats()['utilization'], 1.0)
+        with self.assertRaises(PoolTimeout):
+            pool.getconn(timeout=0.05)
+        self.assertEqual(pool.stats()['timeouts_total'], 1)
+
+        # A waiter gets the connection as soon as one is returned
+        result = {}
+        waiter = threading.Thread(target=lambda: result.setdefault('conn', pool.getconn(timeout=2)))
+        waiter.start()
+        pool.putconn(a)
+        waiter.join()
+        self.assertIs(result['conn'], a)
+        self.assertEqual(len(db.opened), 2)
+        pool.putconn(b)
+
+    def test_error_rolls_back_and_resets_session(self):
+        """Failed work is rolled back; autocommit set by a borrower is reset"""
+        db = FakeDatabase()
+        pool = make_pool(db)
+        with self.assertRaises(ValueError):
+            with pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("UPDATE x SET y = 1")
+                raise ValueError("boom")
+        self.assertEqual(conn.rollbacks, 1)
+        self.assertFalse(conn.in_transaction)
+
+        with pool.connection() as conn:
+            conn.autocommit = True
+        self.assertFalse(conn.autocommit)
+
+    def test_dead_connection_is_replaced(self):
+        """Closed or unhealthy idle connections are replaced on checkout"""
+        db = FakeDatabase()
+        pool = make_pool(db, health_check_interval=0)
+        with pool.connection() as conn:
+            pass
+        conn.broken = True
+
+        with pool.connection() as replacement:
+            pass
+        self.assertIsNot(replacement, conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()['reconnects_total'], 1)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_expired_connection_is_recycled(self):
+        """Connections older than max_lifetime are closed and reopened"""
+        db = FakeDatabase()
+        pool = make_pool(db, max_lifetime=1e-9)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+        self.assertIsNot(first, second)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.stats()['reconnects_total'], 0)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), "needs fork()")
+    def test_forked_child_leaves_parent_sessions_alone(self):
+        """A child drops inherited connections without terminating the parent's sessions"""
+        server, client = socket.socketpair()
+        self.addCleanup(server.close)
+        conn = SocketConnection(client)
+        pool = make_pool(FakeDatabase(), connect_fn=lambda: conn, min_size=1)
+
+        pid = os.fork()
+        if pid == 0:  # child: close the pool and free everything it inherited
+            try:
+                pool.close()
+                del conn
+                gc.collect()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+
+        server.setblocking(False)
+        with self.assertRaises(BlockingIOError):
+            server.recv(16)  # no Terminate from the child
+        with pool.connection() as same:
+            same.sock.send(b'Q')
+        self.assertIs(same, conn)
+        self.assertEqual(server.recv(16), b'Q')
+
+    def test_async_pool(self):
+        """Async helpers run on pooled connections"""
+        db = FakeDatabase()
+        pool = AsyncConnectionPool(make_pool(db))
+
+        async def work():
+            return await asyncio.gather(*[pool.fetchone("SELECT 1") for _ in range(10)])
+
+        rows = asyncio.run(work())
+        self.assertEqual(rows, [(1,)] * 10)
+        self.assertLessEqual(len(db.opened), 2)
+        self.assertEqual(pool.stats()['in_use'], 0)
+        pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
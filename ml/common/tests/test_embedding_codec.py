@@ -0,0 +1,108 @@
+"""
+Unit tests for the binary embedding transport
+"""
+import json
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../src'))
+
+from embedding_client import EmbeddingClient
+from embedding_codec import (
+    MEDIA_TYPE_BINARY,
+    MEDIA_TYPE_JSON,
+    MEDIA_TYPE_NPY,
+    UnsupportedFormat,
+    content_type,
+    decode,
+    encode,
+    negotiate,
+)
+
+
+class TestEmbeddingCodec(unittest.TestCase):
+
+    def setUp(self):
+        self.embeddings = np.random.default_rng(0).normal(size=(4, 8)).astype(np.float32)
+
+    def test_binary_round_trip(self):
+        body = encode(self.embeddings, MEDIA_TYPE_BINARY, 'float32')
+
+        self.assertEqual(len(body), 16 + 4 * 8 * 4)
+        np.testing.assert_array_equal(decode(body, content_type(MEDIA_TYPE_BINARY)), self.embeddings)
+
+    def test_float16_and_npy(self):
+        half = decode(encode(self.embeddings, MEDIA_TYPE_BINARY, 'float16'), MEDIA_TYPE_BINARY)
+        npy = decode(encode(self.embeddings, MEDIA_TYPE_NPY, 'float32'), MEDIA_TYPE_NPY)
+
+        self.assertEqual(half.dtype, np.float16)
+        np.testing.assert_allclose(half, self.embeddings, atol=1e-2)
+        np.testing.assert_array_equal(npy, self.embeddings)
+
+    def test_negotiate(self):
+        self.assertEqual(negotiate(None), (MEDIA_TYPE_JSON, 'float32'))
+        self.assertEqual(negotiate('*/*'), (MEDIA_TYPE_JSON, 'float32'))
+        self.assertEqual(negotiate('application/x-embeddings; dtype=float16'), (MEDIA_TYPE_BINARY, 'float16'))
+        self.assertEqual(
+            negotiate('application/json;q=0.5, application/x-npy;q=0.9'),
+            (MEDIA_TYPE_NPY, 'float32')
+        )
+        with self.assertRaises(UnsupportedFormat):
+            negotiate('application/x-embeddings; dtype=int8')
+
+    def test_truncated_payload_rejected(self):
+        body = encode(self.embeddings, MEDIA_TYPE_BINARY)
+        with self.assertRaises(UnsupportedFormat):
+            decode(body[:-4], MEDIA_TYPE_BINARY)
+
+
+class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+    """Echoes one row per text, negotiated like embedding-service"""
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        texts = payload.get('texts', [payload.get('text')])
+        matrix = np.array([[len(text), 1.0, 2.0] for text in texts], dtype=np.float32)
+
+        media_type, dtype = negotiate(self.headers.get('Accept'))
+        body = encode(matrix, media_type, dtype)
+        self.send_response(200)
+        self.send_header('Content-Type', content_type(media_type, dtype))
+        self.send_header('X-Embedding-Model', 'fake-model')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestEmbeddingClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), FakeEmbeddingHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_embed_and_batch(self):
+        client = EmbeddingClient(self.base_url, dtype='float16')
+
+        vector = client.embed('hello')
+        matrix = client.embed_batch(['a', 'abc'])
+
+        np.testing.assert_array_equal(vector, [5, 1, 2])
+        np.testing.assert_array_equal(matrix[:, 0], [1, 3])
+        self.assertEqual(matrix.dtype, np.float16)
+        self.assertEqual(client.model, 'fake-model')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+"""
+Unit tests for embedding input text and its change hash
+"""
+import os
+import sys
+import unittest
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../src'))
+
+from embedding_text import embedding_change, profile_text, text_hash
+
+
+class TestEmbeddingText(unittest.TestCase):
+
+    def test_profile_text(self):
+        profile = {'full_name': 'Priya Nair', 'city': 'Pune', 'state': 'MH', 'segment': 'vip',
+                   'ltv': Decimal('1250.50'), 'total_orders': 7}
+        self.assertEqual(
+            profile_text(profile),
+            "Customer name: Priya Nair. Location: Pune, MH. Segment: vip. Lifetime value: 1250.50"
+        )
+        self.assertEqual(profile_text({'city': 'Pune'}), "Customer profile")
+
+    def test_hash_tracks_text_changes_only(self):
+        profile = {'full_name': 'Priya Nair', 'segment': 'vip', 'total_orders': 7}
+        unchanged = dict(profile, total_orders=8)  # not part of the text
+        changed = dict(profile, segment='at_risk')
+
+        self.assertEqual(text_hash(profile_text(profile)), text_hash(profile_text(unchanged)))
+        self.assertNotEqual(text_hash(profile_text(profile)), text_hash(profile_text(changed)))
+        self.assertEqual(len(text_hash('x')), 32)
+
+    def test_embedding_change(self):
+        profile = {'full_name': 'Priya Nair', 'segment': 'vip', 'missing_embedding': False,
+                   'embedding_model': 'mpnet'}
+        profile['embedding_text_hash'] = text_hash(profile_text(profile))
+
+        self.assertIsNone(embedding_change(profile, 'mpnet'))
+        self.assertEqual(embedding_change(dict(profile, missing_embedding=True), 'mpnet'), 'new')
+        self.assertEqual(embedding_change(dict(profile, segment='at_risk'), 'mpnet'), 'text')
+        self.assertEqual(embedding_change(dict(profile, embedding_text_hash=None), 'mpnet'), 'text')
+        self.assertEqual(embedding_change(profile, 'minilm'), 'model')
+
+
+if __name__ == '__main__':
+    unittest.main()
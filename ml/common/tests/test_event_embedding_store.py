@@ -0,0 +1,77 @@
+"""
+Unit tests for the date-sharded event embedding store
+"""
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../src'))
+
+from event_embedding_store import EventEmbeddingStore
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+
+def event_id(i):
+    return f"00000000-0000-0000-0000-{i:012d}"
+
+
+class TestEventEmbeddingStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, 'events')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_incremental_appends_are_sharded_by_utc_date(self):
+        store = EventEmbeddingStore(self.root, model='mpnet')
+        store.append(
+            [event_id(3), event_id(1)],
+            # 01:00 IST on the 20th is still the 19th in UTC
+            [datetime(2026, 10, 19, 9, tzinfo=timezone.utc), datetime(2026, 10, 20, 1, tzinfo=IST)],
+            np.array([[3, 3], [1, 1]], dtype=np.float32),
+            cursor=['2026-10-21T00:00:00+00:00', event_id(1)]
+        )
+        self.assertEqual(store.flush(), 2)
+        # A late-arriving event for an older date lands in a new part of that date
+        store.append([event_id(2)], [datetime(2026, 10, 19, 8, tzinfo=timezone.utc)], np.array([[2, 2]]),
+                     cursor=['2026-10-22T00:00:00+00:00', event_id(2)])
+        unflushed = EventEmbeddingStore(self.root)
+        store.flush()
+
+        reopened = EventEmbeddingStore(self.root, model='mpnet')
+        self.assertEqual(reopened.rows, 3)
+        self.assertEqual(unflushed.cursor, ['2026-10-21T00:00:00+00:00', event_id(1)])
+        self.assertEqual(reopened.cursor, ['2026-10-22T00:00:00+00:00', event_id(2)])
+        self.assertEqual([shard['part'] for shard in reopened.shards('2026-10-19', '2026-10-19')],
+                         ['part-00000', 'part-00001'])
+
+        date, ids, event_ts, vectors = next(reopened.iter_shards(end='2026-10-19'))
+        self.assertIsInstance(vectors, np.memmap)
+        self.assertEqual(ids.tolist(), [event_id(1).encode(), event_id(3).encode()])  # sorted by id
+        self.assertEqual(vectors[:, 0].tolist(), [1, 3])
+        self.assertEqual(str(event_ts[0]), '2026-10-19T19:30:00.000000')
+
+        found, vectors = reopened.lookup([event_id(2), event_id(9), event_id(3)])
+        self.assertEqual(found.tolist(), [True, False, True])
+        self.assertEqual(vectors[:, 0].tolist(), [2, 0, 3])
+
+    def test_rejects_other_models_and_dimensions(self):
+        store = EventEmbeddingStore(self.root, model='mpnet')
+        store.append([event_id(1)], [datetime(2026, 10, 19)], np.zeros((1, 4)))
+        store.flush()
+
+        with self.assertRaises(ValueError):
+            EventEmbeddingStore(self.root, model='minilm')
+        with self.assertRaises(ValueError):
+            store.append([event_id(2)], [datetime(2026, 10, 19)], np.zeros((1, 8)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Unit tests for the import-time report, and the import budget of every service that declares one
+"""
+import os
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../src'))
+
+from import_budget import BUDGET_FILE, build_report, check_service, parse_importtime
+
+COMMON_SRC = os.path.join(os.path.dirname(__file__), '../src')
+SERVICES_DIR = os.path.join(os.path.dirname(__file__), '../../../services')
+BUDGETED_SERVICES = sorted(
+    name for name in os.listdir(SERVICES_DIR) if os.path.exists(os.path.join(SERVICES_DIR, name, BUDGET_FILE))
+)
+# Wall-clock import time depends on the machine: the check allows this multiple
+# of budget_ms (0 disables it); the deferred-package check is exact
+IMPORT_BUDGET_SLACK = float(os.getenv('IMPORT_BUDGET_SLACK', '3'))
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:      1000 |       1000 | site
+import time:       100 |        100 | src
+import time:       300 |        300 |     numpy.core
+import time:       200 |        500 |   numpy
+import time:      4000 |       4000 |   fastapi
+import time:       700 |       5200 | src.main
+"""
+
+
+class TestImportBudget(unittest.TestCase):
+
+    def test_parse_depths(self):
+        entries = parse_importtime(IMPORTTIME_OUTPUT)
+
+        self.assertEqual([entry.module for entry in entries], ['site', 'src', 'numpy.core', 'numpy', 'fastapi', 'src.main'])
+        self.assertEqual([entry.depth for entry in entries], [0, 0, 2, 1, 1, 0])
+
+    def test_report_covers_only_the_target_import(self):
+        report = build_report(parse_importtime(IMPORTTIME_OUTPUT), 'src.main', budget_ms=10, deferred=['fastapi', 'shap'])
+
+        self.assertEqual(report.total_ms, 5.2)
+        self.assertEqual(list(report.packages_ms), ['fastapi', 'src', 'numpy'])
+        self.assertNotIn('site', report.modules)
+        self.assertEqual(report.deferred_loaded, ['fastapi'])
+        self.assertFalse(report.over_budget)
+        self.assertFalse(report.ok)
+
+    def test_over_budget(self):
+        report = build_report(parse_importtime(IMPORTTIME_OUTPUT), 'src.main', budget_ms=5)
+
+        self.assertTrue(report.over_budget)
+
+
+class TestServiceImportBudgets(unittest.TestCase):
+
+    def missing_dependency(self, error: RuntimeError):
+        """Third-party package a service could not import here, None for any other failure"""
+        match = re.search(r"ModuleNotFoundError: No module named '([^'.]+)", str(error))
+        if match is None or match.group(1) == 'src' or os.path.exists(os.path.join(COMMON_SRC, match.group(1) + '.py')):
+            return None
+        return match.group(1)
+
+    def test_services_import_within_budget(self):
+        """Budget and deferred packages are declared in each service's import_budget.json"""
+        self.assertIn('ml-scorer-service', BUDGETED_SERVICES)
+        for service in BUDGETED_SERVICES:
+            with self.subTest(service=service):
+                try:
+                    report = check_service(os.path.join(SERVICES_DIR, service))
+                except RuntimeError as e:
+                    missing = self.missing_dependency(e)
+                    if missing is None:
+                        raise
+                    self.skipTest(f"{service} dependency {missing} is not installed")
+
+                self.assertEqual(report.deferred_loaded, [])
+                if IMPORT_BUDGET_SLACK:
+                    self.assertLessEqual(report.total_ms, report.budget_ms * IMPORT_BUDGET_SLACK)
+
+
+if __name__ == '__main__':
+    unittest.main()
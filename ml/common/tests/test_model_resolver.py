@@ -0,0 +1,181 @@
+"""
+Unit tests for the shared model resolver
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../src'))
+
+from model_resolver import ModelResolver, ModelUnavailable, load_lightgbm
+
+
+class FakeRegistry:
+    """Registry + artifact store: run_id -> {artifact_path: {file: bytes}}"""
+
+    def __init__(self):
+        self.version = ('3', 'run-3')
+        self.runs = {
+            'run-3': {'models': {'model.txt': b'tree v3', 'MLmodel': b'flavor'}},
+            'run-4': {'models': {'model.txt': b'tree v4', 'MLmodel': b'flavor'}},
+        }
+        self.available = True
+        self.downloads = 0
+        self.lookups = 0
+
+    def lookup(self, name, experiment):
+        self.lookups += 1
+        if not self.available:
+            raise ConnectionError("tracking server unreachable")
+        return self.version
+
+    def download(self, artifact_uri, dst_path):
+        if not self.available:
+            raise ConnectionError("tracking server unreachable")
+        self.downloads += 1
+        run_id, artifact_path = artifact_uri[len('runs:/'):].split('/', 1)
+        target = os.path.join(dst_path, artifact_path)
+        os.makedirs(target)
+        for filename, content in self.runs[run_id][artifact_path].items():
+            with open(os.path.join(target, filename), 'wb') as f:
+                f.write(content)
+        return target
+
+
+class TestModelResolver(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.registry = FakeRegistry()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def resolver(self, mode='registry'):
+        return ModelResolver(
+            cache_dir=self.cache_dir,
+            mode=mode,
+            download_fn=self.registry.download,
+            registry_fn=self.registry.lookup
+        )
+
+    def read_model(self, resolved):
+        with open(os.path.join(resolved.path, 'model.txt'), 'rb') as f:
+            return f.read()
+
+    def test_downloads_once_per_version(self):
+        first = self.resolver().resolve('churn-prediction')
+        second = self.resolver().resolve('churn-prediction')
+
+        self.assertEqual(self.registry.downloads, 1)
+        self.assertEqual(first.source, 'download')
+        self.assertEqual(second.source, 'registry')
+        self.assertEqual(second.version, '3')
+        self.assertEqual(first.path, second.path)
+        self.assertIn(first.hashes['models'], first.path)
+        self.assertEqual(self.read_model(second), b'tree v3')
+
+    def test_new_version_is_downloaded(self):
+        self.resolver().resolve('churn-prediction')
+        self.registry.version = ('4', 'run-4')
+
+        resolved = self.resolver().resolve('churn-prediction')
+
+        self.assertEqual(self.registry.downloads, 2)
+        self.assertEqual(resolved.version, '4')
+        self.assertEqual(self.read_model(resolved), b'tree v4')
+
+    def test_registry_down_loads_last_cached_version(self):
+        self.resolver().resolve('churn-prediction')
+        self.registry.available = False
+
+        resolved = self.resolver().resolve('churn-prediction')
+
+        self.assertEqual(resolved.source, 'cache')
+        self.assertEqual(resolved.version, '3')
+        self.assertEqual(self.read_model(resolved), b'tree v3')
+
+    def test_registry_down_without_cache_raises(self):
+        self.registry.available = False
+        with self.assertRaises(ModelUnavailable):
+            self.resolver().resolve('churn-prediction')
+
+    def test_cache_mode_skips_registry_when_cached(self):
+        self.resolver().resolve('churn-prediction')
+        self.registry.version = ('4', 'run-4')
+
+        resolved = self.resolver(mode='cache').resolve('churn-prediction')
+
+        self.assertEqual(resolved.source, 'cache')
+        self.assertEqual(resolved.version, '3')
+
+    def test_load_records_timings(self):
+        model, resolved = self.resolver().load('churn-prediction', self.read_model)
+
+        self.assertEqual(model, b'tree v3')
+        self.assertEqual(set(resolved.timings), {'resolve', 'download', 'load'})
+
+    def test_fallback_artifacts_share_one_registry_lookup(self):
+        """A run without the preferred artifact resolves its fallback; registry asked once per resolve"""
+        resolved = self.resolver().resolve('churn-prediction', artifacts=('serving',), fallbacks=[('models',)])
+        self.assertEqual(list(resolved.paths), ['models'])
+        self.assertEqual(self.registry.lookups, 1)
+
+        self.registry.available = False
+        cached = self.resolver().resolve('churn-prediction', artifacts=('serving',), fallbacks=[('models',)])
+        self.assertEqual(cached.source, 'cache')
+        self.assertEqual(self.read_model(cached), b'tree v3')
+        self.assertEqual(self.registry.lookups, 2)
+
+    def test_resolvers_sharing_a_cache_keep_each_others_entries(self):
+        """Separate resolvers (as in separate workers) must not overwrite each other's manifest entries"""
+        lookup = self.registry.lookup
+
+        def slow_lookup(name, experiment):
+            time.sleep(0.05)  # both read the manifest before either writes, without the file lock
+            return lookup(name, experiment)
+        self.registry.lookup = slow_lookup
+
+        names = ['churn-prediction', 'ltv-prediction']
+        threads = [threading.Thread(target=self.resolver().resolve, args=(name,)) for name in names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.registry.available = False
+        for name in names:
+            self.assertEqual(self.resolver().resolve(name).source, 'cache')
+
+    def test_load_lightgbm_prefers_serving_bundle(self):
+        import lightgbm as lgb
+        import numpy as np
+        from serving_bundle import write_bundle
+
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(100, 3))
+        booster = lgb.train(
+            {'objective': 'binary', 'verbose': -1, 'num_leaves': 4},
+            lgb.Dataset(X, label=(X[:, 0] > 0).astype(int)),
+            num_boost_round=3
+        )
+        bundle_dir = os.path.join(self.cache_dir, 'bundle-src')
+        write_bundle(bundle_dir, 'lightgbm', booster=booster)
+        self.registry.runs['run-3']['serving'] = {
+            filename: open(os.path.join(bundle_dir, filename), 'rb').read()
+            for filename in os.listdir(bundle_dir)
+        }
+
+        model, bundle, resolved = load_lightgbm('churn-prediction', resolver=self.resolver())
+
+        self.assertIsNotNone(bundle)
+        self.assertEqual(resolved.version, '3')
+        np.testing.assert_allclose(model.predict(X), booster.predict(X))
+
+
+if __name__ == '__main__':
+    unittest.main()
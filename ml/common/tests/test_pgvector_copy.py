@@ -0,0 +1,49 @@
+"""
+Unit tests for binary pgvector COPY encoding
+"""
+import os
+import sys
+import unittest
+import uuid
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../src'))
+
+from pgvector_copy import (
+    decode_copy_rows,
+    decode_uuid,
+    decode_vector,
+    encode_uuid_vector_copy,
+    invalid_uuids,
+)
+
+
+class TestPgvectorCopy(unittest.TestCase):
+
+    def test_round_trip(self):
+        ids = [str(uuid.uuid4()) for _ in range(3)]
+        embeddings = np.random.default_rng(0).normal(size=(3, 5)).astype(np.float32)
+
+        rows = decode_copy_rows(encode_uuid_vector_copy(ids, embeddings))
+
+        self.assertEqual([decode_uuid(row[0]) for row in rows], ids)
+        np.testing.assert_array_equal(np.stack([decode_vector(row[1]) for row in rows]), embeddings)
+
+    def test_text_column(self):
+        ids = [str(uuid.uuid4()) for _ in range(2)]
+        rows = decode_copy_rows(encode_uuid_vector_copy(ids, np.ones((2, 3)), ['a1f0', None]))
+
+        self.assertEqual([row[2] for row in rows], [b'a1f0', None])
+        np.testing.assert_array_equal(decode_vector(rows[1][1]), [1, 1, 1])
+
+    def test_rejects_bad_input(self):
+        with self.assertRaises(ValueError):
+            encode_uuid_vector_copy(['not-a-uuid'], np.zeros((1, 3)))
+        with self.assertRaises(ValueError):
+            encode_uuid_vector_copy([str(uuid.uuid4())], np.zeros((2, 3)))
+        self.assertEqual(invalid_uuids([str(uuid.uuid4()), 'x']), ['x'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Unit tests for serving bundles
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../src'))
+
+from serving_bundle import load_bundle, write_bundle
+
+
+class TestServingBundle(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def test_round_trip_with_mmap(self):
+        embeddings = np.random.default_rng(0).normal(size=(5, 3)).astype(np.float32)
+        write_bundle(
+            self.path,
+            'lightfm',
+            label_classes=np.array(['complaint', 'purchase']),
+            arrays={'item_embeddings': embeddings, 'item_ids': np.array(['b', 'a', 'c', 'e', 'd'], dtype=object)},
+            indexed=('item_ids',),
+            metadata={'no_components': 3}
+        )
+
+        bundle = load_bundle(self.path)
+
+        self.assertEqual(bundle.kind, 'lightfm')
+        self.assertEqual(bundle.label_classes, ['complaint', 'purchase'])
+        self.assertEqual(bundle.metadata, {'no_components': 3})
+        self.assertIsInstance(bundle['item_embeddings'], np.memmap)
+        np.testing.assert_array_equal(bundle['item_embeddings'], embeddings)
+        self.assertFalse(bundle.has_booster)
+
+    def test_index_of(self):
+        write_bundle(
+            self.path,
+            'lightfm',
+            arrays={'user_ids': np.array([30, 10, 20])},
+            indexed=('user_ids',)
+        )
+
+        bundle = load_bundle(self.path)
+
+        np.testing.assert_array_equal(bundle.index_of('user_ids', ['20', 10, '99', '30']), [2, 1, -1, 0])
+
+    def test_booster_round_trip(self):
+        import lightgbm as lgb
+
+        rng = np.random.default_rng(1)
+        X = rng.normal(size=(200, 4))
+        y = (X[:, 0] > 0).astype(int)
+        booster = lgb.train(
+            {'objective': 'binary', 'verbose': -1, 'num_leaves': 4},
+            lgb.Dataset(X, label=y, feature_name=['a', 'b', 'c', 'd']),
+            num_boost_round=5
+        )
+        write_bundle(self.path, 'lightgbm', booster=booster)
+
+        bundle = load_bundle(self.path)
+
+        self.assertEqual(bundle.feature_names, ['a', 'b', 'c', 'd'])
+        np.testing.assert_allclose(bundle.booster().predict(X), booster.predict(X))
+
+
+if __name__ == '__main__':
+    unittest.main()
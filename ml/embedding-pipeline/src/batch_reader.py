@@ -0,0 +1,66 @@
+"""
+Keyset Page Reader
+Streams large query results page by page
+
+fetchall() over customer_profile or events holds the whole table in
+memory before any work starts. keyset_pages() instead runs the query
+once per page, continuing after the last row of the previous page on a
+unique sort key:
+
+    WHERE ... AND (event_ts, id) < (%s, %s) ORDER BY event_ts DESC, id DESC LIMIT %s
+
+Each page is an independent indexed range scan, so memory stays at one
+page, the first page arrives immediately, and the caller is free to
+commit writes between pages (unlike a named cursor, which dies on commit).
+"""
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import psycopg2.extras
+
+
+def keyset_pages(
+    conn,
+    query: str,
+    keys: Sequence[str],
+    page_size: int,
+    limit: Optional[int] = None,
+    params: Sequence = (),
+    descending: bool = False
+) -> Iterator[List[Dict]]:
+    """
+    Yield lists of dict rows, at most page_size each, in key order
+
+    Args:
+        conn: psycopg2 connection
+        query: SELECT ... WHERE ... {after} without ORDER BY / LIMIT; `{after}`
+            marks the keyset condition and must follow every other placeholder
+        keys: Sort key columns, unique together (e.g. ['event_ts', 'e.id']);
+            rows must expose them under their unqualified names
+        page_size: Rows per page
+        limit: Stop after this many rows (None: all)
+        params: Parameters for the placeholders before {after}
+        descending: Newest/highest first
+    """
+    order = ', '.join(f"{key} DESC" if descending else key for key in keys)
+    compare = f"({', '.join(keys)}) {'<' if descending else '>'} ({', '.join(['%s'] * len(keys))})"
+    columns = [key.split('.')[-1] for key in keys]
+    after = None
+    remaining = limit
+
+    while remaining is None or remaining > 0:
+        size = page_size if remaining is None else min(page_size, remaining)
+        condition, condition_params = ('TRUE', []) if after is None else (compare, after)
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(
+                f"{query.format(after=condition)} ORDER BY {order} LIMIT %s",
+                [*params, *condition_params, size]
+            )
+            rows = cur.fetchall()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < size:
+            return
+        after = [rows[-1][column] for column in columns]
+        if remaining is not None:
+            remaining -= len(rows)
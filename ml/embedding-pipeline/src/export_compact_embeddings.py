@@ -0,0 +1,144 @@
+"""
+Compact Embedding Export
+Exports profile embeddings as full float32 vectors plus compact int8 codes
+
+Reads every non-merged profile embedding with binary COPY, learns a
+projection (PCA or truncation) and int8 ranges from a sample, and writes
+a columnar store:
+
+    <output>/ids.npy             (n,) profile ids, S36
+    <output>/vectors.npy         (n, 768) float32 full vectors
+    <output>/compact_codes.npy   (n, dims) int8 codes
+    <output>/compact_*.npy/json  the codec (see ml/common/src/compact_embeddings.py)
+    <output>/report.json         memory saved and recall impact
+
+Similarity search can hold only compact_codes.npy in RAM and re-rank a
+shortlist against vectors.npy (memory-mapped).
+
+Usage:
+    python src/export_compact_embeddings.py --output /data/profile_embeddings --dims 128
+    python src/export_compact_embeddings.py --output /tmp/compact --dims 96 --method truncate
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Add shared ML modules path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../common/src'))
+from compact_embeddings import CODES_FILE, METHOD_PCA, METHOD_TRUNCATE, fit_codec, memory_report, recall_report
+from db_pool import connect
+from pgvector_copy import copy_query_rows, decode_uuid, decode_vector
+
+load_dotenv()
+
+CHUNK_ROWS = 50000
+
+
+def export_vectors(conn, output: str):
+    """Stream embeddings into ids.npy / vectors.npy; returns (ids, vectors memmap)"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT count(*) FROM customer_profile WHERE is_merged = FALSE AND embedding IS NOT NULL")
+        expected = cur.fetchone()[0]
+        cur.execute("SELECT vector_dims(embedding) FROM customer_profile WHERE embedding IS NOT NULL LIMIT 1")
+        row = cur.fetchone()
+    if not expected or row is None:
+        raise SystemExit("❌ No profile embeddings to export")
+    dims = row[0]
+
+    vectors = np.lib.format.open_memmap(
+        os.path.join(output, 'vectors.npy'), mode='w+', dtype=np.float32, shape=(expected, dims)
+    )
+    ids = []
+    last_id = '00000000-0000-0000-0000-000000000000'
+    while len(ids) < expected:
+        rows = copy_query_rows(
+            conn,
+            """
+            SELECT id, embedding
+            FROM customer_profile
+            WHERE is_merged = FALSE AND embedding IS NOT NULL AND id > %s::uuid
+            ORDER BY id
+            LIMIT %s
+            """,
+            [last_id, min(CHUNK_ROWS, expected - len(ids))]
+        )
+        if not rows:
+            break
+        start = len(ids)
+        for offset, (row_id, embedding) in enumerate(rows):
+            ids.append(decode_uuid(row_id))
+            vectors[start + offset] = decode_vector(embedding)
+        last_id = ids[-1]
+        print(f"  {len(ids)}/{expected} embeddings")
+    conn.rollback()
+
+    vectors.flush()
+    if len(ids) < expected:
+        # Profiles were merged or cleared during the export
+        del vectors
+        full = np.load(os.path.join(output, 'vectors.npy'), mmap_mode='r')
+        np.save(os.path.join(output, 'vectors.tmp.npy'), full[:len(ids)], allow_pickle=False)
+        del full
+        os.replace(os.path.join(output, 'vectors.tmp.npy'), os.path.join(output, 'vectors.npy'))
+        vectors = np.load(os.path.join(output, 'vectors.npy'), mmap_mode='r')
+
+    np.save(os.path.join(output, 'ids.npy'), np.asarray(ids, dtype='S36'), allow_pickle=False)
+    return ids, vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export profile embeddings with compact int8 codes')
+    parser.add_argument('--output', type=str, required=True, help='Output directory')
+    parser.add_argument('--dims', type=int, default=128, help='Compact dimensions')
+    parser.add_argument('--method', choices=[METHOD_PCA, METHOD_TRUNCATE], default=METHOD_PCA,
+                        help='Projection: learned PCA or truncation to the leading dimensions')
+    parser.add_argument('--sample', type=int, default=50000, help='Rows used to fit the projection and ranges')
+    parser.add_argument('--queries', type=int, default=200, help='Sample queries for the recall report')
+    parser.add_argument('--k', type=int, default=10, help='Neighbours for the recall report')
+    parser.add_argument('--rerank', type=int, default=4, help='Shortlist size as a multiple of k')
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    started = time.time()
+
+    print("\n📊 Exporting profile embeddings...")
+    conn = connect(statement_timeout_ms=0)
+    try:
+        ids, vectors = export_vectors(conn, args.output)
+    finally:
+        conn.close()
+    print(f"✅ Exported {len(ids)} embeddings ({vectors.shape[1]} dims)")
+
+    rng = np.random.default_rng(0)
+    sample_rows = np.sort(rng.choice(len(ids), min(args.sample, len(ids)), replace=False))
+    codec = fit_codec(np.asarray(vectors[sample_rows]), args.dims, method=args.method)
+    codes = codec.encode(vectors)
+    codec.save(args.output)
+    np.save(os.path.join(args.output, CODES_FILE), codes, allow_pickle=False)
+
+    memory = memory_report(len(ids), vectors.shape[1], args.dims)
+    recall = recall_report(np.asarray(vectors), codes, codec, queries=args.queries, k=args.k, rerank=args.rerank)
+    report = {
+        'method': args.method,
+        'dims': int(vectors.shape[1]),
+        'compact_dims': args.dims,
+        'memory': memory,
+        'recall': recall,
+        'seconds': round(time.time() - started, 1),
+    }
+    with open(os.path.join(args.output, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"✅ Compact codes: {memory['full_bytes'] / 1e6:.1f} MB -> {memory['compact_bytes'] / 1e6:.1f} MB "
+          f"({memory['compression_ratio']}x, {memory['bytes_saved'] / 1e6:.1f} MB saved)")
+    print(f"   recall@{args.k}: codes only {recall['recall_codes_only']:.3f}, "
+          f"with exact re-rank of {recall['rerank_candidates']} {recall['recall_with_rerank']:.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,7 @@ Generates embeddings for profiles and events using SentenceTransformers
 """
 import os
 import sys
+import time
 import psycopg2
 import psycopg2.extras
 import numpy as np
@@ -13,20 +14,54 @@ from tqdm import tqdm
 from dotenv import load_dotenv
 import json
 
+from batch_reader import keyset_pages
+from parallel_encoder import ShardedEncoder
+from pipeline_stages import print_stage_stats, run_pipeline
+from text_dedup import DedupEncoder
+
+# Add shared ML modules path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../common/src'))
+from db_pool import connect
+from pgvector_copy import bulk_update_embeddings
+from embedding_text import profile_text, text_hash
+from event_embedding_store import EventEmbeddingStore
+
 load_dotenv()
 
 # Model configuration
 EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'all-mpnet-base-v2')
 EMBEDDING_DIM = 768  # all-mpnet-base-v2 dimension
 
+# >1: encode in that many core-pinned worker processes (see parallel_encoder.py)
+EMBEDDING_ENCODE_WORKERS = int(os.getenv('EMBEDDING_ENCODE_WORKERS', '1'))
+EMBEDDING_THREADS_PER_WORKER = int(os.getenv('EMBEDDING_THREADS_PER_WORKER', '0'))
+
+# Rows read (and then encoded and written) per keyset page
+EMBEDDING_PAGE_SIZE = int(os.getenv('EMBEDDING_PAGE_SIZE', '5000'))
+# Rows per write transaction
+EMBEDDING_COMMIT_ROWS = int(os.getenv('EMBEDDING_COMMIT_ROWS', '50000'))
+# Distinct event-text vectors kept across pages (see text_dedup.py)
+EMBEDDING_TEXT_CACHE_SIZE = int(os.getenv('EMBEDDING_TEXT_CACHE_SIZE', '20000'))
+# Date-sharded .npy event embeddings (see ml/common/src/event_embedding_store.py)
+EVENT_EMBEDDING_STORE_DIR = os.getenv(
+    'EVENT_EMBEDDING_STORE_DIR', os.path.join(os.path.dirname(__file__), '../data/event_embeddings')
+)
+# Events younger than this are left to the next run (their inserts may still be uncommitted)
+EVENT_EMBEDDING_SETTLE_SECONDS = int(os.getenv('EVENT_EMBEDDING_SETTLE_SECONDS', '300'))
+
 
 class EmbeddingGenerator:
     """Generate embeddings using SentenceTransformers"""
     
-    def __init__(self):
+    def __init__(self, workers: int = EMBEDDING_ENCODE_WORKERS, threads_per_worker: int = EMBEDDING_THREADS_PER_WORKER):
         self.model = None
+        self.encoder = None
         self.conn = None
-        self._load_model()
+        self.write_conn = None
+        if workers > 1:
+            self.encoder = ShardedEncoder(EMBEDDING_MODEL, workers, threads_per_worker or None)
+        else:
+            self._load_model()
         self._connect_db()
     
     def _load_model(self):
@@ -48,27 +83,12 @@ class EmbeddingGenerator:
             user=os.getenv('POSTGRES_USER', 'retail_brain_user'),
             password=os.getenv('POSTGRES_PASSWORD', 'retail_brain_pass')
         )
+        # Read-only: each page is its own statement, no transaction held open between pages
+        self.conn.autocommit = True
     
     def generate_profile_text(self, profile: Dict) -> str:
         """Generate text representation of profile for embedding"""
-        parts = []
-        
-        if profile.get('full_name'):
-            parts.append(f"Customer name: {profile['full_name']}")
-        
-        if profile.get('city') and profile.get('state'):
-            parts.append(f"Location: {profile['city']}, {profile['state']}")
-        
-        if profile.get('segment'):
-            parts.append(f"Segment: {profile['segment']}")
-        
-        if profile.get('ltv'):
-            parts.append(f"Lifetime value: {profile['ltv']}")
-        
-        if profile.get('total_orders'):
-            parts.append(f"Total orders: {profile['total_orders']}")
-        
-        return ". ".join(parts) if parts else "Customer profile"
+        return profile_text(profile)
     
     def generate_event_text(self, event: Dict) -> str:
         """Generate text representation of event for embedding"""
@@ -96,124 +116,158 @@ class EmbeddingGenerator:
         if not texts:
             return np.array([])
         
+        if self.encoder is not None:
+            return self.encoder.encode(texts)
+        
         embeddings = self.model.encode(
             texts,
             batch_size=batch_size,
-            show_progress_bar=True,
+            show_progress_bar=False,
             convert_to_numpy=True,
             normalize_embeddings=True
         )
         
         return embeddings
     
-    def update_profile_embeddings(self, limit: Optional[int] = None):
-        """Generate and update embeddings for all profiles"""
+    def update_profile_embeddings(
+        self,
+        limit: Optional[int] = None,
+        page_size: int = EMBEDDING_PAGE_SIZE,
+        commit_rows: int = EMBEDDING_COMMIT_ROWS
+    ):
+        """Generate and update embeddings for all profiles, one page at a time"""
         print("\n📊 Generating profile embeddings...")
         
-        with self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            query = """
-                SELECT 
-                    id,
-                    full_name,
-                    city,
-                    state,
-                    segment,
-                    ltv,
-                    total_orders,
-                    tags
-                FROM customer_profile
-                WHERE is_merged = false
+        pages = keyset_pages(
+            self.conn,
             """
-            
-            if limit:
-                query += f" LIMIT {limit}"
-            
-            cur.execute(query)
-            profiles = cur.fetchall()
-            
-            print(f"Found {len(profiles)} profiles to process")
-            
-            # Process in batches
-            batch_size = 32
-            texts = []
-            profile_ids = []
-            
-            for profile in tqdm(profiles, desc="Processing profiles"):
-                text = self.generate_profile_text(dict(profile))
-                texts.append(text)
-                profile_ids.append(profile['id'])
-                
-                if len(texts) >= batch_size:
-                    embeddings = self.generate_embeddings_batch(texts, batch_size)
-                    self._save_profile_embeddings(profile_ids, embeddings)
-                    texts = []
-                    profile_ids = []
-            
-            # Process remaining
-            if texts:
-                embeddings = self.generate_embeddings_batch(texts, batch_size)
-                self._save_profile_embeddings(profile_ids, embeddings)
-            
-            print(f"✅ Updated embeddings for {len(profiles)} profiles")
+            SELECT 
+                id,
+                full_name,
+                city,
+                state,
+                segment,
+                ltv,
+                total_orders,
+                tags
+            FROM customer_profile
+            WHERE is_merged = false AND {after}
+            """,
+            keys=['id'],
+            page_size=page_size,
+            limit=limit
+        )
+        
+        if self.write_conn is None:
+            self.write_conn = connect(statement_timeout_ms=0)
+        
+        # Reads, encoding and bulk writes overlap (see pipeline_stages.py)
+        started = time.time()
+        with tqdm(total=limit, desc="Processing profiles", unit="profiles") as progress:
+            stats = run_pipeline(
+                pages,
+                encode=lambda page: self.generate_embeddings_batch(
+                    [self.generate_profile_text(dict(profile)) for profile in page]
+                ),
+                write=self._save_profile_embeddings,
+                commit=self.write_conn.commit,
+                commit_rows=commit_rows,
+                on_written=progress.update
+            )
+        
+        print(f"✅ Updated embeddings for {stats['write']['rows']} profiles")
+        print_stage_stats(stats, time.time() - started)
+        if self.encoder is not None:
+            print(f"   encoding: {self.encoder.stats()}")
     
-    def _save_profile_embeddings(self, profile_ids: List[str], embeddings: np.ndarray):
-        """Save embeddings to database"""
-        with self.conn.cursor() as cur:
-            for i, profile_id in enumerate(profile_ids):
-                embedding_vector = embeddings[i].tolist()
-                
-                cur.execute(
-                    """
-                    UPDATE customer_profile
-                    SET embedding = %s::vector
-                    WHERE id = %s
-                    """,
-                    [str(embedding_vector), profile_id]
-                )
-            
-            self.conn.commit()
+    def _save_profile_embeddings(self, profiles: List[Dict], embeddings: np.ndarray):
+        """Bulk-write a page of embeddings (COPY + UPDATE ... FROM) into the open write transaction"""
+        bulk_update_embeddings(
+            self.write_conn,
+            [str(profile['id']) for profile in profiles],
+            embeddings,
+            text_hashes=[text_hash(self.generate_profile_text(dict(profile))) for profile in profiles],
+            model=EMBEDDING_MODEL
+        )
     
-    def update_event_embeddings(self, limit: Optional[int] = None):
-        """Generate embeddings for recent events"""
+    def update_event_embeddings(
+        self,
+        limit: Optional[int] = None,
+        page_size: int = EMBEDDING_PAGE_SIZE,
+        commit_rows: int = EMBEDDING_COMMIT_ROWS,
+        store_dir: str = EVENT_EMBEDDING_STORE_DIR
+    ):
+        """
+        Embed events into the date-sharded event embedding store
+        
+        Events are read in ingestion order (created_at, id) after the store's
+        cursor, oldest first, so late-arriving and backfilled events are picked
+        up and an interrupted or --limit-capped run resumes where it stopped.
+        Rows inserted in the last EVENT_EMBEDDING_SETTLE_SECONDS are left for
+        the next run: their transactions may not all have committed yet.
+        """
         print("\n📊 Generating event embeddings...")
         
-        with self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            query = """
-                SELECT 
-                    e.id,
-                    e.event_type,
-                    e.payload,
-                    e.event_ts
-                FROM events e
-                WHERE e.payload IS NOT NULL
-                ORDER BY e.event_ts DESC
-            """
-            
-            if limit:
-                query += f" LIMIT {limit}"
-            
-            cur.execute(query)
-            events = cur.fetchall()
-            
-            print(f"Found {len(events)} events to process")
-            
-            # For events, we'll store in a separate table or add embedding column
-            # For now, just log that we processed them
-            texts = []
-            event_ids = []
-            
-            for event in tqdm(events, desc="Processing events"):
-                text = self.generate_event_text(dict(event))
-                texts.append(text)
-                event_ids.append(event['id'])
-            
-            if texts:
-                embeddings = self.generate_embeddings_batch(texts)
-                print(f"✅ Generated embeddings for {len(events)} events")
-                # Note: Event embeddings would need a separate table or column
+        store = EventEmbeddingStore(store_dir, model=EMBEDDING_MODEL)
+        where, params = "", (EVENT_EMBEDDING_SETTLE_SECONDS,)
+        if store.cursor is not None:
+            print(f"   resuming after events ingested at {store.cursor[0]} ({store.rows} stored)")
+            where = "AND (e.created_at, e.id) > (%s::timestamptz, %s::uuid)"
+            params += tuple(store.cursor)
+        
+        pages = keyset_pages(
+            self.conn,
+            f"""
+            SELECT 
+                e.id,
+                e.event_type,
+                e.payload,
+                e.event_ts,
+                e.created_at
+            FROM events e
+            WHERE e.payload IS NOT NULL
+                AND e.created_at < now() - make_interval(secs => %s)
+                {where} AND {{after}}
+            """,
+            keys=['e.created_at', 'e.id'],
+            page_size=page_size,
+            limit=limit,
+            params=params
+        )
+        
+        # Events share few distinct texts: encode each once, reuse it across pages
+        dedup = DedupEncoder(self.generate_embeddings_batch, cache_size=EMBEDDING_TEXT_CACHE_SIZE)
+        
+        started = time.time()
+        with tqdm(total=limit, desc="Processing events", unit="events") as progress:
+            stats = run_pipeline(
+                pages,
+                encode=lambda page: dedup.encode(
+                    [self.generate_event_text(dict(event)) for event in page]
+                ),
+                write=lambda page, embeddings: store.append(
+                    [event['id'] for event in page],
+                    [event['event_ts'] for event in page],
+                    embeddings,
+                    cursor=[page[-1]['created_at'].isoformat(), str(page[-1]['id'])]
+                ),
+                commit=store.flush,
+                commit_rows=commit_rows,
+                on_written=progress.update
+            )
+        
+        dedupe = dedup.stats()
+        print(f"✅ Stored embeddings for {stats['write']['rows']} events in {store_dir} ({store.rows} total)")
+        print_stage_stats(stats, time.time() - started)
+        print(f"   dedupe: {dedupe['encoded']} distinct texts encoded for {dedupe['texts']} events "
+              f"({dedupe['dedupe_ratio'] or 0:.1f}x, {dedupe['cache_hits']} cache hits)")
     
     def close(self):
-        """Close database connection"""
+        """Close database connection and encoder processes"""
+        if self.encoder is not None:
+            self.encoder.close()
+        if self.write_conn:
+            self.write_conn.close()
         if self.conn:
             self.conn.close()
 
@@ -227,17 +281,32 @@ def main():
     parser.add_argument('--events', action='store_true', help='Generate event embeddings')
     parser.add_argument('--all', action='store_true', help='Generate all embeddings')
     parser.add_argument('--limit', type=int, default=None, help='Limit number of records')
+    parser.add_argument('--page-size', type=int, default=EMBEDDING_PAGE_SIZE,
+                        help='Rows read, encoded and written per page')
+    parser.add_argument('--commit-rows', type=int, default=EMBEDDING_COMMIT_ROWS,
+                        help='Profile embeddings per write transaction / event embeddings per store flush')
+    parser.add_argument('--event-store', type=str, default=EVENT_EMBEDDING_STORE_DIR,
+                        help='Event embedding store directory')
+    parser.add_argument('--workers', type=int, default=EMBEDDING_ENCODE_WORKERS,
+                        help='Encoder processes, each pinned to a slice of the cores (1: in-process)')
+    parser.add_argument('--threads-per-worker', type=int, default=EMBEDDING_THREADS_PER_WORKER,
+                        help='Torch threads per encoder process (0: its core slice size)')
     
     args = parser.parse_args()
     
-    generator = EmbeddingGenerator()
+    generator = EmbeddingGenerator(workers=args.workers, threads_per_worker=args.threads_per_worker)
     
     try:
         if args.all or args.profiles:
-            generator.update_profile_embeddings(limit=args.limit)
+            generator.update_profile_embeddings(
+                limit=args.limit, page_size=args.page_size, commit_rows=args.commit_rows
+            )
         
         if args.all or args.events:
-            generator.update_event_embeddings(limit=args.limit)
+            generator.update_event_embeddings(
+                limit=args.limit, page_size=args.page_size, commit_rows=args.commit_rows,
+                store_dir=args.event_store
+            )
         
         print("\n✅ Embedding generation complete!")
     
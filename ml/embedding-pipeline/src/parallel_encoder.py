@@ -0,0 +1,226 @@
+"""
+Process-Sharded Encoder
+Multi-process CPU encoding with per-worker core pinning
+
+One PyTorch process does not scale linearly across a large box: intra-op
+parallelism flattens out well before 32 cores. ShardedEncoder starts N
+worker processes instead, each pinned to its own slice of cores with a
+fixed intra-op thread count, and feeds them length-sorted text chunks.
+Workers write embeddings straight into a shared-memory output array, so
+only texts (not vectors) cross process boundaries.
+
+Usage:
+    with ShardedEncoder('all-mpnet-base-v2', workers=8) as encoder:
+        embeddings = encoder.encode(texts)   # (len(texts), dims) float32
+"""
+import multiprocessing as mp
+import os
+import queue
+import time
+import traceback
+from multiprocessing import shared_memory
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+
+def available_cores() -> List[int]:
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:  # no affinity API (macOS)
+        return list(range(os.cpu_count() or 1))
+
+
+def core_slices(workers: int, cores: Optional[Sequence[int]] = None) -> List[List[int]]:
+    """Split cores into `workers` contiguous slices (round-robin when workers > cores)"""
+    cores = list(cores) if cores is not None else available_cores()
+    if workers >= len(cores):
+        return [[cores[i % len(cores)]] for i in range(workers)]
+    return [[int(core) for core in part] for part in np.array_split(cores, workers)]
+
+
+def load_sentence_transformer(model_name: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device='cpu')
+
+
+def _worker(worker_id: int, model_name: str, cores: List[int], threads: int,
+            loader: Callable, tasks, results):
+    """Encoder process: pin, load the model once, then encode chunks until None"""
+    # Must be set before torch is imported to size its thread pools
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    os.environ['MKL_NUM_THREADS'] = str(threads)
+    try:
+        if hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, cores)
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+        model = loader(model_name)
+        results.put(('ready', worker_id, None, model.get_sentence_embedding_dimension()))
+    except Exception:
+        results.put(('error', worker_id, None, traceback.format_exc()))
+        return
+
+    shm = None
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        call_id, shm_name, shape, rows, texts = task
+        try:
+            embeddings = model.encode(
+                texts,
+                batch_size=len(texts),
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+            if shm is None or shm.name != shm_name:
+                if shm is not None:
+                    shm.close()
+                # spawned workers share the parent's resource tracker; the parent unlinks
+                shm = shared_memory.SharedMemory(name=shm_name)
+            output = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+            output[rows] = embeddings
+            del output
+            results.put(('done', worker_id, call_id, len(texts)))
+        except Exception:
+            results.put(('error', worker_id, call_id, traceback.format_exc()))
+    if shm is not None:
+        shm.close()
+
+
+class ShardedEncoder:
+    """SentenceTransformer encoding spread over pinned worker processes"""
+
+    def __init__(
+        self,
+        model_name: str,
+        workers: int,
+        threads_per_worker: Optional[int] = None,
+        chunk_size: int = 128,
+        loader: Callable = load_sentence_transformer,
+        startup_timeout: float = 600.0
+    ):
+        """
+        Args:
+            model_name: SentenceTransformer model id or path
+            workers: Encoder processes
+            threads_per_worker: Intra-op threads per process (default: its core slice size)
+            chunk_size: Texts per task handed to a worker
+            loader: Module-level function model_name -> model (picklable for spawn)
+            startup_timeout: Seconds to wait for all workers to load the model
+        """
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.slices = core_slices(workers)
+        self.threads = [threads_per_worker or len(cores) for cores in self.slices]
+        self.texts_encoded = 0
+        self.encode_seconds = 0.0
+        self._calls = 0
+
+        # spawn: forking a process that already initialised torch/OpenMP can deadlock
+        context = mp.get_context('spawn')
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._processes = [
+            context.Process(
+                target=_worker,
+                args=(i, model_name, cores, threads, loader, self._tasks, self._results),
+                daemon=True
+            )
+            for i, (cores, threads) in enumerate(zip(self.slices, self.threads))
+        ]
+        print(f"Starting {workers} encoder processes for {model_name}...")
+        for process in self._processes:
+            process.start()
+
+        dims = set()
+        try:
+            for _ in range(workers):
+                kind, worker_id, _, value = self._next_result(startup_timeout)
+                if kind == 'error':
+                    raise RuntimeError(f"Encoder worker {worker_id} failed to start:\n{value}")
+                dims.add(value)
+        except Exception:
+            self.close()
+            raise
+        self.dims = dims.pop()
+        print(f"✅ {workers} encoder processes ready "
+              f"(cores {[f'{s[0]}-{s[-1]}' for s in self.slices]}, threads {self.threads}, dimension {self.dims})")
+
+    def _next_result(self, timeout: float):
+        deadline = time.time() + timeout
+        while True:
+            try:
+                return self._results.get(timeout=1.0)
+            except queue.Empty:
+                dead = [i for i, process in enumerate(self._processes) if not process.is_alive()]
+                if dead:
+                    raise RuntimeError(f"Encoder worker(s) {dead} exited unexpectedly")
+                if time.time() > deadline:
+                    raise RuntimeError(f"No response from encoder workers in {timeout:.0f}s")
+
+    def encode(self, texts: List[str], timeout: float = 3600.0) -> np.ndarray:
+        """Normalized embeddings of texts in input order, shape (len(texts), dims)"""
+        count = len(texts)
+        if count == 0:
+            return np.zeros((0, self.dims), dtype=np.float32)
+
+        start = time.time()
+        # Results of an earlier, failed call may still arrive; they carry its id
+        self._calls += 1
+        call_id = self._calls
+        # Length-sorted chunks keep padding low inside each worker's batch
+        order = np.argsort([len(text) for text in texts], kind='stable')
+        shape = (count, self.dims)
+        shm = shared_memory.SharedMemory(create=True, size=count * self.dims * 4)
+        try:
+            for offset in range(0, count, self.chunk_size):
+                rows = order[offset:offset + self.chunk_size]
+                self._tasks.put((call_id, shm.name, shape, rows, [texts[i] for i in rows]))
+            done = 0
+            while done < count:
+                kind, worker_id, result_call, value = self._next_result(timeout)
+                if result_call != call_id:
+                    continue
+                if kind == 'error':
+                    raise RuntimeError(f"Encoder worker {worker_id} failed:\n{value}")
+                done += value
+            output = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+            embeddings = output.copy()
+            del output
+        finally:
+            shm.close()
+            shm.unlink()
+
+        self.texts_encoded += count
+        self.encode_seconds += time.time() - start
+        return embeddings
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'threads_per_worker': self.threads,
+            'texts': self.texts_encoded,
+            'seconds': round(self.encode_seconds, 2),
+            'texts_per_sec': round(self.texts_encoded / self.encode_seconds, 1) if self.encode_seconds else None,
+        }
+
+    def close(self):
+        for process in self._processes:
+            if process.is_alive():
+                self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,194 @@
+"""
+Pipelined Embedding Stages
+Read, encode and write running concurrently over bounded queues
+
+    reader thread ──pages──▶ encoder (caller's thread) ──pages+vectors──▶ writer thread
+
+Reading and writing are Postgres I/O and encoding is torch compute, and
+both release the GIL, so with the stages overlapped the CPU encodes one
+page while the next is read and the previous one is written. Bounded
+queues (default two pages each) keep memory flat: a stage that runs ahead
+blocks instead of buffering the table.
+
+The writer groups pages into large transactions (commit every
+`commit_rows` rows) instead of committing per batch. Each stage reports
+rows, busy time (throughput while working) and time spent waiting for
+its input or for room downstream, which shows the bottleneck stage.
+"""
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.pages = 0
+        self.rows = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            'pages': self.pages,
+            'rows': self.rows,
+            'busy_seconds': round(self.busy_seconds, 2),
+            'wait_seconds': round(self.wait_seconds, 2),
+            'rows_per_sec': round(self.rows / self.busy_seconds, 1) if self.busy_seconds else None,
+        }
+
+
+class _Stopped(Exception):
+    """Another stage failed; unwind quietly"""
+
+
+def _put(q: queue.Queue, item, stats: StageStats, stop: threading.Event):
+    start = time.perf_counter()
+    while True:
+        if stop.is_set():
+            raise _Stopped()
+        try:
+            q.put(item, timeout=0.2)
+            break
+        except queue.Full:
+            continue
+    stats.wait_seconds += time.perf_counter() - start
+
+
+def _get(q: queue.Queue, stats: StageStats, stop: threading.Event):
+    start = time.perf_counter()
+    while True:
+        if stop.is_set():
+            raise _Stopped()
+        try:
+            item = q.get(timeout=0.2)
+            break
+        except queue.Empty:
+            continue
+    stats.wait_seconds += time.perf_counter() - start
+    return item
+
+
+def run_pipeline(
+    pages: Iterable[List[Dict]],
+    encode: Callable[[List[Dict]], np.ndarray],
+    write: Optional[Callable[[List[Dict], np.ndarray], None]] = None,
+    commit: Optional[Callable[[], None]] = None,
+    commit_rows: int = 50000,
+    queue_pages: int = 2,
+    on_written: Optional[Callable[[int], None]] = None
+) -> Dict[str, Dict]:
+    """
+    Run read → encode → write until pages is exhausted; per-stage stats
+
+    Args:
+        pages: Iterator of row pages (consumed on the reader thread)
+        encode: page -> (len(page), dims) embeddings (runs on the caller's thread)
+        write: (page, embeddings) -> None, inside the open transaction (None: drop)
+        commit: Commits the writer's transaction (called every commit_rows and at the end)
+        commit_rows: Rows per write transaction
+        queue_pages: Pages buffered between consecutive stages
+        on_written: Called with the row count of each written page (progress)
+
+    Raises whatever a stage raised; the other stages stop at their next queue operation.
+    """
+    stats = {name: StageStats(name) for name in ('read', 'encode', 'write')}
+    read_queue: queue.Queue = queue.Queue(maxsize=queue_pages)
+    write_queue: queue.Queue = queue.Queue(maxsize=queue_pages)
+    stop = threading.Event()
+    errors: List[BaseException] = []
+
+    def reader():
+        read = stats['read']
+        try:
+            iterator = iter(pages)
+            while True:
+                start = time.perf_counter()
+                page = next(iterator, _DONE)
+                read.busy_seconds += time.perf_counter() - start
+                if page is _DONE:
+                    break
+                read.pages += 1
+                read.rows += len(page)
+                _put(read_queue, page, read, stop)
+            _put(read_queue, _DONE, read, stop)
+        except _Stopped:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    def writer():
+        written = stats['write']
+        uncommitted = 0
+        try:
+            while True:
+                item = _get(write_queue, written, stop)
+                start = time.perf_counter()
+                if item is _DONE:
+                    if uncommitted and commit is not None:
+                        commit()
+                    written.busy_seconds += time.perf_counter() - start
+                    break
+                page, embeddings = item
+                if write is not None:
+                    write(page, embeddings)
+                uncommitted += len(page)
+                if uncommitted >= commit_rows and commit is not None:
+                    commit()
+                    uncommitted = 0
+                written.busy_seconds += time.perf_counter() - start
+                written.pages += 1
+                written.rows += len(page)
+                if on_written is not None:
+                    on_written(len(page))
+        except _Stopped:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    threads = [
+        threading.Thread(target=reader, name='embedding-reader', daemon=True),
+        threading.Thread(target=writer, name='embedding-writer', daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    encoded = stats['encode']
+    try:
+        while True:
+            page = _get(read_queue, encoded, stop)
+            if page is _DONE:
+                _put(write_queue, _DONE, encoded, stop)
+                break
+            start = time.perf_counter()
+            embeddings = encode(page)
+            encoded.busy_seconds += time.perf_counter() - start
+            encoded.pages += 1
+            encoded.rows += len(page)
+            _put(write_queue, (page, embeddings), encoded, stop)
+    except _Stopped:
+        pass
+    except BaseException as e:
+        errors.append(e)
+        stop.set()
+
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return {name: stage.as_dict() for name, stage in stats.items()}
+
+
+def print_stage_stats(stats: Dict[str, Dict], seconds: float):
+    total = max(stage['rows'] for stage in stats.values())
+    print(f"   {total} rows in {seconds:.1f}s ({total / max(seconds, 1e-9):.1f} rows/s end to end)")
+    for name, stage in stats.items():
+        print(f"   {name:<7} {stage['rows']:>9} rows  busy {stage['busy_seconds']:>7.1f}s"
+              f"  ({stage['rows_per_sec'] or 0:>9.1f} rows/s)  waiting {stage['wait_seconds']:>7.1f}s")
@@ -0,0 +1,111 @@
+"""
+Deduplicated Text Encoding
+Encode each distinct text once and map vectors back to rows by reference
+
+Event text is built from event type and product fields only, so millions
+of events collapse onto a few thousand distinct texts (catalog size times
+event types). DedupEncoder hashes every text, encodes only the distinct
+texts it has not seen yet and returns, for each input row, the index of
+its vector. Vectors are kept in a bounded LRU cache keyed by the hash, so
+a text repeated across pages is not encoded again either: encoding cost
+follows text cardinality rather than event volume.
+
+Usage:
+    dedup = DedupEncoder(generator.generate_embeddings_batch)
+    embeddings = dedup.encode(texts)          # (len(texts), dims), rows may repeat
+    vectors, rows = dedup.encode_unique(texts)  # distinct vectors + per-text row index
+"""
+import hashlib
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+class DedupEncoder:
+    """Wraps a texts -> embeddings function with in-call dedupe and an LRU vector cache"""
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], cache_size: int = 20000):
+        """
+        Args:
+            encode: List of texts -> (len(texts), dims) embeddings
+            cache_size: Distinct vectors kept between calls (0: dedupe within a call only)
+        """
+        self._encode = encode
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[bytes, np.ndarray]' = OrderedDict()
+        self.dims = None
+        self.texts = 0
+        self.encoded = 0
+        self.cache_hits = 0
+
+    def encode_unique(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Distinct vectors for texts and the row of each text in them
+
+        Returns:
+            (vectors, rows): vectors is (distinct texts, dims); vectors[rows[i]]
+            is the embedding of texts[i]
+        """
+        slots: Dict[bytes, int] = {}
+        rows = np.empty(len(texts), dtype=np.int64)
+        distinct: List[bytes] = []
+        missing: List[int] = []  # slots to encode
+        missing_texts: List[str] = []
+        for i, text in enumerate(texts):
+            key = _digest(text)
+            slot = slots.get(key)
+            if slot is None:
+                slot = slots[key] = len(distinct)
+                distinct.append(key)
+                if key not in self._cache:
+                    missing.append(slot)
+                    missing_texts.append(text)
+            rows[i] = slot
+
+        self.texts += len(texts)
+        self.cache_hits += len(distinct) - len(missing)
+        if missing_texts:
+            fresh = np.asarray(self._encode(missing_texts), dtype=np.float32)
+            self.encoded += len(missing_texts)
+            self.dims = fresh.shape[1]
+        if self.dims is None:
+            return np.zeros((0, 0), dtype=np.float32), rows
+
+        vectors = np.empty((len(distinct), self.dims), dtype=np.float32)
+        # Copy cache hits out before new entries can evict them
+        fresh_slots = set(missing)
+        for slot, key in enumerate(distinct):
+            if slot not in fresh_slots:
+                self._cache.move_to_end(key)
+                vectors[slot] = self._cache[key]
+        if missing_texts:
+            vectors[missing] = fresh
+            for slot, vector in zip(missing, vectors[missing]):
+                self._remember(distinct[slot], vector)
+        return vectors, rows
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embeddings in input order, shape (len(texts), dims)"""
+        vectors, rows = self.encode_unique(texts)
+        return vectors[rows]
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        if self.cache_size <= 0:
+            return
+        self._cache[key] = vector
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            'texts': self.texts,
+            'encoded': self.encoded,
+            'cache_hits': self.cache_hits,
+            'cached': len(self._cache),
+            'dedupe_ratio': round(self.texts / self.encoded, 1) if self.encoded else None,
+        }
@@ -1,20 +1,41 @@
 """
 Incremental Profile Embedding Updates
-Updates embeddings for new or modified profiles
+Re-embeds only profiles whose embedding text or model changed
+
+Each profile stores the hash of the text its embedding was built from
+(embedding_text_hash) and the model that built it (embedding_model). A
+scan reads the few text columns page by page, recomputes the hash in
+Python with the same template as every other writer (embedding_text.py)
+and encodes only rows that are new, whose text changed or whose stored
+model differs from EMBEDDING_MODEL. Edits to columns that are not part of
+the text (total_orders, tags, ...) no longer cost an encode.
 """
 import os
 import sys
+import time
 import psycopg2
 import psycopg2.extras
 from sentence_transformers import SentenceTransformer
-from typing import List, Dict
+from typing import Dict, Iterable, List, Optional
 from dotenv import load_dotenv
-import json
+
+from batch_reader import keyset_pages
+from pipeline_stages import print_stage_stats, run_pipeline
+
+# Add shared ML modules path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../common/src'))
+from db_pool import connect
+from pgvector_copy import bulk_update_embeddings
+from embedding_text import PROFILE_TEXT_COLUMNS, embedding_change, profile_text, text_hash
 
 load_dotenv()
 
 EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'all-mpnet-base-v2')
 
+# Rows scanned per keyset page / changed rows encoded and written per batch
+EMBEDDING_PAGE_SIZE = int(os.getenv('EMBEDDING_PAGE_SIZE', '5000'))
+EMBEDDING_UPDATE_BATCH_SIZE = int(os.getenv('EMBEDDING_UPDATE_BATCH_SIZE', '512'))
+
 
 class IncrementalEmbeddingUpdater:
     """Update embeddings for new/modified profiles"""
@@ -28,103 +49,140 @@ class IncrementalEmbeddingUpdater:
             user=os.getenv('POSTGRES_USER', 'retail_brain_user'),
             password=os.getenv('POSTGRES_PASSWORD', 'retail_brain_pass')
         )
+        # Read-only scans: no transaction held open between pages
+        self.conn.autocommit = True
+        self.write_conn = None
     
     def generate_profile_text(self, profile: Dict) -> str:
         """Generate text representation of profile"""
-        parts = []
-        
-        if profile.get('full_name'):
-            parts.append(f"Customer name: {profile['full_name']}")
-        
-        if profile.get('city') and profile.get('state'):
-            parts.append(f"Location: {profile['city']}, {profile['state']}")
-        
-        if profile.get('segment'):
-            parts.append(f"Segment: {profile['segment']}")
-        
-        if profile.get('ltv'):
-            parts.append(f"Lifetime value: {profile['ltv']}")
-        
-        return ". ".join(parts) if parts else "Customer profile"
+        return profile_text(profile)
+    
+    def _encode(self, profiles: List[Dict]):
+        return self.model.encode(
+            [self.generate_profile_text(profile) for profile in profiles],
+            batch_size=64,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+    
+    def _save(self, profiles: List[Dict], embeddings):
+        bulk_update_embeddings(
+            self.write_conn,
+            [str(profile['id']) for profile in profiles],
+            embeddings,
+            text_hashes=[text_hash(self.generate_profile_text(profile)) for profile in profiles],
+            model=EMBEDDING_MODEL
+        )
     
     def update_profile(self, profile_id: str):
         """Update embedding for a single profile"""
         with self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
             cur.execute(
-                """
-                SELECT 
-                    id,
-                    full_name,
-                    city,
-                    state,
-                    segment,
-                    ltv,
-                    total_orders
+                f"""
+                SELECT id, {', '.join(PROFILE_TEXT_COLUMNS)}
                 FROM customer_profile
                 WHERE id = %s
                 """,
                 [profile_id]
             )
-            
             profile = cur.fetchone()
-            if not profile:
-                return
-            
-            text = self.generate_profile_text(dict(profile))
-            embedding = self.model.encode(text, normalize_embeddings=True)
-            
-            cur.execute(
-                """
-                UPDATE customer_profile
-                SET embedding = %s::vector
-                WHERE id = %s
-                """,
-                [str(embedding.tolist()), profile_id]
-            )
-            
-            self.conn.commit()
+        if not profile:
+            return
+        
+        if self.write_conn is None:
+            self.write_conn = connect(statement_timeout_ms=0)
+        profile = dict(profile)
+        self._save([profile], self._encode([profile]))
+        self.write_conn.commit()
+    
+    def _changed_batches(self, pages: Iterable[List[Dict]], batch_size: int, counts: Dict[str, int]):
+        """Regroup the changed rows of scanned pages into encode batches"""
+        batch = []
+        for page in pages:
+            for row in page:
+                counts['scanned'] += 1
+                reason = embedding_change(row, EMBEDDING_MODEL)
+                if reason is None:
+                    continue
+                counts[reason] += 1
+                batch.append(dict(row))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+    
+    def update_changed_profiles(
+        self,
+        since_timestamp: Optional[str] = None,
+        page_size: int = EMBEDDING_PAGE_SIZE,
+        batch_size: int = EMBEDDING_UPDATE_BATCH_SIZE,
+        limit: Optional[int] = None
+    ) -> int:
+        """
+        Re-embed profiles that are new or whose text hash or model changed
+        
+        Args:
+            since_timestamp: Only scan profiles created/updated since then (None: all)
+            page_size: Rows scanned per keyset page
+            batch_size: Changed rows encoded and written together
+            limit: Maximum rows scanned
+        
+        Returns:
+            Number of profiles re-embedded
+        """
+        where = "is_merged = false"
+        params = ()
+        if since_timestamp:
+            where += " AND (created_at >= %s OR updated_at >= %s)"
+            params = (since_timestamp, since_timestamp)
+        
+        pages = keyset_pages(
+            self.conn,
+            f"""
+            SELECT
+                id,
+                {', '.join(PROFILE_TEXT_COLUMNS)},
+                embedding_text_hash,
+                embedding_model,
+                embedding IS NULL AS missing_embedding
+            FROM customer_profile
+            WHERE {where} AND {{after}}
+            """,
+            keys=['id'],
+            page_size=page_size,
+            limit=limit,
+            params=params
+        )
+        
+        if self.write_conn is None:
+            self.write_conn = connect(statement_timeout_ms=0)
+        
+        counts = {'scanned': 0, 'new': 0, 'text': 0, 'model': 0}
+        started = time.time()
+        stats = run_pipeline(
+            self._changed_batches(pages, batch_size, counts),
+            encode=self._encode,
+            write=self._save,
+            commit=self.write_conn.commit
+        )
+        
+        updated = stats['write']['rows']
+        print(f"✅ Scanned {counts['scanned']} profiles, re-embedded {updated} "
+              f"({counts['new']} new, {counts['text']} text changed, {counts['model']} model changed)")
+        if updated:
+            print_stage_stats(stats, time.time() - started)
+        return updated
     
     def update_new_profiles(self, since_timestamp: str):
         """Update embeddings for profiles created/updated since timestamp"""
-        with self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute(
-                """
-                SELECT 
-                    id,
-                    full_name,
-                    city,
-                    state,
-                    segment,
-                    ltv,
-                    total_orders
-                FROM customer_profile
-                WHERE (created_at >= %s OR updated_at >= %s)
-                    AND is_merged = false
-                    AND embedding IS NULL
-                """,
-                [since_timestamp, since_timestamp]
-            )
-            
-            profiles = cur.fetchall()
-            
-            for profile in profiles:
-                text = self.generate_profile_text(dict(profile))
-                embedding = self.model.encode(text, normalize_embeddings=True)
-                
-                cur.execute(
-                    """
-                    UPDATE customer_profile
-                    SET embedding = %s::vector
-                    WHERE id = %s
-                    """,
-                    [str(embedding.tolist()), profile['id']]
-                )
-            
-            self.conn.commit()
-            return len(profiles)
+        return self.update_changed_profiles(since_timestamp)
     
     def close(self):
-        """Close database connection"""
+        """Close database connections"""
+        if self.write_conn:
+            self.write_conn.close()
         if self.conn:
             self.conn.close()
 
@@ -135,6 +193,12 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Update embeddings incrementally')
     parser.add_argument('--profile-id', type=str, help='Update specific profile')
     parser.add_argument('--since', type=str, help='Update profiles since timestamp (ISO format)')
+    parser.add_argument('--changed', action='store_true',
+                        help='Scan all profiles and re-embed those whose text or model changed')
+    parser.add_argument('--page-size', type=int, default=EMBEDDING_PAGE_SIZE, help='Rows scanned per page')
+    parser.add_argument('--batch-size', type=int, default=EMBEDDING_UPDATE_BATCH_SIZE,
+                        help='Changed profiles encoded and written per batch')
+    parser.add_argument('--limit', type=int, default=None, help='Maximum profiles scanned')
     
     args = parser.parse_args()
     
@@ -144,11 +208,12 @@ if __name__ == '__main__':
         if args.profile_id:
             updater.update_profile(args.profile_id)
             print(f"✅ Updated embedding for profile {args.profile_id}")
-        elif args.since:
-            count = updater.update_new_profiles(args.since)
-            print(f"✅ Updated embeddings for {count} profiles")
+        elif args.since or args.changed:
+            updater.update_changed_profiles(
+                args.since, page_size=args.page_size, batch_size=args.batch_size, limit=args.limit
+            )
         else:
-            print("Please provide --profile-id or --since")
+            print("Please provide --profile-id, --since or --changed")
     
     finally:
         updater.close()
@@ -0,0 +1,66 @@
+"""
+Tests for keyset page reading
+"""
+import unittest
+
+from src.batch_reader import keyset_pages
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params):
+        self.conn.executed.append((' '.join(query.split()), params))
+        self.rows = self.conn.pages.pop(0) if self.conn.pages else []
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    def __init__(self, pages):
+        self.pages = pages
+        self.executed = []
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+
+class TestKeysetPages(unittest.TestCase):
+
+    def test_pages_continue_after_the_last_key(self):
+        conn = FakeConnection([
+            [{'event_ts': 3, 'id': 'c'}, {'event_ts': 2, 'id': 'b'}],
+            [{'event_ts': 1, 'id': 'a'}],
+        ])
+        pages = list(keyset_pages(
+            conn, "SELECT * FROM events e WHERE e.source = %s AND {after}",
+            keys=['e.event_ts', 'e.id'], page_size=2, params=['web'], descending=True
+        ))
+
+        self.assertEqual([len(page) for page in pages], [2, 1])
+        self.assertEqual(conn.executed, [
+            ("SELECT * FROM events e WHERE e.source = %s AND TRUE ORDER BY e.event_ts DESC, e.id DESC LIMIT %s",
+             ['web', 2]),
+            ("SELECT * FROM events e WHERE e.source = %s AND (e.event_ts, e.id) < (%s, %s) "
+             "ORDER BY e.event_ts DESC, e.id DESC LIMIT %s",
+             ['web', 2, 'b', 2]),
+        ])
+
+    def test_limit_caps_the_last_page(self):
+        conn = FakeConnection([[{'id': i} for i in range(4)], [{'id': 4}, {'id': 5}]])
+        pages = list(keyset_pages(conn, "SELECT id FROM t WHERE {after}", ['id'], page_size=4, limit=6))
+
+        self.assertEqual(sum(len(page) for page in pages), 6)
+        self.assertEqual(conn.executed[1], ("SELECT id FROM t WHERE (id) > (%s) ORDER BY id LIMIT %s", [3, 2]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Tests for process-sharded encoding
+"""
+import os
+import unittest
+
+import numpy as np
+
+from src.parallel_encoder import ShardedEncoder, core_slices
+
+
+class FakeModel:
+    """Embeds a text as (length, pid) so tests can see order and which process encoded it"""
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+    def encode(self, texts, **kwargs):
+        return np.array([[len(text), os.getpid()] for text in texts], dtype=np.float32)
+
+
+def load_fake_model(model_name):
+    if model_name == 'broken':
+        raise ValueError("no such model")
+    return FakeModel()
+
+
+class TestShardedEncoder(unittest.TestCase):
+
+    def test_core_slices(self):
+        self.assertEqual(core_slices(2, range(8)), [[0, 1, 2, 3], [4, 5, 6, 7]])
+        self.assertEqual(core_slices(3, [0, 1]), [[0], [1], [0]])
+
+    def test_embeddings_come_back_in_input_order(self):
+        texts = ['x' * (i * 7 % 50 + 1) for i in range(300)]
+        with ShardedEncoder('fake', workers=2, chunk_size=16, loader=load_fake_model) as encoder:
+            embeddings = encoder.encode(texts)
+            empty = encoder.encode([])
+            stats = encoder.stats()
+
+        np.testing.assert_array_equal(embeddings[:, 0], [len(text) for text in texts])
+        self.assertNotIn(os.getpid(), set(embeddings[:, 1]))  # encoded in the workers
+        self.assertEqual(empty.shape, (0, 2))
+        self.assertEqual(stats['texts'], 300)
+
+    def test_worker_start_failure_raises(self):
+        with self.assertRaises(RuntimeError) as raised:
+            ShardedEncoder('broken', workers=1, loader=load_fake_model)
+        self.assertIn('no such model', str(raised.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
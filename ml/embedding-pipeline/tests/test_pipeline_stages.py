@@ -0,0 +1,53 @@
+"""
+Tests for the pipelined read/encode/write stages
+"""
+import itertools
+import unittest
+
+import numpy as np
+
+from src.pipeline_stages import run_pipeline
+
+
+def encode(page):
+    return np.array([[row['id']] for row in page], dtype=np.float32)
+
+
+class TestRunPipeline(unittest.TestCase):
+
+    def test_pages_flow_through_in_order_with_batched_commits(self):
+        pages = [[{'id': i} for i in range(start, start + 10)] for start in range(0, 50, 10)]
+        events = []
+        written = []
+
+        stats = run_pipeline(
+            iter(pages),
+            encode,
+            write=lambda page, embeddings: events.append(('write', embeddings[:, 0].tolist())),
+            commit=lambda: events.append(('commit',)),
+            commit_rows=20,
+            on_written=written.append
+        )
+
+        writes = [event[1] for event in events if event[0] == 'write']
+        self.assertEqual(sum(writes, []), list(range(50)))
+        # Commit after every 20 rows, then once more for the last 10
+        self.assertEqual([event[0] for event in events].count('commit'), 3)
+        self.assertEqual(events[-1], ('commit',))
+        self.assertEqual(written, [10] * 5)
+        self.assertEqual({name: stage['rows'] for name, stage in stats.items()},
+                         {'read': 50, 'encode': 50, 'write': 50})
+
+    def test_stage_failure_stops_the_other_stages(self):
+        endless = ([{'id': i}] for i in itertools.count())
+
+        def failing_write(page, embeddings):
+            if page[0]['id'] == 3:
+                raise ValueError("write failed")
+
+        with self.assertRaises(ValueError):
+            run_pipeline(endless, encode, write=failing_write, queue_pages=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
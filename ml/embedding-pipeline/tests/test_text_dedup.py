@@ -0,0 +1,53 @@
+"""
+Tests for deduplicated text encoding
+"""
+import unittest
+
+import numpy as np
+
+from src.text_dedup import DedupEncoder
+
+
+class CountingEncoder:
+    """Embeds a text as (length, call number) and records every text it was given"""
+
+    def __init__(self):
+        self.seen = []
+
+    def __call__(self, texts):
+        self.seen.extend(texts)
+        return np.array([[len(text), len(self.seen)] for text in texts], dtype=np.float32)
+
+
+class TestDedupEncoder(unittest.TestCase):
+
+    def test_each_distinct_text_is_encoded_once(self):
+        model = CountingEncoder()
+        dedup = DedupEncoder(model, cache_size=10)
+
+        first = dedup.encode(['Event: view', 'Event: purchase', 'Event: view'])
+        second = dedup.encode(['Event: purchase', 'Event: cart', 'Event: view'])
+
+        self.assertEqual(model.seen, ['Event: view', 'Event: purchase', 'Event: cart'])
+        np.testing.assert_array_equal(first[:, 0], [11, 15, 11])
+        np.testing.assert_array_equal(first[0], first[2])
+        np.testing.assert_array_equal(second[0], first[1])  # served from the cache
+        stats = dedup.stats()
+        self.assertEqual((stats['texts'], stats['encoded'], stats['cache_hits']), (6, 3, 2))
+        self.assertEqual(stats['dedupe_ratio'], 2.0)
+
+    def test_unique_vectors_and_bounded_cache(self):
+        model = CountingEncoder()
+        dedup = DedupEncoder(model, cache_size=1)
+
+        vectors, rows = dedup.encode_unique(['a', 'bb', 'a', 'bb'])
+        self.assertEqual(vectors.shape, (2, 2))
+        self.assertEqual(rows.tolist(), [0, 1, 0, 1])
+
+        dedup.encode(['a'])  # evicted by 'bb'
+        self.assertEqual(model.seen, ['a', 'bb', 'a'])
+        self.assertEqual(dedup.stats()['cached'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
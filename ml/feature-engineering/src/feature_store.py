@@ -3,6 +3,7 @@ Feature Store Client
 Connects to Postgres feature store and Redis cache
 """
 import os
+import sys
 import psycopg2
 import psycopg2.extras
 from typing import Dict, List, Optional, Any
@@ -10,6 +11,10 @@ import json
 import redis
 from dotenv import load_dotenv
 
+# Add shared ML modules path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../common/src'))
+from db_pool import get_pool
+
 load_dotenv()
 
 
@@ -17,20 +22,14 @@ class FeatureStoreClient:
     """Client for feature store (Postgres + Redis)"""
     
     def __init__(self):
-        self.pg_conn = None
+        self.pg_pool = None
         self.redis_client = None
         self._connect()
     
     def _connect(self):
         """Connect to Postgres and Redis"""
-        # Postgres connection
-        self.pg_conn = psycopg2.connect(
-            host=os.getenv('POSTGRES_HOST', 'localhost'),
-            port=int(os.getenv('POSTGRES_PORT', 5432)),
-            database=os.getenv('POSTGRES_DB', 'retail_brain'),
-            user=os.getenv('POSTGRES_USER', 'retail_brain_user'),
-            password=os.getenv('POSTGRES_PASSWORD', 'retail_brain_pass')
-        )
+        # Postgres connections come from the shared process-wide pool
+        self.pg_pool = get_pool()
         
         # Redis connection
         redis_password = os.getenv('REDIS_PASSWORD', '')
@@ -54,7 +53,7 @@ class FeatureStoreClient:
             return json.loads(cached)
         
         # Query Postgres
-        with self.pg_conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        with self.pg_pool.connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
             query = """
                 SELECT 
                     feature_name,
@@ -106,7 +105,7 @@ class FeatureStoreClient:
         dataset_id: Optional[str] = None
     ):
         """Write features for a profile"""
-        with self.pg_conn.cursor() as cur:
+        with self.pg_pool.connection() as conn, conn.cursor() as cur:
             for feature_name, feature_data in features.items():
                 if isinstance(feature_data, dict):
                     feature_value = feature_data.get('value', feature_data)
@@ -136,7 +135,7 @@ class FeatureStoreClient:
                     ]
                 )
             
-            self.pg_conn.commit()
+            conn.commit()
             
             # Invalidate cache
             cache_pattern = f"feature:profile:{profile_id}:*"
@@ -144,9 +143,7 @@ class FeatureStoreClient:
                 self.redis_client.delete(key)
     
     def close(self):
-        """Close connections"""
-        if self.pg_conn:
-            self.pg_conn.close()
+        """Close connections (the Postgres pool is shared and stays open)"""
         if self.redis_client:
             self.redis_client.close()
 
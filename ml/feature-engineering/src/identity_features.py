@@ -2,13 +2,31 @@
 Identity Pairwise Feature Engineering
 Extracts features for ML model training from profile pairs
 """
-import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 from Levenshtein import distance as levenshtein_distance
 import hashlib
 import json
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# Feature order produced by extract_pairwise_features (and used in training)
+PAIRWISE_FEATURE_NAMES = [
+    'phone_exact',
+    'email_exact',
+    'email_username_sim',
+    'name_sim',
+    'device_overlap',
+    'loyalty_id_match',
+    'address_sim',
+    'common_orders_count',
+    'time_gap_days',
+    'city_match',
+    'state_match',
+]
+
 
 def normalize_phone(phone: Optional[str]) -> Optional[str]:
     """Normalize phone number (remove spaces, dashes, etc.)"""
@@ -256,7 +274,7 @@ def extract_pairwise_features(
 
 def extract_features_batch(
     profile_pairs: List[Tuple[Dict, Dict, List[Dict], List[Dict], Optional[List[Dict]], Optional[List[Dict]]]]
-) -> pd.DataFrame:
+) -> 'pd.DataFrame':
     """
     Extract features for a batch of profile pairs
     
@@ -275,9 +293,48 @@ def extract_features_batch(
         )
         feature_rows.append(features)
     
+    # Training-only path: serving never pays for the pandas import
+    import pandas as pd
+    
     return pd.DataFrame(feature_rows)
 
 
+def extract_features_matrix(
+    profile_pairs: List[Tuple[Dict, Dict, List[Dict], List[Dict], Optional[List[Dict]], Optional[List[Dict]]]],
+    feature_names: Optional[List[str]] = None
+) -> Tuple[np.ndarray, List[Dict[str, float]]]:
+    """
+    Extract features for a batch of profile pairs into a dense matrix
+    
+    Rows are written straight into a preallocated float32 matrix in
+    feature_names order (e.g. a model's feature_name()), so the result can be
+    passed to a booster without building a DataFrame. Features the extractor
+    does not produce stay 0.
+    
+    Args:
+        profile_pairs: List of tuples (profile_a, profile_b, identifiers_a, identifiers_b, events_a, events_b)
+        feature_names: Column order of the matrix (default: PAIRWISE_FEATURE_NAMES)
+    
+    Returns:
+        Tuple of (float32 matrix [n_pairs, n_features], per-pair feature dicts)
+    """
+    feature_names = list(feature_names or PAIRWISE_FEATURE_NAMES)
+    column_index = {name: idx for idx, name in enumerate(feature_names)}
+    
+    matrix = np.zeros((len(profile_pairs), len(feature_names)), dtype=np.float32)
+    feature_rows = []
+    
+    for row, pair in enumerate(profile_pairs):
+        features = extract_pairwise_features(*pair)
+        for name, value in features.items():
+            col = column_index.get(name)
+            if col is not None:
+                matrix[row, col] = value
+        feature_rows.append(features)
+    
+    return matrix, feature_rows
+
+
 if __name__ == '__main__':
     # Example usage
     profile_a = {
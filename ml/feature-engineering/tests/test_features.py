@@ -3,6 +3,8 @@ Unit tests for feature engineering functions
 """
 import unittest
 from src.identity_features import (
+    PAIRWISE_FEATURE_NAMES,
+    extract_features_matrix,
     extract_pairwise_features,
     compute_name_similarity,
     compute_email_username_similarity,
@@ -95,6 +97,26 @@ class TestFeatureEngineering(unittest.TestCase):
         # City should match
         self.assertEqual(features['city_match'], 1.0)
 
+    
+    def test_extract_features_matrix(self):
+        """Test batch extraction into a dense matrix in model feature order"""
+        profile = {'full_name': 'John Doe', 'city': 'Mumbai'}
+        identifiers = [{'type': 'phone', 'value': '+919876543210', 'value_hash': 'hash_a'}]
+        pairs = [
+            (profile, profile, identifiers, identifiers, None, None),
+            (profile, {'full_name': 'Jane Smith'}, identifiers, [], None, None),
+        ]
+        feature_names = ['city_match', 'phone_exact', 'not_extracted']
+        
+        matrix, feature_rows = extract_features_matrix(pairs, feature_names)
+        
+        self.assertEqual(matrix.shape, (2, 3))
+        self.assertEqual(str(matrix.dtype), 'float32')
+        self.assertEqual(matrix[0].tolist(), [1.0, 1.0, 0.0])
+        self.assertEqual(matrix[1].tolist(), [0.0, 0.0, 0.0])
+        self.assertEqual(len(feature_rows), 2)
+        self.assertEqual(sorted(feature_rows[0]), sorted(PAIRWISE_FEATURE_NAMES))
+
 
 if __name__ == '__main__':
     unittest.main()
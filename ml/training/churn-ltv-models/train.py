@@ -18,6 +18,10 @@ import mlflow.lightgbm
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
+# Add shared ML modules path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../common/src'))
+from serving_bundle import KIND_LIGHTGBM, log_bundle
+
 load_dotenv()
 
 np.random.seed(42)
@@ -280,6 +284,12 @@ class ChurnLTVTrainer:
                     artifact_path='models',
                     registered_model_name=self.config['models']['churn']['name']
                 )
+                log_bundle(
+                    KIND_LIGHTGBM,
+                    booster=model,
+                    feature_names=feature_cols,
+                    metadata={'model_name': self.config['models']['churn']['name']}
+                )
                 
                 results['churn'] = {
                     'run_id': run.info.run_id,
@@ -330,6 +340,12 @@ class ChurnLTVTrainer:
                     artifact_path='models',
                     registered_model_name=self.config['models']['ltv']['name']
                 )
+                log_bundle(
+                    KIND_LIGHTGBM,
+                    booster=model,
+                    feature_names=feature_cols,
+                    metadata={'model_name': self.config['models']['ltv']['name']}
+                )
                 
                 results['ltv'] = {
                     'run_id': run.info.run_id,
@@ -24,6 +24,10 @@ from typing import List, Tuple, Dict, Optional
 from dotenv import load_dotenv
 import pickle
 
+# Add shared ML modules path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../common/src'))
+from serving_bundle import KIND_LIGHTGBM, log_bundle
+
 load_dotenv()
 
 # Set random seeds for reproducibility
@@ -303,6 +307,12 @@ class IdentityModelTrainer:
                 artifact_path=self.config['mlflow']['artifact_path'],
                 registered_model_name=self.config['model']['name']
             )
+            log_bundle(
+                KIND_LIGHTGBM,
+                booster=model,
+                feature_names=feature_cols,
+                metadata={'model_name': self.config['model']['name']}
+            )
             
             # Log SHAP explainer
             explainer = shap.TreeExplainer(model)
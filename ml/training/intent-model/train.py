@@ -21,6 +21,10 @@ from dotenv import load_dotenv
 from pathlib import Path
 from typing import Optional
 
+# Add shared ML modules path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../common/src'))
+from serving_bundle import KIND_LIGHTGBM, log_bundle
+
 load_dotenv()
 
 # Set random seeds
@@ -281,6 +285,16 @@ class IntentModelTrainer:
             with open('label_encoder.pkl', 'wb') as f:
                 pickle.dump(self.label_encoder, f)
             mlflow.log_artifact('label_encoder.pkl', 'models')
+            log_bundle(
+                KIND_LIGHTGBM,
+                booster=model,
+                label_classes=self.label_encoder.classes_,
+                metadata={
+                    'model_name': self.config['model']['name'],
+                    'embedding_model': self.config['embedding']['model'],
+                    'embedding_dim': self.config['embedding']['dimension'],
+                }
+            )
             
             print(f"\n✅ Model registered: {self.config['model']['name']}")
             print(f"Run ID: {run.info.run_id}")
@@ -11,12 +11,18 @@ from lightfm import LightFM
 from lightfm.evaluation import precision_at_k, auc_score
 from lightfm.cross_validation import random_train_test_split
 from scipy.sparse import csr_matrix
+from concurrent.futures import ThreadPoolExecutor
 import mlflow
 import mlflow.pyfunc
 import pickle
 from datetime import datetime
+from typing import Optional
 from dotenv import load_dotenv
 
+# Add shared ML modules path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../common/src'))
+from serving_bundle import KIND_LIGHTFM, log_bundle
+
 load_dotenv()
 
 np.random.seed(42)
@@ -187,6 +193,63 @@ class RecommendationTrainer:
         
         return metrics
     
+    def compute_popular_items(self, interaction_matrix: csr_matrix, k: int) -> np.ndarray:
+        """Top-K item indices by number of interacting users (cold-start fallback)"""
+        item_counts = np.asarray((interaction_matrix > 0).sum(axis=0)).ravel()
+        k = min(k, len(item_counts))
+        top = np.argpartition(-item_counts, k - 1)[:k] if k > 0 else np.array([], dtype=np.int64)
+        top = top[np.argsort(-item_counts[top], kind='stable')]
+        return top.astype(np.int32)
+    
+    def compute_item_similarities(
+        self,
+        item_embeddings: np.ndarray,
+        k: int,
+        chunk_size: int = 1024,
+        num_threads: int = 4
+    ) -> tuple:
+        """
+        Top-K cosine-similar items for every item
+        
+        Rows are processed in chunks of chunk_size against the full normalized
+        embedding matrix; numpy releases the GIL in the matmul so chunks run
+        in parallel threads.
+        
+        Returns:
+            Tuple of (neighbors int32 [n_items, k], scores float32 [n_items, k])
+        """
+        print(f"Computing top-{k} similar items ({num_threads} threads)...")
+        
+        emb = np.asarray(item_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(emb, axis=1, keepdims=True)
+        emb = emb / np.maximum(norms, 1e-12)
+        
+        n_items = emb.shape[0]
+        k = min(k, max(n_items - 1, 0))
+        neighbors = np.zeros((n_items, k), dtype=np.int32)
+        scores = np.zeros((n_items, k), dtype=np.float32)
+        if k == 0:
+            return neighbors, scores
+        
+        def process_chunk(start: int):
+            end = min(start + chunk_size, n_items)
+            sims = emb[start:end] @ emb.T
+            rows = np.arange(end - start)
+            sims[rows, rows + start] = -np.inf  # exclude the item itself
+            
+            top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(sims, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            neighbors[start:end] = np.take_along_axis(top, order, axis=1)
+            scores[start:end] = np.take_along_axis(top_scores, order, axis=1)
+        
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            list(executor.map(process_chunk, range(0, n_items, chunk_size)))
+        
+        print(f"  Items: {n_items}, neighbors per item: {k}")
+        
+        return neighbors, scores
+    
     def train(self, data_path: str, dataset_id: Optional[str] = None) -> str:
         """Complete training pipeline"""
         with mlflow.start_run() as run:
@@ -262,15 +325,72 @@ class RecommendationTrainer:
             with open('mappings.pkl', 'wb') as f:
                 pickle.dump(mappings, f)
             
+            # Seen items (for masking) and popularity list (for cold start)
+            # ship inside the wrapper so serving never touches the raw data
+            popular_items = self.compute_popular_items(
+                interaction_matrix,
+                self.config.get('serving', {}).get('popularity_top_k', 100)
+            )
+            mlflow.log_param('popularity_top_k', len(popular_items))
+            
             # Log model and mappings
             mlflow.pyfunc.log_model(
                 artifact_path='models',
-                python_model=LightFMWrapper(model, mappings),
+                python_model=LightFMWrapper(
+                    model,
+                    mappings,
+                    seen_interactions=interaction_matrix,
+                    popular_items=popular_items
+                ),
                 registered_model_name=self.config['model']['name']
             )
             
             mlflow.log_artifact('mappings.pkl', 'models')
             
+            # Item-to-item similarity lists for "customers also viewed" lookups
+            similarity_config = self.config.get('similarity', {})
+            _, item_embeddings = model.get_item_representations()
+            neighbors, neighbor_scores = self.compute_item_similarities(
+                item_embeddings,
+                k=similarity_config.get('top_k', 50),
+                chunk_size=similarity_config.get('chunk_size', 1024),
+                num_threads=similarity_config.get('num_threads', 4)
+            )
+            item_ids = [str(iid) for iid in unique_items]
+            np.savez(
+                'item_similarity.npz',
+                item_ids=np.array(item_ids),
+                neighbors=neighbors,
+                scores=neighbor_scores
+            )
+            mlflow.log_artifact('item_similarity.npz', 'similarity')
+            mlflow.log_param('similarity_top_k', neighbors.shape[1])
+            
+            # Serving bundle: LightFM without user/item features scores
+            # bias_u + bias_i + <emb_u, emb_i>, so plain arrays replace the pickle
+            user_biases, user_embeddings = model.get_user_representations()
+            item_biases, item_embeddings = model.get_item_representations()
+            seen = csr_matrix(interaction_matrix)
+            seen.sort_indices()
+            log_bundle(
+                KIND_LIGHTFM,
+                arrays={
+                    'user_ids': np.array([str(uid) for uid in unique_users]),
+                    'user_embeddings': user_embeddings.astype(np.float32),
+                    'user_biases': user_biases.astype(np.float32),
+                    'item_ids': np.array(item_ids),
+                    'item_embeddings': item_embeddings.astype(np.float32),
+                    'item_biases': item_biases.astype(np.float32),
+                    'seen_indptr': seen.indptr.astype(np.int64),
+                    'seen_indices': seen.indices.astype(np.int32),
+                    'popular_items': popular_items,
+                    'similarity_neighbors': neighbors,
+                    'similarity_scores': neighbor_scores,
+                },
+                indexed=('user_ids', 'item_ids'),
+                metadata={'model_name': self.config['model']['name']}
+            )
+            
             print(f"\n✅ Model registered: {self.config['model']['name']}")
             print(f"Run ID: {run.info.run_id}")
             
@@ -280,11 +400,31 @@ class RecommendationTrainer:
 class LightFMWrapper(mlflow.pyfunc.PythonModel):
     """MLflow wrapper for LightFM model"""
     
-    def __init__(self, model, mappings):
+    def __init__(self, model, mappings, seen_interactions=None, popular_items=None):
         self.model = model
         self.mappings = mappings
         self.reverse_user_map = {v: k for k, v in mappings['user_map'].items()}
         self.reverse_item_map = {v: k for k, v in mappings['item_map'].items()}
+        
+        # Per-user seen items as CSR rows: items of user u are
+        # seen_indices[seen_indptr[u]:seen_indptr[u + 1]]
+        if seen_interactions is not None:
+            seen = csr_matrix(seen_interactions)
+            seen.sort_indices()
+            self.seen_indptr = seen.indptr.astype(np.int64)
+            self.seen_indices = seen.indices.astype(np.int32)
+        else:
+            self.seen_indptr = None
+            self.seen_indices = None
+        
+        self.popular_items = (
+            np.asarray(popular_items, dtype=np.int32)
+            if popular_items is not None else np.array([], dtype=np.int32)
+        )
+        self.item_ids = np.array(
+            [self.reverse_item_map[i] for i in range(len(self.reverse_item_map))],
+            dtype=object
+        )
     
     def predict(self, context, model_input):
         """Predict scores for user-item pairs"""
@@ -304,12 +444,73 @@ class LightFMWrapper(mlflow.pyfunc.PythonModel):
                 scores.append(0.0)
         
         return np.array(scores)
+    
+    def seen_items(self, user_idx: int) -> np.ndarray:
+        """Item indices the user interacted with during training"""
+        if self.seen_indptr is None or user_idx + 1 >= len(self.seen_indptr):
+            return np.array([], dtype=np.int32)
+        return self.seen_indices[self.seen_indptr[user_idx]:self.seen_indptr[user_idx + 1]]
+    
+    def recommend(
+        self,
+        user_id,
+        item_ids: Optional[list] = None,
+        n: int = 10,
+        exclude_seen: bool = True
+    ) -> dict:
+        """
+        Top-N items for a user
+        
+        Known users are scored against the candidate items with seen items
+        masked out. Unknown (cold-start) users get the precomputed popularity
+        list without any scoring.
+        
+        Returns:
+            Dictionary with 'recommendations' [(item_id, score)] and 'method'
+        """
+        item_map = self.mappings['item_map']
+        if item_ids is None:
+            candidates = np.arange(len(self.item_ids), dtype=np.int32)
+        else:
+            candidates = np.array(
+                [item_map[iid] for iid in item_ids if iid in item_map],
+                dtype=np.int32
+            )
+        
+        user_idx = self.mappings['user_map'].get(user_id, -1)
+        if user_idx < 0:
+            popular = self.popular_items
+            if item_ids is not None:
+                popular = popular[np.isin(popular, candidates)]
+            popular = popular[:n]
+            # Popularity rank as a descending score in (0, 1]
+            ranked = [
+                (self.item_ids[idx], 1.0 - rank / max(len(self.popular_items), 1))
+                for rank, idx in enumerate(popular)
+            ]
+            return {'recommendations': ranked, 'method': 'popularity'}
+        
+        if exclude_seen:
+            candidates = candidates[~np.isin(candidates, self.seen_items(user_idx))]
+        if len(candidates) == 0:
+            return {'recommendations': [], 'method': 'ml'}
+        
+        scores = self.model.predict(user_idx, candidates)
+        k = min(n, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        
+        return {
+            'recommendations': [
+                (self.item_ids[candidates[i]], float(scores[i])) for i in top
+            ],
+            'method': 'ml'
+        }
 
 
 def main():
     """Main function"""
     import argparse
-    from typing import Optional
     
     parser = argparse.ArgumentParser(description='Train recommendation model')
     parser.add_argument('--data', type=str, required=True, help='Interactions data path (CSV with user_id, item_id, rating)')
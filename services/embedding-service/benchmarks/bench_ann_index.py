@@ -0,0 +1,152 @@
+"""
+Similar-Profile Index Benchmark
+Recall and latency of the IVF-flat ProfileIndex against exact brute force
+
+Generates clustered unit vectors shaped like profile embeddings (profiles
+of one segment/city/spend band land close together), builds the index in
+a temporary directory and compares top-k results of ProfileIndex.search
+with an exact scan of the same vectors, for a sweep of nprobe values.
+
+Usage (from services/embedding-service):
+    python benchmarks/bench_ann_index.py                      # 1M x 768
+    python benchmarks/bench_ann_index.py --n 200000 --dims 256 --nprobe 4 8 16 32
+    python benchmarks/bench_ann_index.py --compact-dims 128   # int8 codes + exact re-rank
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from src.ann_index import ProfileIndex, normalize
+
+SEGMENTS = ['vip', 'regular', 'at_risk', 'new', 'dormant']
+CITIES = ['Mumbai', 'Delhi', 'Bengaluru', 'Pune', 'Chennai', 'Kolkata', 'Jaipur', 'Surat']
+
+
+def synthetic_profiles(n: int, dims: int, clusters: int, spread: float, decay: float = 0.0, seed: int = 0):
+    """
+    Unit vectors around `clusters` centres, written in chunks to bound memory
+
+    decay > 0 gives variance a power-law spectrum (dimension i scaled by
+    (i + 1) ** -decay, then randomly rotated), like sentence embeddings whose
+    variance concentrates in a few hundred directions; 0 is isotropic.
+    """
+    rng = np.random.default_rng(seed)
+    spectrum = (np.arange(1, dims + 1, dtype=np.float32) ** -decay)
+    spectrum *= np.sqrt(dims) / np.linalg.norm(spectrum)
+    rotation = np.linalg.qr(rng.standard_normal((dims, dims)))[0].astype(np.float32) if decay else None
+
+    def shaped(values):
+        values = values * spectrum
+        return values @ rotation if rotation is not None else values
+
+    centres = normalize(shaped(rng.standard_normal((clusters, dims)).astype(np.float32)))
+    vectors = np.empty((n, dims), dtype=np.float32)
+    for start in range(0, n, 100000):
+        size = min(100000, n - start)
+        members = rng.integers(0, clusters, size)
+        noise = shaped(rng.standard_normal((size, dims)).astype(np.float32)) * (spread / np.sqrt(dims))
+        vectors[start:start + size] = normalize(centres[members] + noise)
+    ids = [str(uuid.UUID(int=i)) for i in range(n)]
+    segments = [SEGMENTS[i] for i in rng.integers(0, len(SEGMENTS), n)]
+    cities = [CITIES[i] for i in rng.integers(0, len(CITIES), n)]
+    return ids, vectors, segments, cities
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int, chunk_rows: int = 200000) -> np.ndarray:
+    """Row indexes of the exact top-k (excluding the query row itself) per query"""
+    best_scores = np.full((len(queries), k + 1), -np.inf, dtype=np.float32)
+    best_rows = np.zeros((len(queries), k + 1), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_rows):
+        scores = queries @ vectors[start:start + chunk_rows].T
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        merged_rows = np.concatenate([best_rows, np.arange(start, start + scores.shape[1])[None, :].repeat(len(queries), 0)], axis=1)
+        top = np.argpartition(-merged_scores, k, axis=1)[:, :k + 1]
+        best_scores = np.take_along_axis(merged_scores, top, 1)
+        best_rows = np.take_along_axis(merged_rows, top, 1)
+    order = np.argsort(-best_scores, axis=1)
+    return np.take_along_axis(best_rows, order, 1)
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ProfileIndex recall and latency against brute force')
+    parser.add_argument('--n', type=int, default=1000000, help='Profiles in the index')
+    parser.add_argument('--dims', type=int, default=768, help='Embedding dimensions')
+    parser.add_argument('--clusters', type=int, default=2000, help='Synthetic profile clusters')
+    parser.add_argument('--spread', type=float, default=1.0, help='Noise norm around each cluster centre')
+    parser.add_argument('--decay', type=float, default=0.0, help='Power-law spectrum exponent (0: isotropic)')
+    parser.add_argument('--queries', type=int, default=200, help='Queries per setting')
+    parser.add_argument('--k', type=int, default=10, help='Neighbours per query')
+    parser.add_argument('--nlist', type=int, default=None, help='Inverted lists (default ~sqrt(n))')
+    parser.add_argument('--compact-dims', type=int, default=0, help='Scan int8 codes of this many PCA dims (0: exact)')
+    parser.add_argument('--rerank', type=int, default=4, help='Exact re-rank candidates per result with --compact-dims')
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[4, 8, 16, 32, 64], help='nprobe values to sweep')
+    args = parser.parse_args()
+
+    print(f"Generating {args.n} x {args.dims} profile embeddings...")
+    ids, vectors, segments, cities = synthetic_profiles(args.n, args.dims, args.clusters, args.spread, args.decay)
+
+    path = tempfile.mkdtemp(prefix='profile-index-bench-')
+    try:
+        start = time.perf_counter()
+        index = ProfileIndex.build(path, ids, vectors, segments, cities, nlist=args.nlist,
+                                   compact_dims=args.compact_dims, rerank=args.rerank)
+        build_seconds = time.perf_counter() - start
+        stats = index.stats()
+        print(f"Built in {build_seconds:.1f}s: {stats['nlist']} lists, "
+              f"{stats['resident_scan_bytes'] / 1e6:.1f} MB scanned data"
+              + (f" (int8 codes, {stats['compact_dims']} dims)" if stats['compact_dims'] else " (float32 vectors)"))
+
+        rng = np.random.default_rng(1)
+        query_rows = rng.choice(args.n, args.queries, replace=False)
+        queries = vectors[query_rows]
+
+        exact = exact_top_k(vectors, queries, args.k)
+        truth = [
+            [ids[row] for row in rows if row != query_row][:args.k]
+            for rows, query_row in zip(exact, query_rows)
+        ]
+
+        # What a request without the index pays: one full scan per query
+        latencies = []
+        for query in queries[:20]:
+            start = time.perf_counter()
+            scores = vectors @ query
+            np.argpartition(-scores, args.k)[:args.k]
+            latencies.append(time.perf_counter() - start)
+        print(f"Brute force: p50 {percentile_ms(latencies, 50):.2f} ms/query over {args.n} rows (recall 1.000)")
+
+        print(f"\n{'nprobe':>7} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p99 ms':>8}")
+        for nprobe in args.nprobe:
+            latencies, hits = [], 0
+            for query, query_row, expected in zip(queries, query_rows, truth):
+                start = time.perf_counter()
+                results = index.search(query, args.k, exclude=[ids[query_row]], nprobe=nprobe)
+                latencies.append(time.perf_counter() - start)
+                hits += len(set(expected) & {pid for pid, _ in results})
+            recall = hits / (args.k * args.queries)
+            print(f"{nprobe:>7} {recall:>10.3f} {percentile_ms(latencies, 50):>8.2f} {percentile_ms(latencies, 99):>8.2f}")
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, args.k, segment='vip', city='Pune')
+            latencies.append(time.perf_counter() - start)
+        print(f"\nFiltered (segment+city, ~1/40 of profiles): p50 {percentile_ms(latencies, 50):.2f} ms, "
+              f"p99 {percentile_ms(latencies, 99):.2f} ms")
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
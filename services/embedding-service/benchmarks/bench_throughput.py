@@ -0,0 +1,469 @@
+"""
+Embedding Service Throughput Benchmark
+Texts/sec and request latency across batching, text length, threads, workers and response format
+
+Drives the real FastAPI app with synthetic customer profile and event
+texts built from the same templates the service and embedding pipeline
+embed, in two modes:
+
+    inprocess  ASGI calls straight into src.main.app: no network, one
+               process; isolates encoding, batching and serialization
+    socket     uvicorn on 127.0.0.1 (--workers W) driven by keep-alive
+               HTTP/1.1 connections, one per concurrent client
+
+Every combination of the sweep options is measured:
+
+    --max-batch       EMBEDDING_MAX_BATCH of the cross-request batcher
+    --request-batch   texts per /v1/embeddings/batch request
+    --words           text length: 'natural' (template lengths) or a word
+                      count texts are padded/truncated to (sequence length)
+    --threads         torch intra-op threads (0: torch default)
+    --workers         uvicorn worker processes (socket mode)
+    --formats         json or binary (application/x-embeddings, float32)
+    --concurrency     requests in flight
+
+The JSON report holds the environment and one row per setting with
+p50/p95/p99 latency, texts/sec and requests/sec. With --baseline, rows
+are matched to an earlier report and the run exits 1 if any setting lost
+more than --tolerance of its throughput or gained as much p95 latency.
+
+Usage (from services/embedding-service):
+    python benchmarks/bench_throughput.py --output throughput.json
+    python benchmarks/bench_throughput.py --mode socket --workers 1 2 4 --threads 1 2 4
+    python benchmarks/bench_throughput.py --words natural 32 128 256 --request-batch 1 32
+    python benchmarks/bench_throughput.py --baseline throughput.json --output new.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+import numpy as np
+
+SERVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, SERVICE_DIR)
+sys.path.append(os.path.join(SERVICE_DIR, '../../ml/common/src'))
+from embedding_codec import MEDIA_TYPE_BINARY, MEDIA_TYPE_JSON, content_type
+from embedding_text import profile_text  # the service's template, import-free
+
+BATCH_PATH = '/v1/embeddings/batch'
+ACCEPT = {
+    'json': MEDIA_TYPE_JSON,
+    'binary': content_type(MEDIA_TYPE_BINARY, 'float32'),
+}
+# Settings are matched to a baseline report on these keys
+SETTING_KEYS = ('mode', 'workers', 'torch_threads', 'max_batch', 'request_batch', 'words', 'format', 'concurrency')
+
+FIRST_NAMES = ['Aarav', 'Priya', 'Rohan', 'Ananya', 'Vikram', 'Sneha', 'Arjun', 'Kavya', 'Rahul', 'Meera',
+               'Aditya', 'Ishita', 'Karan', 'Neha', 'Siddharth', 'Pooja', 'Nikhil', 'Divya']
+LAST_NAMES = ['Sharma', 'Patel', 'Iyer', 'Reddy', 'Gupta', 'Nair', 'Singh', 'Mehta', 'Kulkarni',
+              'Chatterjee', 'Banerjee', 'Rao', 'Joshi', 'Deshpande', 'Venkataraman']
+LOCATIONS = [('Mumbai', 'MH'), ('Pune', 'MH'), ('Delhi', 'DL'), ('Bengaluru', 'KA'), ('Chennai', 'TN'),
+             ('Hyderabad', 'TS'), ('Kolkata', 'WB'), ('Jaipur', 'RJ'), ('Ahmedabad', 'GJ'), ('Surat', 'GJ')]
+SEGMENTS = ['vip', 'regular', 'at_risk', 'new', 'dormant']
+EVENT_TYPES = ['order_placed', 'purchase', 'add_to_cart', 'checkout', 'view', 'product_updated']
+CATEGORIES = ['Electronics', 'Home & Kitchen', 'Fashion', 'Beauty', 'Grocery', 'Sports', 'Books', 'Toys']
+PRODUCT_WORDS = ['Wireless', 'Bluetooth', 'Stainless', 'Steel', 'Cotton', 'Organic', 'Premium', 'Slim', 'Fit',
+                 'Non-Stick', 'Cookware', 'Set', 'Running', 'Shoes', 'Headphones', 'Noise', 'Cancelling',
+                 'Kurta', 'Saree', 'Silk', 'Face', 'Serum', 'Vitamin', 'Basmati', 'Rice', 'Yoga', 'Mat',
+                 'Smart', 'Watch', 'LED', 'Television', '55-inch', 'Backpack', 'Laptop', 'Sleeve', 'Pack', 'of', '2']
+
+
+def event_text(event: Dict) -> str:
+    # EmbeddingGenerator.generate_event_text in ml/embedding-pipeline
+    parts = []
+    if event.get('event_type'):
+        parts.append(f"Event: {event['event_type']}")
+    payload = event.get('payload') or {}
+    if payload.get('product_name'):
+        parts.append(f"Product: {payload['product_name']}")
+    if payload.get('category'):
+        parts.append(f"Category: {payload['category']}")
+    if payload.get('sku'):
+        parts.append(f"SKU: {payload['sku']}")
+    return ". ".join(parts) if parts else "Event"
+
+
+def synthetic_texts(n: int, seed: int = 0) -> List[str]:
+    """Profile and event texts (half each) with the optional fields real rows leave empty"""
+    rng = random.Random(seed)
+    texts = []
+    for i in range(n):
+        if i % 2 == 0:
+            city, state = rng.choice(LOCATIONS)
+            profile = {
+                'full_name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" if rng.random() < 0.95 else None,
+                'city': city if rng.random() < 0.9 else None,
+                'state': state,
+                'segment': rng.choice(SEGMENTS) if rng.random() < 0.8 else None,
+                'ltv': round(rng.lognormvariate(8, 1.2), 2) if rng.random() < 0.7 else None,
+            }
+            texts.append(profile_text(profile))
+        else:
+            payload = {}
+            if rng.random() < 0.85:
+                payload['product_name'] = ' '.join(rng.choices(PRODUCT_WORDS, k=rng.randint(2, 12)))
+            if rng.random() < 0.7:
+                payload['category'] = rng.choice(CATEGORIES)
+            if rng.random() < 0.5:
+                payload['sku'] = f"SKU-{rng.randint(10000, 99999)}"
+            texts.append(event_text({'event_type': rng.choice(EVENT_TYPES), 'payload': payload}))
+    return texts
+
+
+def fit_words(text: str, words: str, rng: random.Random) -> str:
+    """text as is ('natural'), or padded with product words / truncated to a word count"""
+    if words == 'natural':
+        return text
+    target = int(words)
+    tokens = text.split()
+    while len(tokens) < target:
+        tokens.extend(rng.choices(PRODUCT_WORDS, k=target - len(tokens)))
+    return ' '.join(tokens[:target])
+
+
+def request_bodies(texts: List[str], request_batch: int, words: str, count: int, seed: int = 0) -> List[bytes]:
+    rng = random.Random(seed)
+    return [
+        json.dumps({'texts': [fit_words(text, words, rng) for text in rng.sample(texts, request_batch)]}).encode()
+        for _ in range(count)
+    ]
+
+
+# Transports: each returns post(body, accept) -> (status, response body)
+
+PostFn = Callable[[bytes, str], Awaitable[Tuple[int, bytes]]]
+
+
+def asgi_client(app) -> PostFn:
+    """Calls an ASGI app directly, the way a server would"""
+    async def post(body: bytes, accept: str) -> Tuple[int, bytes]:
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'POST', 'scheme': 'http', 'path': BATCH_PATH, 'raw_path': BATCH_PATH.encode(),
+            'query_string': b'', 'root_path': '',
+            'headers': [
+                (b'content-type', MEDIA_TYPE_JSON.encode()),
+                (b'accept', accept.encode()),
+                (b'content-length', str(len(body)).encode()),
+            ],
+            'client': ('127.0.0.1', 0), 'server': ('127.0.0.1', 80),
+        }
+        request_sent = False
+        response_done = asyncio.Event()
+        status, chunks = 0, []
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            await response_done.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+                if not message.get('more_body'):
+                    response_done.set()
+
+        await app(scope, receive, send)
+        return status, b''.join(chunks)
+
+    return post
+
+
+class HttpConnection:
+    """One keep-alive HTTP/1.1 connection (responses must carry Content-Length)"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def post(self, body: bytes, accept: str) -> Tuple[int, bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(
+            f"POST {BATCH_PATH} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            f"Content-Type: {MEDIA_TYPE_JSON}\r\nAccept: {accept}\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+        await self.writer.drain()
+        head = (await self.reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+        status = int(head[0].split()[1])
+        headers = {name.strip().lower(): value.strip() for name, _, value in (line.partition(':') for line in head[1:] if line)}
+        payload = await self.reader.readexactly(int(headers.get('content-length', 0)))
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, payload
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+async def run_load(clients: List[PostFn], bodies: List[bytes], accept: str, warmup: int) -> Dict:
+    """Send all bodies through len(clients) concurrent senders; latency per request"""
+    for body in bodies[:warmup]:
+        await clients[0](body, accept)
+
+    measured = bodies[warmup:]
+    latencies, errors, response_bytes = [], 0, 0
+    next_index = 0
+
+    async def sender(post: PostFn):
+        nonlocal next_index, errors, response_bytes
+        while next_index < len(measured):
+            body = measured[next_index]
+            next_index += 1
+            start = time.perf_counter()
+            status, payload = await post(body, accept)
+            latencies.append(time.perf_counter() - start)
+            response_bytes += len(payload)
+            if status != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(sender(post) for post in clients))
+    return {'latencies': latencies, 'seconds': time.perf_counter() - start,
+            'errors': errors, 'response_bytes': response_bytes, 'requests': len(measured)}
+
+
+def summarize(setting: Dict, load: Dict, request_batch: int) -> Dict:
+    latencies_ms = np.asarray(load['latencies']) * 1000.0
+    texts = load['requests'] * request_batch
+    return {
+        **setting,
+        'requests': load['requests'],
+        'texts': texts,
+        'errors': load['errors'],
+        'seconds': round(load['seconds'], 3),
+        'texts_per_sec': round(texts / load['seconds'], 1),
+        'requests_per_sec': round(load['requests'] / load['seconds'], 2),
+        'latency_ms': {
+            'p50': round(float(np.percentile(latencies_ms, 50)), 2),
+            'p95': round(float(np.percentile(latencies_ms, 95)), 2),
+            'p99': round(float(np.percentile(latencies_ms, 99)), 2),
+            'mean': round(float(latencies_ms.mean()), 2),
+        },
+        'response_bytes_per_text': round(load['response_bytes'] / texts, 1),
+    }
+
+
+def client_settings(args):
+    return itertools.product(args.request_batch, args.words, args.formats, args.concurrency)
+
+
+def bodies_for(args, texts, request_batch, words, concurrency):
+    count = args.warmup + max(math.ceil(args.texts / request_batch), args.min_requests, concurrency * 2)
+    return request_bodies(texts, request_batch, words, count)
+
+
+def set_torch_threads(threads: int, default: int) -> int:
+    import torch
+    torch.set_num_threads(threads or default)
+    return torch.get_num_threads()
+
+
+async def bench_inprocess(args, texts: List[str]) -> List[Dict]:
+    from src import main
+
+    import torch
+
+    rows = []
+    default_threads = torch.get_num_threads()
+    main.EMBEDDING_MAX_BATCH = args.max_batch[0]
+    await main.app.router.startup()
+    try:
+        for max_batch in args.max_batch:
+            if max_batch != main.EMBEDDING_MAX_BATCH:
+                # A fresh registry (and model load) so the batcher picks up max_batch
+                main.get_registry().close()
+                main.registry = None
+                main.EMBEDDING_MAX_BATCH = max_batch
+                async with main.encoder():
+                    pass
+
+            for threads in args.threads:
+                torch_threads = set_torch_threads(threads, default_threads)
+                for request_batch, words, response_format, concurrency in client_settings(args):
+                    setting = dict(mode='inprocess', workers=1, torch_threads=torch_threads, max_batch=max_batch,
+                                   request_batch=request_batch, words=words, format=response_format,
+                                   concurrency=concurrency)
+                    bodies = bodies_for(args, texts, request_batch, words, concurrency)
+                    before = main.get_registry().stats()['models'][main.EMBEDDING_MODEL]['batching']
+                    load = await run_load([asgi_client(main.app)] * concurrency, bodies,
+                                          ACCEPT[response_format], args.warmup)
+                    after = main.get_registry().stats()['models'][main.EMBEDDING_MODEL]['batching']
+
+                    row = summarize(setting, load, request_batch)
+                    batches = after['batches'] - before['batches']
+                    row['server_avg_batch'] = round((after['texts'] - before['texts']) / batches, 1) if batches else None
+                    rows.append(row)
+                    print_row(row)
+    finally:
+        await main.app.router.shutdown()
+    return rows
+
+
+def start_server(port: int, workers: int, threads: int, max_batch: int, timeout: float) -> subprocess.Popen:
+    env = dict(os.environ, EMBEDDING_MAX_BATCH=str(max_batch), EMBEDDING_INDEX_BUILD_ON_START='false')
+    if threads:
+        env.update(OMP_NUM_THREADS=str(threads), MKL_NUM_THREADS=str(threads))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'src.main:app', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning'],
+        cwd=SERVICE_DIR, env=env
+    )
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"❌ uvicorn exited with {server.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=5) as response:
+                if response.status == 200:
+                    return server
+        except OSError:
+            time.sleep(1)
+    stop_server(server)
+    raise SystemExit(f"❌ Service not healthy after {timeout:.0f}s")
+
+
+def stop_server(server: subprocess.Popen):
+    server.terminate()
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+async def bench_socket(args, texts: List[str]) -> List[Dict]:
+    rows = []
+    for workers, threads, max_batch in itertools.product(args.workers, args.threads, args.max_batch):
+        print(f"Starting uvicorn: {workers} worker(s), torch threads {threads or 'default'}, max batch {max_batch}...")
+        server = start_server(args.port, workers, threads, max_batch, args.startup_timeout)
+        try:
+            for request_batch, words, response_format, concurrency in client_settings(args):
+                setting = dict(mode='socket', workers=workers, torch_threads=threads or None, max_batch=max_batch,
+                               request_batch=request_batch, words=words, format=response_format,
+                               concurrency=concurrency)
+                connections = [HttpConnection('127.0.0.1', args.port) for _ in range(concurrency)]
+                try:
+                    load = await run_load([connection.post for connection in connections],
+                                          bodies_for(args, texts, request_batch, words, concurrency),
+                                          ACCEPT[response_format], args.warmup)
+                finally:
+                    for connection in connections:
+                        await connection.close()
+                row = summarize(setting, load, request_batch)
+                rows.append(row)
+                print_row(row)
+        finally:
+            stop_server(server)
+    return rows
+
+
+def print_row(row: Dict):
+    latency = row['latency_ms']
+    print(f"{row['mode']:>9} w{row['workers']} t{row['torch_threads'] or '-'} mb{row['max_batch']:<4} "
+          f"rb{row['request_batch']:<4} {row['words']:>7} {row['format']:>6} c{row['concurrency']:<3} "
+          f"{row['texts_per_sec']:>9.1f} texts/s  p50 {latency['p50']:>8.2f}  p95 {latency['p95']:>8.2f}  "
+          f"p99 {latency['p99']:>8.2f} ms" + (f"  errors {row['errors']}" if row['errors'] else ""))
+
+
+def compare(rows: List[Dict], baseline: Dict, tolerance: float) -> List[str]:
+    """Settings whose throughput fell or p95 latency rose by more than tolerance"""
+    key = lambda row: tuple(row.get(name) for name in SETTING_KEYS)
+    previous = {key(row): row for row in baseline.get('results', [])}
+    regressions = []
+    for row in rows:
+        old = previous.get(key(row))
+        if old is None:
+            continue
+        if row['texts_per_sec'] < old['texts_per_sec'] * (1 - tolerance):
+            regressions.append(f"{key(row)}: {old['texts_per_sec']} -> {row['texts_per_sec']} texts/s")
+        if row['latency_ms']['p95'] > old['latency_ms']['p95'] * (1 + tolerance):
+            regressions.append(f"{key(row)}: p95 {old['latency_ms']['p95']} -> {row['latency_ms']['p95']} ms")
+    return regressions
+
+
+def environment() -> Dict:
+    try:
+        import torch
+        torch_version = torch.__version__
+    except ImportError:
+        torch_version = None
+    return {
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'torch': torch_version,
+        'model': os.getenv('EMBEDDING_MODEL', 'all-mpnet-base-v2'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark embedding-service throughput and latency')
+    parser.add_argument('--mode', choices=['inprocess', 'socket', 'both'], default='inprocess')
+    parser.add_argument('--max-batch', type=int, nargs='+', default=[64], help='EMBEDDING_MAX_BATCH values')
+    parser.add_argument('--request-batch', type=int, nargs='+', default=[1, 16, 64], help='Texts per request')
+    parser.add_argument('--words', nargs='+', default=['natural', '128'], help="'natural' or words per text")
+    parser.add_argument('--threads', type=int, nargs='+', default=[0], help='Torch threads (0: default)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1], help='uvicorn workers (socket mode)')
+    parser.add_argument('--formats', choices=list(ACCEPT), nargs='+', default=['json', 'binary'])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8], help='Requests in flight')
+    parser.add_argument('--texts', type=int, default=2048, help='Texts sent per setting')
+    parser.add_argument('--min-requests', type=int, default=20, help='Fewest measured requests per setting')
+    parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per setting')
+    parser.add_argument('--port', type=int, default=3916, help='Port for socket mode')
+    parser.add_argument('--startup-timeout', type=float, default=300, help='Seconds to wait for uvicorn')
+    parser.add_argument('--output', type=str, default='embedding_throughput.json', help='JSON report path')
+    parser.add_argument('--baseline', type=str, default=None, help='Earlier report to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed relative regression')
+    args = parser.parse_args()
+
+    os.environ.setdefault('EMBEDDING_INDEX_BUILD_ON_START', 'false')
+    texts = synthetic_texts(5000)
+    lengths = [len(text.split()) for text in texts]
+    print(f"Synthetic texts: {len(texts)}, words p50 {np.percentile(lengths, 50):.0f}, "
+          f"p95 {np.percentile(lengths, 95):.0f}, max {max(lengths)}")
+
+    report = {'environment': environment(), 'results': []}
+    if args.mode in ('inprocess', 'both'):
+        report['results'] += asyncio.run(bench_inprocess(args, texts))
+    if args.mode in ('socket', 'both'):
+        report['results'] += asyncio.run(bench_socket(args, texts))
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Report written to {args.output} ({len(report['results'])} settings)")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report['results'], json.load(f), args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
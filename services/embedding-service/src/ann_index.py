@@ -0,0 +1,661 @@
+"""
+Profile ANN Index
+In-process IVF-flat nearest-neighbour index over customer profile embeddings
+
+Vectors are clustered into `nlist` inverted lists around spherical k-means
+centroids. A query scores the centroids, then scans only the `nprobe`
+closest lists. Each generation of the index is a directory of .npy files
+grouped by list (CSR layout) and opened with mmap_mode='r':
+
+    index.json     format version, dims, counts, segment/city categories
+    centroids.npy  (nlist, dims) float32
+    offsets.npy    (nlist + 1,) start of each list
+    vectors.npy    (n, dims) float32, unit length, grouped by list
+    ids.npy        (n,) profile ids, S36
+    ids_order.npy  argsort of ids, for id lookups without a dict
+    segments.npy / cities.npy   (n,) int32 category codes, -1 for none
+
+With compact_dims set, each generation also stores int8 codes of a PCA
+projection (compact_codes.npy + codec, see ml/common compact_embeddings):
+lists are scanned on the codes and the best k * rerank candidates are
+re-scored with the exact vectors, so only the codes need to stay resident.
+
+Writes after the build go to an in-memory delta, journaled to
+journal.jsonl so a restart replays them, and searched by brute force next
+to the lists. Delta vectors live in one preallocated array grown in
+chunks; each write takes the next row (its profile's slot) and rows are
+never rewritten, so a search slices the array and scans it without
+holding the lock. compact() folds the delta into a new generation with the
+same centroids; build() retrains them.
+
+    <dir>/CURRENT     name of the live generation
+    <dir>/gen-<n>/    one generation
+"""
+import base64
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../../ml/common/src'))
+from compact_embeddings import CODES_FILE, CompactCodec, fit_codec
+
+FORMAT_VERSION = 1
+CURRENT_FILE = 'CURRENT'
+META_FILE = 'index.json'
+JOURNAL_FILE = 'journal.jsonl'
+ID_DTYPE = 'S36'
+DELTA_CHUNK_ROWS = 4096
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def default_nlist(n: int) -> int:
+    """~sqrt(n) lists: about as many lists as rows per list"""
+    return int(max(1, min(n, round(np.sqrt(n)))))
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray, chunk_rows: int = 16384) -> np.ndarray:
+    """Nearest centroid (by inner product) of every row"""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk_rows):
+        block = np.asarray(vectors[start:start + chunk_rows], dtype=np.float32)
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def train_centroids(
+    vectors: np.ndarray,
+    nlist: int,
+    iterations: int = 10,
+    sample_per_list: int = 32,
+    seed: int = 0
+) -> np.ndarray:
+    """Spherical k-means on a sample of unit vectors"""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample_size = min(n, nlist * sample_per_list)
+    sample = normalize(vectors[np.sort(rng.choice(n, sample_size, replace=False))])
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty lists with random sample points
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+def _encode_categories(values: Sequence[Optional[str]]) -> Tuple[np.ndarray, List[str]]:
+    categories: Dict[str, int] = {}
+    codes = np.full(len(values), -1, dtype=np.int32)
+    for idx, value in enumerate(values):
+        if value is not None:
+            codes[idx] = categories.setdefault(value, len(categories))
+    return codes, list(categories)
+
+
+def write_generation(
+    path: str,
+    ids: Sequence[str],
+    vectors: np.ndarray,
+    segments: Sequence[Optional[str]],
+    cities: Sequence[Optional[str]],
+    centroids: np.ndarray,
+    codec: Optional[CompactCodec] = None
+):
+    """Write one index generation: rows grouped by their nearest centroid"""
+    os.makedirs(path, exist_ok=True)
+    labels = assign(vectors, centroids)  # argmax is unaffected by row norms
+    order = np.argsort(labels, kind='stable')
+    offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels, minlength=len(centroids)), out=offsets[1:])
+
+    id_array = np.asarray(ids, dtype=ID_DTYPE)[order]
+    segment_codes, segment_names = _encode_categories(segments)
+    city_codes, city_names = _encode_categories(cities)
+
+    np.save(os.path.join(path, 'centroids.npy'), centroids.astype(np.float32), allow_pickle=False)
+    np.save(os.path.join(path, 'offsets.npy'), offsets, allow_pickle=False)
+
+    # Streamed in list order so a large index is never copied whole
+    out = np.lib.format.open_memmap(
+        os.path.join(path, 'vectors.npy'), mode='w+', dtype=np.float32, shape=(len(order), vectors.shape[1])
+    )
+    codes = None
+    if codec is not None:
+        codec.save(path)
+        codes = np.lib.format.open_memmap(
+            os.path.join(path, CODES_FILE), mode='w+', dtype=np.int8, shape=(len(order), codec.compact_dims)
+        )
+    for start in range(0, len(order), 65536):
+        block = normalize(vectors[order[start:start + 65536]])
+        out[start:start + len(block)] = block
+        if codes is not None:
+            codes[start:start + len(block)] = codec.encode(block)
+    out.flush()
+    del out
+    if codes is not None:
+        codes.flush()
+        del codes
+
+    np.save(os.path.join(path, 'ids.npy'), id_array, allow_pickle=False)
+    np.save(os.path.join(path, 'ids_order.npy'), np.argsort(id_array, kind='stable'), allow_pickle=False)
+    np.save(os.path.join(path, 'segments.npy'), segment_codes[order], allow_pickle=False)
+    np.save(os.path.join(path, 'cities.npy'), city_codes[order], allow_pickle=False)
+
+    with open(os.path.join(path, META_FILE), 'w') as f:
+        json.dump({
+            'format_version': FORMAT_VERSION,
+            'count': int(len(id_array)),
+            'dims': int(vectors.shape[1]),
+            'nlist': int(len(centroids)),
+            'segments': segment_names,
+            'cities': city_names,
+            'built_at': time.time(),
+        }, f)
+
+
+@dataclass
+class _DeltaEntry:
+    seq: int
+    slot: Optional[int]  # row in the delta arrays; None: removed
+    segment: Optional[str]
+    city: Optional[str]
+
+
+class _Generation:
+    """Read-only view of one generation directory"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        if self.meta['format_version'] > FORMAT_VERSION:
+            raise ValueError(f"Index format {self.meta['format_version']} is newer than {FORMAT_VERSION}")
+
+        def load(filename):
+            # Plain ndarray view of the mapping: same pages, no np.memmap slicing overhead
+            return np.asarray(np.load(os.path.join(path, filename), mmap_mode='r', allow_pickle=False))
+
+        self.centroids = np.array(load('centroids.npy'))  # small, scored on every query
+        self.offsets = np.array(load('offsets.npy'))
+        self.vectors = load('vectors.npy')
+        self.ids = load('ids.npy')
+        self.ids_order = load('ids_order.npy')
+        self.segments = load('segments.npy')
+        self.cities = load('cities.npy')
+        self.codec = CompactCodec.load(path)
+        self.codes = load(CODES_FILE) if self.codec is not None else None
+        self.segment_codes = {name: code for code, name in enumerate(self.meta['segments'])}
+        self.city_codes = {name: code for code, name in enumerate(self.meta['cities'])}
+
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+
+    def row_of(self, profile_id: str) -> Optional[int]:
+        if self.count == 0:
+            return None
+        key = np.asarray(profile_id, dtype=ID_DTYPE)
+        pos = int(np.searchsorted(self.ids, key, sorter=self.ids_order))
+        if pos < self.count:
+            row = int(self.ids_order[pos])
+            if self.ids[row] == key:
+                return row
+        return None
+
+    def category(self, codes: np.ndarray, names: List[str], row: int) -> Optional[str]:
+        code = int(codes[row])
+        return names[code] if code >= 0 else None
+
+
+class ProfileIndex:
+    """IVF-flat profile index with an incremental delta; thread-safe"""
+
+    def __init__(
+        self,
+        path: str,
+        nprobe: int = 16,
+        compact_rows: int = 20000,
+        compact_dims: int = 0,
+        rerank: int = 4
+    ):
+        """
+        Args:
+            path: Index directory (CURRENT + generations)
+            nprobe: Lists scanned per query (more: higher recall, slower)
+            compact_rows: Delta rows (superseded ones included) at which
+                needs_compaction turns true; bounds the brute-force scan
+            compact_dims: int8 code dimensions for build() (0: exact vectors only)
+            rerank: Candidates re-scored exactly per result, when codes are used
+        """
+        self.path = path
+        self.nprobe = nprobe
+        self.compact_rows = compact_rows
+        self.compact_dims = compact_dims
+        self.rerank = max(1, rerank)
+
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._gen: Optional[_Generation] = None
+        self._masked: Optional[np.ndarray] = None
+        self._delta: Dict[str, _DeltaEntry] = {}
+        self._seq = 0
+        self._reset_delta_arrays()
+
+    # ---------------------------------------------------------------- lifecycle
+
+    @classmethod
+    def open(cls, path: str, **kwargs) -> Optional['ProfileIndex']:
+        """The index at path, or None if none was built yet"""
+        current = os.path.join(path, CURRENT_FILE)
+        if not os.path.exists(current):
+            return None
+        with open(current) as f:
+            generation = f.read().strip()
+
+        index = cls(path, **kwargs)
+        index._swap(_Generation(os.path.join(path, generation)))
+        index._replay_journal()
+        return index
+
+    @classmethod
+    def build(
+        cls,
+        path: str,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        segments: Sequence[Optional[str]],
+        cities: Sequence[Optional[str]],
+        nlist: Optional[int] = None,
+        **kwargs
+    ) -> 'ProfileIndex':
+        """Train centroids on vectors and write a fresh generation"""
+        if len(vectors) == 0:
+            raise ValueError("Cannot build an index without vectors")
+        centroids = train_centroids(vectors, nlist or default_nlist(len(vectors)))
+
+        index = cls(path, **kwargs)
+        codec = None
+        if index.compact_dims:
+            rng = np.random.default_rng(0)
+            sample = np.sort(rng.choice(len(vectors), min(len(vectors), 50000), replace=False))
+            codec = fit_codec(normalize(vectors[sample]), min(index.compact_dims, vectors.shape[1]))
+        generation = index._next_generation_name()
+        write_generation(os.path.join(path, generation), ids, vectors, segments, cities, centroids, codec)
+        index._publish(generation)
+        index._swap(_Generation(os.path.join(path, generation)))
+        # Older generations stay until drop_stale_generations(): a previous
+        # ProfileIndex may still be journaling writes into one
+        return index
+
+    @property
+    def seq(self) -> int:
+        """Sequence number of the latest write"""
+        return self._seq
+
+    def carry_over(self, other: 'ProfileIndex', since_seq: int):
+        """Re-apply other's writes after since_seq (writes that raced a rebuild)"""
+        with other._lock:
+            entries = [(pid, other._vector(e), e.segment, e.city)
+                       for pid, e in other._delta.items() if e.seq > since_seq]
+        with self._lock:
+            applied = [(pid, self._apply(pid, vector, segment, city)) for pid, vector, segment, city in entries]
+            self._journal(self._record(pid, e) for pid, e in applied)
+
+    def drop_stale_generations(self):
+        """
+        Delete every generation but this index's own (and their journals)
+
+        Only once no other ProfileIndex on this path writes or compacts any more.
+        """
+        with self._lock:
+            live = os.path.basename(self._gen.path)
+        for name in os.listdir(self.path):
+            if name.startswith('gen-') and name != live:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def _current_generation(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.path, CURRENT_FILE)) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _next_generation_name(self) -> str:
+        os.makedirs(self.path, exist_ok=True)
+        numbers = [int(name[4:]) for name in os.listdir(self.path)
+                   if name.startswith('gen-') and name[4:].isdigit()]
+        return f"gen-{max(numbers, default=0) + 1}"
+
+    def _publish(self, generation: str):
+        tmp = os.path.join(self.path, CURRENT_FILE + '.tmp')
+        with open(tmp, 'w') as f:
+            f.write(generation)
+        os.replace(tmp, os.path.join(self.path, CURRENT_FILE))
+
+    def _swap(self, generation: _Generation):
+        with self._lock:
+            self._gen = generation
+            self._masked = np.zeros(generation.count, dtype=bool)
+            for profile_id in self._delta:
+                row = generation.row_of(profile_id)
+                if row is not None:
+                    self._masked[row] = True
+
+    # ------------------------------------------------------------------ journal
+
+    @property
+    def _journal_path(self) -> str:
+        return os.path.join(self._gen.path, JOURNAL_FILE)
+
+    def _replay_journal(self):
+        if not os.path.exists(self._journal_path):
+            return
+        with open(self._journal_path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn last line
+                vector = None
+                if record.get('vector') is not None:
+                    vector = np.frombuffer(base64.b64decode(record['vector']), dtype='<f4')
+                self._apply(record['id'], vector, record.get('segment'), record.get('city'))
+
+    def _journal(self, records: Iterable[Dict], path: Optional[str] = None, mode: str = 'a'):
+        with open(path or self._journal_path, mode) as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+
+    def _record(self, profile_id: str, entry: _DeltaEntry) -> Dict:
+        if entry.slot is None:
+            return {'id': profile_id, 'vector': None}
+        return {
+            'id': profile_id,
+            'segment': entry.segment,
+            'city': entry.city,
+            'vector': base64.b64encode(np.asarray(self._vector(entry), dtype='<f4').tobytes()).decode('ascii'),
+        }
+
+    # ------------------------------------------------------------------ updates
+
+    def _reset_delta_arrays(self):
+        self._delta_vectors: Optional[np.ndarray] = None  # (capacity, dims); rows below _delta_rows are final
+        self._delta_ids = np.empty(0, dtype=object)
+        self._delta_segments = np.empty(0, dtype=object)
+        self._delta_cities = np.empty(0, dtype=object)
+        self._delta_live = np.zeros(0, dtype=bool)  # False once a row is superseded or removed
+        self._delta_rows = 0
+
+    def _store(self, profile_id: str, vector: np.ndarray, segment, city) -> int:
+        """Write vector into the next delta row, growing the arrays by a chunk when full"""
+        slot = self._delta_rows
+        if self._delta_vectors is None or slot == len(self._delta_vectors):
+            capacity = slot + max(DELTA_CHUNK_ROWS, slot // 2)
+            # New arrays rather than resizing: searches may still scan the old ones
+            vectors = np.empty((capacity, len(vector)), dtype=np.float32)
+            if self._delta_vectors is not None:
+                vectors[:slot] = self._delta_vectors[:slot]
+            self._delta_vectors = vectors
+            for name in ('_delta_ids', '_delta_segments', '_delta_cities', '_delta_live'):
+                old = getattr(self, name)
+                grown = np.zeros(capacity, dtype=old.dtype)
+                grown[:slot] = old[:slot]
+                setattr(self, name, grown)
+        self._delta_vectors[slot] = vector
+        self._delta_ids[slot] = profile_id
+        self._delta_segments[slot] = segment
+        self._delta_cities[slot] = city
+        self._delta_live[slot] = True
+        self._delta_rows = slot + 1
+        return slot
+
+    def _vector(self, entry: _DeltaEntry) -> Optional[np.ndarray]:
+        return self._delta_vectors[entry.slot] if entry.slot is not None else None
+
+    def _apply(self, profile_id: str, vector: Optional[np.ndarray], segment, city) -> _DeltaEntry:
+        self._seq += 1
+        previous = self._delta.get(profile_id)
+        if previous is not None and previous.slot is not None:
+            self._delta_live[previous.slot] = False
+        slot = self._store(profile_id, vector, segment, city) if vector is not None else None
+        entry = _DeltaEntry(self._seq, slot, segment, city)
+        self._delta[profile_id] = entry
+        row = self._gen.row_of(profile_id)
+        if row is not None:
+            self._masked[row] = True
+        return entry
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        segments: Sequence[Optional[str]],
+        cities: Sequence[Optional[str]]
+    ):
+        """Add or replace profiles; visible to the next search"""
+        vectors = normalize(np.atleast_2d(vectors))
+        with self._lock:
+            entries = [
+                (profile_id, self._apply(profile_id, vector, segment, city))
+                for profile_id, vector, segment, city in zip(ids, vectors, segments, cities)
+            ]
+            self._journal(self._record(profile_id, entry) for profile_id, entry in entries)
+
+    def remove(self, ids: Sequence[str]):
+        """Drop profiles (e.g. merged away) from results"""
+        with self._lock:
+            entries = [(profile_id, self._apply(profile_id, None, None, None)) for profile_id in ids]
+            self._journal(self._record(profile_id, entry) for profile_id, entry in entries)
+
+    @property
+    def needs_compaction(self) -> bool:
+        return self._delta_rows >= self.compact_rows
+
+    def compact(self):
+        """Fold the delta into a new generation (same centroids); searches keep running"""
+        with self._compact_lock:
+            with self._lock:
+                gen = self._gen
+                snapshot_seq = self._seq
+                delta = dict(self._delta)
+                delta_vectors = self._delta_vectors
+                keep = np.nonzero(~self._masked)[0]
+
+            upserts = [(pid, e) for pid, e in delta.items() if e.slot is not None]
+            ids = list(gen.ids[keep]) + [pid for pid, _ in upserts]
+            vectors = np.concatenate([
+                np.asarray(gen.vectors[keep], dtype=np.float32),
+                delta_vectors[[e.slot for _, e in upserts]] if upserts else np.zeros((0, gen.meta['dims']), np.float32)
+            ])
+            segments = [gen.category(gen.segments, gen.meta['segments'], row) for row in keep] + [e.segment for _, e in upserts]
+            cities = [gen.category(gen.cities, gen.meta['cities'], row) for row in keep] + [e.city for _, e in upserts]
+
+            generation = self._next_generation_name()
+            new_path = os.path.join(self.path, generation)
+            write_generation(new_path, ids, vectors, segments, cities, gen.centroids, gen.codec)
+
+            with self._lock:
+                if self._current_generation() != os.path.basename(gen.path):
+                    # A rebuild published a newer generation meanwhile; keep it
+                    shutil.rmtree(new_path, ignore_errors=True)
+                    print(f"⚠️  Profile index compaction of {os.path.basename(gen.path)} skipped: superseded")
+                    return
+                # Writes that raced the compaction stay in the delta, repacked into fresh arrays
+                raced = {pid: e for pid, e in self._delta.items() if e.seq > snapshot_seq}
+                old_vectors = self._delta_vectors
+                self._reset_delta_arrays()
+                self._delta = {
+                    pid: _DeltaEntry(e.seq, self._store(pid, old_vectors[e.slot], e.segment, e.city)
+                                     if e.slot is not None else None, e.segment, e.city)
+                    for pid, e in sorted(raced.items(), key=lambda item: item[1].seq)
+                }
+                self._journal((self._record(pid, e) for pid, e in self._delta.items()),
+                              path=os.path.join(new_path, JOURNAL_FILE), mode='w')
+                self._publish(generation)
+                self._swap(_Generation(new_path))
+
+            # Open mmaps of the old files stay valid after unlinking
+            shutil.rmtree(gen.path, ignore_errors=True)
+            print(f"✅ Profile index compacted into {generation} ({len(ids)} profiles)")
+
+    # ------------------------------------------------------------------- search
+
+    def vector_of(self, profile_id: str) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._delta.get(profile_id)
+            if entry is not None:
+                return self._vector(entry).copy() if entry.slot is not None else None
+            row = self._gen.row_of(profile_id)
+            return np.asarray(self._gen.vectors[row], dtype=np.float32) if row is not None else None
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 10,
+        segment: Optional[str] = None,
+        city: Optional[str] = None,
+        exclude: Iterable[str] = (),
+        nprobe: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Top-k (profile_id, cosine similarity), best first
+
+        With a segment/city filter, lists keep being scanned past nprobe
+        until k matching profiles were seen.
+        """
+        query = normalize(query).ravel()
+        exclude = set(exclude)
+        want = k + len(exclude)
+        nprobe = nprobe or self.nprobe
+
+        with self._lock:
+            gen, masked = self._gen, self._masked
+            # Rows below delta_rows are never rewritten and growth allocates new
+            # arrays, so only the live flags need copying to scan without the lock
+            delta_rows = self._delta_rows
+            delta_vectors, delta_ids = self._delta_vectors, self._delta_ids
+            delta_segments, delta_cities = self._delta_segments, self._delta_cities
+            delta_live = self._delta_live[:delta_rows].copy()
+
+        ids: List[str] = []
+        scores: List[np.ndarray] = []
+
+        # Base lists; a filter value the generation never saw matches nothing
+        segment_code = gen.segment_codes.get(segment, -2) if segment is not None else None
+        city_code = gen.city_codes.get(city, -2) if city is not None else None
+        if gen.codec is not None:
+            code_weights, code_bias = gen.codec.query_weights(query)
+        if segment_code != -2 and city_code != -2:
+            filtered = segment_code is not None or city_code is not None
+            rows_seen, row_chunks, score_chunks = 0, [], []
+            for probed, lst in enumerate(np.argsort(-(gen.centroids @ query))):
+                if probed >= nprobe and (not filtered or rows_seen >= want):
+                    break
+                lo, hi = int(gen.offsets[lst]), int(gen.offsets[lst + 1])
+                if lo == hi:
+                    continue
+                keep = ~masked[lo:hi]
+                if segment_code is not None:
+                    keep &= gen.segments[lo:hi] == segment_code
+                if city_code is not None:
+                    keep &= gen.cities[lo:hi] == city_code
+                if gen.codec is not None:
+                    list_scores = gen.codes[lo:hi].astype(np.float32) @ code_weights + code_bias
+                else:
+                    list_scores = gen.vectors[lo:hi] @ query
+                if keep.all():
+                    rows = np.arange(lo, hi)
+                else:
+                    rows = np.nonzero(keep)[0]
+                    list_scores = list_scores[rows]
+                    rows += lo
+                if len(rows) == 0:
+                    continue
+                score_chunks.append(list_scores)
+                row_chunks.append(rows)
+                rows_seen += len(rows)
+
+            if row_chunks:
+                base_rows = np.concatenate(row_chunks)
+                base_scores = np.concatenate(score_chunks)
+                if gen.codec is not None:
+                    # Re-rank the code shortlist with exact vectors (only these rows are paged in)
+                    shortlist = _top(base_scores, want * self.rerank)
+                    base_rows = base_rows[shortlist]
+                    base_scores = gen.vectors[base_rows] @ query
+                top = _top(base_scores, want)
+                ids.extend(gen.ids[row].decode('ascii') for row in base_rows[top])
+                scores.append(base_scores[top])
+
+        # Delta: brute force
+        if delta_rows:
+            keep = delta_live
+            if segment is not None:
+                keep &= delta_segments[:delta_rows] == segment
+            if city is not None:
+                keep &= delta_cities[:delta_rows] == city
+            if keep.all():
+                rows = np.arange(delta_rows)
+                delta_scores = delta_vectors[:delta_rows] @ query
+            else:
+                rows = np.nonzero(keep)[0]
+                delta_scores = delta_vectors[rows] @ query
+            if len(rows):
+                top = _top(delta_scores, want)
+                ids.extend(delta_ids[rows[i]] for i in top)
+                scores.append(delta_scores[top])
+
+        if not ids:
+            return []
+        all_scores = np.concatenate(scores)
+        results = []
+        for i in np.argsort(-all_scores, kind='stable'):
+            if ids[i] not in exclude:
+                results.append((ids[i], float(all_scores[i])))
+                if len(results) == k:
+                    break
+        return results
+
+    def stats(self) -> Dict:
+        with self._lock:
+            gen = self._gen
+            return {
+                "generation": os.path.basename(gen.path),
+                "base_profiles": gen.count,
+                "delta_profiles": len(self._delta),
+                "delta_rows": self._delta_rows,
+                "masked_base_profiles": int(self._masked.sum()),
+                "dims": gen.meta['dims'],
+                "nlist": gen.meta['nlist'],
+                "nprobe": self.nprobe,
+                "compact_dims": gen.codec.compact_dims if gen.codec is not None else 0,
+                "resident_scan_bytes": int(gen.codes.nbytes if gen.codes is not None else gen.vectors.nbytes),
+                "built_at": gen.meta['built_at'],
+            }
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indexes of the k highest scores, best first"""
+    if len(scores) > k:
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(len(scores))
+    return top[np.argsort(-scores[top], kind='stable')]
@@ -0,0 +1,204 @@
+"""
+Embedding Batcher
+Cross-request dynamic batching for the embedding model
+
+Every request (one text or many) is split into texts on a shared queue.
+A dedicated worker thread waits until max_batch texts are queued or the
+oldest has waited max_wait_ms, drains a window of the queue, sorts it by
+token length and encodes it in batches of similar length, so short texts
+are not padded to the length of long ones. Results are handed back to the
+waiting asyncio requests in their original order.
+
+The event loop never runs the model: handlers only await their future.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional
+
+import numpy as np
+
+# Texts drained per scheduling round, in multiples of max_batch: a wider
+# window groups lengths better at the cost of latency for the round
+BUCKET_WINDOW = 4
+
+
+class _Request:
+    """One caller's texts; resolved once every row is filled"""
+
+    def __init__(self, n_texts: int, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.result: Optional[np.ndarray] = None
+        self.remaining = n_texts
+        self.failed = False
+
+    def _resolve(self, fn, value):
+        if not self.future.done():
+            fn(value)
+
+    def fill(self, index: int, vector: np.ndarray, n_texts: int):
+        if self.failed:
+            return
+        if self.result is None:
+            self.result = np.empty((n_texts, vector.shape[0]), dtype=vector.dtype)
+        self.result[index] = vector
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.loop.call_soon_threadsafe(self._resolve, self.future.set_result, self.result)
+
+    def fail(self, exc: Exception):
+        if not self.failed:
+            self.failed = True
+            self.loop.call_soon_threadsafe(self._resolve, self.future.set_exception, exc)
+
+
+@dataclass
+class _Item:
+    request: _Request
+    index: int
+    n_texts: int
+    text: str
+    enqueued_at: float
+
+
+class EmbeddingBatcher:
+    """Pools concurrent encode requests into length-bucketed batches on one worker thread"""
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        length_fn: Optional[Callable[[List[str]], List[int]]] = None,
+        max_batch: int = 64,
+        max_wait_ms: float = 5.0,
+        on_batch: Optional[Callable[[int, float, float], None]] = None
+    ):
+        """
+        Args:
+            encode_fn: texts -> (len(texts), dims) embeddings
+            length_fn: texts -> token counts (defaults to character counts)
+            max_batch: Most texts per encode call
+            max_wait_ms: Longest a queued text waits for the batch to fill
+            on_batch: Called after each encode with (batch size, padding ratio, seconds queued)
+        """
+        self.encode_fn = encode_fn
+        self.length_fn = length_fn or (lambda texts: [len(text) for text in texts])
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self.on_batch = on_batch
+
+        self._queue: Deque[_Item] = deque()
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+
+        self.batches = 0
+        self.texts = 0
+        self.padded_tokens = 0
+        self.real_tokens = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name='embedding-batcher', daemon=True)
+            self._worker.start()
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """Embeddings of texts in input order, shape (len(texts), dims)"""
+        if not texts:
+            raise ValueError("encode() needs at least one text")
+
+        request = _Request(len(texts), asyncio.get_running_loop())
+        now = time.monotonic()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Embedding batcher is closed")
+            self._ensure_worker()
+            self._queue.extend(_Item(request, idx, len(texts), text, now) for idx, text in enumerate(texts))
+            self._cond.notify()
+        return await request.future
+
+    def _next_round(self) -> List[_Item]:
+        """Block until a batch is due, then drain up to one bucketing window"""
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if not self._queue:
+                return []
+
+            deadline = self._queue[0].enqueued_at + self.max_wait
+            while len(self._queue) < self.max_batch and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            window = min(len(self._queue), self.max_batch * BUCKET_WINDOW)
+            return [self._queue.popleft() for _ in range(window)]
+
+    def _run(self):
+        while True:
+            items = self._next_round()
+            if not items:
+                return
+
+            try:
+                lengths = np.asarray(self.length_fn([item.text for item in items]))
+            except Exception:
+                lengths = np.array([len(item.text) for item in items])
+            order = np.argsort(lengths, kind='stable')
+
+            for start in range(0, len(order), self.max_batch):
+                self._encode_batch([items[i] for i in order[start:start + self.max_batch]],
+                                   lengths[order[start:start + self.max_batch]])
+
+    def _encode_batch(self, batch: List[_Item], lengths: np.ndarray):
+        live = [item for item in batch if not item.request.failed and not item.request.future.done()]
+        if not live:
+            return
+
+        queued = time.monotonic() - min(item.enqueued_at for item in live)
+        try:
+            vectors = self.encode_fn([item.text for item in live])
+        except Exception as e:
+            for item in live:
+                item.request.fail(e)
+            return
+
+        for item, vector in zip(live, vectors):
+            item.request.fill(item.index, vector, item.n_texts)
+
+        # Padding: every sequence in a batch is padded to its longest one
+        longest = int(lengths.max()) if len(lengths) else 0
+        real = int(lengths.sum())
+        padded = longest * len(batch)
+        self.batches += 1
+        self.texts += len(live)
+        self.real_tokens += real
+        self.padded_tokens += padded
+        if self.on_batch:
+            self.on_batch(len(live), 1.0 - real / padded if padded else 0.0, queued)
+
+    def stats(self) -> Dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "padding_ratio": round(1.0 - self.real_tokens / self.padded_tokens, 3) if self.padded_tokens else 0.0,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    def close(self):
+        """Finish queued work and stop the worker"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._worker is not None:
+            self._worker.join()
@@ -2,14 +2,34 @@
 Embedding Service
 FastAPI service for generating embeddings using SentenceTransformers
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional
+from contextlib import asynccontextmanager
+from datetime import datetime
 from sentence_transformers import SentenceTransformer
+from prometheus_client import CONTENT_TYPE_LATEST, Gauge, Histogram, generate_latest
+import asyncio
+import functools
+import numpy as np
 import os
+import sys
+import threading
+import uuid
 from dotenv import load_dotenv
 
+from src.ann_index import ProfileIndex
+from src.batcher import EmbeddingBatcher
+from src.model_registry import EncoderRegistry, ModelBudgetExceeded, UnknownModel, parse_model_sizes, parse_models
+
+# Add shared ML modules path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../../ml/common/src'))
+from db_pool import connect, get_async_pool, pool_stats
+from embedding_codec import MEDIA_TYPE_JSON, UnsupportedFormat, content_type, encode, negotiate
+from embedding_text import profile_text, text_hash
+from pgvector_copy import bulk_update_embeddings, copy_query_rows, decode_uuid, decode_vector, invalid_uuids
+
 load_dotenv()
 
 app = FastAPI(title="Embedding Service", version="1.0.0")
@@ -23,151 +43,616 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load model
+# Encoders: EMBEDDING_MODEL is the default (profiles and the similarity index
+# use it); EMBEDDING_MODELS lists further encoders requests may name, as
+# `model-id` or `name=model-id-or-path`, loaded on demand; an `@<MB>` suffix
+# gives the expected resident size so a first load can make room beforehand
 EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'all-mpnet-base-v2')
-model = None
-
-def load_model():
-    """Load SentenceTransformer model"""
-    global model
-    if model is None:
-        print(f"Loading embedding model: {EMBEDDING_MODEL}...")
-        model = SentenceTransformer(EMBEDDING_MODEL)
-        print(f"✅ Model loaded (dimension: {model.get_sentence_embedding_dimension()})")
+EMBEDDING_MODELS = parse_models(os.getenv('EMBEDDING_MODELS', ''), EMBEDDING_MODEL)
+EMBEDDING_MODEL_SIZES = parse_model_sizes(os.getenv('EMBEDDING_MODELS', ''))
+EMBEDDING_MODEL_MEMORY_MB = int(os.getenv('EMBEDDING_MODEL_MEMORY_MB', '4096'))
+registry = None
+
+# Cross-request batching: texts from concurrent requests share encode calls
+EMBEDDING_MAX_BATCH = int(os.getenv('EMBEDDING_MAX_BATCH', '64'))
+EMBEDDING_MAX_WAIT_MS = float(os.getenv('EMBEDDING_MAX_WAIT_MS', '5'))
+
+EMBEDDING_QUEUE_DEPTH = Gauge(
+    "embedding_queue_depth",
+    "Texts waiting for the embedding batcher",
+    ["model"],
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "embedding_batch_size",
+    "Texts per model encode call",
+    ["model"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+EMBEDDING_BATCH_PADDING = Histogram(
+    "embedding_batch_padding_ratio",
+    "Share of padded token positions per encode call",
+    ["model"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0),
+)
+EMBEDDING_QUEUE_WAIT = Histogram(
+    "embedding_queue_wait_seconds",
+    "Time the oldest text of a batch spent queued",
+    ["model"],
+)
+EMBEDDING_MODEL_RESIDENT = Gauge(
+    "embedding_model_resident_bytes",
+    "Parameter and buffer bytes of a loaded encoder (0 when unloaded)",
+    ["model"],
+)
+EMBEDDING_MODEL_HITS = Gauge(
+    "embedding_model_hits",
+    "Requests served by an encoder since startup",
+    ["model"],
+)
+EMBEDDING_MODEL_LOADS = Gauge(
+    "embedding_model_loads",
+    "Times an encoder was loaded since startup",
+    ["model"],
+)
+EMBEDDING_MODEL_LOAD_SECONDS = Gauge(
+    "embedding_model_load_seconds",
+    "Duration of an encoder's most recent load",
+    ["model"],
+)
+
+def load_encoder(source: str) -> SentenceTransformer:
+    model = SentenceTransformer(source)
+    print(f"   dimension: {model.get_sentence_embedding_dimension()}, max_seq_length: {model.max_seq_length}")
     return model
 
+def model_size_bytes(model: SentenceTransformer) -> int:
+    """Bytes held by the model's parameters and buffers"""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+def token_lengths(model: SentenceTransformer, texts: List[str]) -> List[int]:
+    """Token counts as the model will see them (truncated to max_seq_length)"""
+    tokenized = model.tokenizer(
+        texts,
+        add_special_tokens=True,
+        truncation=True,
+        max_length=model.max_seq_length
+    )
+    return [len(ids) for ids in tokenized['input_ids']]
+
+def encode_batch(model: SentenceTransformer, texts: List[str]) -> np.ndarray:
+    """One model call for a length-bucketed batch (runs on the batcher thread)"""
+    return model.encode(
+        texts,
+        batch_size=len(texts),
+        normalize_embeddings=True,
+        convert_to_numpy=True,
+        show_progress_bar=False
+    )
+
+def record_batch(name: str, size: int, padding_ratio: float, queued_seconds: float):
+    EMBEDDING_BATCH_SIZE.labels(model=name).observe(size)
+    EMBEDDING_BATCH_PADDING.labels(model=name).observe(padding_ratio)
+    EMBEDDING_QUEUE_WAIT.labels(model=name).observe(queued_seconds)
+
+def make_batcher(name: str, model: SentenceTransformer) -> EmbeddingBatcher:
+    """A batcher of its own for every loaded encoder"""
+    batcher = EmbeddingBatcher(
+        functools.partial(encode_batch, model),
+        length_fn=functools.partial(token_lengths, model),
+        max_batch=EMBEDDING_MAX_BATCH,
+        max_wait_ms=EMBEDDING_MAX_WAIT_MS,
+        on_batch=functools.partial(record_batch, name)
+    )
+    print(f"✅ Embedding batcher for {name} ready (max batch {EMBEDDING_MAX_BATCH}, max wait {EMBEDDING_MAX_WAIT_MS}ms)")
+    return batcher
+
+def model_stat(name: str, key: str) -> Callable[[], float]:
+    return lambda: registry.stats()['models'][name][key] or 0
+
+def get_registry() -> EncoderRegistry:
+    global registry
+    if registry is None:
+        registry = EncoderRegistry(
+            EMBEDDING_MODELS,
+            loader=load_encoder,
+            batcher_factory=make_batcher,
+            size_fn=model_size_bytes,
+            memory_budget_bytes=EMBEDDING_MODEL_MEMORY_MB * 1024 * 1024,
+            pinned=[EMBEDDING_MODEL],
+            size_hints=EMBEDDING_MODEL_SIZES
+        )
+        for name in EMBEDDING_MODELS:
+            for gauge, key in (
+                (EMBEDDING_QUEUE_DEPTH, 'queue_depth'),
+                (EMBEDDING_MODEL_RESIDENT, 'resident_bytes'),
+                (EMBEDDING_MODEL_HITS, 'hits'),
+                (EMBEDDING_MODEL_LOADS, 'loads'),
+                (EMBEDDING_MODEL_LOAD_SECONDS, 'last_load_seconds'),
+            ):
+                gauge.labels(model=name).set_function(model_stat(name, key))
+        print(f"✅ Encoder registry: {', '.join(EMBEDDING_MODELS)} (budget {EMBEDDING_MODEL_MEMORY_MB} MB)")
+    return registry
+
+@asynccontextmanager
+async def encoder(name: Optional[str] = None):
+    """
+    Hold a loaded encoder for the duration of a request
+
+    Loads it (in a worker thread) on first use; 404 for a name outside
+    EMBEDDING_MODELS, 503 if it cannot fit the memory budget.
+    """
+    registry = get_registry()
+    name = name or EMBEDDING_MODEL
+    try:
+        entry = registry.try_acquire(name) or await asyncio.to_thread(registry.acquire, name)
+    except UnknownModel:
+        raise HTTPException(status_code=404, detail=f"Unknown model {name}; available: {registry.names}")
+    except ModelBudgetExceeded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    try:
+        yield entry
+    finally:
+        registry.release(entry)
+
+async def encode_texts(texts: List[str], model: Optional[str] = None):
+    """(model name, normalized embeddings) for texts, batched with concurrent requests"""
+    async with encoder(model) as entry:
+        if not texts:
+            dims = entry.model.get_sentence_embedding_dimension()
+            return entry.name, np.zeros((0, dims), dtype=np.float32)
+        return entry.name, await entry.batcher.encode(texts)
+
+# Similar-profile index (IVF-flat over customer_profile.embedding)
+EMBEDDING_INDEX_DIR = os.getenv('EMBEDDING_INDEX_DIR', os.path.join(os.path.dirname(__file__), '../data/profile_index'))
+EMBEDDING_INDEX_NPROBE = int(os.getenv('EMBEDDING_INDEX_NPROBE', '16'))
+EMBEDDING_INDEX_COMPACT_ROWS = int(os.getenv('EMBEDDING_INDEX_COMPACT_ROWS', '20000'))
+EMBEDDING_INDEX_COMPACT_DIMS = int(os.getenv('EMBEDDING_INDEX_COMPACT_DIMS', '0'))  # e.g. 128: scan int8 codes
+EMBEDDING_INDEX_RERANK = int(os.getenv('EMBEDDING_INDEX_RERANK', '4'))
+EMBEDDING_INDEX_BUILD_ON_START = os.getenv('EMBEDDING_INDEX_BUILD_ON_START', 'true').lower() == 'true'
+EMBEDDING_INDEX_LOAD_CHUNK = 50000
+INDEX_LOAD_FILE = os.path.join(EMBEDDING_INDEX_DIR, 'load.tmp.npy')  # scratch vectors of a rebuild
+INDEX_OPTIONS = dict(
+    nprobe=EMBEDDING_INDEX_NPROBE,
+    compact_rows=EMBEDDING_INDEX_COMPACT_ROWS,
+    compact_dims=EMBEDDING_INDEX_COMPACT_DIMS,
+    rerank=EMBEDDING_INDEX_RERANK
+)
+profile_index: Optional[ProfileIndex] = None
+index_state = {"building": False, "compacting": False, "last_error": None}
+index_state_lock = threading.Lock()
+# Held by index writers and by the swap to a rebuilt index, so no write lands
+# on the previous index after its writes were carried over
+index_write_lock = threading.RLock()
+# One build or compaction at a time: both write generations under EMBEDDING_INDEX_DIR
+index_job_lock = threading.Lock()
+pending_index_writes = []  # embedding writes made while the first build runs
+
+def load_profile_embeddings():
+    """
+    (ids, vectors, segments, cities) of every non-merged profile with an embedding, via binary COPY
+
+    Vectors are decoded straight into a memory-mapped scratch file sized by a
+    count taken first, so the load never holds per-row arrays or a second copy.
+    """
+    conn = connect(statement_timeout_ms=0)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM customer_profile WHERE is_merged = FALSE AND embedding IS NOT NULL")
+            expected = cur.fetchone()[0]
+            cur.execute("SELECT vector_dims(embedding) FROM customer_profile WHERE embedding IS NOT NULL LIMIT 1")
+            row = cur.fetchone()
+        if not expected or row is None:
+            conn.rollback()
+            return [], None, [], []
+
+        os.makedirs(EMBEDDING_INDEX_DIR, exist_ok=True)
+        vectors = np.lib.format.open_memmap(
+            INDEX_LOAD_FILE, mode='w+', dtype=np.float32, shape=(expected, row[0])
+        )
+        ids, segments, cities = [], [], []
+        last_id = '00000000-0000-0000-0000-000000000000'
+        while len(ids) < expected:
+            rows = copy_query_rows(
+                conn,
+                """
+                SELECT id, segment, city, embedding
+                FROM customer_profile
+                WHERE is_merged = FALSE AND embedding IS NOT NULL AND id > %s::uuid
+                ORDER BY id
+                LIMIT %s
+                """,
+                [last_id, min(EMBEDDING_INDEX_LOAD_CHUNK, expected - len(ids))]
+            )
+            if not rows:
+                break
+            for row_id, segment, city, embedding in rows:
+                vectors[len(ids)] = decode_vector(embedding)
+                ids.append(decode_uuid(row_id))
+                segments.append(segment.decode('utf-8') if segment is not None else None)
+                cities.append(city.decode('utf-8') if city is not None else None)
+            last_id = ids[-1]
+        conn.rollback()
+    finally:
+        conn.close()
+    # Profiles merged or cleared since the count leave unused rows; profiles
+    # embedded since then reach the index as writes carried over
+    return ids, (vectors[:len(ids)] if ids else None), segments, cities
+
+def build_profile_index():
+    """Rebuild the index from the database; writes that race the build are carried over"""
+    global profile_index
+    try:
+        with index_job_lock:
+            previous = profile_index
+            start_seq = previous.seq if previous else 0
+            ids, vectors, segments, cities = load_profile_embeddings()
+            if vectors is None:
+                print("⚠️  No profile embeddings yet; similar-profile index not built")
+                return
+            index = ProfileIndex.build(EMBEDDING_INDEX_DIR, ids, vectors, segments, cities, **INDEX_OPTIONS)
+            with index_write_lock:
+                if previous:
+                    index.carry_over(previous, start_seq)
+                profile_index = index
+                with index_state_lock:
+                    pending = list(pending_index_writes)
+                    pending_index_writes.clear()
+                for profiles, embeddings in pending:
+                    update_profile_index(profiles, embeddings)
+            # No writer can reach the previous index any more
+            index.drop_stale_generations()
+        print(f"✅ Similar-profile index built ({len(ids)} profiles, {index.stats()['nlist']} lists)")
+    except Exception as e:
+        index_state["last_error"] = str(e)
+        print(f"⚠️  Similar-profile index build failed: {e}")
+    finally:
+        with index_write_lock, index_state_lock:
+            index_state["building"] = False
+            pending_index_writes.clear()
+        # The generation holds its own copy; open mappings stay valid after unlinking
+        if os.path.exists(INDEX_LOAD_FILE):
+            os.remove(INDEX_LOAD_FILE)
+
+def compact_profile_index():
+    try:
+        with index_job_lock:
+            profile_index.compact()
+    except Exception as e:
+        index_state["last_error"] = str(e)
+        print(f"⚠️  Similar-profile index compaction failed: {e}")
+    finally:
+        with index_state_lock:
+            index_state["compacting"] = False
+
+def start_index_job(job: str, target: Callable) -> bool:
+    """Run a build/compaction on a background thread unless one is already running"""
+    with index_state_lock:
+        if index_state[job]:
+            return False
+        index_state[job] = True
+    threading.Thread(target=target, name=f"profile-index-{job}", daemon=True).start()
+    return True
+
+def update_profile_index(profiles: List[Dict], embeddings: np.ndarray):
+    """Mirror embedding writes into the index: non-merged profiles upserted, merged ones removed"""
+    with index_write_lock:
+        index = profile_index
+        if index is None:
+            with index_state_lock:
+                if index_state["building"]:
+                    pending_index_writes.append((profiles, embeddings))
+            return
+        live = [i for i, profile in enumerate(profiles) if not profile.get('is_merged')]
+        merged = [profiles[i]['id'] for i in range(len(profiles)) if profiles[i].get('is_merged')]
+        if live:
+            index.upsert(
+                [profiles[i]['id'] for i in live],
+                embeddings[live],
+                [profiles[i].get('segment') for i in live],
+                [profiles[i].get('city') for i in live]
+            )
+        if merged:
+            index.remove(merged)
+    if index.needs_compaction:
+        start_index_job("compacting", compact_profile_index)
+
 @app.on_event("startup")
 async def startup_event():
-    """Load model on startup"""
-    load_model()
+    """Load the default model on startup"""
+    global profile_index
+    async with encoder(EMBEDDING_MODEL):
+        pass
+    try:
+        profile_index = ProfileIndex.open(EMBEDDING_INDEX_DIR, **INDEX_OPTIONS)
+    except Exception as e:
+        print(f"⚠️  Could not open similar-profile index: {e}")
+    if profile_index is not None:
+        print(f"✅ Similar-profile index loaded ({profile_index.stats()['base_profiles']} profiles)")
+    elif EMBEDDING_INDEX_BUILD_ON_START:
+        start_index_job("building", build_profile_index)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if registry is not None:
+        registry.close()
 
 class EmbeddingRequest(BaseModel):
     text: str
+    model: Optional[str] = None  # one of EMBEDDING_MODELS; default EMBEDDING_MODEL
 
 class BatchEmbeddingRequest(BaseModel):
     texts: List[str]
+    model: Optional[str] = None
+
+class BulkProfileEmbeddingRequest(BaseModel):
+    profile_ids: Optional[List[str]] = None
+    changed_since: Optional[str] = None  # ISO timestamp or a previous next_cursor
+    limit: int = 5000
+
+class SimilarProfilesRequest(BaseModel):
+    profile_id: Optional[str] = None
+    text: Optional[str] = None
+    k: int = 10
+    segment: Optional[str] = None
+    city: Optional[str] = None
+
+EMBEDDING_BULK_MAX_PROFILES = int(os.getenv('EMBEDDING_BULK_MAX_PROFILES', '50000'))
+
+PROFILE_COLUMNS = """
+    id::text AS id,
+    full_name,
+    city,
+    state,
+    segment,
+    ltv,
+    total_orders,
+    is_merged,
+    updated_at
+"""
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "service": "embedding-service", "model": EMBEDDING_MODEL}
+    return {
+        "status": "healthy",
+        "service": "embedding-service",
+        "model": EMBEDDING_MODEL,
+        "db_pool": pool_stats(),
+        "models": {name: stats["loaded"] for name, stats in registry.stats()["models"].items()} if registry else None,
+        "profile_index": profile_index.stats() if profile_index else dict(index_state)
+    }
+
+@app.get("/v1/embeddings/stats")
+async def embedding_stats():
+    """Default encoder's batcher queue depth, batch sizes and padding"""
+    return get_registry().stats()["models"][EMBEDDING_MODEL]["batching"]
+
+@app.get("/v1/embeddings/models")
+async def embedding_models():
+    """Per-encoder load state, load time, hits, resident bytes and batching, plus the memory budget"""
+    return get_registry().stats()
+
+@app.get("/metrics")
+async def metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+def negotiate_format(accept: Optional[str]):
+    """(media_type, dtype) for the Accept header; 406 for an unknown binary dtype"""
+    try:
+        return negotiate(accept)
+    except UnsupportedFormat as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+
+def embeddings_response(embeddings: np.ndarray, model: str, response_format, json_body: Callable[[], Dict]):
+    """JSON body (default) or the negotiated binary encoding of a (rows, dims) matrix"""
+    media_type, dtype = response_format
+    if media_type == MEDIA_TYPE_JSON:
+        return json_body()
+    
+    return Response(
+        content=encode(embeddings, media_type, dtype),
+        media_type=content_type(media_type, dtype),
+        headers={
+            "X-Embedding-Model": model,
+            "X-Embedding-Count": str(embeddings.shape[0]),
+            "X-Embedding-Dimensions": str(embeddings.shape[1]),
+        }
+    )
+
 
 @app.post("/v1/embeddings/generate")
-async def generate_embedding(request: EmbeddingRequest):
-    """Generate embedding for a single text"""
+async def generate_embedding(request: EmbeddingRequest, accept: Optional[str] = Header(None)):
+    """Generate embedding for a single text (Accept: application/x-embeddings for raw float32/float16)"""
+    response_format = negotiate_format(accept)
     try:
-        model = load_model()
-        embedding = model.encode(
-            request.text,
-            normalize_embeddings=True,
-            convert_to_numpy=True
-        )
+        model, embeddings = await encode_texts([request.text], request.model)
+        embedding = embeddings[0]
         
-        return {
-            "embedding": embedding.tolist(),
-            "dimensions": len(embedding),
-            "model": EMBEDDING_MODEL
-        }
+        return embeddings_response(
+            embeddings,
+            model,
+            response_format,
+            lambda: {
+                "embedding": embedding.tolist(),
+                "dimensions": len(embedding),
+                "model": model
+            }
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/v1/embeddings/batch")
-async def generate_batch_embeddings(request: BatchEmbeddingRequest):
-    """Generate embeddings for multiple texts"""
+async def generate_batch_embeddings(request: BatchEmbeddingRequest, accept: Optional[str] = Header(None)):
+    """Generate embeddings for multiple texts (Accept: application/x-embeddings for raw float32/float16)"""
+    response_format = negotiate_format(accept)
     try:
-        model = load_model()
-        embeddings = model.encode(
-            request.texts,
-            batch_size=32,
-            normalize_embeddings=True,
-            convert_to_numpy=True,
-            show_progress_bar=False
-        )
+        model, embeddings = await encode_texts(request.texts, request.model)
         
-        return {
-            "embeddings": [emb.tolist() for emb in embeddings],
-            "dimensions": len(embeddings[0]) if len(embeddings) > 0 else 0,
-            "count": len(embeddings),
-            "model": EMBEDDING_MODEL
-        }
+        return embeddings_response(
+            embeddings,
+            model,
+            response_format,
+            lambda: {
+                "embeddings": [emb.tolist() for emb in embeddings],
+                "dimensions": len(embeddings[0]) if len(embeddings) > 0 else 0,
+                "count": len(embeddings),
+                "model": model
+            }
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def parse_cursor(cursor: str):
+    """(updated_at, last_id) of a changed_since value; last_id is None for a bare timestamp"""
+    timestamp, _, last_id = cursor.partition('|')
+    try:
+        return datetime.fromisoformat(timestamp.replace('Z', '+00:00')), (last_id or None)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid changed_since: {cursor}")
+
+async def embed_profiles(profiles: List[Dict]) -> np.ndarray:
+    """Encode profile rows and write all their vectors back in one COPY + UPDATE"""
+    texts = [profile_text(profile) for profile in profiles]
+    model, embeddings = await encode_texts(texts)
+    ids = [profile['id'] for profile in profiles]
+    hashes = [text_hash(text) for text in texts]
+    await get_async_pool().run(
+        lambda conn: bulk_update_embeddings(conn, ids, embeddings, text_hashes=hashes, model=model)
+    )
+    await asyncio.to_thread(update_profile_index, profiles, embeddings)
+    return embeddings
+
 @app.post("/v1/embeddings/profile/{profile_id}")
 async def generate_profile_embedding(profile_id: str):
     """Generate embedding for a profile (fetches from database)"""
+    if invalid_uuids([profile_id]):
+        raise HTTPException(status_code=404, detail="Profile not found")
     try:
-        import psycopg2
-        import psycopg2.extras
-        
-        # Connect to database
-        conn = psycopg2.connect(
-            host=os.getenv('POSTGRES_HOST', 'localhost'),
-            port=int(os.getenv('POSTGRES_PORT', 5432)),
-            database=os.getenv('POSTGRES_DB', 'retail_brain'),
-            user=os.getenv('POSTGRES_USER', 'retail_brain_user'),
-            password=os.getenv('POSTGRES_PASSWORD', 'retail_brain_pass')
+        # Pooled connections are only held for the queries, not during encoding
+        profile = await get_async_pool().fetchone(
+            f"SELECT {PROFILE_COLUMNS} FROM customer_profile WHERE id = %s",
+            [profile_id],
+            dict_rows=True
         )
+        if not profile:
+            raise HTTPException(status_code=404, detail="Profile not found")
         
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute(
-                """
-                SELECT 
-                    full_name,
-                    city,
-                    state,
-                    segment,
-                    ltv,
-                    total_orders
-                FROM customer_profile
-                WHERE id = %s
-                """,
-                [profile_id]
-            )
-            
-            profile = cur.fetchone()
-            if not profile:
-                raise HTTPException(status_code=404, detail="Profile not found")
-            
-            # Generate text representation
-            parts = []
-            if profile.get('full_name'):
-                parts.append(f"Customer name: {profile['full_name']}")
-            if profile.get('city') and profile.get('state'):
-                parts.append(f"Location: {profile['city']}, {profile['state']}")
-            if profile.get('segment'):
-                parts.append(f"Segment: {profile['segment']}")
-            if profile.get('ltv'):
-                parts.append(f"Lifetime value: {profile['ltv']}")
-            
-            text = ". ".join(parts) if parts else "Customer profile"
-            
-            # Generate embedding
-            model = load_model()
-            embedding = model.encode(text, normalize_embeddings=True, convert_to_numpy=True)
-            
-            # Update database
-            cur.execute(
-                """
-                UPDATE customer_profile
-                SET embedding = %s::vector
-                WHERE id = %s
-                """,
-                [str(embedding.tolist()), profile_id]
-            )
-            conn.commit()
-            conn.close()
-            
-            return {
-                "profile_id": profile_id,
-                "embedding": embedding.tolist(),
-                "dimensions": len(embedding),
-                "model": EMBEDDING_MODEL
-            }
+        embedding = (await embed_profiles([profile]))[0]
+        
+        return {
+            "profile_id": profile_id,
+            "embedding": embedding.tolist(),
+            "dimensions": len(embedding),
+            "model": EMBEDDING_MODEL
+        }
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/v1/embeddings/profiles/bulk")
+async def generate_bulk_profile_embeddings(request: BulkProfileEmbeddingRequest):
+    """
+    Embed many profiles: one read, batched encoding, one bulk write
+    
+    Either `profile_ids`, or `changed_since` to page through non-merged
+    profiles in (updated_at, id) order; pass the returned `next_cursor`
+    as the next `changed_since` until `has_more` is false.
+    """
+    if (request.profile_ids is None) == (request.changed_since is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of profile_ids or changed_since")
+    limit = min(max(request.limit, 1), EMBEDDING_BULK_MAX_PROFILES)
+    db = get_async_pool()
+    
+    if request.profile_ids is not None:
+        if len(request.profile_ids) > EMBEDDING_BULK_MAX_PROFILES:
+            raise HTTPException(status_code=400, detail=f"At most {EMBEDDING_BULK_MAX_PROFILES} profile_ids per call")
+        invalid = invalid_uuids(request.profile_ids)
+        if invalid:
+            raise HTTPException(status_code=400, detail=f"Invalid profile ids: {invalid[:10]}")
+        requested = list(dict.fromkeys(str(uuid.UUID(pid)) for pid in request.profile_ids))
+        query = f"SELECT {PROFILE_COLUMNS} FROM customer_profile WHERE id = ANY(%s::uuid[])"
+        params = [requested]
+    else:
+        since, last_id = parse_cursor(request.changed_since)
+        if last_id is None:
+            query_filter, params = "updated_at > %s", [since]
+        else:
+            query_filter, params = "(updated_at, id) > (%s, %s::uuid)", [since, last_id]
+        query = f"""
+            SELECT {PROFILE_COLUMNS}
+            FROM customer_profile
+            WHERE {query_filter} AND is_merged = FALSE
+            ORDER BY updated_at, id
+            LIMIT %s
+        """
+        params.append(limit)
+    
+    try:
+        profiles = await db.fetchall(query, params, dict_rows=True)
+        if profiles:
+            await embed_profiles(profiles)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    response = {"count": len(profiles), "model": EMBEDDING_MODEL}
+    if request.profile_ids is not None:
+        found = {profile['id'] for profile in profiles}
+        response["missing"] = [pid for pid in requested if pid not in found]
+    else:
+        last = profiles[-1] if profiles else None
+        response["next_cursor"] = f"{last['updated_at'].isoformat()}|{last['id']}" if last else request.changed_since
+        response["has_more"] = len(profiles) == limit
+    return response
+
+@app.post("/v1/embeddings/similar")
+async def similar_profiles(request: SimilarProfilesRequest):
+    """
+    Top-k most similar non-merged profiles to a profile or a free text
+    
+    Optional `segment` / `city` filters are exact matches. Scores are cosine
+    similarities from the in-process IVF index (approximate; raise
+    EMBEDDING_INDEX_NPROBE for recall).
+    """
+    if profile_index is None:
+        raise HTTPException(status_code=503, detail="Similar-profile index is not built yet")
+    if (request.profile_id is None) == (request.text is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of profile_id or text")
+    k = min(max(request.k, 1), 1000)
+    
+    if request.profile_id is not None:
+        query = profile_index.vector_of(request.profile_id)
+        if query is None:
+            raise HTTPException(status_code=404, detail="Profile has no indexed embedding")
+        exclude = [request.profile_id]
+    else:
+        query = (await encode_texts([request.text]))[1][0]
+        exclude = []
+    
+    results = await asyncio.to_thread(
+        profile_index.search, query, k, request.segment, request.city, exclude
+    )
+    return {
+        "results": [{"profile_id": pid, "score": round(score, 6)} for pid, score in results],
+        "count": len(results),
+        "model": EMBEDDING_MODEL
+    }
+
+@app.post("/v1/embeddings/index/rebuild")
+async def rebuild_profile_index():
+    """Rebuild the similar-profile index from customer_profile in the background"""
+    started = start_index_job("building", build_profile_index)
+    return {"status": "started" if started else "already_running"}
+
+@app.get("/v1/embeddings/index/stats")
+async def profile_index_stats():
+    return {"index": profile_index.stats() if profile_index else None, **index_state}
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv('EMBEDDING_SERVICE_PORT', 3016))
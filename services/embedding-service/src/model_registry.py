@@ -0,0 +1,300 @@
+"""
+Encoder Registry
+On-demand encoder loading under a shared memory budget
+
+Requests name an encoder from the EMBEDDING_MODELS allowlist; the
+registry loads it on first use (one load at a time per model, concurrent
+requests wait for it) and gives every loaded model its own batcher.
+
+When loading would exceed the memory budget, the least recently used
+idle models are unloaded first. A model is idle when no request holds it
+and its batcher queue is empty. Pinned models (the default encoder, which
+profile embeddings and the similarity index depend on) are never evicted.
+
+The budget is enforced: a model that cannot fit once every evictable
+model is gone is unloaded again and ModelBudgetExceeded raised. Room is
+made before a load when the model's size is known, from an earlier load
+or from a size hint (`name=source@<MB>` in EMBEDDING_MODELS); without
+either, the first load briefly holds the budget plus the new model.
+"""
+import gc
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class UnknownModel(KeyError):
+    """Model name not in the registry's allowlist"""
+
+
+class ModelBudgetExceeded(RuntimeError):
+    """The model does not fit the memory budget even after evicting idle models"""
+
+
+class _Entry:
+    def __init__(self, name: str, source: str, size_hint: int = 0):
+        self.name = name
+        self.source = source
+        self.size_hint = size_hint  # expected resident bytes before the first load
+        self.model = None
+        self.batcher = None
+        self.lock = threading.Lock()  # serializes load/unload of this model
+        self.in_use = 0
+        self.resident_bytes = 0
+        self.last_used = 0.0
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self.last_load_seconds = None
+        self.last_error = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.model is not None
+
+    @property
+    def idle(self) -> bool:
+        return self.in_use == 0 and (self.batcher is None or self.batcher.queue_depth == 0)
+
+
+class EncoderRegistry:
+    """Named encoders loaded on demand, LRU-evicted to stay within a memory budget"""
+
+    def __init__(
+        self,
+        models: Dict[str, str],
+        loader: Callable[[str], Any],
+        batcher_factory: Callable[[str, Any], Any],
+        size_fn: Callable[[Any], int],
+        memory_budget_bytes: int,
+        pinned: Iterable[str] = (),
+        size_hints: Optional[Dict[str, int]] = None
+    ):
+        """
+        Args:
+            models: name -> model source (hub id or local path)
+            loader: source -> loaded model
+            batcher_factory: (name, model) -> batcher with encode() and close()
+            size_fn: model -> resident bytes
+            memory_budget_bytes: Total bytes all loaded models may use
+            pinned: Names never evicted
+            size_hints: name -> expected resident bytes, to make room before a first load
+        """
+        size_hints = size_hints or {}
+        self._entries = {name: _Entry(name, source, size_hints.get(name, 0)) for name, source in models.items()}
+        self.loader = loader
+        self.batcher_factory = batcher_factory
+        self.size_fn = size_fn
+        self.memory_budget_bytes = memory_budget_bytes
+        self.pinned = set(pinned)
+
+        self._lock = threading.Lock()  # guards in_use counts, LRU order and totals
+        self._lru: "OrderedDict[str, None]" = OrderedDict()
+
+    @property
+    def names(self):
+        return list(self._entries)
+
+    def _entry(self, name: str) -> _Entry:
+        entry = self._entries.get(name)
+        if entry is None:
+            raise UnknownModel(name)
+        return entry
+
+    def resident_bytes(self) -> int:
+        return sum(entry.resident_bytes for entry in self._entries.values() if entry.loaded)
+
+    def _touch(self, entry: _Entry):
+        entry.in_use += 1
+        entry.hits += 1
+        entry.last_used = time.time()
+        self._lru[entry.name] = None
+        self._lru.move_to_end(entry.name)
+
+    def try_acquire(self, name: str) -> Optional[_Entry]:
+        """The entry if its model is already loaded (no blocking), else None"""
+        entry = self._entry(name)
+        with self._lock:
+            if entry.loaded:
+                self._touch(entry)
+                return entry
+        return None
+
+    def acquire(self, name: str) -> _Entry:
+        """
+        Loaded entry for name, loading it (and evicting idle models) if needed
+
+        Blocks while the model loads. Pair with release().
+
+        Raises:
+            UnknownModel: name is not in the allowlist
+            ModelBudgetExceeded: the model cannot fit the budget
+        """
+        entry = self.try_acquire(name)
+        if entry is not None:
+            return entry
+
+        entry = self._entry(name)
+        with entry.lock:
+            with self._lock:
+                if entry.loaded:
+                    self._touch(entry)
+                    return entry
+            self._load(entry)
+            return entry
+
+    def release(self, entry: _Entry):
+        with self._lock:
+            entry.in_use -= 1
+
+    def _load(self, entry: _Entry):
+        # A size from an earlier load (or the hint) makes room before loading
+        expected = entry.resident_bytes or entry.size_hint
+        if expected > self.memory_budget_bytes:
+            entry.last_error = f"needs {expected} bytes, budget is {self.memory_budget_bytes}"
+            raise ModelBudgetExceeded(f"Encoder {entry.name} {entry.last_error}")
+        if expected and not self._evict_for(expected, keep=entry.name):
+            entry.last_error = f"needs {expected} bytes, {self._over_budget()}"
+            raise ModelBudgetExceeded(f"Encoder {entry.name} {entry.last_error}")
+
+        print(f"Loading encoder {entry.name} ({entry.source})...")
+        start = time.time()
+        try:
+            model = self.loader(entry.source)
+        except Exception as e:
+            entry.last_error = str(e)
+            raise
+        size = int(self.size_fn(model))
+        entry.resident_bytes = size
+
+        if size > self.memory_budget_bytes:
+            del model
+            gc.collect()
+            entry.last_error = f"needs {size} bytes, budget is {self.memory_budget_bytes}"
+            raise ModelBudgetExceeded(f"Encoder {entry.name} {entry.last_error}")
+        fits = self._evict_for(size, keep=entry.name)
+        batcher = self.batcher_factory(entry.name, model) if fits else None
+        with self._lock:
+            # Checked again with the lock held: another model may have loaded meanwhile
+            fits = fits and self.resident_bytes() + size <= self.memory_budget_bytes
+            if fits:
+                entry.model, entry.batcher = model, batcher
+                entry.loads += 1
+                entry.last_load_seconds = round(time.time() - start, 3)
+                entry.last_error = None
+                # Held by the loading request before anything can pick it for eviction
+                self._touch(entry)
+        if not fits:
+            if batcher is not None:
+                batcher.close()
+            del model, batcher
+            gc.collect()
+            entry.last_error = f"needs {size} bytes, {self._over_budget()}"
+            raise ModelBudgetExceeded(f"Encoder {entry.name} {entry.last_error}")
+        print(f"✅ Encoder {entry.name} loaded in {entry.last_load_seconds}s ({size / 1e6:.0f} MB)")
+
+    def _over_budget(self) -> str:
+        return (f"{self.resident_bytes() / 1e6:.0f} MB held by models in use or pinned, "
+                f"budget is {self.memory_budget_bytes / 1e6:.0f} MB")
+
+    def _evict_for(self, incoming_bytes: int, keep: str) -> bool:
+        """Unload LRU idle, unpinned models until incoming_bytes fit the budget; False if they cannot"""
+        skipped = {keep} | self.pinned
+        while self.resident_bytes() + incoming_bytes > self.memory_budget_bytes:
+            victim = None
+            with self._lock:
+                for name in self._lru:
+                    candidate = self._entries[name]
+                    if name not in skipped and candidate.loaded and candidate.idle:
+                        victim = name
+                        break
+            if victim is None:
+                return False
+            # Never wait on another model's lock here: its holder may be evicting too
+            if not self.unload(victim, wait=False):
+                skipped.add(victim)
+        return True
+
+    def unload(self, name: str, wait: bool = True) -> bool:
+        """Unload a model now (False if it is busy, being loaded, or not loaded)"""
+        entry = self._entry(name)
+        if not entry.lock.acquire(blocking=wait):
+            return False
+        try:
+            with self._lock:
+                if not entry.loaded or not entry.idle:
+                    return False
+                self._lru.pop(name, None)
+                batcher, entry.batcher, entry.model = entry.batcher, None, None
+                entry.evictions += 1
+            if batcher is not None:
+                batcher.close()
+        finally:
+            entry.lock.release()
+        gc.collect()
+        print(f"✅ Encoder {name} unloaded ({entry.resident_bytes / 1e6:.0f} MB freed)")
+        return True
+
+    def stats(self) -> Dict:
+        models = {}
+        for name, entry in self._entries.items():
+            models[name] = {
+                "source": entry.source,
+                "loaded": entry.loaded,
+                "pinned": name in self.pinned,
+                "in_use": entry.in_use,
+                "hits": entry.hits,
+                "loads": entry.loads,
+                "evictions": entry.evictions,
+                "last_load_seconds": entry.last_load_seconds,
+                "resident_bytes": entry.resident_bytes if entry.loaded else 0,
+                "queue_depth": entry.batcher.queue_depth if entry.batcher is not None else 0,
+                "last_used": entry.last_used or None,
+                "batching": entry.batcher.stats() if entry.batcher is not None else None,
+                "last_error": entry.last_error,
+            }
+        return {
+            "memory_budget_bytes": self.memory_budget_bytes,
+            "resident_bytes": self.resident_bytes(),
+            "models": models,
+        }
+
+    def close(self):
+        for entry in self._entries.values():
+            if entry.batcher is not None:
+                entry.batcher.close()
+
+
+def _model_items(spec: str):
+    """(name, source, size hint MB or None) per EMBEDDING_MODELS item"""
+    for item in (spec or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        head, at, size_mb = item.rpartition('@')
+        if at and size_mb.strip().isdigit():
+            item, size_mb = head, int(size_mb)
+        else:
+            size_mb = None
+        name, _, source = item.partition('=')
+        yield name.strip(), (source or name).strip(), size_mb
+
+
+def parse_models(spec: str, default: str) -> Dict[str, str]:
+    """
+    name -> source from an EMBEDDING_MODELS value
+
+    Comma-separated; each item is a model id (used as its own name) or
+    `name=source`, optionally followed by `@<MB>`, the model's expected
+    resident size (see parse_model_sizes). The default model is always
+    included.
+    """
+    models: Dict[str, str] = {name: source for name, source, _ in _model_items(spec)}
+    models.setdefault(default, default)
+    return models
+
+
+def parse_model_sizes(spec: str) -> Dict[str, int]:
+    """name -> expected resident bytes for the EMBEDDING_MODELS items with an `@<MB>` hint"""
+    return {name: size_mb * 1024 * 1024 for name, _, size_mb in _model_items(spec) if size_mb is not None}
@@ -0,0 +1,125 @@
+"""
+Tests for the IVF-flat profile index
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import uuid
+
+import numpy as np
+
+from src.ann_index import ProfileIndex, normalize
+
+
+class TestProfileIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        self.ids = [str(uuid.UUID(int=i)) for i in range(500)]
+        self.vectors = normalize(rng.normal(size=(500, 16)))
+        self.segments = ['vip' if i % 5 == 0 else 'regular' for i in range(500)]
+        self.cities = ['Mumbai' if i % 2 else None for i in range(500)]
+        self.index = ProfileIndex.build(self.path, self.ids, self.vectors, self.segments, self.cities, nlist=10)
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def exact(self, query, k, mask=None):
+        scores = self.vectors @ query
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        return [self.ids[i] for i in np.argsort(-scores)[:k]]
+
+    def test_full_probe_matches_brute_force(self):
+        query = self.vectors[7]
+        results = self.index.search(query, k=5, nprobe=10)
+
+        self.assertEqual([pid for pid, _ in results], self.exact(query, 5))
+        self.assertAlmostEqual(results[0][1], 1.0, places=5)
+
+    def test_filters_and_exclude(self):
+        query = self.vectors[3]
+        results = self.index.search(query, k=5, segment='vip', city='Mumbai', exclude=[self.ids[3]], nprobe=10)
+        narrow = self.index.search(query, k=5, segment='vip', city='Mumbai', nprobe=1)
+
+        mask = np.array([s == 'vip' and c == 'Mumbai' for s, c in zip(self.segments, self.cities)])
+        self.assertEqual([pid for pid, _ in results], self.exact(query, 5, mask))
+        # A selective filter keeps probing past nprobe until k matches are found
+        self.assertEqual(len(narrow), 5)
+        self.assertTrue(all(mask[self.ids.index(pid)] for pid, _ in narrow))
+        self.assertEqual(self.index.search(query, k=5, segment='unknown'), [])
+
+    def test_updates_survive_reopen_and_compaction(self):
+        new_id = str(uuid.uuid4())
+        target = normalize(np.ones(16))
+        self.index.upsert([new_id, self.ids[0]], np.stack([target, -target]), ['vip', 'vip'], [None, None])
+        self.index.remove([self.ids[1]])
+
+        reopened = ProfileIndex.open(self.path)
+        self.assertEqual(reopened.search(target, k=1, nprobe=10)[0][0], new_id)
+        self.assertNotIn(self.ids[1], [pid for pid, _ in reopened.search(self.vectors[1], k=5, nprobe=10)])
+
+        reopened.compact()
+        compacted = ProfileIndex.open(self.path)
+        self.assertEqual(compacted.stats()['base_profiles'], 500)
+        self.assertEqual(compacted.stats()['delta_profiles'], 0)
+        self.assertEqual(compacted.search(target, k=1, nprobe=10)[0][0], new_id)
+        np.testing.assert_allclose(compacted.vector_of(self.ids[0]), -target, atol=1e-6)
+
+    def test_delta_rows_grow_and_superseded_rows_are_skipped(self):
+        rng = np.random.default_rng(1)
+        new_ids = [str(uuid.uuid4()) for _ in range(5000)]  # more than one DELTA_CHUNK_ROWS chunk
+        new_vectors = normalize(rng.normal(size=(5000, 16)))
+        self.index.upsert(new_ids, new_vectors, ['vip'] * 5000, [None] * 5000)
+        # Re-upserting a profile supersedes its row; removing one hides it
+        self.index.upsert([new_ids[0]], -new_vectors[0][None], ['regular'], [None])
+        self.index.remove([new_ids[1]])
+
+        self.assertEqual(self.index.stats()['delta_rows'], 5001)
+        self.assertEqual(self.index.stats()['delta_profiles'], 5000)
+        self.assertEqual(self.index.search(new_vectors[2], k=1)[0][0], new_ids[2])
+        self.assertNotIn(new_ids[0], [pid for pid, _ in self.index.search(new_vectors[0], k=5, segment='vip')])
+        self.assertNotIn(new_ids[1], [pid for pid, _ in self.index.search(new_vectors[1], k=5)])
+        self.assertEqual(self.index.search(-new_vectors[0], k=1, segment='regular')[0][0], new_ids[0])
+
+        self.index.compact()
+        self.assertEqual(self.index.stats()['delta_rows'], 0)
+        self.assertEqual(ProfileIndex.open(self.path).search(new_vectors[2], k=1)[0][0], new_ids[2])
+
+    def test_rebuild_leaves_previous_index_writable_until_dropped(self):
+        new_id = str(uuid.uuid4())
+        target = normalize(np.ones(16))
+        rebuilt = ProfileIndex.build(self.path, self.ids, self.vectors, self.segments, self.cities, nlist=10)
+
+        # A write that raced the rebuild still journals and is carried over
+        self.index.upsert([new_id], target[None], ['vip'], [None])
+        rebuilt.carry_over(self.index, 0)
+        # Compacting the superseded index must not replace the rebuilt generation
+        self.index.compact()
+        rebuilt.drop_stale_generations()
+
+        reopened = ProfileIndex.open(self.path)
+        self.assertEqual(reopened.stats()['generation'], rebuilt.stats()['generation'])
+        self.assertEqual(reopened.search(target, k=1, nprobe=10)[0][0], new_id)
+        self.assertEqual(len([name for name in os.listdir(self.path) if name.startswith('gen-')]), 1)
+
+    def test_compact_codes_rerank_with_exact_vectors(self):
+        path = tempfile.mkdtemp()
+        try:
+            index = ProfileIndex.build(path, self.ids, self.vectors, self.segments, self.cities,
+                                       nlist=10, compact_dims=8, rerank=10)
+            query = self.vectors[11]
+            results = index.search(query, k=5, nprobe=10)
+
+            self.assertEqual(index.stats()['compact_dims'], 8)
+            self.assertEqual(results[0][0], self.ids[11])
+            # Returned scores are exact cosine similarities, not code estimates
+            self.assertAlmostEqual(results[1][1], float(self.vectors[self.ids.index(results[1][0])] @ query), places=5)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+"""
+Tests for cross-request embedding batching
+"""
+import asyncio
+import unittest
+
+import numpy as np
+
+from src.batcher import EmbeddingBatcher
+
+
+class TestEmbeddingBatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+
+        def encode(texts):
+            self.calls.append(list(texts))
+            return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+        self.encode = encode
+
+    def test_concurrent_requests_share_batches(self):
+        batcher = EmbeddingBatcher(self.encode, max_batch=4, max_wait_ms=50)
+
+        async def run():
+            return await asyncio.gather(
+                batcher.encode(['aaaa']),
+                batcher.encode(['b', 'cccccc']),
+                batcher.encode(['dd', 'e', 'ffffffff']),
+            )
+
+        single, pair, triple = asyncio.run(run())
+        batcher.close()
+
+        np.testing.assert_array_equal(single[:, 0], [4])
+        np.testing.assert_array_equal(pair[:, 0], [1, 6])
+        np.testing.assert_array_equal(triple[:, 0], [2, 1, 8])
+        # Six texts, max_batch 4: two calls, each sorted by length
+        self.assertEqual([len(call) for call in self.calls], [4, 2])
+        self.assertEqual(self.calls[0], ['b', 'e', 'dd', 'aaaa'])
+        self.assertEqual(batcher.stats()['texts'], 6)
+
+    def test_encode_error_reaches_caller(self):
+        def failing(texts):
+            raise RuntimeError('model failed')
+
+        batcher = EmbeddingBatcher(failing, max_wait_ms=1)
+        with self.assertRaises(RuntimeError):
+            asyncio.run(batcher.encode(['text']))
+        batcher.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+Tests for the memory-budgeted encoder registry
+"""
+import asyncio
+import unittest
+
+import numpy as np
+
+from src.batcher import EmbeddingBatcher
+from src.model_registry import EncoderRegistry, ModelBudgetExceeded, UnknownModel, parse_model_sizes, parse_models
+
+MB = 1024 * 1024
+
+
+class FakeModel:
+    def __init__(self, source, size):
+        self.source = source
+        self.size = size
+
+    def encode(self, texts):
+        return np.full((len(texts), 2), self.size, dtype=np.float32)
+
+
+class TestEncoderRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.sizes = {'default': 40 * MB, 'small': 30 * MB, 'medium': 50 * MB, 'huge': 200 * MB}
+        self.loaded = []
+        self.registry = self.make_registry()
+
+    def make_registry(self, size_hints=None):
+        def loader(source):
+            self.loaded.append(source)
+            self.resident_at_load = self.registry.resident_bytes()
+            return FakeModel(source, self.sizes[source])
+
+        return EncoderRegistry(
+            {name: name for name in self.sizes},
+            loader=loader,
+            batcher_factory=lambda name, model: EmbeddingBatcher(model.encode, max_wait_ms=1),
+            size_fn=lambda model: model.size,
+            memory_budget_bytes=100 * MB,
+            pinned=['default'],
+            size_hints=size_hints
+        )
+
+    def tearDown(self):
+        self.registry.close()
+
+    def use(self, name):
+        entry = self.registry.acquire(name)
+        self.registry.release(entry)
+        return entry
+
+    def test_loads_once_and_evicts_least_recently_used_idle_model(self):
+        self.use('default')
+        self.use('small')
+        self.use('small')
+        self.assertEqual(self.loaded, ['default', 'small'])
+
+        # 40 + 30 + 50 > 100: the idle 'small' goes, the pinned default stays
+        self.use('medium')
+        stats = self.registry.stats()
+        self.assertFalse(stats['models']['small']['loaded'])
+        self.assertTrue(stats['models']['default']['loaded'])
+        self.assertEqual(stats['resident_bytes'], 90 * MB)
+        self.assertEqual(stats['models']['small']['hits'], 2)
+        self.assertEqual(stats['models']['small']['evictions'], 1)
+        self.assertIsNotNone(stats['models']['medium']['last_load_seconds'])
+
+        # Known size now: 'medium' is evicted before 'small' reloads
+        self.use('small')
+        self.assertEqual(self.loaded, ['default', 'small', 'medium', 'small'])
+        self.assertFalse(self.registry.stats()['models']['medium']['loaded'])
+
+    def test_models_in_use_are_not_evicted_and_the_budget_holds(self):
+        self.use('default')
+        held = self.registry.acquire('small')
+        # 40 + 30 + 50 > 100 with nothing idle: 'medium' is unloaded again and refused
+        with self.assertRaises(ModelBudgetExceeded):
+            self.use('medium')
+        self.assertTrue(self.registry.stats()['models']['small']['loaded'])
+        self.assertFalse(self.registry.stats()['models']['medium']['loaded'])
+        self.assertEqual(self.registry.resident_bytes(), 70 * MB)
+
+        embeddings = asyncio.run(held.batcher.encode(['a', 'b']))
+        self.registry.release(held)
+        np.testing.assert_array_equal(embeddings[:, 0], [30 * MB, 30 * MB])
+        # Once 'small' is idle it gives way
+        self.use('medium')
+        self.assertFalse(self.registry.stats()['models']['small']['loaded'])
+        self.assertEqual(self.registry.resident_bytes(), 90 * MB)
+
+    def test_size_hint_makes_room_before_first_load(self):
+        self.registry.close()
+        self.registry = self.make_registry(size_hints={'medium': 50 * MB, 'huge': 200 * MB})
+        self.use('default')
+        self.use('small')
+
+        self.use('medium')
+        self.assertEqual(self.resident_at_load, 40 * MB)  # 'small' went before 'medium' loaded
+        with self.assertRaises(ModelBudgetExceeded):
+            self.use('huge')
+        self.assertNotIn('huge', self.loaded)
+
+    def test_unknown_and_oversized_models(self):
+        with self.assertRaises(UnknownModel):
+            self.registry.acquire('missing')
+        with self.assertRaises(ModelBudgetExceeded):
+            self.registry.acquire('huge')
+        self.assertFalse(self.registry.stats()['models']['huge']['loaded'])
+
+    def test_parse_models(self):
+        spec = 'all-MiniLM-L6-v2@100, multi=/models/multilingual@1100'
+        self.assertEqual(
+            parse_models(spec, 'all-mpnet-base-v2'),
+            {
+                'all-MiniLM-L6-v2': 'all-MiniLM-L6-v2',
+                'multi': '/models/multilingual',
+                'all-mpnet-base-v2': 'all-mpnet-base-v2',
+            }
+        )
+        self.assertEqual(parse_model_sizes(spec), {'all-MiniLM-L6-v2': 100 * MB, 'multi': 1100 * MB})
+        self.assertEqual(parse_model_sizes('multi=/models/multi'), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,12 +11,10 @@ import hashlib
 import json
 import logging
 import os
-import requests
-import shap
+import sys
+import threading
 import time
 
-import mlflow
-import mlflow.lightgbm
 import numpy as np
 import pickle
 import redis
@@ -24,7 +22,7 @@ from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from prometheus_client import Counter, Histogram
-from sentence_transformers import SentenceTransformer
+from pydantic import BaseModel
 from src.adapters import (
     ChatChannelPayload,
     EmailChannelPayload,
@@ -42,6 +40,10 @@ from src.adapters import (
     prepare_chat_payload,
 )
 
+# Add shared ML modules path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../../ml/common/src'))
+from model_resolver import load_lightgbm
+
 load_dotenv()
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "info").upper()
@@ -103,8 +105,10 @@ redis_client = build_redis_client()
 # Global variables
 embedding_model = None
 intent_classifier = None
-label_encoder = None
+intent_labels = None
 model_explainer = None
+model_explainer_attempted = False
+model_explainer_lock = threading.Lock()
 
 
 def sanitize_label(value: Optional[str]) -> str:
@@ -149,6 +153,8 @@ def emit_monitoring(payload: Dict[str, Any]) -> None:
         return
 
     try:
+        import requests
+
         requests.post(INTENT_MONITORING_ENDPOINT, json=payload, timeout=2)
     except Exception as exc:
         logger.debug("Monitoring POST failed (%s): %s", INTENT_MONITORING_ENDPOINT, exc)
@@ -215,12 +221,32 @@ def log_intent_call(
     )
 
 
+def get_model_explainer():
+    """SHAP explainer for the intent classifier, built on the first explained request"""
+    global model_explainer, model_explainer_attempted
+    if model_explainer_attempted or intent_classifier is None:
+        return model_explainer
+
+    with model_explainer_lock:
+        if not model_explainer_attempted:
+            try:
+                import shap
+
+                model_explainer = shap.TreeExplainer(intent_classifier)
+            except Exception as explainer_exc:
+                logger.warning("SHAP explainer init failed: %s", explainer_exc)
+                model_explainer = None
+            model_explainer_attempted = True
+    return model_explainer
+
+
 def compute_shap_summary(embedding: np.ndarray, class_idx: int) -> Optional[List[Dict[str, Any]]]:
-    if model_explainer is None:
+    explainer = get_model_explainer()
+    if explainer is None:
         return None
 
     try:
-        shap_values = model_explainer.shap_values(embedding)
+        shap_values = explainer.shap_values(embedding)
         if isinstance(shap_values, list):
             class_values = shap_values[class_idx]
         else:
@@ -248,34 +274,6 @@ def compute_shap_summary(embedding: np.ndarray, class_idx: int) -> Optional[List
         return None
 
 
-@app.get("/v1/intent/stats")
-async def intent_stats():
-    store = intent_metrics_store
-    total = store["total_requests"]
-    cache_hits = store["cache_hits"]
-    fallbacks = store["fallbacks"]
-    cache_rate = cache_hits / total if total else 0
-    fallback_rate = fallbacks / total if total else 0
-    return {
-        "totalRequests": total,
-        "cacheHits": cache_hits,
-        "cacheHitRate": cache_rate,
-        "fallbackRate": fallback_rate,
-        "driftAlert": store["drift_alert"],
-        "driftReason": "Fallback rate above 15%" if store["drift_alert"] else "Stable traffic",
-        "lastDriftAt": store["last_drift_at"],
-        "intentDistribution": [
-            {"intent": intent, "count": count}
-            for intent, count in store["intent_distribution"].most_common(5)
-        ],
-        "channelDistribution": [
-            {"channel": channel, "count": count}
-            for channel, count in store["channel_distribution"].most_common(5)
-        ],
-        "recentActivity": list(store["recent"]),
-    }
-
-
 async def run_intent_pipeline(
     text: str,
     channel: Optional[str] = None,
@@ -388,9 +386,9 @@ async def run_intent_pipeline(
         )
         predicted_class_idx = np.argmax(proba[0])
         confidence = float(proba[0][predicted_class_idx])
-        intent = label_encoder.inverse_transform([predicted_class_idx])[0]
+        intent = str(intent_labels[predicted_class_idx])
         probabilities = {
-            label_encoder.inverse_transform([i])[0]: float(proba[0][i])
+            str(intent_labels[i]): float(proba[0][i])
             for i in range(len(proba[0]))
         }
 
@@ -464,69 +462,32 @@ app.add_middleware(
 
 def load_models():
     """Load embedding model and intent classifier"""
-    global embedding_model, intent_classifier, label_encoder, model_explainer
+    global embedding_model, intent_classifier, intent_labels
     
     if embedding_model is None:
+        from sentence_transformers import SentenceTransformer
+        
         print("Loading embedding model...")
+        started = time.perf_counter()
         embedding_model = SentenceTransformer('all-mpnet-base-v2')
-        print("✅ Embedding model loaded")
+        print(f"✅ Embedding model loaded in {time.perf_counter() - started:.2f}s")
     
     if intent_classifier is None:
         try:
-            mlflow.set_tracking_uri(os.getenv('MLFLOW_TRACKING_URI', 'http://localhost:5001'))
-            
-            # Get latest model
-            client = mlflow.tracking.MlflowClient()
             model_name = os.getenv('INTENT_MODEL_NAME', 'intent-detection')
+            intent_classifier, bundle, resolved = load_lightgbm(model_name, experiment="intent-detection")
             
-            try:
-                latest_version = client.get_latest_versions(model_name, stages=["Production", "Staging", "None"])
-                if latest_version:
-                    model_uri = f"models:/{model_name}/{latest_version[0].version}"
-                else:
-                    # Fallback: latest run
-                    experiment = mlflow.get_experiment_by_name("intent-detection")
-                    if experiment:
-                        runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id], order_by=["start_time DESC"], max_results=1)
-                        if not runs.empty:
-                            run_id = runs.iloc[0]['run_id']
-                            model_uri = f"runs:/{run_id}/models"
-                        else:
-                            raise ValueError("No model runs found")
-                    else:
-                        raise ValueError("Experiment not found")
-            except Exception:
-                # Fallback
-                experiment = mlflow.get_experiment_by_name("intent-detection")
-                if experiment:
-                    runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id], order_by=["start_time DESC"], max_results=1)
-                    if not runs.empty:
-                        run_id = runs.iloc[0]['run_id']
-                        model_uri = f"runs:/{run_id}/models"
-                    else:
-                        raise ValueError("No model runs found")
-                else:
-                    raise ValueError("Experiment not found")
-            
-            # Load model
-            intent_classifier = mlflow.lightgbm.load_model(model_uri)
-            try:
-                model_explainer = shap.TreeExplainer(intent_classifier)
-            except Exception as explainer_exc:
-                logger.warning("SHAP explainer init failed: %s", explainer_exc)
-                model_explainer = None
-            
-            # Load label encoder
-            try:
-                label_encoder_path = mlflow.artifacts.download_artifacts(f"{model_uri.replace('/models', '')}/models/label_encoder.pkl")
-                with open(label_encoder_path, 'rb') as f:
-                    label_encoder = pickle.load(f)
-            except Exception as e:
-                print(f"Warning: Could not load label encoder: {e}")
-                # Create default encoder
-                from sklearn.preprocessing import LabelEncoder
-                label_encoder = LabelEncoder()
-                label_encoder.classes_ = np.array(['purchase', 'inquiry', 'complaint', 'support', 'feedback', 'other'])
+            # Class labels in model output order
+            if bundle is not None and bundle.label_classes:
+                intent_labels = np.array(bundle.label_classes)
+            else:
+                # Runs logged before serving bundles pickle a LabelEncoder next to the model
+                try:
+                    with open(os.path.join(resolved.path, 'label_encoder.pkl'), 'rb') as f:
+                        intent_labels = pickle.load(f).classes_
+                except Exception as e:
+                    print(f"Warning: Could not load label encoder: {e}")
+                    intent_labels = np.array(['purchase', 'inquiry', 'complaint', 'support', 'feedback', 'other'])
             
             print("✅ Intent classifier loaded")
         except Exception as e:
@@ -556,6 +517,33 @@ async def health():
         "model_loaded": intent_classifier is not None
     }
 
+@app.get("/v1/intent/stats")
+async def intent_stats():
+    store = intent_metrics_store
+    total = store["total_requests"]
+    cache_hits = store["cache_hits"]
+    fallbacks = store["fallbacks"]
+    cache_rate = cache_hits / total if total else 0
+    fallback_rate = fallbacks / total if total else 0
+    return {
+        "totalRequests": total,
+        "cacheHits": cache_hits,
+        "cacheHitRate": cache_rate,
+        "fallbackRate": fallback_rate,
+        "driftAlert": store["drift_alert"],
+        "driftReason": "Fallback rate above 15%" if store["drift_alert"] else "Stable traffic",
+        "lastDriftAt": store["last_drift_at"],
+        "intentDistribution": [
+            {"intent": intent, "count": count}
+            for intent, count in store["intent_distribution"].most_common(5)
+        ],
+        "channelDistribution": [
+            {"channel": channel, "count": count}
+            for channel, count in store["channel_distribution"].most_common(5)
+        ],
+        "recentActivity": list(store["recent"]),
+    }
+
 @app.post("/v1/intent/detect")
 async def detect_intent(request: IntentRequest):
     """Detect intent from text"""
@@ -616,7 +604,7 @@ async def detect_intent_batch(request: BatchIntentRequest):
         predicted_indices = np.argmax(proba, axis=1)
         confidences = proba[np.arange(len(proba)), predicted_indices]
         
-        intents = label_encoder.inverse_transform(predicted_indices)
+        intents = intent_labels[predicted_indices]
         
         results = [
             {
@@ -7,8 +7,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 import os
+import sys
 from dotenv import load_dotenv
 
+# Add shared ML modules path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../../ml/common/src'))
+from db_pool import pool_stats
+
 load_dotenv()
 
 app = FastAPI(title="ML Monitoring Service", version="1.0.0")
@@ -47,7 +52,7 @@ class DriftCheckRequest(BaseModel):
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "service": "ml-monitoring-service"}
+    return {"status": "healthy", "service": "ml-monitoring-service", "db_pool": pool_stats()}
 
 
 @app.post("/v1/predictions/log")
@@ -5,10 +5,15 @@ Sends alerts for model degradation and drift
 import psycopg2
 import psycopg2.extras
 import os
+import sys
 from datetime import datetime
 from typing import Dict, List, Optional
 import logging
 
+# Add shared ML modules path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../../../ml/common/src'))
+from db_pool import get_pool
+
 logger = logging.getLogger('alert-service')
 
 
@@ -16,18 +21,12 @@ class AlertService:
     """Send alerts for ML issues"""
     
     def __init__(self):
-        self.conn = None
+        self.pool = None
         self._connect_db()
     
     def _connect_db(self):
-        """Connect to PostgreSQL"""
-        self.conn = psycopg2.connect(
-            host=os.getenv('POSTGRES_HOST', 'localhost'),
-            port=int(os.getenv('POSTGRES_PORT', 5432)),
-            database=os.getenv('POSTGRES_DB', 'retail_brain'),
-            user=os.getenv('POSTGRES_USER', 'retail_brain_user'),
-            password=os.getenv('POSTGRES_PASSWORD', 'retail_brain_pass')
-        )
+        """Attach to the shared PostgreSQL pool"""
+        self.pool = get_pool()
     
     def send_drift_alert(self, model_name: str, drift_metrics: Dict):
         """Send alert for data drift"""
@@ -49,7 +48,7 @@ class AlertService:
     def _store_alert(self, alert: Dict):
         """Store alert in database"""
         try:
-            with self.conn.cursor() as cur:
+            with self.pool.connection() as conn, conn.cursor() as cur:
                 cur.execute(
                     """INSERT INTO ml_alert (type, model_name, severity, message, details, created_at)
                        VALUES (%s, %s, %s, %s, %s::jsonb, %s)""",
@@ -62,7 +61,6 @@ class AlertService:
                         alert['created_at']
                     ]
                 )
-                self.conn.commit()
         except Exception:
             # Table might not exist yet
             pass
@@ -70,7 +68,7 @@ class AlertService:
     def get_alerts(self, model_name: Optional[str] = None, limit: int = 50) -> List[Dict]:
         """Get recent alerts"""
         try:
-            with self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            with self.pool.connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
                 if model_name:
                     cur.execute(
                         """SELECT id, type, model_name, severity, message, details, created_at FROM ml_alert
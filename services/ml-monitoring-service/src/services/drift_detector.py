@@ -9,25 +9,24 @@ from typing import List, Dict, Optional
 import psycopg2
 import psycopg2.extras
 import os
+import sys
 from datetime import datetime, timedelta
 
+# Add shared ML modules path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../../../ml/common/src'))
+from db_pool import get_pool
+
 
 class DriftDetector:
     """Detect data and concept drift"""
     
     def __init__(self):
-        self.conn = None
+        self.pool = None
         self._connect_db()
     
     def _connect_db(self):
-        """Connect to PostgreSQL"""
-        self.conn = psycopg2.connect(
-            host=os.getenv('POSTGRES_HOST', 'localhost'),
-            port=int(os.getenv('POSTGRES_PORT', 5432)),
-            database=os.getenv('POSTGRES_DB', 'retail_brain'),
-            user=os.getenv('POSTGRES_USER', 'retail_brain_user'),
-            password=os.getenv('POSTGRES_PASSWORD', 'retail_brain_pass')
-        )
+        """Attach to the shared PostgreSQL pool"""
+        self.pool = get_pool()
     
     def check_drift(
         self,
@@ -123,13 +122,12 @@ class DriftDetector:
     def _store_drift_check(self, model_name: str, drift_detected: bool, metrics: Dict):
         """Store drift check result"""
         try:
-            with self.conn.cursor() as cur:
+            with self.pool.connection() as conn, conn.cursor() as cur:
                 cur.execute(
                     """INSERT INTO ml_drift_check (model_name, drift_detected, metrics, checked_at)
-                       VALUES ($1, $2, $3::jsonb, NOW())""",
+                       VALUES (%s, %s, %s::jsonb, NOW())""",
                     [model_name, drift_detected, str(metrics)]
                 )
-                self.conn.commit()
         except Exception:
             # Table might not exist yet
             pass
@@ -137,13 +135,13 @@ class DriftDetector:
     def get_drift_history(self, model_name: str, days: int = 30) -> List[Dict]:
         """Get drift detection history"""
         try:
-            with self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            with self.pool.connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
                 cur.execute(
                     """SELECT * FROM ml_drift_check
-                       WHERE model_name = $1
-                         AND checked_at >= NOW() - INTERVAL '%s days'
+                       WHERE model_name = %s
+                         AND checked_at >= NOW() - INTERVAL %s
                        ORDER BY checked_at DESC""",
-                    [model_name, days]
+                    [model_name, f"{days} days"]
                 )
                 return [dict(row) for row in cur.fetchall()]
         except Exception:
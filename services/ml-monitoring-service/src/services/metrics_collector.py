@@ -5,30 +5,27 @@ Collects and stores model performance metrics
 import psycopg2
 import psycopg2.extras
 import os
+import sys
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
+# Add shared ML modules path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../../../ml/common/src'))
+from db_pool import get_pool
+
 
 class MetricsCollector:
     """Collect model performance metrics"""
     
     def __init__(self):
-        self.conn = None
+        self.pool = None
         self._connect_db()
     
     def _connect_db(self):
-        """Connect to PostgreSQL"""
-        self.conn = psycopg2.connect(
-            host=os.getenv('POSTGRES_HOST', 'localhost'),
-            port=int(os.getenv('POSTGRES_PORT', 5432)),
-            database=os.getenv('POSTGRES_DB', 'retail_brain'),
-            user=os.getenv('POSTGRES_USER', 'retail_brain_user'),
-            password=os.getenv('POSTGRES_PASSWORD', 'retail_brain_pass')
-        )
-        # Avoid lingering aborted transactions across requests
-        self.conn.autocommit = True
+        """Attach to the shared PostgreSQL pool"""
+        self.pool = get_pool()
         # Ensure table exists
-        with self.conn.cursor() as cur:
+        with self.pool.connection() as conn, conn.cursor() as cur:
             cur.execute(
                 """
                 CREATE TABLE IF NOT EXISTS ml_prediction_log (
@@ -53,7 +50,7 @@ class MetricsCollector:
     ):
         """Log a prediction"""
         try:
-            with self.conn.cursor() as cur:
+            with self.pool.connection() as conn, conn.cursor() as cur:
                 cur.execute(
                     """INSERT INTO ml_prediction_log (model_name, profile_id, features, prediction, actual, predicted_at)
                        VALUES (%s, %s, %s::jsonb, %s, %s, NOW())""",
@@ -66,7 +63,7 @@ class MetricsCollector:
     def get_metrics(self, model_name: str, days: int = 7) -> Dict:
         """Get model performance metrics"""
         try:
-            with self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            with self.pool.connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
                 # Get predictions with actuals
                 # Format interval in Python to avoid psycopg2 parameter issues with INTERVAL
                 interval_str = f"{days} days"
@@ -0,0 +1,96 @@
+"""
+Scoring Core Microbenchmark
+Per-call overhead of single-row scoring: DataFrame path vs BoosterScorer engines
+
+Trains a small synthetic LightGBM model shaped like the identity model
+(11 features) and times each path on the same feature dicts.
+
+Usage (from services/ml-scorer-service):
+    python benchmarks/bench_scoring_core.py --calls 5000 --trees 100
+"""
+import argparse
+import os
+import sys
+import time
+
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from src.services.scoring_core import BoosterScorer
+
+FEATURE_NAMES = [
+    'phone_exact', 'email_exact', 'email_username_sim', 'name_sim',
+    'device_overlap', 'loyalty_id_match', 'address_sim', 'common_orders_count',
+    'time_gap_days', 'city_match', 'state_match',
+]
+
+
+def train_synthetic_booster(n_trees: int, n_rows: int = 5000) -> lgb.Booster:
+    rng = np.random.default_rng(42)
+    X = rng.random((n_rows, len(FEATURE_NAMES)))
+    y = (X[:, 0] + X[:, 3] + 0.2 * rng.standard_normal(n_rows) > 1.0).astype(int)
+    data = lgb.Dataset(pd.DataFrame(X, columns=FEATURE_NAMES), label=y)
+    return lgb.train({'objective': 'binary', 'verbose': -1, 'num_leaves': 31}, data, num_boost_round=n_trees)
+
+
+def dataframe_score(model: lgb.Booster, feature_cols, features: dict) -> float:
+    """The per-call path the scorers used before scoring_core"""
+    feature_df = pd.DataFrame([features])
+    for col in feature_cols:
+        if col not in feature_df.columns:
+            feature_df[col] = 0
+    X = feature_df[feature_cols]
+    return float(model.predict(X, num_iteration=model.best_iteration)[0])
+
+
+def time_per_call(fn, inputs) -> float:
+    start = time.perf_counter()
+    for features in inputs:
+        fn(features)
+    return (time.perf_counter() - start) / len(inputs) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark single-row scoring overhead')
+    parser.add_argument('--calls', type=int, default=5000, help='Scoring calls per path')
+    parser.add_argument('--trees', type=int, default=100, help='Boosting rounds of the synthetic model')
+    args = parser.parse_args()
+
+    model = train_synthetic_booster(args.trees)
+    feature_cols = model.feature_name()
+    scorer = BoosterScorer(model)
+    compiled = BoosterScorer(model, engine='compiled')
+
+    rng = np.random.default_rng(0)
+    # Drop one feature per row to exercise the missing-column handling
+    inputs = [
+        {name: float(v) for name, v in zip(FEATURE_NAMES[:-1], row)}
+        for row in rng.random((args.calls, len(FEATURE_NAMES)))
+    ]
+
+    # All paths must agree before timing them
+    for features in inputs[:100]:
+        expected = dataframe_score(model, feature_cols, features)
+        assert abs(expected - scorer.predict_one(features)) < 1e-6
+        assert abs(expected - compiled.predict_one(features)) < 1e-6
+
+    # Warm up
+    time_per_call(lambda f: dataframe_score(model, feature_cols, f), inputs[:200])
+    time_per_call(scorer.predict_one, inputs[:200])
+    time_per_call(compiled.predict_one, inputs[:200])
+
+    before = time_per_call(lambda f: dataframe_score(model, feature_cols, f), inputs)
+    after = time_per_call(scorer.predict_one, inputs)
+    after_compiled = time_per_call(compiled.predict_one, inputs)
+
+    print(f"Synthetic model: {len(feature_cols)} features, {args.trees} trees, {args.calls} calls")
+    print(f"  DataFrame path:     {before:8.1f} us/call")
+    print(f"  BoosterScorer path: {after:8.1f} us/call")
+    print(f"  Compiled engine:    {after_compiled:8.1f} us/call")
+    print(f"  Speedup:            {before / after:8.2f}x (booster), {before / after_compiled:8.2f}x (compiled)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Nightly Churn/LTV Scoring Job
+Scores the full customer_profile population into profile_score
+
+Each worker process takes one shard of profiles (by hash of id), streams
+it through a server-side cursor in chunks, scores each chunk with one
+batched booster call per model and bulk-writes the scores with COPY.
+
+Usage (from services/ml-scorer-service, PYTHONPATH=.):
+    python -m src.jobs.score_profiles --workers 4 --chunk-size 5000
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict
+
+from dotenv import load_dotenv
+
+from src.services.churn_ltv_scorer import ChurnLTVScorer
+from src.services.profile_features import PROFILE_COLUMNS_SQL, profile_feature_columns
+from src.services.score_store import copy_scores
+
+# Add shared ML modules path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../../../ml/common/src'))
+from db_pool import connect
+
+load_dotenv()
+
+# Active profiles of one shard; hashtext spreads UUIDs evenly over shards.
+# Masked to non-negative as bigint: abs() of int4 INT_MIN is out of range
+SHARD_QUERY = f"""
+    SELECT {PROFILE_COLUMNS_SQL},
+        updated_at::text
+    FROM customer_profile
+    WHERE is_merged = false
+        AND mod(hashtext(id::text)::bigint & 2147483647, %s) = %s
+"""
+
+
+def score_shard(shard: int, num_shards: int, chunk_size: int) -> Dict:
+    """Score every profile of one shard; returns counts for the run summary"""
+    scorer = ChurnLTVScorer()
+    if scorer.churn_model is None or scorer.ltv_model is None:
+        # Never persist heuristic fallback scores
+        raise RuntimeError("Churn and LTV models must both be loaded to run batch scoring")
+
+    # Dedicated connections: the cursor stays open for the whole shard
+    read_conn = connect(statement_timeout_ms=0)
+    write_conn = connect(statement_timeout_ms=0)
+    scored = 0
+    started = time.time()
+
+    try:
+        # Named cursor = server-side cursor: rows arrive chunk_size at a time
+        with read_conn.cursor(name=f'score_profiles_shard_{shard}') as cur:
+            cur.itersize = chunk_size
+            cur.execute(SHARD_QUERY, (num_shards, shard))
+
+            while True:
+                chunk = cur.fetchmany(chunk_size)
+                if not chunk:
+                    break
+
+                profile_ids = [row[0] for row in chunk]
+                rows = {row[0]: row[1:7] for row in chunk}
+                now = datetime.now(timezone.utc).timestamp()
+                churn_columns, ltv_columns, _ = profile_feature_columns(profile_ids, rows, now)
+
+                churn_probs, churn_version = scorer.predict_churn_batch(churn_columns, len(chunk))
+                predicted_ltvs, ltv_version = scorer.predict_ltv_batch(ltv_columns, len(chunk))
+
+                copy_scores(
+                    write_conn,
+                    profile_ids,
+                    churn_probs,
+                    churn_version,
+                    predicted_ltvs,
+                    ltv_version,
+                    [row[7] for row in chunk]
+                )
+                write_conn.commit()
+                scored += len(chunk)
+    finally:
+        read_conn.close()
+        write_conn.close()
+
+    return {
+        "shard": shard,
+        "scored": scored,
+        "seconds": round(time.time() - started, 1),
+        "churn_model_version": scorer.churn_model_version,
+        "ltv_model_version": scorer.ltv_model_version,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score all customer profiles for churn and LTV')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('SCORING_JOB_WORKERS', 4)),
+                        help='Worker processes (one shard each)')
+    parser.add_argument('--chunk-size', type=int, default=int(os.getenv('SCORING_JOB_CHUNK_SIZE', 5000)),
+                        help='Profiles fetched, scored and written per chunk')
+    args = parser.parse_args()
+
+    print(f"Scoring profiles: {args.workers} shards, chunks of {args.chunk_size}")
+    started = time.time()
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(score_shard, shard, args.workers, args.chunk_size)
+            for shard in range(args.workers)
+        ]
+
+        failed = 0
+        total = 0
+        for future in futures:
+            try:
+                result = future.result()
+                total += result['scored']
+                print(f"  ✅ Shard {result['shard']}: {result['scored']} profiles in {result['seconds']}s "
+                      f"(churn v{result['churn_model_version']}, ltv v{result['ltv_model_version']})")
+            except Exception as e:
+                failed += 1
+                print(f"  ⚠️  Shard failed: {e}")
+
+    elapsed = time.time() - started
+    if failed:
+        print(f"⚠️  Scored {total} profiles in {elapsed:.1f}s, {failed} shard(s) failed")
+        sys.exit(1)
+    print(f"✅ Scored {total} profiles in {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
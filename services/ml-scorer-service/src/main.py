@@ -6,18 +6,27 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, Dict, List
-import mlflow
 import os
 from dotenv import load_dotenv
 import sys
 
 # Add feature engineering path
 sys.path.append(os.path.join(os.path.dirname(__file__), '../../../ml/feature-engineering/src'))
-from identity_features import extract_pairwise_features
+from identity_features import PAIRWISE_FEATURE_NAMES, extract_features_matrix, extract_pairwise_features
+
+# Add shared ML modules path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../../ml/common/src'))
+from db_pool import get_async_pool, pool_stats
+from model_resolver import ModelUnavailable, get_resolver
+from serving_bundle import BUNDLE_ARTIFACT_PATH, load_bundle
 
 from src.services.identity_scorer import IdentityScorer
 from src.services.explainer import ExplainerService
 from src.services.churn_ltv_scorer import ChurnLTVScorer
+from src.services.item_similarity import ItemSimilarityIndex
+from src.services.recommender import BundleRecommender
+from src.services.profile_features import canonical_profile_id, fetch_profile_rows, profile_feature_columns
+from src.services.score_store import fetch_fresh_scores, serving_from_table
 
 load_dotenv()
 
@@ -33,10 +42,12 @@ app.add_middleware(
 )
 
 # Initialize services
-mlflow.set_tracking_uri(os.getenv('MLFLOW_TRACKING_URI', 'http://localhost:5001'))
 identity_scorer = IdentityScorer()
 explainer_service = ExplainerService()
 churn_ltv_scorer = ChurnLTVScorer()
+item_similarity_index = ItemSimilarityIndex()
+# Queries run on the pool's threads, never on the event loop
+db = get_async_pool()
 
 
 class ScoreRequest(BaseModel):
@@ -50,6 +61,11 @@ class ScoreRequest(BaseModel):
     events_b: Optional[List[Dict]] = None
 
 
+class BatchScoreRequest(BaseModel):
+    pairs: List[ScoreRequest]
+    include_features: bool = True
+
+
 class ExplainRequest(BaseModel):
     profile_a_id: str
     profile_b_id: str
@@ -59,11 +75,17 @@ class ExplainRequest(BaseModel):
     identifiers_b: List[Dict]
     events_a: Optional[List[Dict]] = None
     events_b: Optional[List[Dict]] = None
+    mode: Optional[str] = None
+
+
+class BatchExplainRequest(BaseModel):
+    pairs: List[ExplainRequest]
+    mode: Optional[str] = None
 
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "service": "ml-scorer-service"}
+    return {"status": "healthy", "service": "ml-scorer-service", "db_pool": pool_stats()}
 
 
 @app.post("/v1/score/identity")
@@ -94,6 +116,45 @@ async def score_identity(request: ScoreRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/v1/score/identity/batch")
+async def score_identity_batch(request: BatchScoreRequest):
+    """Score many profile pairs in one call (scores returned in input order)"""
+    try:
+        feature_names = identity_scorer.feature_cols or PAIRWISE_FEATURE_NAMES
+        
+        # Extract features straight into a dense matrix in model order
+        X, feature_rows = extract_features_matrix(
+            [
+                (pair.profile_a, pair.profile_b, pair.identifiers_a,
+                 pair.identifiers_b, pair.events_a, pair.events_b)
+                for pair in request.pairs
+            ],
+            feature_names
+        )
+        
+        # Score all pairs with one model call
+        scores, model_version = identity_scorer.score_batch(X, feature_names)
+        
+        results = []
+        for pair, score, features in zip(request.pairs, scores, feature_rows):
+            result = {
+                "profile_a_id": pair.profile_a_id,
+                "profile_b_id": pair.profile_b_id,
+                "score": float(score),
+            }
+            if request.include_features:
+                result["features"] = features
+            results.append(result)
+        
+        return {
+            "results": results,
+            "count": len(results),
+            "model_version": model_version
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/v1/explain/identity")
 async def explain_identity(request: ExplainRequest):
     """Get SHAP explanation for identity score"""
@@ -109,13 +170,52 @@ async def explain_identity(request: ExplainRequest):
         )
         
         # Get explanation
-        explanation = explainer_service.explain(features)
+        explanation = explainer_service.explain(features, request.mode)
         
         return {
             "profile_a_id": request.profile_a_id,
             "profile_b_id": request.profile_b_id,
             "explanation": explanation
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/v1/explain/identity/batch")
+async def explain_identity_batch(request: BatchExplainRequest):
+    """Explain many profile pairs in one call (explanations returned in input order)"""
+    try:
+        feature_rows = [
+            extract_pairwise_features(
+                pair.profile_a,
+                pair.profile_b,
+                pair.identifiers_a,
+                pair.identifiers_b,
+                pair.events_a,
+                pair.events_b
+            )
+            for pair in request.pairs
+        ]
+        
+        # Cached rows are served from the LRU, the rest explained in one model call
+        explanations = explainer_service.explain_batch(feature_rows, request.mode)
+        
+        return {
+            "results": [
+                {
+                    "profile_a_id": pair.profile_a_id,
+                    "profile_b_id": pair.profile_b_id,
+                    "explanation": explanation
+                }
+                for pair, explanation in zip(request.pairs, explanations)
+            ],
+            "count": len(explanations),
+            "cache": explainer_service.cache.info()
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -124,55 +224,72 @@ class RecommendationRequest(BaseModel):
     user_id: str
     item_ids: Optional[List[str]] = None
     n_recommendations: int = 10
+    exclude_seen: bool = True
 
 
-@app.post("/v1/recommendations/predict")
-async def predict_recommendations(request: RecommendationRequest):
-    """Get ML-based recommendations using LightFM"""
-    try:
-        import mlflow.pyfunc
-        
-        # Load recommendation model
+_recommendation_model = None
+
+
+def _load_recommendation_artifact(resolved):
+    if BUNDLE_ARTIFACT_PATH in resolved.paths:
+        return BundleRecommender(load_bundle(resolved.artifact(BUNDLE_ARTIFACT_PATH)))
+    # Unpickling the pyfunc wrapper is the only path that needs MLflow
+    import mlflow.pyfunc
+
+    return mlflow.pyfunc.load_model(resolved.path)
+
+
+def get_recommendation_model():
+    """Recommendation model, resolved and loaded from the local artifact cache on first use"""
+    global _recommendation_model
+    if _recommendation_model is None:
+        resolver = get_resolver()
         model_name = os.getenv('RECOMMENDATION_MODEL_NAME', 'recommendation-model')
-        client = mlflow.tracking.MlflowClient()
         
         try:
-            latest_version = client.get_latest_versions(model_name, stages=["Production", "Staging", "None"])
-            if latest_version:
-                model_uri = f"models:/{model_name}/{latest_version[0].version}"
-            else:
-                # Fallback
-                experiment = mlflow.get_experiment_by_name("recommendation-model")
-                if experiment:
-                    runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id], order_by=["start_time DESC"], max_results=1)
-                    if not runs.empty:
-                        run_id = runs.iloc[0]['run_id']
-                        model_uri = f"runs:/{run_id}/models"
-                    else:
-                        raise ValueError("No recommendation model found")
-                else:
-                    raise ValueError("Experiment not found")
-        except Exception as e:
+            # One registry lookup; runs logged before serving bundles fall back to the pyfunc wrapper
+            _recommendation_model, _ = resolver.load(
+                model_name,
+                _load_recommendation_artifact,
+                experiment="recommendation-model",
+                artifacts=(BUNDLE_ARTIFACT_PATH,),
+                fallbacks=[('models',)]
+            )
+        except ModelUnavailable as e:
             raise HTTPException(status_code=503, detail=f"Model not available: {e}")
+    return _recommendation_model
+
+
+@app.post("/v1/recommendations/predict")
+async def predict_recommendations(request: RecommendationRequest):
+    """Get ML-based recommendations using LightFM"""
+    try:
+        model = get_recommendation_model()
         
-        # Load model
-        model = mlflow.pyfunc.load_model(model_uri)
+        # Models trained with seen-item masking expose recommend(): candidates
+        # default to the model's own catalog and cold-start users get the
+        # shipped popularity list without scoring
+        wrapper = model if isinstance(model, BundleRecommender) else model.unwrap_python_model()
+        if hasattr(wrapper, 'recommend') and getattr(wrapper, 'seen_indptr', None) is not None:
+            result = wrapper.recommend(
+                request.user_id,
+                item_ids=request.item_ids,
+                n=request.n_recommendations,
+                exclude_seen=request.exclude_seen
+            )
+            return {
+                "recommendations": [
+                    {"item_id": item_id, "score": float(score)}
+                    for item_id, score in result['recommendations']
+                ],
+                "method": result['method']
+            }
         
         # Get all items if not specified
         if request.item_ids is None:
             # Fetch from database or use cached list
-            import psycopg2
-            conn = psycopg2.connect(
-                host=os.getenv('POSTGRES_HOST', 'localhost'),
-                port=int(os.getenv('POSTGRES_PORT', 5432)),
-                database=os.getenv('POSTGRES_DB', 'retail_brain'),
-                user=os.getenv('POSTGRES_USER', 'retail_brain_user'),
-                password=os.getenv('POSTGRES_PASSWORD', 'retail_brain_pass')
-            )
-            with conn.cursor() as cur:
-                cur.execute("SELECT DISTINCT sku FROM product_catalog LIMIT 1000")
-                item_ids = [row[0] for row in cur.fetchall()]
-            conn.close()
+            rows = await db.fetchall("SELECT DISTINCT sku FROM product_catalog LIMIT 1000")
+            item_ids = [row[0] for row in rows]
         else:
             item_ids = request.item_ids
         
@@ -204,6 +321,50 @@ async def predict_recommendations(request: RecommendationRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class SimilarItemsRequest(BaseModel):
+    item_id: str
+    n: int = 10
+
+
+class SimilarItemsBatchRequest(BaseModel):
+    item_ids: List[str]
+    n: int = 10
+
+
+@app.post("/v1/recommendations/similar")
+async def similar_items(request: SimilarItemsRequest):
+    """Get precomputed similar items for a product"""
+    if not item_similarity_index.loaded:
+        raise HTTPException(status_code=503, detail="Item similarity not available")
+    
+    similar = item_similarity_index.similar(request.item_id, request.n)
+    return {
+        "item_id": request.item_id,
+        "similar_items": [
+            {"item_id": item_id, "score": score}
+            for item_id, score in similar
+        ],
+        "model_version": item_similarity_index.model_version
+    }
+
+
+@app.post("/v1/recommendations/similar/batch")
+async def similar_items_batch(request: SimilarItemsBatchRequest):
+    """Get similar items for a set of products (e.g. a cart)"""
+    if not item_similarity_index.loaded:
+        raise HTTPException(status_code=503, detail="Item similarity not available")
+    
+    similar = item_similarity_index.similar_to_items(request.item_ids, request.n)
+    return {
+        "item_ids": request.item_ids,
+        "similar_items": [
+            {"item_id": item_id, "score": score}
+            for item_id, score in similar
+        ],
+        "model_version": item_similarity_index.model_version
+    }
+
+
 class ChurnPredictionRequest(BaseModel):
     profile_id: str
     profile_features: Optional[Dict] = None
@@ -214,59 +375,108 @@ class LTVPredictionRequest(BaseModel):
     profile_features: Optional[Dict] = None
 
 
+class ProfileBatchPredictionRequest(BaseModel):
+    profile_ids: List[str]
+
+
+# Upper bound on profile ids per batch prediction call
+MAX_PROFILE_BATCH_SIZE = int(os.getenv('MAX_PROFILE_BATCH_SIZE', 5000))
+
+
+EMPTY_PROFILE_FEATURES = {
+    'total_orders': 0,
+    'total_spent': 0.0,
+    'avg_order_value': 0.0,
+    'days_since_first_seen': 0,
+    'days_since_last_purchase': 0,
+}
+
+
+def fetch_churn_features(conn, profile_id: str) -> Dict:
+    """Churn model features of one profile (zeros when it does not exist)"""
+    from datetime import datetime, timezone
+    
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT 
+                total_orders,
+                total_spent,
+                avg_order_value,
+                first_seen_at,
+                last_seen_at,
+                last_purchase_at
+            FROM customer_profile
+            WHERE id = %s
+        """, (profile_id,))
+        row = cur.fetchone()
+    
+    if not row:
+        return dict(EMPTY_PROFILE_FEATURES)
+    total_orders, total_spent, avg_order_value, first_seen, last_seen, last_purchase = row
+    now = datetime.now(timezone.utc)
+    days_since_first = (now - first_seen).days if first_seen else 0
+    days_since_last = (now - last_purchase).days if last_purchase else (now - last_seen).days if last_seen else 0
+    
+    return {
+        'total_orders': total_orders or 0,
+        'total_spent': float(total_spent or 0),
+        'avg_order_value': float(avg_order_value or 0),
+        'days_since_first_seen': days_since_first,
+        'days_since_last_purchase': days_since_last,
+    }
+
+
+def fetch_ltv_features(conn, profile_id: str) -> Dict:
+    """LTV model features of one profile (zeros when it does not exist)"""
+    from datetime import datetime, timezone
+    
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT 
+                total_orders,
+                total_spent,
+                avg_order_value,
+                first_seen_at,
+                last_purchase_at
+            FROM customer_profile
+            WHERE id = %s
+        """, (profile_id,))
+        row = cur.fetchone()
+    
+    if not row:
+        return dict(EMPTY_PROFILE_FEATURES)
+    total_orders, total_spent, avg_order_value, first_seen, last_purchase = row
+    now = datetime.now(timezone.utc)
+    days_since_first = (now - first_seen).days if first_seen else 0
+    days_since_last = (now - last_purchase).days if last_purchase else 0
+    
+    return {
+        'total_orders': total_orders or 0,
+        'total_spent': float(total_spent or 0),
+        'avg_order_value': float(avg_order_value or 0),
+        'days_since_first_seen': days_since_first,
+        'days_since_last_purchase': days_since_last,
+    }
+
+
 @app.post("/v1/predict/churn")
 async def predict_churn(request: ChurnPredictionRequest):
     """Predict churn probability for a profile"""
     try:
+        # Serve the nightly score when it is still fresh
+        if request.profile_features is None and serving_from_table():
+            precomputed = await db.run(lookup_precomputed_scores, [request.profile_id])
+            if precomputed[0] is not None:
+                return {
+                    "profile_id": request.profile_id,
+                    "churn_probability": precomputed[0]["churn_probability"],
+                    "model_version": precomputed[0]["churn_model_version"],
+                    "source": "table"
+                }
+        
         # Get profile features from database if not provided
         if request.profile_features is None:
-            import psycopg2
-            from datetime import datetime, timezone
-            
-            conn = psycopg2.connect(
-                host=os.getenv('POSTGRES_HOST', 'localhost'),
-                port=int(os.getenv('POSTGRES_PORT', 5432)),
-                database=os.getenv('POSTGRES_DB', 'retail_brain'),
-                user=os.getenv('POSTGRES_USER', 'retail_brain_user'),
-                password=os.getenv('POSTGRES_PASSWORD', 'retail_brain_pass')
-            )
-            
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT 
-                        total_orders,
-                        total_spent,
-                        avg_order_value,
-                        first_seen_at,
-                        last_seen_at,
-                        last_purchase_at
-                    FROM customer_profile
-                    WHERE id = %s
-                """, (request.profile_id,))
-                row = cur.fetchone()
-                
-                if row:
-                    total_orders, total_spent, avg_order_value, first_seen, last_seen, last_purchase = row
-                    now = datetime.now(timezone.utc)
-                    days_since_first = (now - first_seen).days if first_seen else 0
-                    days_since_last = (now - last_purchase).days if last_purchase else (now - last_seen).days if last_seen else 0
-                    
-                    profile_features = {
-                        'total_orders': total_orders or 0,
-                        'total_spent': float(total_spent or 0),
-                        'avg_order_value': float(avg_order_value or 0),
-                        'days_since_first_seen': days_since_first,
-                        'days_since_last_purchase': days_since_last,
-                    }
-                else:
-                    profile_features = {
-                        'total_orders': 0,
-                        'total_spent': 0.0,
-                        'avg_order_value': 0.0,
-                        'days_since_first_seen': 0,
-                        'days_since_last_purchase': 0,
-                    }
-            conn.close()
+            profile_features = await db.run(fetch_churn_features, request.profile_id)
         else:
             profile_features = request.profile_features
         
@@ -286,54 +496,20 @@ async def predict_churn(request: ChurnPredictionRequest):
 async def predict_ltv(request: LTVPredictionRequest):
     """Predict LTV for a profile"""
     try:
+        # Serve the nightly score when it is still fresh
+        if request.profile_features is None and serving_from_table():
+            precomputed = await db.run(lookup_precomputed_scores, [request.profile_id])
+            if precomputed[0] is not None:
+                return {
+                    "profile_id": request.profile_id,
+                    "predicted_ltv": precomputed[0]["predicted_ltv"],
+                    "model_version": precomputed[0]["ltv_model_version"],
+                    "source": "table"
+                }
+        
         # Get profile features from database if not provided
         if request.profile_features is None:
-            import psycopg2
-            from datetime import datetime, timezone
-            
-            conn = psycopg2.connect(
-                host=os.getenv('POSTGRES_HOST', 'localhost'),
-                port=int(os.getenv('POSTGRES_PORT', 5432)),
-                database=os.getenv('POSTGRES_DB', 'retail_brain'),
-                user=os.getenv('POSTGRES_USER', 'retail_brain_user'),
-                password=os.getenv('POSTGRES_PASSWORD', 'retail_brain_pass')
-            )
-            
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT 
-                        total_orders,
-                        total_spent,
-                        avg_order_value,
-                        first_seen_at,
-                        last_purchase_at
-                    FROM customer_profile
-                    WHERE id = %s
-                """, (request.profile_id,))
-                row = cur.fetchone()
-                
-                if row:
-                    total_orders, total_spent, avg_order_value, first_seen, last_purchase = row
-                    now = datetime.now(timezone.utc)
-                    days_since_first = (now - first_seen).days if first_seen else 0
-                    days_since_last = (now - last_purchase).days if last_purchase else 0
-                    
-                    profile_features = {
-                        'total_orders': total_orders or 0,
-                        'total_spent': float(total_spent or 0),
-                        'avg_order_value': float(avg_order_value or 0),
-                        'days_since_first_seen': days_since_first,
-                        'days_since_last_purchase': days_since_last,
-                    }
-                else:
-                    profile_features = {
-                        'total_orders': 0,
-                        'total_spent': 0.0,
-                        'avg_order_value': 0.0,
-                        'days_since_first_seen': 0,
-                        'days_since_last_purchase': 0,
-                    }
-            conn.close()
+            profile_features = await db.run(fetch_ltv_features, request.profile_id)
         else:
             profile_features = request.profile_features
         
@@ -349,6 +525,115 @@ async def predict_ltv(request: LTVPredictionRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def lookup_precomputed_scores(conn, profile_ids: List[str]) -> List[Optional[Dict]]:
+    """Fresh rows from profile_score for profile_ids (input order), None where missing or stale"""
+    scores = fetch_fresh_scores(
+        conn,
+        profile_ids,
+        churn_ltv_scorer.churn_model_version,
+        churn_ltv_scorer.ltv_model_version
+    )
+    return [scores.get(canonical_profile_id(profile_id)) for profile_id in profile_ids]
+
+
+def fetch_batch_inputs(conn, profile_ids: List[str]):
+    """(precomputed scores, profile ids to score online, their profile rows) on one connection"""
+    precomputed = [None] * len(profile_ids)
+    if serving_from_table():
+        precomputed = lookup_precomputed_scores(conn, profile_ids)
+    online_ids = [profile_id for profile_id, score in zip(profile_ids, precomputed) if score is None]
+    rows = fetch_profile_rows(conn, online_ids) if online_ids else {}
+    return precomputed, online_ids, rows
+
+
+async def predict_profiles_batch(profile_ids: List[str], churn: bool, ltv: bool) -> Dict:
+    """
+    Fetch profiles in one query and run each requested model once over all of them
+    
+    In SCORE_SERVING_MODE=table, fresh nightly scores are served from
+    profile_score and only missing or stale profiles are scored online.
+    """
+    if len(profile_ids) > MAX_PROFILE_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_PROFILE_BATCH_SIZE} profile_ids per request"
+        )
+    
+    from datetime import datetime, timezone
+    
+    precomputed, online_ids, rows = await db.run(fetch_batch_inputs, profile_ids)
+    
+    now = datetime.now(timezone.utc).timestamp()
+    churn_columns, ltv_columns, found = profile_feature_columns(online_ids, rows, now)
+    n_rows = len(online_ids)
+    
+    online_results = [{"profile_id": profile_id, "found": bool(hit), "source": "online"}
+                      for profile_id, hit in zip(online_ids, found)]
+    response = {"count": len(profile_ids)}
+    
+    if churn:
+        churn_probs, churn_version = churn_ltv_scorer.predict_churn_batch(churn_columns, n_rows)
+        for result, churn_prob in zip(online_results, churn_probs.tolist()):
+            result["churn_probability"] = churn_prob
+        response["churn_model_version"] = churn_version
+    
+    if ltv:
+        predicted_ltvs, ltv_version = churn_ltv_scorer.predict_ltv_batch(ltv_columns, n_rows)
+        for result, predicted_ltv in zip(online_results, predicted_ltvs.tolist()):
+            result["predicted_ltv"] = predicted_ltv
+        response["ltv_model_version"] = ltv_version
+    
+    # Merge precomputed and online results back into input order
+    online_iter = iter(online_results)
+    results = []
+    for profile_id, score in zip(profile_ids, precomputed):
+        if score is None:
+            results.append(next(online_iter))
+            continue
+        result = {"profile_id": profile_id, "found": True, "source": "table"}
+        if churn:
+            result["churn_probability"] = score["churn_probability"]
+        if ltv:
+            result["predicted_ltv"] = score["predicted_ltv"]
+        results.append(result)
+    
+    response["results"] = results
+    return response
+
+
+@app.post("/v1/predict/churn/batch")
+async def predict_churn_batch(request: ProfileBatchPredictionRequest):
+    """Predict churn probability for many profiles (results in input order)"""
+    try:
+        return await predict_profiles_batch(request.profile_ids, churn=True, ltv=False)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/v1/predict/ltv/batch")
+async def predict_ltv_batch(request: ProfileBatchPredictionRequest):
+    """Predict LTV for many profiles (results in input order)"""
+    try:
+        return await predict_profiles_batch(request.profile_ids, churn=False, ltv=True)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/v1/predict/churn-ltv/batch")
+async def predict_churn_ltv_batch(request: ProfileBatchPredictionRequest):
+    """Predict churn and LTV together for many profiles from one profile fetch"""
+    try:
+        return await predict_profiles_batch(request.profile_ids, churn=True, ltv=True)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv('ML_SCORER_PORT', 3015))
@@ -2,11 +2,16 @@
 Churn and LTV Prediction Scorer
 Loads and scores churn/LTV models from MLflow
 """
-import mlflow
-import mlflow.lightgbm
+import numpy as np
 import os
+import sys
 from typing import Dict, Optional, Tuple
-import pandas as pd
+
+from src.services.scoring_core import BoosterScorer
+
+# Add shared ML modules path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../../../ml/common/src'))
+from model_resolver import load_lightgbm
 
 class ChurnLTVScorer:
     """Scores churn and LTV predictions"""
@@ -14,41 +19,38 @@ class ChurnLTVScorer:
     def __init__(self):
         self.churn_model = None
         self.ltv_model = None
+        self.churn_scorer = None
+        self.ltv_scorer = None
         self.churn_model_version = "not_loaded"
         self.ltv_model_version = "not_loaded"
         self._load_models()
     
     def _load_models(self):
-        """Load churn and LTV models from MLflow"""
-        mlflow.set_tracking_uri(os.getenv('MLFLOW_TRACKING_URI', 'http://localhost:5001'))
-        client = mlflow.tracking.MlflowClient()
-        
+        """Load churn and LTV models via the local artifact cache"""
         # Load churn model
         try:
             churn_model_name = os.getenv('CHURN_MODEL_NAME', 'churn-prediction')
-            latest_churn = client.get_latest_versions(churn_model_name, stages=["Production", "Staging", "None"])
-            if latest_churn:
-                model_uri = f"models:/{churn_model_name}/{latest_churn[0].version}"
-                self.churn_model = mlflow.lightgbm.load_model(model_uri)
-                self.churn_model_version = latest_churn[0].version
-                print(f"✅ Churn model loaded: {model_uri}")
-            else:
-                print("⚠️  Churn model not found in MLflow")
+            self.churn_model, _, resolved = load_lightgbm(churn_model_name)
+            self.churn_scorer = BoosterScorer(
+                self.churn_model,
+                engine=os.getenv('CHURN_INFERENCE_ENGINE', 'booster')
+            )
+            self.churn_model_version = resolved.version
         except Exception as e:
+            self.churn_model = None
             print(f"⚠️  Failed to load churn model: {e}")
         
         # Load LTV model
         try:
             ltv_model_name = os.getenv('LTV_MODEL_NAME', 'ltv-prediction')
-            latest_ltv = client.get_latest_versions(ltv_model_name, stages=["Production", "Staging", "None"])
-            if latest_ltv:
-                model_uri = f"models:/{ltv_model_name}/{latest_ltv[0].version}"
-                self.ltv_model = mlflow.lightgbm.load_model(model_uri)
-                self.ltv_model_version = latest_ltv[0].version
-                print(f"✅ LTV model loaded: {model_uri}")
-            else:
-                print("⚠️  LTV model not found in MLflow")
+            self.ltv_model, _, resolved = load_lightgbm(ltv_model_name)
+            self.ltv_scorer = BoosterScorer(
+                self.ltv_model,
+                engine=os.getenv('LTV_INFERENCE_ENGINE', 'booster')
+            )
+            self.ltv_model_version = resolved.version
         except Exception as e:
+            self.ltv_model = None
             print(f"⚠️  Failed to load LTV model: {e}")
     
     def predict_churn(self, profile_features: Dict) -> Tuple[float, str]:
@@ -58,19 +60,8 @@ class ChurnLTVScorer:
             return 0.1, "fallback"
         
         try:
-            # Convert features to DataFrame
-            # For MVP, use simple features from profile
-            features_df = pd.DataFrame([{
-                'total_orders': profile_features.get('total_orders', 0),
-                'total_spent': profile_features.get('total_spent', 0),
-                'avg_order_value': profile_features.get('avg_order_value', 0),
-                'days_since_last_purchase': profile_features.get('days_since_last_purchase', 0),
-                'days_since_first_seen': profile_features.get('days_since_first_seen', 0),
-            }])
-            
-            # Predict
-            proba = self.churn_model.predict_proba(features_df)
-            churn_prob = float(proba[0][1]) if len(proba[0]) > 1 else float(proba[0][0])
+            # Binary booster output is the positive-class (churn) probability
+            churn_prob = self.churn_scorer.predict_one(profile_features)
             
             return churn_prob, self.churn_model_version
         except Exception as e:
@@ -85,22 +76,46 @@ class ChurnLTVScorer:
             return float(current_ltv * 1.5), "fallback"
         
         try:
-            # Convert features to DataFrame
-            features_df = pd.DataFrame([{
-                'total_orders': profile_features.get('total_orders', 0),
-                'total_spent': profile_features.get('total_spent', 0),
-                'avg_order_value': profile_features.get('avg_order_value', 0),
-                'days_since_first_seen': profile_features.get('days_since_first_seen', 0),
-                'days_since_last_purchase': profile_features.get('days_since_last_purchase', 0),
-            }])
-            
-            # Predict
-            prediction = self.ltv_model.predict(features_df)
-            predicted_ltv = float(prediction[0])
+            predicted_ltv = self.ltv_scorer.predict_one(profile_features)
             
             return max(0, predicted_ltv), self.ltv_model_version
         except Exception as e:
             print(f"Error predicting LTV: {e}")
             current_ltv = profile_features.get('total_spent', 0)
             return float(current_ltv * 1.5), "error"
-
+    
+    def predict_churn_batch(self, columns: Dict[str, np.ndarray], n_rows: int) -> Tuple[np.ndarray, str]:
+        """
+        Predict churn for many profiles with one booster call
+        
+        Args:
+            columns: Feature name -> array of n_rows values (missing features are 0)
+            n_rows: Number of profiles
+        
+        Returns:
+            Tuple of (churn probabilities in row order, model_version)
+        """
+        if self.churn_model is None:
+            return np.full(n_rows, 0.1), "fallback"
+        
+        X = self.churn_scorer.vectorizer.from_columns(columns, n_rows)
+        return self.churn_scorer.predict_matrix(X), self.churn_model_version
+    
+    def predict_ltv_batch(self, columns: Dict[str, np.ndarray], n_rows: int) -> Tuple[np.ndarray, str]:
+        """
+        Predict LTV for many profiles with one booster call
+        
+        Args:
+            columns: Feature name -> array of n_rows values (missing features are 0)
+            n_rows: Number of profiles
+        
+        Returns:
+            Tuple of (predicted LTVs in row order, model_version)
+        """
+        if self.ltv_model is None:
+            # Fallback: use current total_spent * 1.5
+            total_spent = columns.get('total_spent', np.zeros(n_rows))
+            return np.asarray(total_spent, dtype=np.float64) * 1.5, "fallback"
+        
+        X = self.ltv_scorer.vectorizer.from_columns(columns, n_rows)
+        return np.maximum(self.ltv_scorer.predict_matrix(X), 0), self.ltv_model_version
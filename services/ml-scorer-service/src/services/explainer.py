@@ -2,129 +2,164 @@
 SHAP Explainer Service
 Provides explainability for ML model predictions
 """
-try:
-    import shap
-    SHAP_AVAILABLE = True
-except ImportError:
-    SHAP_AVAILABLE = False
-import pandas as pd
+import hashlib
+import importlib.util
 import numpy as np
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Optional
 import os
-import pickle
-import mlflow
+import sys
 from dotenv import load_dotenv
 
+from src.services.scoring_core import FeatureVectorizer, as_booster
+
+# Add shared ML modules path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../../../ml/common/src'))
+from model_resolver import load_lightgbm
+
 load_dotenv()
 
+# Explanation modes: LightGBM's native contributions (pred_contrib) or SHAP
+MODE_FAST = 'fast'
+MODE_SHAP = 'shap'
+
+# shap (and its numba/sklearn chain) is only imported by the first SHAP-mode request
+SHAP_AVAILABLE = importlib.util.find_spec('shap') is not None
+
+
+class ExplanationCache:
+    """Bounded LRU of explanations keyed by (model version, mode, feature-vector hash)"""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def feature_hash(row: np.ndarray) -> str:
+        """Hash of one float32 feature row in model column order"""
+        return hashlib.blake2b(np.ascontiguousarray(row, dtype=np.float32).tobytes(), digest_size=16).hexdigest()
+
+    def get(self, key) -> Optional[Dict]:
+        with self._lock:
+            explanation = self._entries.get(key)
+            if explanation is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return explanation
+
+    def put(self, key, explanation: Dict):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = explanation
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def info(self) -> Dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
 
 class ExplainerService:
     """SHAP explainer service"""
     
     def __init__(self):
         self.explainer = None
+        self._explainer_lock = threading.Lock()
+        self._explainer_attempted = False
         self.model = None
+        self.vectorizer = None
+        self.model_version = "not_loaded"
+        self.num_iteration = None
+        self.default_mode = os.getenv('EXPLAIN_MODE', MODE_FAST)
+        self.cache = ExplanationCache(int(os.getenv('EXPLAIN_CACHE_SIZE', '10000')))
         self._load_explainer()
     
     def _load_explainer(self):
-        """Load SHAP explainer from MLflow"""
+        """Load the serving identity model; SHAP mode builds its TreeExplainer from it on first use"""
         try:
-            mlflow.set_tracking_uri(os.getenv('MLFLOW_TRACKING_URI', 'http://localhost:5000'))
-            
-            # Try to load explainer from latest run
-            experiment = mlflow.get_experiment_by_name("identity-resolution")
-            if experiment:
-                runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id], order_by=["start_time DESC"], max_results=1)
-                if not runs.empty:
-                    run_id = runs.iloc[0]['run_id']
-                    
-                    # Download explainer artifact
-                    client = mlflow.tracking.MlflowClient()
-                    artifact_path = f"runs:/{run_id}/explainability/shap_explainer.pkl"
-                    
-                    try:
-                        local_path = mlflow.artifacts.download_artifacts(artifact_path)
-                        with open(local_path, 'rb') as f:
-                            self.explainer = pickle.load(f)
-                        
-                        # Also load model for TreeExplainer
-                        model_uri = f"runs:/{run_id}/models"
-                        self.model = mlflow.lightgbm.load_model(model_uri)
-                        
-                        print("Loaded SHAP explainer")
-                    except Exception as e:
-                        print(f"Could not load SHAP explainer: {e}")
-                        # Create new explainer
-                        self._create_explainer()
+            model_name = os.getenv('ML_MODEL_NAME', 'identity-resolution')
+            model, _, resolved = load_lightgbm(model_name, experiment="identity-resolution")
+            self._set_model(model, resolved.version)
         except Exception as e:
             print(f"Warning: Failed to load explainer: {e}")
-            self._create_explainer()
     
-    def _create_explainer(self):
-        """Create new SHAP explainer from model"""
-        try:
-            if self.model:
-                self.explainer = shap.TreeExplainer(self.model)
-            else:
-                # Load model first
-                mlflow.set_tracking_uri(os.getenv('MLFLOW_TRACKING_URI', 'http://localhost:5000'))
-                experiment = mlflow.get_experiment_by_name("identity-resolution")
-                if experiment:
-                    runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id], order_by=["start_time DESC"], max_results=1)
-                    if not runs.empty:
-                        run_id = runs.iloc[0]['run_id']
-                        model_uri = f"runs:/{run_id}/models"
-                        self.model = mlflow.lightgbm.load_model(model_uri)
+    def _set_model(self, model, model_version: str):
+        """Adopt the identity model (all fast mode needs)"""
+        self.model = model
+        self.vectorizer = FeatureVectorizer(self.model.feature_name())
+        self.model_version = model_version
+        
+        best_iteration = getattr(as_booster(self.model), 'best_iteration', 0)
+        self.num_iteration = best_iteration if best_iteration and best_iteration > 0 else None
+    
+    def _get_explainer(self):
+        """SHAP TreeExplainer for the loaded model, created on first use (None if unavailable)"""
+        if not self._explainer_attempted and self.model is not None and SHAP_AVAILABLE:
+            with self._explainer_lock:
+                if not self._explainer_attempted:
+                    try:
+                        import shap
                         self.explainer = shap.TreeExplainer(self.model)
-        except Exception as e:
-            print(f"Could not create explainer: {e}")
-            self.explainer = None
+                    except Exception as e:
+                        print(f"Could not create explainer: {e}")
+                    self._explainer_attempted = True
+        return self.explainer
     
-    def explain(self, features: Dict) -> Dict:
-        """
-        Generate SHAP explanation for features
-        
-        Args:
-            features: Dictionary of feature values
-        
-        Returns:
-            Explanation dictionary with feature contributions
-        """
-        if self.explainer is None or self.model is None:
-            # Fallback: return feature importance based on rule weights
-            return {
-                "method": "rule-based",
-                "feature_contributions": {
-                    "phone_exact": features.get('phone_exact', 0) * 0.6,
-                    "email_exact": features.get('email_exact', 0) * 0.4,
-                    "name_sim": features.get('name_sim', 0) * 0.3,
-                    "device_overlap": features.get('device_overlap', 0) * 0.4,
-                    "common_orders_count": min(features.get('common_orders_count', 0) / 5, 1.0) * 0.2,
-                }
+    def _resolve_mode(self, mode: Optional[str]) -> str:
+        """Requested mode, falling back to fast when no SHAP explainer is loaded"""
+        mode = mode or self.default_mode
+        if mode not in (MODE_FAST, MODE_SHAP):
+            raise ValueError(f"Unknown explanation mode: {mode}")
+        if mode == MODE_SHAP and self._get_explainer() is None:
+            return MODE_FAST
+        return mode
+    
+    def _rule_based(self, features: Dict) -> Dict:
+        """Fallback: feature importance based on rule weights"""
+        return {
+            "method": "rule-based",
+            "feature_contributions": {
+                "phone_exact": features.get('phone_exact', 0) * 0.6,
+                "email_exact": features.get('email_exact', 0) * 0.4,
+                "name_sim": features.get('name_sim', 0) * 0.3,
+                "device_overlap": features.get('device_overlap', 0) * 0.4,
+                "common_orders_count": min(features.get('common_orders_count', 0) / 5, 1.0) * 0.2,
             }
+        }
+    
+    def _contributions(self, X: np.ndarray, mode: str):
+        """Per-feature contributions (n, n_features) and base values (n,) in log-odds"""
+        if mode == MODE_FAST:
+            # LightGBM's native TreeSHAP: last column is the expected value
+            contrib = as_booster(self.model).predict(X, num_iteration=self.num_iteration, pred_contrib=True)
+            return contrib[:, :-1], contrib[:, -1]
         
-        # Prepare features DataFrame
-        feature_df = pd.DataFrame([features])
-        feature_cols = self.model.feature_name()
-        
-        # Ensure all features are present
-        for col in feature_cols:
-            if col not in feature_df.columns:
-                feature_df[col] = 0
-        
-        X = feature_df[feature_cols]
-        
-        # Compute SHAP values
         shap_values = self.explainer.shap_values(X)
-        
-        # Get feature importance
         if isinstance(shap_values, list):
             shap_values = shap_values[1]  # For binary classification, use positive class
-        
-        # Create explanation
-        feature_contributions = {}
-        for i, col in enumerate(feature_cols):
-            feature_contributions[col] = float(shap_values[0][i])
+        expected_value = self.explainer.expected_value
+        base_value = float(expected_value[1] if isinstance(expected_value, list) else expected_value)
+        return np.asarray(shap_values), np.full(len(X), base_value)
+    
+    def _format(self, contributions: np.ndarray, base_value: float, mode: str) -> Dict:
+        """Build the explanation dict for one row"""
+        feature_contributions = {
+            col: float(value)
+            for col, value in zip(self.vectorizer.feature_names, contributions)
+        }
         
         # Sort by absolute contribution
         sorted_contributions = sorted(
@@ -134,12 +169,55 @@ class ExplainerService:
         )
         
         return {
-            "method": "shap",
+            "method": "lightgbm_contrib" if mode == MODE_FAST else "shap",
+            "model_version": self.model_version,
             "feature_contributions": feature_contributions,
             "top_contributors": [
                 {"feature": feat, "contribution": contrib}
                 for feat, contrib in sorted_contributions[:10]
             ],
-            "base_value": float(self.explainer.expected_value[1] if isinstance(self.explainer.expected_value, list) else self.explainer.expected_value)
+            "base_value": float(base_value)
         }
-
+    
+    def explain_matrix(self, X: np.ndarray, mode: Optional[str] = None) -> List[Dict]:
+        """
+        Explain each row of a float32 matrix in model column order
+        
+        Rows already in the cache are served from it; the remaining rows are
+        explained with a single model call.
+        """
+        mode = self._resolve_mode(mode)
+        keys = [(self.model_version, mode, ExplanationCache.feature_hash(row)) for row in X]
+        explanations = [self.cache.get(key) for key in keys]
+        
+        missing = [i for i, explanation in enumerate(explanations) if explanation is None]
+        if missing:
+            contributions, base_values = self._contributions(np.ascontiguousarray(X[missing]), mode)
+            for j, i in enumerate(missing):
+                explanations[i] = self._format(contributions[j], base_values[j], mode)
+                self.cache.put(keys[i], explanations[i])
+        
+        return explanations
+    
+    def explain(self, features: Dict, mode: Optional[str] = None) -> Dict:
+        """
+        Generate explanation for features
+        
+        Args:
+            features: Dictionary of feature values
+            mode: 'fast' (LightGBM pred_contrib) or 'shap'; defaults to EXPLAIN_MODE
+        
+        Returns:
+            Explanation dictionary with feature contributions
+        """
+        if self.model is None:
+            return self._rule_based(features)
+        
+        # Feature row in model column order (missing features are 0)
+        return self.explain_matrix(self.vectorizer.row(features), mode)[0]
+    
+    def explain_batch(self, feature_rows: List[Dict], mode: Optional[str] = None) -> List[Dict]:
+        """Explanations for many feature dicts (input order)"""
+        if self.model is None:
+            return [self._rule_based(features) for features in feature_rows]
+        return self.explain_matrix(self.vectorizer.matrix(feature_rows), mode)
@@ -2,14 +2,18 @@
 Identity Scorer Service
 Loads model from MLflow and provides scoring
 """
-import mlflow
-import mlflow.lightgbm
-import pandas as pd
 import numpy as np
-from typing import Dict, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 import os
+import sys
 from dotenv import load_dotenv
 
+from src.services.scoring_core import BoosterScorer
+
+# Add shared ML modules path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../../../ml/common/src'))
+from model_resolver import load_lightgbm
+
 load_dotenv()
 
 
@@ -20,63 +24,32 @@ class IdentityScorer:
         self.model = None
         self.model_version = None
         self.feature_cols = None
+        self.scorer = None
         self._load_model()
     
     def _load_model(self):
-        """Load latest model from MLflow"""
+        """Load the serving model (registry, else latest run) via the local artifact cache"""
         try:
-            mlflow.set_tracking_uri(os.getenv('MLFLOW_TRACKING_URI', 'http://localhost:5000'))
-            
-            # Get latest model version
-            client = mlflow.tracking.MlflowClient()
             model_name = os.getenv('ML_MODEL_NAME', 'identity-resolution')
+            self.model, _, resolved = load_lightgbm(model_name, experiment="identity-resolution")
+            self.model_version = resolved.version
             
-            try:
-                latest_version = client.get_latest_versions(model_name, stages=["Production", "Staging", "None"])
-                if latest_version:
-                    model_version = latest_version[0].version
-                    model_uri = f"models:/{model_name}/{model_version}"
-                else:
-                    # Fallback: get latest run
-                    experiment = mlflow.get_experiment_by_name("identity-resolution")
-                    if experiment:
-                        runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id], order_by=["start_time DESC"], max_results=1)
-                        if not runs.empty:
-                            run_id = runs.iloc[0]['run_id']
-                            model_uri = f"runs:/{run_id}/models"
-                            model_version = run_id
-                        else:
-                            raise ValueError("No model runs found")
-                    else:
-                        raise ValueError("Experiment not found")
-            except Exception:
-                # Fallback: use latest run
-                experiment = mlflow.get_experiment_by_name("identity-resolution")
-                if experiment:
-                    runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id], order_by=["start_time DESC"], max_results=1)
-                    if not runs.empty:
-                        run_id = runs.iloc[0]['run_id']
-                        model_uri = f"runs:/{run_id}/models"
-                        model_version = run_id
-                    else:
-                        raise ValueError("No model runs found")
-                else:
-                    raise ValueError("Experiment not found")
-            
-            # Load model
-            self.model = mlflow.lightgbm.load_model(model_uri)
-            self.model_version = model_version
-            
-            # Get feature columns from model
-            self.feature_cols = self.model.feature_name()
+            # Precompute feature name -> column map once
+            self.scorer = BoosterScorer(
+                self.model,
+                engine=os.getenv('IDENTITY_INFERENCE_ENGINE', 'booster')
+            )
+            self.feature_cols = self.scorer.feature_names
             
-            print(f"Loaded model version: {model_version}")
+            print(f"Loaded model version: {self.model_version}")
             print(f"Features: {len(self.feature_cols)}")
+            print(f"Inference engine: {self.scorer.engine}")
         
         except Exception as e:
             print(f"Warning: Failed to load ML model: {e}")
             print("Falling back to rule-based scoring")
             self.model = None
+            self.scorer = None
             self.model_version = "rule-based"
     
     def score(self, features: Dict) -> Tuple[float, str]:
@@ -100,19 +73,47 @@ class IdentityScorer:
             )
             return float(score), "rule-based"
         
-        # Prepare features DataFrame
-        feature_df = pd.DataFrame([features])
+        # Missing features are 0, columns in model order
+        score = self.scorer.predict_one(features)
         
-        # Ensure all feature columns are present
-        for col in self.feature_cols:
-            if col not in feature_df.columns:
-                feature_df[col] = 0
+        return score, self.model_version
+    
+    def score_batch(self, X: np.ndarray, feature_names: List[str]) -> Tuple[np.ndarray, str]:
+        """
+        Score many pairs with a single model call
         
-        # Select only model features in correct order
-        X = feature_df[self.feature_cols]
+        Args:
+            X: float32 matrix [n_pairs, n_features]; columns in feature_names
+                order, which must be the model's feature_name() order when a
+                model is loaded
+            feature_names: Column names of X
         
-        # Predict
-        score = self.model.predict(X, num_iteration=self.model.best_iteration)[0]
+        Returns:
+            Tuple of (scores array in row order, model_version)
+        """
+        if len(X) == 0:
+            return np.zeros(0, dtype=np.float64), self.model_version
         
-        return float(score), self.model_version
-
+        if self.model is None:
+            # Fallback to rule-based (weighted sum), column-wise
+            column_index = {name: idx for idx, name in enumerate(feature_names)}
+            
+            def column(name: str) -> np.ndarray:
+                idx = column_index.get(name)
+                return X[:, idx].astype(np.float64) if idx is not None else np.zeros(len(X))
+            
+            scores = (
+                0.6 * column('phone_exact') +
+                0.4 * column('email_exact') +
+                0.3 * column('name_sim') +
+                0.4 * column('device_overlap') +
+                0.2 * np.minimum(column('common_orders_count') / 5, 1.0)
+            )
+            return scores, "rule-based"
+        
+        if list(feature_names) != list(self.feature_cols):
+            raise ValueError("Feature matrix columns do not match model feature order")
+        
+        scores = self.scorer.predict_matrix(X)
+        
+        return scores, self.model_version
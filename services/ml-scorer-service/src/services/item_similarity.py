@@ -0,0 +1,111 @@
+"""
+Item Similarity Service
+Serves precomputed item-to-item similarity lists from the recommendation model run
+"""
+import numpy as np
+import os
+import sys
+from typing import Dict, List, Tuple
+from dotenv import load_dotenv
+
+# Add shared ML modules path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../../../ml/common/src'))
+from model_resolver import get_resolver
+from serving_bundle import BUNDLE_ARTIFACT_PATH, load_bundle
+
+load_dotenv()
+
+
+class ItemSimilarityIndex:
+    """Lookup of top-K similar items (no scoring at request time)"""
+
+    def __init__(self):
+        self.item_ids = None
+        self.item_index: Dict[str, int] = {}
+        self.neighbors = None
+        self.scores = None
+        self.model_version = "not_loaded"
+        self._load_index()
+
+    def _load_index(self):
+        """Load the similarity lists of the serving recommendation model via the local artifact cache"""
+        resolver = get_resolver()
+        model_name = os.getenv('RECOMMENDATION_MODEL_NAME', 'recommendation-model')
+        try:
+            # One registry lookup; runs logged before serving bundles ship an npz instead
+            _, resolved = resolver.load(
+                model_name,
+                self._read_artifact,
+                experiment="recommendation-model",
+                artifacts=(BUNDLE_ARTIFACT_PATH,),
+                fallbacks=[('similarity',)]
+            )
+            self.model_version = resolved.version
+
+            print(f"✅ Item similarity loaded: {len(self.item_ids)} items, top-{self.neighbors.shape[1]}")
+        except Exception as e:
+            print(f"⚠️  Item similarity not available: {e}")
+            self.item_ids = None
+
+    def _read_artifact(self, resolved):
+        if BUNDLE_ARTIFACT_PATH in resolved.paths:
+            self._read_bundle(resolved)
+        else:
+            self._read_npz(resolved)
+
+    def _read_bundle(self, resolved):
+        bundle = load_bundle(resolved.artifact(BUNDLE_ARTIFACT_PATH))
+        self._set_index(bundle['item_ids'], bundle['similarity_neighbors'], bundle['similarity_scores'])
+
+    def _read_npz(self, resolved):
+        with np.load(os.path.join(resolved.artifact('similarity'), 'item_similarity.npz')) as data:
+            self._set_index(data['item_ids'], data['neighbors'], data['scores'])
+
+    def _set_index(self, item_ids, neighbors, scores):
+        self.item_ids = item_ids
+        self.neighbors = neighbors
+        self.scores = scores
+        self.item_index = {item_id: idx for idx, item_id in enumerate(self.item_ids.tolist())}
+
+    @property
+    def loaded(self) -> bool:
+        return self.item_ids is not None
+
+    def similar(self, item_id: str, n: int = 10) -> List[Tuple[str, float]]:
+        """Top-N items similar to one item"""
+        idx = self.item_index.get(item_id)
+        if idx is None:
+            return []
+
+        n = min(n, self.neighbors.shape[1])
+        return [
+            (self.item_ids[j], float(score))
+            for j, score in zip(self.neighbors[idx, :n], self.scores[idx, :n])
+        ]
+
+    def similar_to_items(self, item_ids: List[str], n: int = 10) -> List[Tuple[str, float]]:
+        """
+        Top-N items similar to a set of items (e.g. a cart)
+
+        Neighbor lists of all known input items are merged by summing
+        similarity scores; the input items themselves are excluded.
+        """
+        rows = [self.item_index[iid] for iid in item_ids if iid in self.item_index]
+        if not rows:
+            return []
+
+        rows = np.array(rows, dtype=np.int64)
+        candidates = self.neighbors[rows].ravel()
+        weights = self.scores[rows].ravel()
+
+        unique_items, inverse = np.unique(candidates, return_inverse=True)
+        totals = np.bincount(inverse, weights=weights)
+        totals[np.isin(unique_items, rows)] = -np.inf
+
+        n = min(n, int(np.isfinite(totals).sum()))
+        if n <= 0:
+            return []
+        top = np.argpartition(-totals, n - 1)[:n]
+        top = top[np.argsort(-totals[top])]
+
+        return [(self.item_ids[unique_items[i]], float(totals[i])) for i in top]
@@ -0,0 +1,114 @@
+"""
+Profile Features
+Set-based customer_profile fetch and vectorized churn/LTV feature columns
+"""
+import uuid
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+SECONDS_PER_DAY = 86400
+
+# Columns the churn and LTV scorers read from customer_profile
+PROFILE_FEATURE_NAMES = [
+    'total_orders',
+    'total_spent',
+    'avg_order_value',
+    'days_since_first_seen',
+    'days_since_last_purchase',
+]
+
+# Timestamps come back as epoch seconds so date math stays in numpy
+PROFILE_COLUMNS_SQL = """
+        id::text,
+        total_orders,
+        total_spent,
+        avg_order_value,
+        EXTRACT(EPOCH FROM first_seen_at)::float8,
+        EXTRACT(EPOCH FROM last_seen_at)::float8,
+        EXTRACT(EPOCH FROM last_purchase_at)::float8"""
+
+PROFILE_BATCH_QUERY = f"""
+    SELECT {PROFILE_COLUMNS_SQL}
+    FROM customer_profile
+    WHERE id = ANY(%s::uuid[])
+"""
+
+
+def canonical_profile_id(profile_id: str) -> Optional[str]:
+    """Lowercase hyphenated UUID text, or None if profile_id is not a UUID"""
+    try:
+        return str(uuid.UUID(profile_id))
+    except (ValueError, AttributeError, TypeError):
+        return None
+
+
+def fetch_profile_rows(conn, profile_ids: List[str]) -> Dict[str, Tuple]:
+    """
+    Fetch many profiles with one WHERE id = ANY(...) query
+    
+    Ids that are not valid UUIDs are skipped (they cannot match a row).
+    Returns canonical profile_id -> (total_orders, total_spent,
+    avg_order_value, first_seen_epoch, last_seen_epoch, last_purchase_epoch).
+    """
+    valid_ids = {canonical_profile_id(profile_id) for profile_id in profile_ids}
+    valid_ids.discard(None)
+    
+    if not valid_ids:
+        return {}
+    
+    with conn.cursor() as cur:
+        cur.execute(PROFILE_BATCH_QUERY, (sorted(valid_ids),))
+        # id::text is already canonical UUID text
+        return {row[0]: row[1:] for row in cur.fetchall()}
+
+
+def _days_since(now: float, epoch_seconds: np.ndarray) -> np.ndarray:
+    """Whole days elapsed (floored like timedelta.days); NaN where the timestamp is missing"""
+    return np.floor((now - epoch_seconds) / SECONDS_PER_DAY)
+
+
+def profile_feature_columns(
+    profile_ids: List[str],
+    rows: Dict[str, Tuple],
+    now: float
+) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray], np.ndarray]:
+    """
+    Churn and LTV feature columns for profile_ids (input order), vectorized
+    
+    days_since_last_purchase differs between the models: churn falls back
+    to last_seen_at when there is no purchase, LTV falls back to 0.
+    Profiles not found get all-zero features, as in the single-profile
+    endpoints.
+    
+    Args:
+        profile_ids: Requested ids
+        rows: Output of fetch_profile_rows
+        now: Current time as epoch seconds
+    
+    Returns:
+        Tuple of (churn columns, LTV columns, found mask)
+    """
+    empty = (None, None, None, None, None, None)
+    ordered = [rows.get(canonical_profile_id(profile_id), empty) for profile_id in profile_ids]
+    found = np.array([row is not empty for row in ordered], dtype=bool)
+    
+    # None becomes NaN with dtype=float
+    values = np.array(ordered, dtype=np.float64).reshape(len(profile_ids), 6)
+    total_orders, total_spent, avg_order_value, first_seen, last_seen, last_purchase = values.T
+    
+    days_since_first = np.nan_to_num(_days_since(now, first_seen))
+    days_since_purchase = _days_since(now, last_purchase)
+    days_since_seen = _days_since(now, last_seen)
+    
+    shared = {
+        'total_orders': np.nan_to_num(total_orders),
+        'total_spent': np.nan_to_num(total_spent),
+        'avg_order_value': np.nan_to_num(avg_order_value),
+        'days_since_first_seen': days_since_first,
+    }
+    churn_columns = dict(shared, days_since_last_purchase=np.nan_to_num(
+        np.where(np.isnan(days_since_purchase), days_since_seen, days_since_purchase)
+    ))
+    ltv_columns = dict(shared, days_since_last_purchase=np.nan_to_num(days_since_purchase))
+    
+    return churn_columns, ltv_columns, found
@@ -0,0 +1,91 @@
+"""
+Bundle Recommender
+Serves LightFM recommendations from a memory-mapped serving bundle
+"""
+import numpy as np
+from typing import List, Optional
+
+
+class BundleRecommender:
+    """
+    Same recommend() contract as the training LightFMWrapper, computed from
+    the bundle's bias and embedding arrays instead of the pickled model
+    """
+
+    def __init__(self, bundle):
+        self.bundle = bundle
+        self.item_ids = bundle['item_ids']
+        self.user_embeddings = bundle['user_embeddings']
+        self.user_biases = bundle['user_biases']
+        self.item_embeddings = bundle['item_embeddings']
+        self.item_biases = bundle['item_biases']
+        self.seen_indptr = bundle['seen_indptr']
+        self.seen_indices = bundle['seen_indices']
+        self.popular_items = bundle['popular_items']
+
+    def seen_items(self, user_idx: int) -> np.ndarray:
+        """Item indices the user interacted with during training"""
+        if user_idx + 1 >= len(self.seen_indptr):
+            return np.array([], dtype=np.int32)
+        return self.seen_indices[self.seen_indptr[user_idx]:self.seen_indptr[user_idx + 1]]
+
+    def score(self, user_idx: int, candidates: np.ndarray) -> np.ndarray:
+        """LightFM score (no side features): bias_u + bias_i + <emb_u, emb_i>"""
+        return (
+            self.item_embeddings[candidates] @ self.user_embeddings[user_idx]
+            + self.item_biases[candidates]
+            + self.user_biases[user_idx]
+        )
+
+    def recommend(
+        self,
+        user_id,
+        item_ids: Optional[List[str]] = None,
+        n: int = 10,
+        exclude_seen: bool = True
+    ) -> dict:
+        """
+        Top-N items for a user
+
+        Known users are scored against the candidate items with seen items
+        masked out. Unknown (cold-start) users get the precomputed popularity
+        list without any scoring.
+
+        Returns:
+            Dictionary with 'recommendations' [(item_id, score)] and 'method'
+        """
+        if item_ids is None:
+            candidates = np.arange(len(self.item_ids), dtype=np.int32)
+        else:
+            candidates = self.bundle.index_of('item_ids', item_ids)
+            candidates = candidates[candidates >= 0].astype(np.int32)
+
+        user_idx = int(self.bundle.index_of('user_ids', [user_id])[0])
+        if user_idx < 0:
+            popular = np.asarray(self.popular_items)
+            if item_ids is not None:
+                popular = popular[np.isin(popular, candidates)]
+            popular = popular[:n]
+            # Popularity rank as a descending score in (0, 1]
+            ranked = [
+                (str(self.item_ids[idx]), 1.0 - rank / max(len(self.popular_items), 1))
+                for rank, idx in enumerate(popular)
+            ]
+            return {'recommendations': ranked, 'method': 'popularity'}
+
+        if exclude_seen:
+            candidates = candidates[~np.isin(candidates, self.seen_items(user_idx))]
+        if len(candidates) == 0:
+            return {'recommendations': [], 'method': 'ml'}
+
+        scores = self.score(user_idx, candidates)
+        k = min(n, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return {
+            'recommendations': [
+                (str(self.item_ids[candidates[i]]), float(scores[i])) for i in top
+            ],
+            'method': 'ml'
+        }
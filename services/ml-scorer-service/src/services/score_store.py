@@ -0,0 +1,133 @@
+"""
+Profile Score Store
+Reads and bulk-writes precomputed churn/LTV scores in profile_score
+"""
+import csv
+import io
+import os
+import numpy as np
+from typing import Dict, List, Optional
+
+from src.services.profile_features import canonical_profile_id
+
+# 'online' scores every request; 'table' serves fresh precomputed scores first
+SCORE_SERVING_MODE = os.getenv('SCORE_SERVING_MODE', 'online')
+
+# Precomputed scores older than this are stale (date features move daily)
+SCORE_MAX_AGE_HOURS = int(os.getenv('SCORE_MAX_AGE_HOURS', 36))
+
+SCORE_COLUMNS = [
+    'profile_id',
+    'churn_probability',
+    'churn_model_version',
+    'predicted_ltv',
+    'ltv_model_version',
+    'profile_updated_at',
+]
+
+# Only rows computed from the current profile state and recent enough
+FRESH_SCORES_QUERY = """
+    SELECT
+        s.profile_id::text,
+        s.churn_probability,
+        s.churn_model_version,
+        s.predicted_ltv,
+        s.ltv_model_version
+    FROM profile_score s
+    JOIN customer_profile p ON p.id = s.profile_id
+    WHERE s.profile_id = ANY(%s::uuid[])
+        AND s.profile_updated_at >= p.updated_at
+        AND s.scored_at >= NOW() - make_interval(hours => %s)
+"""
+
+
+def serving_from_table() -> bool:
+    return SCORE_SERVING_MODE == 'table'
+
+
+def _version_matches(stored: str, current: Optional[str]) -> bool:
+    """Stored scores are only valid for the model version currently loaded"""
+    if current in (None, 'not_loaded', 'fallback', 'error'):
+        # No model online: a precomputed model score beats the heuristic
+        return True
+    return stored == str(current)
+
+
+def fetch_fresh_scores(
+    conn,
+    profile_ids: List[str],
+    churn_model_version: Optional[str] = None,
+    ltv_model_version: Optional[str] = None,
+    max_age_hours: int = SCORE_MAX_AGE_HOURS
+) -> Dict[str, Dict]:
+    """
+    Precomputed scores that are still valid, keyed by canonical profile id
+
+    A row is stale (and left out) if the profile was updated after it was
+    scored, it is older than max_age_hours, or it was written by a model
+    version other than the one currently loaded.
+    """
+    valid_ids = {canonical_profile_id(profile_id) for profile_id in profile_ids}
+    valid_ids.discard(None)
+    if not valid_ids:
+        return {}
+
+    with conn.cursor() as cur:
+        cur.execute(FRESH_SCORES_QUERY, (sorted(valid_ids), max_age_hours))
+        rows = cur.fetchall()
+
+    scores = {}
+    for profile_id, churn_prob, churn_version, predicted_ltv, ltv_version in rows:
+        if not (_version_matches(churn_version, churn_model_version) and
+                _version_matches(ltv_version, ltv_model_version)):
+            continue
+        scores[profile_id] = {
+            "churn_probability": float(churn_prob),
+            "churn_model_version": churn_version,
+            "predicted_ltv": float(predicted_ltv),
+            "ltv_model_version": ltv_version,
+        }
+    return scores
+
+
+def copy_scores(
+    conn,
+    profile_ids: List[str],
+    churn_probs: np.ndarray,
+    churn_model_version: str,
+    predicted_ltvs: np.ndarray,
+    ltv_model_version: str,
+    profile_updated_at: List
+):
+    """
+    Bulk upsert one chunk of scores: COPY into a temp staging table, then
+    INSERT ... ON CONFLICT from it (COPY itself cannot upsert)
+
+    The caller commits.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in zip(profile_ids, churn_probs.tolist(), [churn_model_version] * len(profile_ids),
+                   predicted_ltvs.tolist(), [ltv_model_version] * len(profile_ids), profile_updated_at):
+        writer.writerow(row)
+    buffer.seek(0)
+
+    columns = ', '.join(SCORE_COLUMNS)
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS profile_score_staging
+            (LIKE profile_score INCLUDING DEFAULTS)
+            ON COMMIT DELETE ROWS
+        """)
+        cur.copy_expert(f"COPY profile_score_staging ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cur.execute(f"""
+            INSERT INTO profile_score ({columns}, scored_at)
+            SELECT {columns}, NOW() FROM profile_score_staging
+            ON CONFLICT (profile_id) DO UPDATE SET
+                churn_probability = EXCLUDED.churn_probability,
+                churn_model_version = EXCLUDED.churn_model_version,
+                predicted_ltv = EXCLUDED.predicted_ltv,
+                ltv_model_version = EXCLUDED.ltv_model_version,
+                profile_updated_at = EXCLUDED.profile_updated_at,
+                scored_at = EXCLUDED.scored_at
+        """)
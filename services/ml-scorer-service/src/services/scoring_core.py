@@ -0,0 +1,122 @@
+"""
+Scoring Core
+DataFrame-free single-row and batch inference for LightGBM boosters
+"""
+import threading
+import numpy as np
+from typing import Dict, List, Optional
+
+from src.services.tree_engine import CompiledTreeEnsemble
+
+# Inference engines selectable per scorer
+ENGINE_BOOSTER = 'booster'
+ENGINE_COMPILED = 'compiled'
+
+
+def as_booster(model):
+    """Return the underlying lgb.Booster of a Booster or sklearn LGBM model"""
+    return getattr(model, 'booster_', model)
+
+
+class FeatureVectorizer:
+    """Maps feature dicts onto model columns using a precomputed name -> index map"""
+
+    def __init__(self, feature_names: List[str]):
+        self.feature_names = list(feature_names)
+        self.column_index = {name: idx for idx, name in enumerate(self.feature_names)}
+        self._local = threading.local()
+
+    @property
+    def num_features(self) -> int:
+        return len(self.feature_names)
+
+    def row(self, features: Dict) -> np.ndarray:
+        """
+        Fill a reusable contiguous float32 buffer of shape (1, n_features)
+
+        The buffer is preallocated once per thread and overwritten on every
+        call, so callers must finish with it before the next call. Missing
+        features are 0; None values become NaN (LightGBM's missing value).
+        """
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = np.zeros((1, self.num_features), dtype=np.float32)
+            self._local.buffer = buffer
+        else:
+            buffer.fill(0)
+
+        column_index = self.column_index
+        for name, value in features.items():
+            col = column_index.get(name)
+            if col is not None:
+                buffer[0, col] = np.nan if value is None else value
+
+        return buffer
+
+    def matrix(self, rows: List[Dict]) -> np.ndarray:
+        """Build a new contiguous float32 matrix of shape (n_rows, n_features)"""
+        X = np.zeros((len(rows), self.num_features), dtype=np.float32)
+        column_index = self.column_index
+        for i, features in enumerate(rows):
+            for name, value in features.items():
+                col = column_index.get(name)
+                if col is not None:
+                    X[i, col] = np.nan if value is None else value
+        return X
+
+    def from_columns(self, columns: Dict[str, np.ndarray], n_rows: int) -> np.ndarray:
+        """Build a float32 matrix in model order from named column arrays (missing columns are 0)"""
+        X = np.zeros((n_rows, self.num_features), dtype=np.float32)
+        for name, values in columns.items():
+            col = self.column_index.get(name)
+            if col is not None:
+                X[:, col] = values
+        return X
+
+
+class BoosterScorer:
+    """
+    Scores feature dicts or matrices with a LightGBM booster, no pandas involved
+
+    engine='compiled' evaluates a CompiledTreeEnsemble built once from the
+    model dump instead of calling Booster.predict; models the compiler does
+    not support fall back to the booster.
+    """
+
+    def __init__(self, model, feature_names: Optional[List[str]] = None, engine: str = ENGINE_BOOSTER):
+        self.booster = as_booster(model)
+        self.vectorizer = FeatureVectorizer(feature_names or self.booster.feature_name())
+        best_iteration = getattr(self.booster, 'best_iteration', 0)
+        self.num_iteration = best_iteration if best_iteration and best_iteration > 0 else None
+
+        self.engine = ENGINE_BOOSTER
+        self.compiled = None
+        if engine == ENGINE_COMPILED:
+            try:
+                self.compiled = CompiledTreeEnsemble.from_booster(self.booster, self.num_iteration)
+                self.engine = ENGINE_COMPILED
+            except NotImplementedError as e:
+                print(f"⚠️  Compiled engine unavailable ({e}), using booster")
+        elif engine != ENGINE_BOOSTER:
+            raise ValueError(f"Unknown inference engine: {engine}")
+
+    @property
+    def feature_names(self) -> List[str]:
+        return self.vectorizer.feature_names
+
+    def predict_matrix(self, X: np.ndarray) -> np.ndarray:
+        """Model output for each row of a float32 matrix in feature_names order"""
+        if self.compiled is not None:
+            return self.compiled.predict(X)
+        return self.booster.predict(
+            np.ascontiguousarray(X, dtype=np.float32),
+            num_iteration=self.num_iteration
+        )
+
+    def predict_one(self, features: Dict) -> float:
+        """Model output for a single feature dict"""
+        return float(self.predict_matrix(self.vectorizer.row(features))[0])
+
+    def predict_many(self, rows: List[Dict]) -> np.ndarray:
+        """Model output for a list of feature dicts"""
+        return self.predict_matrix(self.vectorizer.matrix(rows))
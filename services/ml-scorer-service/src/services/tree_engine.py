@@ -0,0 +1,335 @@
+"""
+Compiled Tree Ensemble
+Array-backed inference engine for LightGBM model dumps
+"""
+import numpy as np
+from typing import Dict, List, Optional
+
+# LightGBM missing_type values in the model dump
+MISSING_NONE = 0
+MISSING_ZERO = 1
+MISSING_NAN = 2
+_MISSING_TYPES = {'None': MISSING_NONE, 'Zero': MISSING_ZERO, 'NaN': MISSING_NAN}
+
+# LightGBM's kZeroThreshold: |x| <= this counts as zero for missing_type=Zero
+ZERO_THRESHOLD = 1e-35
+
+# Leaves of a tree are tracked as bits of one uint64
+MAX_LEAVES = 64
+
+
+class CompiledTreeEnsemble:
+    """
+    LightGBM ensemble compiled into flat node tables
+
+    Split nodes of all trees are stored in one set of arrays (feature index,
+    threshold, default direction, missing type, left/right child offsets),
+    grouped by tree; leaf values are stored per tree in left-to-right order.
+    Each split also carries the bitmask of the leaves in its left subtree.
+
+    Scoring is fully vectorized (QuickScorer-style): every split is
+    evaluated for every row in one comparison, the left-subtree masks of
+    the splits that went right are OR-ed per tree, and the lowest leaf not
+    cleared is the exit leaf. Splits are padded to the same count per tree
+    and stored split-major so the per-tree reduction is elementwise. Trees without
+    splits are folded into a constant.
+
+    Only numerical splits on constant-leaf trees with at most 64 leaves are
+    supported; anything else raises NotImplementedError at compile time.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        default_left: np.ndarray,
+        missing_type: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        left_leaves: np.ndarray,
+        tree_starts: np.ndarray,
+        leaf_offsets: np.ndarray,
+        leaf_value: np.ndarray,
+        tree_class: np.ndarray,
+        constant: np.ndarray,
+        num_class: int,
+        objective: str,
+        feature_names: List[str],
+        average_output: bool = False,
+        num_iterations: int = 0
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.default_left = default_left
+        self.missing_type = missing_type
+        self.left = left
+        self.right = right
+        self.left_leaves = left_leaves
+        self.tree_starts = tree_starts
+        self.leaf_offsets = leaf_offsets
+        self.leaf_value = leaf_value
+        self.tree_class = tree_class
+        self.constant = constant
+        self.num_class = num_class
+        self.objective = objective
+        self.feature_names = feature_names
+        self.average_output = average_output
+        self.num_iterations = num_iterations
+        self._transform = _output_transform(objective)
+        self._build_padded_tables()
+
+    def _build_padded_tables(self):
+        """Lay splits out in padded, split-major scoring tables"""
+        num_trees = self.num_trees
+        ends = np.append(self.tree_starts[1:], self.num_splits)
+        counts = ends - self.tree_starts
+        self.splits_per_tree = int(counts.max()) if num_trees else 0
+
+        # Fewer than 32 leaves fit the masks into uint32
+        max_leaves = self.splits_per_tree + 1
+        self.mask_dtype = np.uint32 if max_leaves <= 32 else np.uint64
+
+        # Split-major layout: slot = rank within tree * num_trees + tree, so
+        # the per-tree reduction is an elementwise OR of num_trees-long rows
+        tree = np.repeat(np.arange(num_trees), counts)
+        rank = np.arange(self.num_splits) - np.repeat(self.tree_starts, counts)
+        slots = rank * num_trees + tree
+
+        # Padding splits never go right and clear no leaves
+        size = num_trees * self.splits_per_tree
+        feature = np.zeros(size, dtype=np.int64)
+        threshold = np.full(size, np.inf)
+        left_leaves = np.zeros(size, dtype=self.mask_dtype)
+        default_right = np.zeros(size, dtype=bool)
+        default_on_nan = np.zeros(size, dtype=bool)
+        default_on_zero = np.zeros(size, dtype=bool)
+
+        feature[slots] = self.feature
+        threshold[slots] = self.threshold
+        left_leaves[slots] = self.left_leaves.astype(self.mask_dtype)
+        default_right[slots] = ~self.default_left
+        default_on_nan[slots] = self.missing_type != MISSING_NONE
+        default_on_zero[slots] = self.missing_type == MISSING_ZERO
+
+        self._feature = feature
+        self._has_zero_missing = bool(default_on_zero.any())
+        self._one = self.mask_dtype(1)
+        # Exponent of 2**k from frexp is k + 1
+        leaf_base = self.leaf_offsets - 1
+
+        # Flat tables score one row; (size, 1) column views broadcast over a batch
+        self._row_tables = (threshold, left_leaves, default_right, default_on_nan, default_on_zero, leaf_base)
+        self._batch_tables = tuple(table[:, None] for table in self._row_tables)
+        # (num_class, num_trees) one-hot used to sum leaf values per class
+        self._class_matrix = np.eye(self.num_class, dtype=np.float64)[self.tree_class].T
+
+    @property
+    def num_trees(self) -> int:
+        return len(self.tree_starts)
+
+    @property
+    def num_splits(self) -> int:
+        return len(self.feature)
+
+    @classmethod
+    def from_booster(cls, booster, num_iteration: Optional[int] = None) -> 'CompiledTreeEnsemble':
+        """Compile a lgb.Booster (defaults to its best_iteration, if any)"""
+        if num_iteration is None:
+            best_iteration = getattr(booster, 'best_iteration', 0)
+            num_iteration = best_iteration if best_iteration and best_iteration > 0 else None
+        return cls.from_model_dump(booster.dump_model(num_iteration=num_iteration))
+
+    @classmethod
+    def from_model_dump(cls, dump: Dict) -> 'CompiledTreeEnsemble':
+        """Compile the dict returned by lgb.Booster.dump_model()"""
+        trees_per_iteration = int(dump.get('num_tree_per_iteration', 1))
+        num_class = max(int(dump.get('num_class', 1)), 1)
+
+        feature, threshold, default_left, missing_type = [], [], [], []
+        left, right, left_leaves = [], [], []
+        tree_starts, leaf_offsets, leaf_value, tree_class = [], [], [], []
+        constant = np.zeros(num_class, dtype=np.float64)
+
+        for position, tree in enumerate(dump['tree_info']):
+            if tree.get('is_linear'):
+                raise NotImplementedError("Linear trees are not supported")
+
+            root = tree['tree_structure']
+            class_idx = position % trees_per_iteration
+            if 'split_index' not in root:
+                constant[class_idx] += float(root['leaf_value'])
+                continue
+            if int(tree.get('num_leaves', 0)) > MAX_LEAVES:
+                raise NotImplementedError(f"Trees with more than {MAX_LEAVES} leaves are not supported")
+
+            tree_starts.append(len(feature))
+            leaf_offsets.append(len(leaf_value))
+            tree_class.append(class_idx)
+            base = len(feature)
+            tree_leaves = []
+
+            def compile_node(node) -> tuple:
+                """Append node's subtree; returns (child ref, first leaf, leaf count)"""
+                if 'split_index' not in node:
+                    tree_leaves.append(float(node['leaf_value']))
+                    leaf = len(tree_leaves) - 1
+                    # Leaf children are encoded as ~leaf_index (negative)
+                    return ~leaf, leaf, 1
+
+                if node.get('decision_type', '<=') != '<=':
+                    raise NotImplementedError(f"Unsupported decision_type {node['decision_type']!r}")
+
+                idx = len(feature)
+                feature.append(int(node['split_feature']))
+                threshold.append(float(node['threshold']))
+                default_left.append(bool(node.get('default_left', True)))
+                missing_type.append(_MISSING_TYPES[node.get('missing_type', 'None')])
+                left.append(0)
+                right.append(0)
+                left_leaves.append(0)
+
+                left_ref, first_leaf, left_count = compile_node(node['left_child'])
+                right_ref, _, right_count = compile_node(node['right_child'])
+                left[idx] = left_ref if left_ref < 0 else left_ref - base
+                right[idx] = right_ref if right_ref < 0 else right_ref - base
+                left_leaves[idx] = ((1 << left_count) - 1) << first_leaf
+                return idx, first_leaf, left_count + right_count
+
+            compile_node(root)
+            leaf_value.extend(tree_leaves)
+
+        return cls(
+            feature=np.array(feature, dtype=np.int32),
+            threshold=np.array(threshold, dtype=np.float64),
+            default_left=np.array(default_left, dtype=bool),
+            missing_type=np.array(missing_type, dtype=np.int8),
+            left=np.array(left, dtype=np.int32),
+            right=np.array(right, dtype=np.int32),
+            left_leaves=np.array(left_leaves, dtype=np.uint64),
+            tree_starts=np.array(tree_starts, dtype=np.int64),
+            leaf_offsets=np.array(leaf_offsets, dtype=np.int64),
+            leaf_value=np.array(leaf_value, dtype=np.float64),
+            tree_class=np.array(tree_class, dtype=np.int64),
+            constant=constant,
+            num_class=num_class,
+            objective=dump.get('objective', 'regression'),
+            feature_names=list(dump.get('feature_names', [])),
+            average_output=bool(dump.get('average_output', False)),
+            num_iterations=len(dump['tree_info']) // max(trees_per_iteration, 1)
+        )
+
+    def _exit_leaves(self, XT: np.ndarray) -> np.ndarray:
+        """
+        Exit leaf of every tree, as an index into leaf_value
+
+        XT is either one row of shape (num_features,) or a column block of
+        shape (num_features, n); the result is (num_trees,) or (num_trees, n).
+        """
+        (threshold, left_leaves, default_right,
+         default_on_nan, default_on_zero, leaf_base) = self._row_tables if XT.ndim == 1 else self._batch_tables
+
+        is_nan = np.isnan(XT)
+        any_nan = bool(is_nan.any())
+        if any_nan:
+            XT = np.where(is_nan, 0.0, XT)
+
+        values = XT.take(self._feature, axis=0)
+        go_right = values > threshold
+
+        # Default directions only matter for NaN inputs, or zeros at
+        # zero_as_missing splits
+        if any_nan or self._has_zero_missing:
+            use_default = np.zeros(go_right.shape, dtype=bool)
+            if any_nan:
+                use_default |= is_nan.take(self._feature, axis=0) & default_on_nan
+            if self._has_zero_missing:
+                use_default |= (np.abs(values) <= ZERO_THRESHOLD) & default_on_zero
+            go_right = np.where(use_default, default_right, go_right)
+
+        # Splits that went right clear their left-subtree leaves
+        cleared = left_leaves * go_right
+        cleared = np.bitwise_or.reduce(
+            cleared.reshape((self.splits_per_tree, self.num_trees) + XT.shape[1:]), axis=0
+        )
+        # Lowest leaf whose bit was not cleared, as 2**leaf
+        exit_bit = ~cleared & (cleared + self._one)
+        return leaf_base + np.frexp(exit_bit.astype(np.float64))[1]
+
+    def predict_leaves(self, X: np.ndarray) -> np.ndarray:
+        """Exit leaf index within each compiled tree: (n, num_trees)"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        leaves = self._exit_leaves(np.ascontiguousarray(X.T)) - self.leaf_offsets[:, None]
+        return leaves.T
+
+    def predict_raw(self, X: np.ndarray, chunk_size: int = 128) -> np.ndarray:
+        """Raw scores, shape (n,) or (n, num_class) for multiclass"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        raw = np.zeros((self.num_class, len(X)), dtype=np.float64)
+        if self.num_trees and len(X) == 1:
+            values = self.leaf_value.take(self._exit_leaves(X[0]))
+            raw[:, 0] = values.sum() if self.num_class == 1 else self._class_matrix @ values
+        elif self.num_trees:
+            for start in range(0, len(X), chunk_size):
+                XT = np.ascontiguousarray(X[start:start + chunk_size].T)
+                values = self.leaf_value.take(self._exit_leaves(XT))
+                if self.num_class == 1:
+                    raw[0, start:start + XT.shape[1]] = values.sum(axis=0)
+                else:
+                    raw[:, start:start + XT.shape[1]] = self._class_matrix @ values
+        raw += self.constant[:, None]
+
+        if self.average_output and self.num_iterations:
+            raw /= self.num_iterations
+
+        return raw[0] if self.num_class == 1 else raw.T
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Transformed output matching lgb.Booster.predict"""
+        return self._transform(self.predict_raw(X))
+
+
+def _sigmoid(raw: np.ndarray, scale: float = 1.0) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-scale * raw))
+
+
+def _softmax(raw: np.ndarray) -> np.ndarray:
+    shifted = np.exp(raw - raw.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+
+def _objective_param(objective: str, name: str, default: float) -> float:
+    for token in objective.split()[1:]:
+        key, _, value = token.partition(':')
+        if key == name:
+            return float(value)
+    return default
+
+
+def _output_transform(objective: str):
+    """Raw score -> prediction function for a LightGBM objective string"""
+    name = objective.split()[0] if objective else 'regression'
+
+    if name == 'binary':
+        scale = _objective_param(objective, 'sigmoid', 1.0)
+        return lambda raw: _sigmoid(raw, scale)
+    if name == 'multiclassova':
+        scale = _objective_param(objective, 'sigmoid', 1.0)
+        return lambda raw: _sigmoid(raw, scale)
+    if name in ('cross_entropy', 'xentropy'):
+        return _sigmoid
+    if name == 'multiclass':
+        return _softmax
+    if name in ('poisson', 'gamma', 'tweedie'):
+        return np.exp
+    if name == 'regression' and 'sqrt' in objective.split()[1:]:
+        raise NotImplementedError("reg_sqrt regression output is not supported")
+    if name in ('regression', 'regression_l1', 'huber', 'fair', 'quantile', 'mape',
+                'lambdarank', 'rank_xendcg', 'custom'):
+        return lambda raw: raw
+
+    raise NotImplementedError(f"Unsupported objective {objective!r}")
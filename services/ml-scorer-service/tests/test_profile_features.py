@@ -0,0 +1,51 @@
+"""
+Tests for set-based profile feature extraction
+"""
+import unittest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from src.services.profile_features import PROFILE_FEATURE_NAMES, profile_feature_columns
+
+PROFILE_A = '7c9e6679-7425-40de-944b-e07fc1f90ae7'
+PROFILE_B = '16fd2706-8baf-433b-82eb-8c7fada847da'
+
+
+class TestProfileFeatureColumns(unittest.TestCase):
+
+    def setUp(self):
+        self.now = datetime(2024, 6, 1, 12, tzinfo=timezone.utc)
+
+    def days_ago(self, days, hours=0):
+        return (self.now - timedelta(days=days, hours=hours)).timestamp()
+
+    def test_matches_single_profile_date_logic(self):
+        """Days floor like timedelta.days; churn falls back to last_seen, LTV to 0"""
+        rows = {
+            PROFILE_A: (3, Decimal('120.50'), Decimal('40.10'), self.days_ago(100, 3), self.days_ago(2), self.days_ago(5, 23)),
+            PROFILE_B: (1, Decimal('10'), Decimal('10'), self.days_ago(30), self.days_ago(7, 1), None),
+        }
+        churn, ltv, found = profile_feature_columns([PROFILE_A, PROFILE_B], rows, self.now.timestamp())
+
+        self.assertEqual(sorted(churn), sorted(PROFILE_FEATURE_NAMES))
+        self.assertEqual(found.tolist(), [True, True])
+        self.assertEqual(churn['total_spent'].tolist(), [120.5, 10.0])
+        self.assertEqual(churn['days_since_first_seen'].tolist(), [100, 30])
+        self.assertEqual(churn['days_since_last_purchase'].tolist(), [5, 7])
+        self.assertEqual(ltv['days_since_last_purchase'].tolist(), [5, 0])
+
+    def test_missing_and_invalid_ids_get_zero_features(self):
+        """Unknown ids and non-UUID ids are returned as not found with zeros; lookups ignore case"""
+        rows = {PROFILE_A: (2, Decimal('50'), Decimal('25'), None, None, None)}
+        ids = [PROFILE_A.upper(), PROFILE_B, 'not-a-uuid']
+        churn, ltv, found = profile_feature_columns(ids, rows, self.now.timestamp())
+
+        self.assertEqual(found.tolist(), [True, False, False])
+        self.assertEqual(churn['total_orders'].tolist(), [2, 0, 0])
+        for columns in (churn, ltv):
+            for name in PROFILE_FEATURE_NAMES:
+                self.assertEqual(columns[name][1:].tolist(), [0, 0], name)
+
+
+if __name__ == '__main__':
+    unittest.main()
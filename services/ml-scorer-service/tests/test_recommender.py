@@ -0,0 +1,73 @@
+"""
+Tests for serving recommendations from a LightFM serving bundle
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../../ml/common/src'))
+from serving_bundle import load_bundle, write_bundle
+
+from src.services.recommender import BundleRecommender
+
+
+class TestBundleRecommender(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        rng = np.random.default_rng(7)
+        self.user_embeddings = rng.normal(size=(3, 4)).astype(np.float32)
+        self.user_biases = rng.normal(size=3).astype(np.float32)
+        self.item_embeddings = rng.normal(size=(6, 4)).astype(np.float32)
+        self.item_biases = rng.normal(size=6).astype(np.float32)
+        write_bundle(
+            self.path,
+            'lightfm',
+            arrays={
+                'user_ids': np.array(['u2', 'u0', 'u1']),
+                'user_embeddings': self.user_embeddings,
+                'user_biases': self.user_biases,
+                'item_ids': np.array([f'sku-{i}' for i in range(6)]),
+                'item_embeddings': self.item_embeddings,
+                'item_biases': self.item_biases,
+                # u0 (row 1) has seen items 0 and 3
+                'seen_indptr': np.array([0, 0, 2, 2], dtype=np.int64),
+                'seen_indices': np.array([0, 3], dtype=np.int32),
+                'popular_items': np.array([4, 1, 5], dtype=np.int32),
+            },
+            indexed=('user_ids', 'item_ids')
+        )
+        self.recommender = BundleRecommender(load_bundle(self.path))
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def test_known_user_matches_lightfm_scoring(self):
+        result = self.recommender.recommend('u0', n=3)
+
+        expected = self.item_embeddings @ self.user_embeddings[1] + self.item_biases + self.user_biases[1]
+        expected[[0, 3]] = -np.inf
+        top = np.argsort(-expected)[:3]
+
+        self.assertEqual(result['method'], 'ml')
+        self.assertEqual([item for item, _ in result['recommendations']], [f'sku-{i}' for i in top])
+        np.testing.assert_allclose([score for _, score in result['recommendations']], expected[top], rtol=1e-5)
+
+    def test_candidate_items_and_seen_masking(self):
+        result = self.recommender.recommend('u0', item_ids=['sku-0', 'sku-2', 'unknown'], n=5)
+
+        self.assertEqual([item for item, _ in result['recommendations']], ['sku-2'])
+
+    def test_cold_start_user_gets_popular_items(self):
+        result = self.recommender.recommend('new-user', n=2)
+
+        self.assertEqual(result['method'], 'popularity')
+        self.assertEqual([item for item, _ in result['recommendations']], ['sku-4', 'sku-1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
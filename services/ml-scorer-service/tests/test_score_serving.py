@@ -0,0 +1,72 @@
+"""
+Tests for single-profile score serving from profile_score
+"""
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+from src import main
+
+PROFILE_ID = '7c9e6679-7425-40de-944b-e07fc1f90ae7'
+
+
+class FakeCursor:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        FakePool.query_threads.append(threading.current_thread())
+
+    def fetchone(self):
+        return None
+
+
+class FakePool:
+    """AsyncConnectionPool stand-in: fn(conn, *args) on a worker thread"""
+    query_threads = []
+
+    async def run(self, fn, *args):
+        return await asyncio.to_thread(fn, mock.Mock(cursor=FakeCursor), *args)
+
+
+class TestTableServing(unittest.TestCase):
+
+    def setUp(self):
+        patches = [
+            mock.patch.object(main, 'serving_from_table', return_value=True),
+            mock.patch.object(main, 'db', FakePool()),
+            mock.patch.object(FakePool, 'query_threads', []),
+            mock.patch.object(main.churn_ltv_scorer, 'predict_churn', return_value=(0.25, 'churn-v3')),
+            mock.patch.object(main.churn_ltv_scorer, 'predict_ltv', return_value=(310.0, 'ltv-v3')),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_missing_or_stale_score_falls_back_to_model(self):
+        with mock.patch.object(main, 'lookup_precomputed_scores', return_value=[None]):
+            churn = asyncio.run(main.predict_churn(main.ChurnPredictionRequest(profile_id=PROFILE_ID)))
+            ltv = asyncio.run(main.predict_ltv(main.LTVPredictionRequest(profile_id=PROFILE_ID)))
+
+        self.assertEqual((churn['churn_probability'], churn['model_version']), (0.25, 'churn-v3'))
+        self.assertEqual((ltv['predicted_ltv'], ltv['model_version']), (310.0, 'ltv-v3'))
+        self.assertNotIn('source', churn)
+        # Profile queries ran on pool threads, not on the event loop's
+        self.assertEqual(len(FakePool.query_threads), 2)
+        self.assertNotIn(threading.main_thread(), FakePool.query_threads)
+
+    def test_fresh_score_is_served_from_table(self):
+        stored = {'churn_probability': 0.8, 'churn_model_version': 'churn-v3',
+                  'predicted_ltv': 99.0, 'ltv_model_version': 'ltv-v3'}
+        with mock.patch.object(main, 'lookup_precomputed_scores', return_value=[stored]):
+            churn = asyncio.run(main.predict_churn(main.ChurnPredictionRequest(profile_id=PROFILE_ID)))
+
+        self.assertEqual((churn['churn_probability'], churn['source']), (0.8, 'table'))
+
+
+if __name__ == '__main__':
+    unittest.main()
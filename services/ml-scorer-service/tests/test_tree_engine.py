@@ -0,0 +1,120 @@
+"""
+Parity tests for the compiled tree ensemble engine
+"""
+import unittest
+
+import lightgbm as lgb
+import numpy as np
+
+from src.services.scoring_core import BoosterScorer
+from src.services.tree_engine import CompiledTreeEnsemble
+
+
+def make_data(n_rows=2000, n_features=8, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, n_features))
+    # Exact zeros and NaNs exercise the Zero/NaN missing-value paths
+    X[rng.random(X.shape) < 0.05] = 0.0
+    X[rng.random(X.shape) < 0.05] = np.nan
+    signal = np.nan_to_num(X[:, 0]) + 0.5 * np.nan_to_num(X[:, 1]) ** 2
+    return X, signal, rng
+
+
+def train(params, X, y, rounds=60, **kwargs):
+    params = {'verbose': -1, 'num_leaves': 31, 'seed': 7, **params}
+    return lgb.train(params, lgb.Dataset(X, label=y), num_boost_round=rounds, **kwargs)
+
+
+class TestCompiledTreeEnsemble(unittest.TestCase):
+
+    def assert_parity(self, booster, X, num_iteration=None):
+        compiled = CompiledTreeEnsemble.from_booster(booster, num_iteration)
+        expected = booster.predict(X, num_iteration=num_iteration)
+
+        np.testing.assert_allclose(compiled.predict(X), expected, rtol=1e-9, atol=1e-9)
+        # Single rows take the small-batch path
+        for i in range(5):
+            np.testing.assert_allclose(compiled.predict(X[i:i + 1]), expected[i:i + 1], rtol=1e-9, atol=1e-9)
+
+    def test_binary_parity(self):
+        """Binary classifier with missing values"""
+        X, signal, _ = make_data()
+        booster = train({'objective': 'binary'}, X, (signal > 0.5).astype(int))
+        self.assert_parity(booster, X)
+
+    def test_regression_parity(self):
+        """Regression (LTV-style) model"""
+        X, signal, rng = make_data(seed=1)
+        booster = train({'objective': 'regression'}, X, 100 * signal + rng.normal(size=len(X)))
+        self.assert_parity(booster, X)
+
+    def test_zero_as_missing_parity(self):
+        """zero_as_missing=True produces Zero missing_type splits"""
+        X, signal, _ = make_data(seed=2)
+        booster = train({'objective': 'binary', 'zero_as_missing': True}, X, (signal > 0).astype(int))
+        self.assert_parity(booster, X)
+
+    def test_multiclass_parity(self):
+        """Multiclass softmax output"""
+        X, signal, _ = make_data(seed=3)
+        y = np.digitize(signal, [-0.5, 0.5, 1.5])
+        booster = train({'objective': 'multiclass', 'num_class': 4}, X, y, rounds=20)
+        self.assert_parity(booster, X)
+
+    def test_best_iteration_parity(self):
+        """Early-stopped model is compiled at its best iteration"""
+        X, signal, _ = make_data(seed=4)
+        y = (signal > 0.5).astype(int)
+        train_set = lgb.Dataset(X[:1500], label=y[:1500])
+        valid_set = lgb.Dataset(X[1500:], label=y[1500:], reference=train_set)
+        booster = lgb.train(
+            {'objective': 'binary', 'verbose': -1, 'learning_rate': 0.3},
+            train_set,
+            num_boost_round=200,
+            valid_sets=[valid_set],
+            callbacks=[lgb.early_stopping(stopping_rounds=5, verbose=False)]
+        )
+        self.assertGreater(booster.best_iteration, 0)
+        self.assert_parity(booster, X, num_iteration=booster.best_iteration)
+
+    def test_single_leaf_trees(self):
+        """Trees without splits contribute their constant leaf value"""
+        X = np.zeros((50, 3))
+        y = np.linspace(0, 1, 50)
+        booster = train({'objective': 'regression', 'min_data_in_leaf': 100}, X, y, rounds=5)
+        self.assert_parity(booster, X)
+
+    def test_categorical_split_not_supported(self):
+        """Categorical splits are rejected at compile time"""
+        rng = np.random.default_rng(5)
+        X = rng.integers(0, 5, size=(500, 2)).astype(float)
+        y = (X[:, 0] == 3).astype(int)
+        booster = lgb.train(
+            {'objective': 'binary', 'verbose': -1, 'min_data_per_group': 1, 'cat_smooth': 1},
+            lgb.Dataset(X, label=y, categorical_feature=[0]),
+            num_boost_round=5
+        )
+        with self.assertRaises(NotImplementedError):
+            CompiledTreeEnsemble.from_booster(booster)
+
+    def test_booster_scorer_engines_agree(self):
+        """BoosterScorer gives the same scores with either engine"""
+        X, signal, _ = make_data(seed=6)
+        booster = train({'objective': 'binary'}, X, (signal > 0.5).astype(int))
+        names = booster.feature_name()
+        features = {name: float(X[3, i]) for i, name in enumerate(names) if not np.isnan(X[3, i])}
+
+        default = BoosterScorer(booster)
+        compiled = BoosterScorer(booster, engine='compiled')
+
+        self.assertEqual(compiled.engine, 'compiled')
+        self.assertAlmostEqual(default.predict_one(features), compiled.predict_one(features), places=9)
+        np.testing.assert_allclose(
+            default.predict_matrix(X[:100].astype(np.float32)),
+            compiled.predict_matrix(X[:100].astype(np.float32)),
+            rtol=1e-9, atol=1e-9
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -24,7 +24,7 @@ interface MLRecommendationResponse {
     item_id: string;
     score: number;
   }>;
-  method: 'ml' | 'rule_based_fallback';
+  method: 'ml' | 'popularity' | 'rule_based_fallback';
 }
 
 /**